@@ -0,0 +1,5 @@
+"""
+Benchmarks of bot's hot paths. Each module is runnable from "bot" directory, e.g.:
+
+    python -m benchmarks.deadlines_benchmark
+"""
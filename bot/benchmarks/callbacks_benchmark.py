@@ -0,0 +1,122 @@
+"""
+Benchmark of callback queries dispatching with `routes_count` registered callbacks: per-update time of Dispatcher.feed_update for
+    - magic filters F.data.startswith(...) with parsing of data in handler (previous style of bot's routers),
+    - aiogram filters CallbackData.filter() (each filter unpacks data),
+    - CallbackRouter (dictionary lookup by prefix, data is unpacked once).
+
+Handlers do not call Telegram API. Run from "bot" directory:
+    python -m benchmarks.callbacks_benchmark [routes_count]
+"""
+
+import asyncio
+import random
+import sys
+import types as python_types
+
+from time import perf_counter
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Update
+
+from bot_scripts.updates_processing import CallbackRouter
+
+from .fake_session import FAKE_TOKEN, FakeTelegramSession
+
+
+UPDATES_COUNT = 5_000
+USER_ID = 100
+
+
+def _make_callback_data_types(routes_count : int) -> list[type[CallbackData]]:
+    def add_fields(namespace : dict) -> None:
+        namespace["__annotations__"] = {"item_id" : int, "action" : str}
+    return [
+        python_types.new_class(f"Route{route_number}Callback", (CallbackData,), {"prefix" : f"r{route_number}"}, add_fields)
+        for route_number in range(routes_count)
+    ]
+
+
+def _build_magic_router(routes_count : int, handled : list) -> Router:
+    router = Router(name = "magic")
+    for route_number in range(routes_count):
+        async def handler(callback, route_number = route_number):
+            _, item_id, action = callback.data.split(":")
+            handled.append((route_number, int(item_id), action))
+        router.callback_query.register(handler, F.data.startswith(f"r{route_number}:"))
+    return router
+
+
+def _build_filter_router(callback_data_types : list[type[CallbackData]], handled : list) -> Router:
+    router = Router(name = "filters")
+    for route_number, callback_data_type in enumerate(callback_data_types):
+        async def handler(callback, callback_data, route_number = route_number):
+            handled.append((route_number, callback_data.item_id, callback_data.action))
+        router.callback_query.register(handler, callback_data_type.filter())
+    return router
+
+
+def _build_callback_router(callback_data_types : list[type[CallbackData]], handled : list) -> Router:
+    router = CallbackRouter(name = "callbacks")
+    for route_number, callback_data_type in enumerate(callback_data_types):
+        async def handler(callback, callback_data, route_number = route_number):
+            handled.append((route_number, callback_data.item_id, callback_data.action))
+        router.register_callback(handler, callback_data_type)
+    return router
+
+
+def _make_updates(callback_data_types : list[type[CallbackData]]) -> list[Update]:
+    random.seed(0)
+    updates = []
+    for update_number in range(UPDATES_COUNT):
+        callback_data_type = random.choice(callback_data_types)
+        updates.append(Update.model_validate({
+            "update_id" : update_number,
+            "callback_query" : {
+                "id" : str(update_number),
+                "chat_instance" : "1",
+                "from" : {"id" : USER_ID, "is_bot" : False, "first_name" : "user"},
+                "data" : callback_data_type(item_id = update_number, action = "open").pack(),
+            },
+        }))
+    return updates
+
+
+async def _measure(router : Router, updates : list[Update]) -> float:
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+    # Warming up
+    for update in updates[:100]:
+        await dispatcher.feed_update(bot, update)
+    started_at = perf_counter()
+    for update in updates:
+        await dispatcher.feed_update(bot, update)
+    duration = perf_counter() - started_at
+    await bot.session.close()
+    return duration / len(updates)
+
+
+def run_benchmark(routes_count : int = 300) -> None:
+    callback_data_types = _make_callback_data_types(routes_count)
+    updates = _make_updates(callback_data_types)
+
+    results = {}
+    for title, build_router in (
+            ("F.data.startswith + split", lambda handled: _build_magic_router(routes_count, handled)),
+            ("CallbackData.filter()", lambda handled: _build_filter_router(callback_data_types, handled)),
+            ("CallbackRouter", lambda handled: _build_callback_router(callback_data_types, handled)),
+        ):
+        handled = []
+        results[title] = asyncio.run(_measure(build_router(handled), updates))
+        assert len(handled) == len(updates) + 100, f"{title}: not all updates were handled"
+        assert handled[-1][1] == len(updates) - 1
+
+    print(f"Callback queries dispatching, {routes_count} routes, {UPDATES_COUNT} updates with random routes")
+    baseline = results["F.data.startswith + split"]
+    for title, duration in results.items():
+        print(f"{title:<28} {duration * 1e6:>9.1f} µs per update ({baseline / duration:.1f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,60 @@
+"""
+Benchmark of DeadlineScheduler with 100k active chats: cost of arming, cancelling and firing of deadlines.
+
+Run from "bot" directory:
+    python -m benchmarks.deadlines_benchmark [chats_count]
+"""
+
+import random
+import sys
+
+from time import perf_counter
+
+from delay_control import DeadlineScheduler
+
+
+def _measure(title : str, operations_count : int, function) -> None:
+    started_at = perf_counter()
+    function()
+    elapsed = perf_counter() - started_at
+    print(f"{title:<40} {operations_count:>8} ops  {elapsed * 1e3:9.1f} ms  {elapsed / operations_count * 1e6:7.3f} us/op")
+
+
+def run_benchmark(chats_count : int = 100_000) -> None:
+    random.seed(0)
+    now = 1_700_000_000.0
+    chats_ids = [-1_000_000_000_000 - chat_number for chat_number in range(chats_count)]
+    deadlines = [now + random.uniform(60, 3600) for _ in chats_ids]
+    scheduler = DeadlineScheduler()
+
+    def arm_all():
+        for chat_id, deadline in zip(chats_ids, deadlines):
+            scheduler.arm(chat_id, deadline)
+
+    cancelled_chats = random.sample(chats_ids, chats_count // 2)
+
+    def cancel_half():
+        for chat_id in cancelled_chats:
+            scheduler.cancel(chat_id)
+
+    def rearm_cancelled():
+        for chat_id in cancelled_chats:
+            scheduler.arm(chat_id, now + random.uniform(60, 3600))
+
+    def fire_all():
+        fired_count = 0
+        step_now = now
+        while scheduler.next_deadline() is not None:
+            step_now += 60
+            fired_count += len(scheduler.pop_expired(step_now))
+        assert fired_count == chats_count
+
+    print(f"DeadlineScheduler, {chats_count} active chats")
+    _measure("arm (empty -> full)", chats_count, arm_all)
+    _measure("cancel (manager replies)", len(cancelled_chats), cancel_half)
+    _measure("re-arm cancelled", len(cancelled_chats), rearm_cancelled)
+    _measure("next_deadline + pop_expired (fire all)", chats_count, fire_all)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
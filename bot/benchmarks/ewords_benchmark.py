@@ -0,0 +1,120 @@
+"""
+Benchmark of EwordsMatcher: 5k ewords of company against 100k customers' messages.
+
+Naive check (substring search of each eword in message) is measured on a sample of messages and extrapolated.
+Recompilation is measured with new distinct ewords and purged cache of "re" module, then the same recompilation
+is executed inside of event loop to measure the longest call of contains_eword while new pattern is compiled.
+
+Run from "bot" directory:
+    python -m benchmarks.ewords_benchmark [ewords_count] [messages_count]
+"""
+
+import asyncio
+import random
+import re
+import sys
+
+from time import perf_counter
+
+from delay_control import EwordsMatcher
+from delay_control.ewords_matcher import normalize_text
+
+
+NAIVE_SAMPLE_SIZE = 1000
+RECOMPILATIONS_COUNT = 10
+
+ALPHABETS = ("абвгдеёжзийклмнопрстуфхцчшщъыьэюя", "abcdefghijklmnopqrstuvwxyz")
+COMMON_EWORDS = ["спасибо", "Спасибо большое", "ок", "ok", "thanks", "благодарю", "Хорошо", "понял", "ясно", "до свидания"]
+
+
+def _random_word(length : int) -> str:
+    return "".join(random.choices(random.choice(ALPHABETS), k = length))
+
+
+def _naive_contains_eword(ewords : list[str], text : str) -> bool:
+    text = normalize_text(text)
+    for eword in ewords:
+        position = text.find(eword)
+        while position != -1:
+            end = position + len(eword)
+            if (position == 0 or not text[position - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                return True
+            position = text.find(eword, position + 1)
+    return False
+
+
+def _measure(title : str, operations_count : int, function) -> float:
+    started_at = perf_counter()
+    function()
+    elapsed = perf_counter() - started_at
+    print(f"{title:<40} {operations_count:>8} ops  {elapsed * 1e3:9.1f} ms  {elapsed / operations_count * 1e6:9.3f} us/op")
+    return elapsed
+
+
+def run_benchmark(ewords_count : int = 5_000, messages_count : int = 100_000) -> None:
+    random.seed(0)
+    ewords = COMMON_EWORDS + [_random_word(random.randint(3, 12)) for _ in range(ewords_count - len(COMMON_EWORDS))]
+    vocabulary = [_random_word(random.randint(2, 10)) for _ in range(20_000)]
+    messages = []
+    for _ in range(messages_count):
+        words = random.choices(vocabulary, k = random.randint(3, 30))
+        if random.random() < 0.3:
+            words.insert(random.randint(0, len(words)), random.choice(ewords).upper())
+        messages.append(" ".join(words))
+
+    matcher = EwordsMatcher()
+    results = []
+
+    def build():
+        matcher.add(ewords)
+        matcher.compile()
+
+    def match_all():
+        results.extend(matcher.contains_eword(message) for message in messages)
+
+    def recompile():
+        for _ in range(RECOMPILATIONS_COUNT):
+            matcher.add([_random_word(14)])
+            re.purge()
+            matcher.compile()
+
+    async def recompile_in_loop() -> tuple[float, float, int]:
+        new_eword = _random_word(14)
+        matcher.add([new_eword])
+        re.purge()
+        started_at = perf_counter()
+        longest_call, calls_count = 0.0, 0
+        while True:
+            call_started_at = perf_counter()
+            assert matcher.contains_eword(f"{messages[calls_count]} {new_eword}")
+            longest_call = max(longest_call, perf_counter() - call_started_at)
+            calls_count += 1
+            if matcher.is_compiled:
+                return perf_counter() - started_at, longest_call, calls_count
+            await asyncio.sleep(0)
+
+    normalized_ewords = [" ".join(normalize_text(eword).split()) for eword in ewords]
+    sample = messages[:NAIVE_SAMPLE_SIZE]
+
+    def naive_sample():
+        naive_results = [_naive_contains_eword(normalized_ewords, message) for message in sample]
+        assert naive_results == results[:len(sample)]
+
+    print(f"EwordsMatcher, {ewords_count} ewords, {messages_count} messages")
+    _measure("build (trie + regex compilation)", ewords_count, build)
+    matcher_elapsed = _measure("matcher: contains_eword", messages_count, match_all)
+    _measure("add of new eword + recompilation", RECOMPILATIONS_COUNT, recompile)
+    compilation_elapsed, longest_call, calls_count = asyncio.run(recompile_in_loop())
+    print(f"background recompilation: {compilation_elapsed * 1e3:.1f} ms, {calls_count} messages matched meanwhile, "
+          f"the longest call {longest_call * 1e3:.3f} ms")
+    naive_elapsed = _measure("naive substring loops (sample)", len(sample), naive_sample)
+    print(f"messages with ewords: {sum(results)}")
+    print(f"naive, extrapolated to {messages_count} messages: {naive_elapsed / len(sample) * messages_count:.1f} s "
+          f"(x{naive_elapsed / len(sample) * messages_count / matcher_elapsed:.0f} slower)")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100_000,
+    )
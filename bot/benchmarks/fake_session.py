@@ -0,0 +1,130 @@
+"""
+This module provides FakeTelegramSession - session of aiogram Bot which does not send requests to Telegram,
+but records them and answers like Telegram does. It is used to count API calls of bot's components and to load-test bot offline:
+
+    session = FakeTelegramSession(latency = (0.03, 0.12), too_many_requests_rate = 0.01)
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    ...
+    session.get_calls_count("sendMessage")
+"""
+
+import asyncio
+import random
+
+from collections import Counter
+from datetime import datetime
+from time import monotonic
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, Update, User
+
+
+FAKE_TOKEN = "42:FAKE"
+FAKE_BOT_ID = 42
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Records all requests as tuples (monotonic time, API method, chat ID, text).
+
+    Parameters:
+    -----------
+    server_errors_rate : float
+        share of requests which fail with TelegramServerError (5xx answer), failed requests are not recorded
+    latency : float | tuple[float, float]
+        seconds of answer waiting: constant or bounds of uniform distribution
+    too_many_requests_rate : float
+        share of requests which fail with TelegramRetryAfter (429 answer), failed requests are not recorded
+    retry_after : int
+        "retry_after" of 429 answers
+    pending_updates : list[Update] | None
+        updates returned by getUpdates (with respect to offset), by default getUpdates returns no updates
+    """
+
+    def __init__(
+            self,
+            server_errors_rate : float = 0.0,
+            latency : float | tuple[float, float] = 0.0,
+            too_many_requests_rate : float = 0.0,
+            retry_after : int = 1,
+            pending_updates : list[Update] | None = None,
+        ) -> None:
+        super().__init__()
+        self.server_errors_rate = server_errors_rate
+        self.latency = latency
+        self.too_many_requests_rate = too_many_requests_rate
+        self.retry_after = retry_after
+        self.pending_updates = pending_updates or []
+        self.calls : list[tuple[float, str, int | str | None, str | None]] = []
+        self.server_errors_count = 0
+        self.too_many_requests_count = 0
+        self._last_message_id = 0
+
+
+    async def _wait_answer(self) -> None:
+        if isinstance(self.latency, tuple):
+            await asyncio.sleep(random.uniform(*self.latency))
+        elif self.latency:
+            await asyncio.sleep(self.latency)
+
+
+    async def make_request(self, bot : Bot, method : TelegramMethod, timeout : int | None = None):
+        api_method = method.__api_method__
+        chat_id = getattr(method, "chat_id", None)
+        await self._wait_answer()
+        if self.server_errors_rate and random.random() < self.server_errors_rate:
+            self.server_errors_count += 1
+            raise TelegramServerError(method = method, message = "Internal Server Error")
+        if self.too_many_requests_rate and random.random() < self.too_many_requests_rate:
+            self.too_many_requests_count += 1
+            raise TelegramRetryAfter(
+                method = method,
+                message = f"Too Many Requests: retry after {self.retry_after}",
+                retry_after = self.retry_after,
+            )
+        self.calls.append((monotonic(), api_method, chat_id, getattr(method, "text", None)))
+
+        if api_method == "getUpdates":
+            offset = method.offset or 0
+            return [update for update in self.pending_updates if update.update_id >= offset][:method.limit or 100]
+        if api_method == "getMe":
+            return User(id = FAKE_BOT_ID, is_bot = True, first_name = "Fake bot", username = "fake_bot")
+        if api_method.startswith(("send", "copy", "forward")) or api_method == "editMessageText":
+            message_id = getattr(method, "message_id", None)
+            if message_id is None:
+                self._last_message_id += 1
+                message_id = self._last_message_id
+            return Message(
+                message_id = message_id,
+                date = datetime.now(),
+                chat = Chat(id = int(chat_id), type = "private" if int(chat_id) > 0 else "supergroup"),
+                text = getattr(method, "text", None),
+            )
+        return True
+
+
+    def get_calls_count(self, api_method : str | None = None) -> int:
+        if api_method is None:
+            return len(self.calls)
+        return sum(1 for call in self.calls if call[1] == api_method)
+
+
+    def get_calls_by_method(self) -> dict[str, int]:
+        return dict(Counter(call[1] for call in self.calls))
+
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.server_errors_count = 0
+        self.too_many_requests_count = 0
+
+
+    async def close(self) -> None:
+        pass
+
+
+    async def stream_content(self, url, headers = None, timeout = 30, chunk_size = 65536, raise_for_status = True):
+        yield b""
@@ -0,0 +1,158 @@
+"""
+Benchmark of GroupMessagePipeline on synthetic messages of customer chats: per-message cost of each stage and of whole pipeline.
+
+Database is seeded in temporary directory, bot's database is not touched. Run from "bot" directory:
+    python -m benchmarks.group_pipeline_benchmark [messages_count]
+"""
+
+import random
+import sqlite3 as sqlt
+import sys
+import tempfile
+
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+from aiogram import types
+
+from database import BotDBClient
+
+from delay_control import DeadlineScheduler, GroupMessagePipeline
+
+
+COMPANIES_COUNT = 20
+CHATS_COUNT = 2_000
+MANAGERS_PER_COMPANY = 5
+EWORDS_PER_COMPANY = 200
+MANAGER_MESSAGES_SHARE = 0.3
+
+
+def seed_database(database_client : BotDBClient) -> dict[int, list[int]]:
+    """
+    Fills database with companies, managers, ewords and customer chats. Returns managers' IDs by company.
+    """
+    managers_by_company = {
+        company_id : [company_id * 1000 + manager_number for manager_number in range(MANAGERS_PER_COMPANY)]
+        for company_id in range(1, COMPANIES_COUNT + 1)
+    }
+    with sqlt.connect(database_client.database_path) as connection:
+        connection.executemany("INSERT INTO companies (company_id, company_name) VALUES (?, ?)", [(company_id, f"company {company_id}") for company_id in managers_by_company])
+        connection.executemany(
+            "INSERT INTO companies_settings (company_id, redirect_chat_id, message_response_timeout) VALUES (?, ?, ?)",
+            [(company_id, -company_id, 900) for company_id in managers_by_company]
+        )
+        connection.executemany(
+            "INSERT INTO users (user_tg_id, first_name) VALUES (?, ?)",
+            [(manager_id, "manager") for managers_ids in managers_by_company.values() for manager_id in managers_ids]
+        )
+        connection.executemany(
+            "INSERT INTO managers (user_tg_id, company_id) VALUES (?, ?)",
+            [(manager_id, company_id) for company_id, managers_ids in managers_by_company.items() for manager_id in managers_ids]
+        )
+        connection.executemany(
+            "INSERT INTO ewords VALUES (?, ?)",
+            [(f"eword{eword_number}", company_id) for company_id in managers_by_company for eword_number in range(EWORDS_PER_COMPANY)]
+            + [("спасибо", company_id) for company_id in managers_by_company]
+        )
+        connection.executemany(
+            "INSERT INTO chats VALUES (?, ?, ?, ?)",
+            [(_chat_id(chat_number), f"chat {chat_number}", chat_number % COMPANIES_COUNT + 1, "customer") for chat_number in range(CHATS_COUNT)]
+        )
+        connection.executemany("INSERT INTO chats_limits (chat_tg_id) VALUES (?)", [(_chat_id(chat_number),) for chat_number in range(CHATS_COUNT)])
+        connection.commit()
+    return managers_by_company
+
+
+def _chat_id(chat_number : int) -> int:
+    return -1_000_000_000_000 - chat_number
+
+
+def build_messages(messages_count : int, managers_by_company : dict[int, list[int]]) -> list[types.Message]:
+    random.seed(0)
+    date = datetime.now()
+    messages = []
+    for message_id in range(1, messages_count + 1):
+        chat_number = random.randrange(CHATS_COUNT)
+        company_id = chat_number % COMPANIES_COUNT + 1
+        if random.random() < MANAGER_MESSAGES_SHARE:
+            user_id = random.choice(managers_by_company[company_id])
+            text = "Здравствуйте! Уточню и вернусь с ответом"
+        else:
+            user_id = 10_000_000 + random.randrange(50_000)
+            text = random.choice(("Добрый день, когда будет готово?", "Спасибо!", "есть новости по заказу?", "ok"))
+        messages.append(types.Message(
+            message_id = message_id,
+            date = date,
+            chat = types.Chat(id = _chat_id(chat_number), type = "supergroup", title = f"chat {chat_number}"),
+            from_user = types.User(id = user_id, is_bot = False, first_name = "user"),
+            text = text,
+        ))
+    return messages
+
+
+def _measure(title : str, operations_count : int, function) -> None:
+    started_at = perf_counter()
+    function()
+    elapsed = perf_counter() - started_at
+    print(f"{title:<40} {operations_count:>8} ops  {elapsed * 1e3:9.1f} ms  {elapsed / operations_count * 1e6:8.2f} us/op")
+
+
+def run_benchmark(messages_count : int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        database_client = BotDBClient(database_path = Path(temporary_directory) / "bot_database.db")
+        managers_by_company = seed_database(database_client)
+        database_client.load_roles_index()
+        messages = build_messages(messages_count, managers_by_company)
+
+        is_company_manager = database_client.roles_index.is_company_manager
+
+        def make_pipeline() -> GroupMessagePipeline:
+            return GroupMessagePipeline(database_client = database_client, tracker = DeadlineScheduler(), is_company_manager = is_company_manager)
+
+        print(f"GroupMessagePipeline, {messages_count} messages, {CHATS_COUNT} chats, {COMPANIES_COUNT} companies")
+
+        # Stages separately
+        pipeline = make_pipeline()
+        chats_infos = []
+        _measure("1. chat lookup (cold cache)", messages_count, lambda: chats_infos.extend(pipeline.lookup_chat(message.chat.id) for message in messages))
+        _measure("1. chat lookup (warm cache)", messages_count, lambda: [pipeline.lookup_chat(message.chat.id) for message in messages])
+
+        are_managers = []
+        _measure(
+            "2. sender classification", messages_count,
+            lambda: are_managers.extend(is_company_manager(message.from_user.id, chat_info["company_id"]) for message, chat_info in zip(messages, chats_infos))
+        )
+        customers_messages = [(message, chat_info) for message, chat_info, is_manager in zip(messages, chats_infos, are_managers) if not is_manager]
+        for company_id in managers_by_company:
+            pipeline.contains_eword(company_id, "build matcher")
+        _measure(
+            "3. eword filtering", len(customers_messages),
+            lambda: [pipeline.contains_eword(chat_info["company_id"], message.text) for message, chat_info in customers_messages]
+        )
+
+        def arm_and_cancel():
+            for message, chat_info, is_manager in zip(messages, chats_infos, are_managers):
+                if is_manager:
+                    pipeline.cancel_deadline(message.chat.id)
+                else:
+                    pipeline.arm_deadline(message, chat_info["company_id"])
+
+        _measure("4. deadline arming / cancelling", messages_count, arm_and_cancel)
+        pending_chats_count = len(pipeline._pending_limits)
+        _measure(f"5. flush ({pending_chats_count} chats)", messages_count, pipeline.flush)
+
+        # Whole pipeline
+        pipeline = make_pipeline()
+
+        def process_all():
+            for message in messages:
+                pipeline.process(message)
+            pipeline.flush()
+
+        _measure("whole pipeline (with flush)", messages_count, process_all)
+        print(pipeline.get_stats())
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,135 @@
+"""
+Load test of overload protection: latency of updates by priority, when updates arrive faster than bot can handle them.
+
+Handler of message blocks event loop for HANDLER_CPU_TIME (work of handler) and then waits HANDLER_IO_TIME (requests to Telegram),
+so bot handles at most 1 / HANDLER_CPU_TIME updates per second. Updates arrive with rate `rate` during DURATION seconds
+(as tasks, like in polling) and are compared in two modes:
+    - Dispatcher without intake guard (all updates are admitted and wait for workers in FIFO order),
+    - GuardedDispatcher (LOW updates are shed on overload, HIGH updates get workers first).
+
+Run from "bot" directory:
+    python -m benchmarks.intake_benchmark [rate]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Update
+
+from bot_scripts.updates_processing import ChatOrderedEventIsolation
+
+from incoming import GuardedDispatcher, IntakeGuard, LoopLagMonitor, UpdatePriority
+
+from .fake_session import FAKE_TOKEN, FakeTelegramSession
+
+
+DURATION = 5.0
+HANDLER_CPU_TIME = 0.002
+HANDLER_IO_TIME = 0.01
+WORKERS_COUNT = 16
+CHATS_COUNT = 500
+
+# Shares of priorities in incoming updates
+PRIORITIES_SHARES : dict[UpdatePriority, float] = {
+    UpdatePriority.HIGH : 0.05,
+    UpdatePriority.NORMAL : 0.25,
+    UpdatePriority.LOW : 0.70,
+}
+
+# Priority is encoded into chat ID: -(priority * 10^6 + chat number)
+def _get_priority(chat_id : int) -> UpdatePriority:
+    return UpdatePriority(-chat_id // 1_000_000)
+
+
+def _classify(update : Update) -> UpdatePriority:
+    return _get_priority(update.message.chat.id)
+
+
+def _make_update(update_id : int, priority : UpdatePriority) -> Update:
+    chat_id = -(priority * 1_000_000 + random.randrange(CHATS_COUNT))
+    return Update.model_validate({
+        "update_id" : update_id,
+        "message" : {
+            "message_id" : update_id,
+            "date" : 0,
+            "chat" : {"id" : chat_id, "type" : "supergroup"},
+            "from" : {"id" : update_id, "is_bot" : False, "first_name" : "user"},
+            "text" : "text",
+        },
+    })
+
+
+async def _run_load(rate : float, is_guarded : bool) -> tuple[dict[UpdatePriority, list[float]], dict | None]:
+    random.seed(0)
+    arrived_at : dict[int, float] = {}
+    latencies : dict[UpdatePriority, list[float]] = {priority : [] for priority in UpdatePriority}
+
+    router = Router()
+
+    @router.message()
+    async def handler(message):
+        time.sleep(HANDLER_CPU_TIME)
+        await asyncio.sleep(HANDLER_IO_TIME)
+        latencies[_get_priority(message.chat.id)].append(time.monotonic() - arrived_at[message.message_id])
+
+    lag_monitor = LoopLagMonitor(interval = 0.05)
+    events_isolation = ChatOrderedEventIsolation(workers_count = WORKERS_COUNT)
+    if is_guarded:
+        intake_guard = IntakeGuard(classify = _classify, lag_monitor = lag_monitor, max_pending = 200, lag_threshold = 0.1)
+        dispatcher = GuardedDispatcher(events_isolation = events_isolation, intake_guard = intake_guard)
+    else:
+        intake_guard = None
+        dispatcher = Dispatcher(events_isolation = events_isolation)
+    dispatcher.include_router(router)
+    bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+    lag_task = asyncio.create_task(lag_monitor.run())
+
+    priorities, weights = list(PRIORITIES_SHARES), list(PRIORITIES_SHARES.values())
+    tasks = []
+    tick = 0.01
+    started_at = time.monotonic()
+    update_id = 0
+    while time.monotonic() - started_at < DURATION:
+        expected_count = int((time.monotonic() - started_at) * rate)
+        while update_id < expected_count:
+            update_id += 1
+            update = _make_update(update_id, random.choices(priorities, weights)[0])
+            arrived_at[update_id] = time.monotonic()
+            tasks.append(asyncio.create_task(dispatcher.feed_update(bot, update)))
+        await asyncio.sleep(tick)
+
+    await asyncio.gather(*tasks)
+    lag_task.cancel()
+    await bot.session.close()
+    return latencies, intake_guard.get_stats() if intake_guard else None
+
+
+def _percentile(values : list[float], percent : float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run_benchmark(rate : float = 1_000) -> None:
+    print(
+        f"Load test: {rate:.0f} updates/s during {DURATION} s, capacity about {1 / HANDLER_CPU_TIME:.0f} updates/s, "
+        f"{WORKERS_COUNT} workers"
+    )
+    for is_guarded in (False, True):
+        latencies, stats = asyncio.run(_run_load(rate, is_guarded))
+        print("GuardedDispatcher:" if is_guarded else "Dispatcher without guard:")
+        for priority, values in latencies.items():
+            print(
+                f"    {priority.name:<7} handled {len(values):>5}, "
+                f"p50 {_percentile(values, 50) * 1000:>8.1f} ms, p99 {_percentile(values, 99) * 1000:>8.1f} ms"
+            )
+        if stats:
+            print(f"    shed: {stats['shed']}, max loop lag {stats['max_lag']} s")
+
+
+if __name__ == "__main__":
+    run_benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 1_000)
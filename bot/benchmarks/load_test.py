@@ -0,0 +1,313 @@
+"""
+End-to-end load test of bot offline: synthetic updates are fed through Dispatcher.feed_update of the real bot
+(all routers, middlewares, events isolation, outgoing scheduler) with configurable rate, Telegram is replaced
+by FakeTelegramSession with latency and 429 errors, databases are scratch copies (see benchmarks.offline_bot).
+
+Traffic mix:
+    customer_message - message of customer in customer chat,
+    manager_reply - message of company's manager in customer chat,
+    private_menu - "меню" request of user in private chat,
+    admin_flow - next step of bot-admin's flow: content list -> content type -> menu (admins make steps in turn).
+
+Latencies are reported by scenarios and by priorities of IntakeGuard: HIGH updates are never shed,
+so under overload their p99 shows whether shedding of LOW updates keeps the bot responsive.
+
+Report contains throughput, latency percentiles of scenarios (from feeding to the end of handling) and of handlers,
+counts of API calls and shed updates. It can be saved as JSON and compared between runs.
+
+Run from "bot" directory:
+    python -m benchmarks.load_test --rate 300 --duration 10 --latency 0.05 0.15 --too-many-requests-rate 0.01 --json load.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from .fake_session import FakeTelegramSession
+from .offline_bot import start_offline_bot
+
+
+SCENARIOS_SHARES : dict[str, float] = {
+    "customer_message" : 0.6,
+    "manager_reply" : 0.2,
+    "private_menu" : 0.15,
+    "admin_flow" : 0.05,
+}
+
+# Priorities of scenarios' updates in IntakeGuard (see incoming.UpdateClassifier)
+SCENARIOS_PRIORITIES : dict[str, str] = {
+    "customer_message" : "NORMAL",
+    "manager_reply" : "HIGH",
+    "private_menu" : "LOW",
+    "admin_flow" : "HIGH",
+}
+
+CUSTOMERS_TEXTS : tuple[str] = ("Добрый день, когда будет готово?", "Спасибо!", "есть новости по заказу?", "ok")
+PRIVATE_USERS_COUNT = 5_000
+
+
+def percentiles(values : list[float]) -> dict[str, float]:
+    """
+    Returns count and p50/p90/p99/max of values in milliseconds.
+    """
+    if not values:
+        return {"count" : 0}
+    values = sorted(values)
+    def get_percentile(percent : float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * percent / 100))] * 1000, 2)
+    return {
+        "count" : len(values),
+        "p50_ms" : get_percentile(50),
+        "p90_ms" : get_percentile(90),
+        "p99_ms" : get_percentile(99),
+        "max_ms" : round(values[-1] * 1000, 2),
+    }
+
+
+class HandlersTimer(BaseMiddleware):
+    """
+    Inner middleware which records duration of handlers by handler's name
+    (callbacks of CallbackRouter are recorded by handlers of their routes).
+    """
+
+    def __init__(self) -> None:
+        self.durations : dict[str, list[float]] = defaultdict(list)
+
+
+    def attach(self, dispatcher : Dispatcher) -> None:
+        # Inner middlewares of dispatcher are applied to handlers of all included routers
+        for event_name, observer in dispatcher.observers.items():
+            if event_name != "update":
+                observer.middleware(self)
+
+
+    async def __call__(
+            self,
+            handler : Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event : TelegramObject,
+            data : dict[str, Any],
+        ) -> Any:
+        handler_name = data["handler"].callback.__name__
+        started_at = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.durations[handler_name].append(perf_counter() - started_at)
+
+
+class TrafficGenerator:
+    """
+    Builds synthetic updates of scenarios from content of bot database.
+    """
+
+    def __init__(self, database_client, seed : int = 0) -> None:
+        from bot_scripts.custom_types import ContentListCallback, ContentType, ContentTypeCallback
+
+        self.random = random.Random(seed)
+        self.update_id = 0
+        customer_chats = [chat for chat in database_client.get_full_chats_list() if chat.get("chat_type") == "customer"]
+        managers_by_company : dict[int, list[int]] = defaultdict(list)
+        for user_id, companies_ids in database_client.roles_index.managers.items():
+            for company_id in companies_ids:
+                managers_by_company[company_id].append(user_id)
+        self.customer_chats = [(chat["chat_tg_id"], chat["company_id"]) for chat in customer_chats]
+        self.managers_by_company = dict(managers_by_company)
+        self.bot_admins = sorted(database_client.roles_index.bot_admins)
+        if not (self.customer_chats and self.managers_by_company and self.bot_admins):
+            raise ValueError("Database has no customer chats, managers or bot-admins for load test")
+
+        self.admin_flow = (
+            ("callback", ContentListCallback().pack()),
+            ("callback", ContentTypeCallback(content_type = ContentType.KEYBOARDS).pack()),
+            ("message", "меню"),
+        )
+        self._admins_steps : dict[int, int] = defaultdict(int)
+        self._admins_count = 0
+
+
+    def _next_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+
+    def _message(self, chat_id : int, user_id : int, text : str) -> Update:
+        update_id = self._next_id()
+        return Update.model_validate({
+            "update_id" : update_id,
+            "message" : {
+                "message_id" : update_id,
+                "date" : int(datetime.now().timestamp()),
+                "chat" : {"id" : chat_id, "type" : "private" if chat_id > 0 else "supergroup", "title" : None if chat_id > 0 else "chat"},
+                "from" : {"id" : user_id, "is_bot" : False, "first_name" : "user"},
+                "text" : text,
+            },
+        })
+
+
+    def _callback(self, user_id : int, callback_data : str) -> Update:
+        update_id = self._next_id()
+        return Update.model_validate({
+            "update_id" : update_id,
+            "callback_query" : {
+                "id" : str(update_id),
+                "chat_instance" : str(user_id),
+                "from" : {"id" : user_id, "is_bot" : False, "first_name" : "admin"},
+                "message" : {"message_id" : 1, "date" : 0, "chat" : {"id" : user_id, "type" : "private"}, "text" : "menu"},
+                "data" : callback_data,
+            },
+        })
+
+
+    def make_update(self, scenario : str) -> Update:
+        match scenario:
+            case "customer_message":
+                chat_id, _ = self.random.choice(self.customer_chats)
+                return self._message(chat_id, 10_000_000 + self.random.randrange(50_000), self.random.choice(CUSTOMERS_TEXTS))
+            case "manager_reply":
+                chat_id, company_id = self.random.choice(self.customer_chats)
+                manager_id = self.random.choice(self.managers_by_company.get(company_id) or [0])
+                return self._message(chat_id, manager_id, "Здравствуйте! Уточню и вернусь с ответом")
+            case "private_menu":
+                user_id = 20_000_000 + self.random.randrange(PRIVATE_USERS_COUNT)
+                return self._message(user_id, user_id, "меню")
+            case "admin_flow":
+                admin_id = self.bot_admins[self._admins_count % len(self.bot_admins)]
+                self._admins_count += 1
+                step = self._admins_steps[admin_id]
+                self._admins_steps[admin_id] = (step + 1) % len(self.admin_flow)
+                step_type, step_data = self.admin_flow[step]
+                if step_type == "callback":
+                    return self._callback(admin_id, step_data)
+                return self._message(admin_id, admin_id, step_data)
+            case unexpected_scenario:
+                raise ValueError(f"Unexpected scenario: {unexpected_scenario}")
+
+
+async def run_load(
+        dispatcher : Dispatcher,
+        bot : Bot,
+        generator : TrafficGenerator,
+        rate : float,
+        duration : float,
+        shares : dict[str, float] = SCENARIOS_SHARES,
+    ) -> dict[str, list[float]]:
+    """
+    Feeds updates with passed rate during `duration` seconds (each update in separate task, like polling does).
+    Returns latencies of handling by scenarios.
+    """
+    latencies : dict[str, list[float]] = defaultdict(list)
+    scenarios, weights = list(shares), list(shares.values())
+
+    async def feed(scenario : str, update : Update) -> None:
+        fed_at = monotonic()
+        await dispatcher.feed_update(bot, update)
+        latencies[scenario].append(monotonic() - fed_at)
+
+    tasks = []
+    started_at = monotonic()
+    fed_count = 0
+    while monotonic() - started_at < duration:
+        expected_count = int((monotonic() - started_at) * rate)
+        while fed_count < expected_count:
+            fed_count += 1
+            scenario = generator.random.choices(scenarios, weights)[0]
+            tasks.append(asyncio.create_task(feed(scenario, generator.make_update(scenario))))
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*tasks, return_exceptions = True)
+    return latencies
+
+
+async def _run_test(arguments : argparse.Namespace, databases_dir : Path) -> dict:
+    latency = tuple(arguments.latency) if len(arguments.latency) == 2 else arguments.latency[0]
+    session = FakeTelegramSession(latency = latency, too_many_requests_rate = arguments.too_many_requests_rate)
+    dispatcher, bot = start_offline_bot(session, databases_dir)
+
+    import vars
+    from bot_scripts import bot_subtasks
+
+    timer = HandlersTimer()
+    timer.attach(dispatcher)
+    generator = TrafficGenerator(vars.bot_db_client, seed = arguments.seed)
+
+    bot_subtasks.start_subtasks()
+    started_at = monotonic()
+    try:
+        latencies = await run_load(dispatcher, bot, generator, arguments.rate, arguments.duration)
+    finally:
+        elapsed = monotonic() - started_at
+        await bot_subtasks.stop_subtasks()
+
+    handled_count = sum(len(values) for values in latencies.values())
+    return {
+        "config" : {
+            "rate" : arguments.rate,
+            "duration" : arguments.duration,
+            "latency" : arguments.latency,
+            "too_many_requests_rate" : arguments.too_many_requests_rate,
+            "seed" : arguments.seed,
+        },
+        "elapsed_s" : round(elapsed, 3),
+        "throughput_per_s" : round(handled_count / elapsed, 1),
+        "scenarios" : {scenario : percentiles(values) for scenario, values in sorted(latencies.items())},
+        "priorities" : {
+            priority : percentiles([
+                latency for scenario, values in latencies.items() if SCENARIOS_PRIORITIES[scenario] == priority for latency in values
+            ])
+            for priority in ("HIGH", "NORMAL", "LOW")
+        },
+        "handlers" : {name : percentiles(values) for name, values in sorted(timer.durations.items())},
+        "api_calls" : session.get_calls_by_method(),
+        "too_many_requests_count" : session.too_many_requests_count,
+        "intake" : vars.intake_guard.get_stats(),
+        "outgoing" : vars.outgoing_scheduler.get_stats(),
+    }
+
+
+def print_report(report : dict) -> None:
+    print(f"Load test {report['config']}")
+    print(f"Handled {sum(stats['count'] for stats in report['scenarios'].values())} updates in {report['elapsed_s']} s: {report['throughput_per_s']} updates/s")
+    for title in ("scenarios", "priorities", "handlers"):
+        print(f"{title.capitalize()} (ms):")
+        for name, stats in report[title].items():
+            print(
+                f"    {name:<36} {stats['count']:>7}  p50 {stats.get('p50_ms', 0):>9}  p90 {stats.get('p90_ms', 0):>9}  "
+                f"p99 {stats.get('p99_ms', 0):>9}  max {stats.get('max_ms', 0):>9}"
+            )
+    print(f"API calls: {report['api_calls']}, 429 answers: {report['too_many_requests_count']}")
+    print(
+        f"Intake: admitted {report['intake']['admitted']}, shed {report['intake']['shed']}, max loop lag {report['intake']['max_lag']} s, "
+        f"outgoing wait: {report['outgoing']['wait_time']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Offline end-to-end load test of bot")
+    parser.add_argument("--rate", type = float, default = 200.0, help = "updates per second")
+    parser.add_argument("--duration", type = float, default = 10.0, help = "seconds of feeding")
+    parser.add_argument("--latency", type = float, nargs = "+", default = [0.05], help = "latency of Telegram: seconds or min max")
+    parser.add_argument("--too-many-requests-rate", type = float, default = 0.0, help = "share of requests answered by 429")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--json", type = Path, default = None, help = "path of JSON report")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as databases_dir:
+        report = asyncio.run(_run_test(arguments, Path(databases_dir)))
+    print_report(report)
+    if arguments.json:
+        arguments.json.write_text(json.dumps(report, indent = 2, ensure_ascii = False), encoding = "UTF-8")
+        print(f"Report is saved into {arguments.json}")
+
+
+if __name__ == "__main__":
+    main()
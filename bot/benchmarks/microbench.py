@@ -0,0 +1,424 @@
+"""
+Microbenchmarks of bot's hot-path primitives:
+    - BotDBClient reads and writes on seeded databases of 1k / 100k / 1M rows (users, chats and chats' limits),
+    - Communicator.get_message and update_patterns,
+    - PagedKeyboard.next / previous / _show, cached pages of content list and create_keyboard_by_access,
+    - define_caller, record_log and regist_error (reports are not sent, log is written into temporary file),
+    - error path of handlers: operate_error_case with the same repeated error,
+    - filters of custom_filters,
+    - overhead of metrics: handler's middleware and rendering of registry.
+
+Bot works offline (see benchmarks.offline_bot), databases are created in temporary directory. Each case is run
+in `repeats` series, series is long enough to be measured reliably; median and minimal time per call are reported.
+
+Run from "bot" directory:
+    python -m benchmarks.microbench run --json before.json [--sizes 1000 100000] [--filter db.]
+    python -m benchmarks.microbench compare before.json after.json [--threshold 0.1]
+Compare mode prints ratio of minimal times (they are less noisy than medians) and flags regressions (slowdown beyond threshold),
+exit code is 1 if there are regressions.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3 as sqlt
+import sys
+import tempfile
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from time import perf_counter, time
+from typing import Callable
+
+from .fake_session import FakeTelegramSession
+from .offline_bot import start_offline_bot
+from .replay import get_environment
+
+
+DATABASE_SIZES : tuple[int] = (1_000, 100_000, 1_000_000)
+REPEATS = 5
+# Minimal duration of one series of calls
+SERIES_TIME = 0.05
+REGRESSION_THRESHOLD = 0.1
+
+USERS_ID_BASE = 1_000_000
+CHATS_ID_BASE = -1_000_000_000_000
+EWORDS_PER_COMPANY = 20
+
+
+class BenchmarkCase:
+    """
+    Parameters:
+    -----------
+    name : str
+        unique name of case, e.g. "db.get_chat_info[100000]"
+    function : Callable[[], object]
+        measured call, coroutine functions are awaited
+    """
+
+    def __init__(self, name : str, function : Callable[[], object]) -> None:
+        self.name = name
+        self.function = function
+        self.is_async = inspect.iscoroutinefunction(function)
+
+
+    def _run_series(self, number : int) -> float:
+        function = self.function
+        if self.is_async:
+            async def run_series() -> float:
+                started_at = perf_counter()
+                for _ in range(number):
+                    await function()
+                return perf_counter() - started_at
+            return asyncio.run(run_series())
+
+        started_at = perf_counter()
+        for _ in range(number):
+            function()
+        return perf_counter() - started_at
+
+
+    def measure(self, repeats : int = REPEATS) -> dict[str, float | int]:
+        """
+        Returns median and minimal nanoseconds per call of `repeats` series.
+        """
+        number = 1
+        duration = self._run_series(number)
+        while duration < SERIES_TIME and number < 1_000_000:
+            number *= 10
+            duration = self._run_series(number)
+        durations = [duration] + [self._run_series(number) for _ in range(repeats - 1)]
+        return {
+            "ns_per_call" : round(median(durations) / number * 1e9, 1),
+            "min_ns_per_call" : round(min(durations) / number * 1e9, 1),
+            "calls_per_series" : number,
+            "repeats" : repeats,
+        }
+
+
+def seed_scaled_database(database_path : Path, rows_count : int) -> dict[str, int]:
+    """
+    Fills empty bot database: `rows_count` users and customer chats with limits, one company per 100 chats
+    (one owner and managers of 10% of users), ewords of companies. 1% of chats have armed deadline.
+    Returns counts of rows.
+    """
+    companies_count = max(10, rows_count // 100)
+    managers_count = max(companies_count, rows_count // 10)
+    now = int(time())
+    with sqlt.connect(database_path) as connection:
+        connection.executemany(
+            "INSERT INTO users (user_tg_id, username, first_name) VALUES (?, ?, ?)",
+            ((USERS_ID_BASE + user_number, f"user{user_number}", "user") for user_number in range(rows_count)),
+        )
+        connection.executemany(
+            "INSERT INTO companies (company_id, company_name) VALUES (?, ?)",
+            ((company_id, f"company {company_id}") for company_id in range(1, companies_count + 1)),
+        )
+        connection.executemany(
+            "INSERT INTO companies_settings (company_id, redirect_chat_id, message_response_timeout) VALUES (?, ?, ?)",
+            ((company_id, str(-company_id), 900) for company_id in range(1, companies_count + 1)),
+        )
+        connection.executemany(
+            "INSERT INTO tasks_counter (company_id, task_number) VALUES (?, ?)",
+            ((company_id, 0) for company_id in range(1, companies_count + 1)),
+        )
+        # The first users are owners, the next ones are managers
+        connection.executemany(
+            "INSERT INTO owners (user_tg_id, company_id) VALUES (?, ?)",
+            ((USERS_ID_BASE + company_id - 1, company_id) for company_id in range(1, companies_count + 1)),
+        )
+        connection.executemany(
+            "INSERT INTO managers (user_tg_id, company_id, extra_name) VALUES (?, ?, ?)",
+            (
+                (USERS_ID_BASE + companies_count + manager_number, manager_number % companies_count + 1, None)
+                for manager_number in range(min(managers_count, rows_count - companies_count))
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO ewords (eword_content, company_id) VALUES (?, ?)",
+            (
+                (f"eword{eword_number}", company_id)
+                for company_id in range(1, companies_count + 1) for eword_number in range(EWORDS_PER_COMPANY)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO chats (chat_tg_id, chat_title, company_id, chat_type) VALUES (?, ?, ?, ?)",
+            ((CHATS_ID_BASE - chat_number, f"chat {chat_number}", chat_number % companies_count + 1, "customer") for chat_number in range(rows_count)),
+        )
+        connection.executemany(
+            "INSERT INTO chats_limits (chat_tg_id, time_limit, last_message_id) VALUES (?, ?, ?)",
+            ((CHATS_ID_BASE - chat_number, now + chat_number if chat_number % 100 == 0 else None, 1) for chat_number in range(rows_count)),
+        )
+        connection.commit()
+    return {"rows" : rows_count, "companies" : companies_count, "managers" : managers_count}
+
+
+def build_database_cases(databases_dir : Path, rows_count : int) -> list[BenchmarkCase]:
+    from database import BotDBClient
+
+    database_path = databases_dir / f"bot_database_{rows_count}.db"
+    database_client = BotDBClient(database_path)
+    counts = seed_scaled_database(database_path, rows_count)
+    database_client.load_roles_index()
+
+    companies_count = counts["companies"]
+    randomizer = random.Random(rows_count)
+    random_user = lambda: USERS_ID_BASE + randomizer.randrange(rows_count)
+    random_manager = lambda: USERS_ID_BASE + companies_count + randomizer.randrange(min(counts["managers"], rows_count - companies_count))
+    random_chat = lambda: CHATS_ID_BASE - randomizer.randrange(rows_count)
+    random_company = lambda: randomizer.randrange(companies_count) + 1
+    new_users_ids = iter(range(USERS_ID_BASE + rows_count, USERS_ID_BASE + 100 * rows_count))
+
+    def update_chats_batch():
+        database_client.update_chats_limits_batch({random_chat() : {"last_message_id" : 2} for _ in range(100)})
+
+    cases = {
+        # Reads
+        "get_user_info" : lambda: database_client.get_user_info(random_user()),
+        "get_company_info" : lambda: database_client.get_company_info(random_company()),
+        "get_owner_info" : lambda: database_client.get_owner_info(USERS_ID_BASE + random_company() - 1),
+        "get_manager_info" : lambda: database_client.get_manager_info(random_manager()),
+        "get_cached_manager_info" : lambda: database_client.get_cached_manager_info(random_manager()),
+        "get_managers_list_of_owner" : lambda: database_client.get_managers_list_of_owner(USERS_ID_BASE + random_company() - 1),
+        "get_chat_info" : lambda: database_client.get_chat_info(random_chat()),
+        "get_cached_chat_info" : lambda: database_client.get_cached_chat_info(random_chat()),
+        "get_ewords_list_of_company" : lambda: database_client.get_ewords_list_of_company(random_company()),
+        "get_last_task_id" : lambda: database_client.get_last_task_id(random_company()),
+        "get_armed_chats" : database_client.get_armed_chats,
+        "get_registered_chats" : database_client.get_registered_chats,
+        "get_full_chats_list" : database_client.get_full_chats_list,
+        "load_roles_index" : database_client.load_roles_index,
+        # Writes
+        "register_user" : lambda: database_client.register_user(next(new_users_ids), "new_user"),
+        "update_user" : lambda: database_client.update_user(random_user(), first_name = "renamed"),
+        "update_chat_limits" : lambda: database_client.update_chat_limits(random_chat(), last_message_id = 2),
+        "update_chats_limits_batch_100" : update_chats_batch,
+        "reset_chats_time_limits_100" : lambda: database_client.reset_chats_time_limits([random_chat() for _ in range(100)]),
+        "increase_last_task_id" : lambda: database_client.increase_last_task_id(random_company()),
+        "enqueue_outbox_messages" : lambda: database_client.enqueue_outbox_messages([("bot", random_chat(), "text", "benchmark")]),
+    }
+    return [BenchmarkCase(f"db.{name}[{rows_count}]", function) for name, function in cases.items()]
+
+
+def build_bot_cases() -> list[BenchmarkCase]:
+    from aiogram import types
+    from aiogram.dispatcher.event.handler import HandlerObject
+
+    import vars
+    from logger import define_caller, record_log, regist_error
+    from bot_scripts.custom_filters import IsBotAdminFilter, IsCustomerChatFilter, IsGroupChatFilter, IsPrivateChatFilter
+    from bot_scripts.error_case import operate_error_case
+    from bot_scripts.custom_types import ContentType
+    from bot_scripts.keyboards import PagedKeyboard, content_list_pages, create_keyboard_by_access
+    from bot_scripts.middlewares import UserContext
+    from metrics import HandlerMetricsMiddleware
+
+    from .offline_bot import SEEDED_BOT_ADMINS
+
+    communicator = vars.communicator
+    message_key = next(iter(communicator.get_messages_content()))
+
+    paged_keyboard = PagedKeyboard([f"item {item_number}\n" for item_number in range(100)], "bench", growth_factor = 5)
+    def page_through():
+        paged_keyboard.current_first_point = -1
+        for _ in range(20):
+            paged_keyboard.next()
+    def page_back():
+        paged_keyboard.current_first_point = 95
+        for _ in range(20):
+            paged_keyboard.previous()
+    def show_page():
+        paged_keyboard.current_first_point = 50
+        paged_keyboard._show()
+
+    admin_id = SEEDED_BOT_ADMINS[0]
+    admin_context = UserContext(admin_id, vars.bot_db_client)
+    customer_chat_id = vars.bot_db_client.get_full_chats_list()[0]["chat_tg_id"]
+    group_message = types.Message.model_validate({
+        "message_id" : 1,
+        "date" : 0,
+        "chat" : {"id" : customer_chat_id, "type" : "supergroup", "title" : "chat"},
+        "from" : {"id" : 10, "is_bot" : False, "first_name" : "user"},
+        "text" : "text",
+    })
+    private_message = types.Message.model_validate({
+        "message_id" : 1,
+        "date" : 0,
+        "chat" : {"id" : admin_id, "type" : "private"},
+        "from" : {"id" : admin_id, "is_bot" : False, "first_name" : "admin"},
+        "text" : "меню",
+    })
+    filters = {
+        "IsPrivateChatFilter" : (IsPrivateChatFilter(), private_message, {}),
+        "IsGroupChatFilter" : (IsGroupChatFilter(), group_message, {}),
+        "IsCustomerChatFilter" : (IsCustomerChatFilter(), group_message, {}),
+        "IsBotAdminFilter" : (IsBotAdminFilter(), private_message, {}),
+        "IsBotAdminFilter(user_context)" : (IsBotAdminFilter(), private_message, {"user_context" : admin_context}),
+    }
+
+    def caller_of_logger():
+        # define_caller is called by logging functions and defines their caller
+        return define_caller()
+
+    async def handle_error():
+        # Error path of handler during error storm: the same error is repeated
+        try:
+            raise ValueError("benchmark error")
+        except ValueError as error:
+            await operate_error_case(
+                error_text = f"Benchmark error: {error}",
+                error_type = type(error),
+                user_id = admin_id,
+                call_user = False,
+                user_context = admin_context,
+                error_event = private_message,
+            )
+
+    metrics_middleware = HandlerMetricsMiddleware(vars.bot_metrics)
+    metrics_data = {"handler" : HandlerObject(callback = caller_of_logger), "event_update" : types.Update(update_id = 1, message = private_message)}
+    async def empty_handler(event, data):
+        return None
+    async def call_metrics_middleware():
+        return await metrics_middleware(empty_handler, private_message, metrics_data)
+
+    cases = [
+        BenchmarkCase("communicator.get_message", lambda: communicator.get_message(message_key)),
+        BenchmarkCase("communicator.update_patterns", communicator.update_patterns),
+        BenchmarkCase("paged_keyboard.next_20_pages", page_through),
+        BenchmarkCase("paged_keyboard.previous_20_pages", page_back),
+        BenchmarkCase("paged_keyboard._show", show_page),
+        BenchmarkCase("keyboards.content_list_pages.show_page", lambda: content_list_pages.get_keyboard(ContentType.MESSAGES).show_page(0)),
+        BenchmarkCase("keyboards.create_keyboard_by_access(admin)", lambda: create_keyboard_by_access(user_context = admin_context)),
+        BenchmarkCase("keyboards.create_keyboard_by_access(user_id)", lambda: create_keyboard_by_access(user_id = 10)),
+        BenchmarkCase("logger.define_caller", caller_of_logger),
+        BenchmarkCase("logger.record_log", lambda: record_log("benchmark record", "benchmark")),
+        BenchmarkCase("logger.record_log(define_caller)", lambda: record_log("benchmark record")),
+        BenchmarkCase("logger.regist_error", lambda: regist_error("benchmark error", "BenchmarkError")),
+        BenchmarkCase("error_case.operate_error_case", handle_error),
+        BenchmarkCase("metrics.HandlerMetricsMiddleware", call_metrics_middleware),
+        BenchmarkCase("metrics.render", vars.bot_metrics.registry.render),
+    ]
+    for filter_name, (filter_object, event, kwargs) in filters.items():
+        async def check_filter(filter_object = filter_object, event = event, kwargs = kwargs):
+            return await filter_object(event, **kwargs)
+        cases.append(BenchmarkCase(f"filters.{filter_name}", check_filter))
+    return cases
+
+
+@contextmanager
+def _isolated_logging(log_path : Path):
+    """
+    Redirects records of logger into temporary file and prints of logger into null device.
+    """
+    root_logger = logging.getLogger()
+    handlers = root_logger.handlers[:]
+    file_handler = logging.FileHandler(log_path, encoding = "UTF-8")
+    file_handler.setFormatter(logging.Formatter("(%(asctime)s) %(message)s", datefmt = "%d-%m-%y %H:%M:%S"))
+    root_logger.handlers = [file_handler]
+    try:
+        with open(os.devnull, "w") as null_device, redirect_stdout(null_device):
+            yield
+    finally:
+        file_handler.close()
+        root_logger.handlers = handlers
+
+
+def run_benchmarks(arguments : argparse.Namespace) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        temporary_dir = Path(temporary_dir)
+        with _isolated_logging(temporary_dir / "log.log"):
+            start_offline_bot(FakeTelegramSession(), temporary_dir / "bot")
+            cases = build_bot_cases()
+            for rows_count in arguments.sizes:
+                cases.extend(build_database_cases(temporary_dir, rows_count))
+
+            for case in cases:
+                if arguments.filter and not any(pattern in case.name for pattern in arguments.filter):
+                    continue
+                results[case.name] = case.measure(arguments.repeats)
+                print(f"{case.name:<56} {_format_ns(results[case.name]['ns_per_call']):>12}", file = sys.__stdout__)
+
+    import aiogram
+    return {
+        "environment" : {
+            **get_environment(),
+            "processor" : platform.processor() or platform.machine(),
+            "cpu_count" : os.cpu_count(),
+            "sqlite" : sqlt.sqlite_version,
+            "aiogram" : aiogram.__version__,
+            "created_at" : datetime.now().isoformat(timespec = "seconds"),
+        },
+        "config" : {"sizes" : arguments.sizes, "repeats" : arguments.repeats, "series_time" : SERIES_TIME},
+        "results" : results,
+    }
+
+
+def _format_ns(nanoseconds : float) -> str:
+    if nanoseconds >= 1e6:
+        return f"{nanoseconds / 1e6:.2f} ms"
+    if nanoseconds >= 1e3:
+        return f"{nanoseconds / 1e3:.2f} us"
+    return f"{nanoseconds:.0f} ns"
+
+
+def compare_results(base_report : dict, new_report : dict, threshold : float = REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Prints comparison of two reports. Returns names of cases which are slower than `threshold` share.
+    """
+    regressions = []
+    base_results, new_results = base_report["results"], new_report["results"]
+    print(f"Base: {base_report['environment'].get('commit')}, new: {new_report['environment'].get('commit')}, threshold {threshold:.0%}")
+    for name in sorted(base_results.keys() | new_results.keys()):
+        if (name not in base_results) or (name not in new_results):
+            print(f"    {name:<56} {'only in ' + ('new' if name in new_results else 'base'):>30}")
+            continue
+        base_time, new_time = base_results[name]["min_ns_per_call"], new_results[name]["min_ns_per_call"]
+        ratio = new_time / base_time if base_time else 1.0
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "improvement"
+        print(f"    {name:<56} {_format_ns(base_time):>12} -> {_format_ns(new_time):>12}  x{ratio:<6.2f} {mark}")
+    print(f"Regressions: {len(regressions)}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Microbenchmarks of bot's hot-path primitives")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    run_parser = subparsers.add_parser("run", help = "run benchmarks")
+    run_parser.add_argument("--sizes", type = int, nargs = "*", default = list(DATABASE_SIZES), help = "rows of seeded databases")
+    run_parser.add_argument("--repeats", type = int, default = REPEATS)
+    run_parser.add_argument("--filter", nargs = "*", default = None, help = "substrings of names of cases")
+    run_parser.add_argument("--json", type = Path, default = None, help = "path of JSON results")
+
+    compare_parser = subparsers.add_parser("compare", help = "compare two JSON results")
+    compare_parser.add_argument("base", type = Path)
+    compare_parser.add_argument("new", type = Path)
+    compare_parser.add_argument("--threshold", type = float, default = REGRESSION_THRESHOLD, help = "allowed slowdown share")
+
+    arguments = parser.parse_args()
+    if arguments.command == "compare":
+        base_report = json.loads(arguments.base.read_text(encoding = "UTF-8"))
+        new_report = json.loads(arguments.new.read_text(encoding = "UTF-8"))
+        sys.exit(1 if compare_results(base_report, new_report, arguments.threshold) else 0)
+
+    report = run_benchmarks(arguments)
+    if arguments.json:
+        arguments.json.write_text(json.dumps(report, indent = 2, ensure_ascii = False, sort_keys = True), encoding = "UTF-8")
+        print(f"Results are saved into {arguments.json}")
+
+
+if __name__ == "__main__":
+    main()
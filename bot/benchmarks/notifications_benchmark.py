@@ -0,0 +1,79 @@
+"""
+Benchmark of NotificationAggregator: count of Telegram API calls per delay incident against fake Bot session.
+
+Incident: `chats_count` chats of one company become overdue in several bursts during peak, then managers answer them one by one.
+Without aggregation each overdue chat costs separate message.
+
+Run from "bot" directory:
+    python -m benchmarks.notifications_benchmark [chats_count]
+"""
+
+import asyncio
+import random
+import sys
+
+from time import time
+
+from aiogram import Bot
+
+from delay_control import NotificationAggregator, OverdueChat
+
+from .fake_session import FAKE_TOKEN, FakeTelegramSession
+
+
+REDIRECT_CHAT_ID = -1_000_000_000_001
+
+# Seconds of collecting / minimal interval between edits (scaled down from production value)
+WINDOW = 0.2
+
+
+def _render_line(overdue_chat : OverdueChat, now : float) -> str:
+    return f"{overdue_chat.chat_title}: {overdue_chat.message_link} - {int(overdue_chat.get_waiting_seconds(now) // 60)} min"
+
+
+async def _run_incident(chats_count : int) -> tuple[FakeTelegramSession, NotificationAggregator, float]:
+    random.seed(0)
+    session = FakeTelegramSession()
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    aggregator = NotificationAggregator(bot = bot, render_line = _render_line, window = WINDOW)
+    runner = asyncio.create_task(aggregator.run())
+
+    started_at = time()
+    chats_ids = [-2_000_000_000_000 - chat_number for chat_number in range(chats_count)]
+
+    # Peak: chats become overdue in 5 bursts during 2 windows
+    for burst in range(5):
+        for chat_id in chats_ids[burst::5]:
+            aggregator.add_overdue(REDIRECT_CHAT_ID, chat_id, f"chat {chat_id}", f"https://t.me/c/{-chat_id}/1", time() - 60, 900)
+        await asyncio.sleep(WINDOW * 2 / 5)
+
+    # Managers answer chats one by one during 10 windows
+    random.shuffle(chats_ids)
+    for chat_id in chats_ids:
+        aggregator.mark_answered(chat_id)
+        await asyncio.sleep(WINDOW * 10 / chats_count)
+
+    # Last changes are rendered
+    await asyncio.sleep(WINDOW * 2)
+    duration = time() - started_at
+    runner.cancel()
+    try:
+        await runner
+    except asyncio.CancelledError:
+        pass
+    await bot.session.close()
+    return session, aggregator, duration
+
+
+def run_benchmark(chats_count : int = 50) -> None:
+    session, aggregator, duration = asyncio.run(_run_incident(chats_count))
+    calls_by_method = session.get_calls_by_method()
+    print(f"NotificationAggregator, incident of {chats_count} overdue chats, window {WINDOW} s, duration {duration:.1f} s")
+    print(f"API calls with aggregation:    {session.get_calls_count():>5} {calls_by_method}")
+    print(f"API calls without aggregation: {chats_count:>5} (one sendMessage per overdue chat)")
+    print(aggregator.get_stats())
+    assert calls_by_method.get("sendMessage") == 1, "incident must be reported by one message"
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,97 @@
+"""
+This module starts bot offline for load tests and replays: bot works with scratch copies of databases
+and FakeTelegramSession instead of Telegram, reports of errors are not sent.
+
+    dispatcher, bot = start_offline_bot(session, databases_dir)
+
+Must be called before the first import of "vars" (databases are opened on its import).
+"""
+
+import re
+import shutil
+
+from pathlib import Path
+
+from aiogram import Bot, Dispatcher
+
+from .fake_session import FakeTelegramSession
+from .group_pipeline_benchmark import seed_database
+
+
+BOT_DIR = Path(__file__).parent.parent
+
+PATTERN_KEY_REGEX = re.compile(r"""get_(message|keyboard_title)\(["']([a-z_]+)["']\)""")
+
+# Bot-admins of seeded database: load test passes steps of admins' flows to them in turn, so at 10 steps
+# per second each admin makes a step once in 5 seconds (like a real user; private chat gets 1 message per second)
+SEEDED_BOT_ADMINS : tuple[int] = tuple(range(900_001, 900_051))
+
+
+def find_pattern_keys() -> tuple[set[str], set[str]]:
+    """
+    Returns keys of messages and keyboards which are requested from communicator in bot's code.
+    """
+    messages_keys, keyboards_keys = set(), set()
+    for source_path in BOT_DIR.rglob("*.py"):
+        for pattern_type, key in PATTERN_KEY_REGEX.findall(source_path.read_text(encoding = "UTF-8")):
+            (messages_keys if pattern_type == "message" else keyboards_keys).add(key)
+    messages_keys.update(("new_message_content", "new_keyboard_content"))
+    return messages_keys, keyboards_keys
+
+
+def prepare_databases(databases_dir : Path, seed : bool = True) -> tuple[Path, Path]:
+    """
+    Creates scratch copies of bot's databases in `databases_dir` (or empty databases, if bot has no databases yet)
+    and points database clients to them. Returns paths of bot database and communication database.
+    """
+    import communication.messages_patterns_db_client as patterns_module
+    import database.bot_database_client as database_module
+
+    databases_dir.mkdir(parents = True, exist_ok = True)
+    paths = []
+    for module in (database_module, patterns_module):
+        source_path = Path(module.INSTANCES_RELATIONS_DB_PATH)
+        scratch_path = databases_dir / source_path.name
+        if source_path.exists() and not scratch_path.exists():
+            shutil.copyfile(source_path, scratch_path)
+        module.INSTANCES_RELATIONS_DB_PATH = scratch_path
+        paths.append(scratch_path)
+
+    if seed:
+        patterns_client = patterns_module.MessagesPatternsDBClient()
+        messages_keys, keyboards_keys = find_pattern_keys()
+        # Existing patterns are kept (adding fails on constraint)
+        for key in messages_keys:
+            patterns_client.add_message_pattern(key, f"[{key}] *KEY* *CONTENT_TEXT*")
+        for key in keyboards_keys:
+            patterns_client.add_keyboard_pattern(key, key)
+    return paths[0], paths[1]
+
+
+def start_offline_bot(session : FakeTelegramSession, databases_dir : Path, seed : bool = True) -> tuple[Dispatcher, Bot]:
+    """
+    Prepares databases, imports bot and replaces its session by `session` (scheduler and metrics of outgoing requests are kept).
+    If `seed` is True, database is filled by companies, managers, customer chats and bot-admins of benchmarks.
+    Returns dispatcher and bot.
+    """
+    import logger.rchat_interactor as rchat_interactor
+
+    prepare_databases(databases_dir, seed)
+    # Reports of errors are only recorded into log
+    rchat_interactor.post_message = lambda message_text, receiver_id: None
+
+    import vars
+    import run
+
+    if seed and not vars.bot_db_client.get_companies_list():
+        seed_database(vars.bot_db_client)
+        for user_id in SEEDED_BOT_ADMINS:
+            vars.bot_db_client.register_user(user_id, f"admin{user_id}")
+            vars.bot_db_client.register_bot_admin(user_id)
+        vars.bot_db_client.load_roles_index()
+        vars.communicator.update_patterns()
+
+    session.middleware(vars.outgoing_scheduler)
+    session.middleware(vars.api_metrics_middleware)
+    vars.bot.session = session
+    return run.dp, vars.bot
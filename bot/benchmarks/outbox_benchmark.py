@@ -0,0 +1,77 @@
+"""
+Benchmark of OutboxDispatcher: draining of backlog of pending messages against fake Bot session with 5xx failures.
+
+Shows throughput of draining and lag of event loop (how long other tasks, e.g. updates handling, wait) during draining.
+Database is created in temporary directory, bot's database is not touched. Run from "bot" directory:
+    python -m benchmarks.outbox_benchmark [messages_count]
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+
+from pathlib import Path
+from time import monotonic
+
+from aiogram import Bot
+
+from database import BotDBClient
+
+from outgoing import OutboxDispatcher
+
+from .fake_session import FAKE_TOKEN, FakeTelegramSession
+
+
+SERVER_ERRORS_RATE = 0.05
+
+
+async def _measure_loop_lag(lags : list[float], interval : float = 0.01) -> None:
+    while True:
+        started_at = monotonic()
+        await asyncio.sleep(interval)
+        lags.append(monotonic() - started_at - interval)
+
+
+async def _drain(database_client : BotDBClient, messages_count : int) -> None:
+    random.seed(0)
+    session = FakeTelegramSession(server_errors_rate = SERVER_ERRORS_RATE)
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    dispatcher = OutboxDispatcher(database_client = database_client, bot = bot, initial_backoff = 0.05, poll_interval = 0.05)
+
+    database_client.enqueue_outbox_messages([
+        ("bot", -1_000_000_000_000 - message_number % 100, f"Delay alert #{message_number}", "delay_alert") 
+        for message_number in range(messages_count)
+    ])
+
+    lags = []
+    lag_task = asyncio.create_task(_measure_loop_lag(lags))
+    started_at = monotonic()
+    runner = asyncio.create_task(dispatcher.run())
+    while True:
+        await asyncio.sleep(0.05)
+        outbox_stats = await asyncio.to_thread(database_client.get_outbox_stats)
+        if not outbox_stats.get("pending") and not outbox_stats.get("sending"):
+            break
+    duration = monotonic() - started_at
+    for task in (runner, lag_task):
+        task.cancel()
+    await asyncio.gather(runner, lag_task, return_exceptions = True)
+    await bot.session.close()
+
+    lags.sort()
+    print(f"OutboxDispatcher, {messages_count} pending messages, {SERVER_ERRORS_RATE:.0%} of requests fail with 5xx")
+    print(f"drained in {duration:.2f} s: {dispatcher.delivered_count / duration:.0f} messages/s")
+    print(f"delivered {dispatcher.delivered_count}, retried {dispatcher.retried_count}, dead {dispatcher.dead_count}, 5xx answers {session.server_errors_count}")
+    print(f"outbox: {outbox_stats}")
+    print(f"event loop lag: median {lags[len(lags) // 2] * 1e3:.2f} ms, p99 {lags[int(len(lags) * 0.99)] * 1e3:.2f} ms, max {lags[-1] * 1e3:.2f} ms")
+
+
+def run_benchmark(messages_count : int = 5_000) -> None:
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        database_client = BotDBClient(database_path = Path(temporary_directory) / "bot_database.db")
+        asyncio.run(_drain(database_client, messages_count))
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000)
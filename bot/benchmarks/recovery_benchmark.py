@@ -0,0 +1,80 @@
+"""
+Benchmark of deadlines recovery after restart: indexed query of armed chats from "chats_limits" and heapify into DeadlineScheduler.
+
+Database is seeded in temporary directory, bot's database is not touched. Run from "bot" directory:
+    python -m benchmarks.recovery_benchmark [armed_chats_count]
+"""
+
+import random
+import sqlite3 as sqlt
+import sys
+import tempfile
+
+from bisect import bisect_right
+from pathlib import Path
+from time import perf_counter, time
+
+from database import BotDBClient
+
+from delay_control import DeadlineScheduler
+
+
+def seed_database(database_client : BotDBClient, armed_chats_count : int, idle_chats_count : int) -> None:
+    """
+    Fills database with companies and chats: `armed_chats_count` chats have deadline (10% of them expired), other chats are idle.
+    """
+    random.seed(0)
+    now = int(time())
+    companies_count = 100
+    chats_count = armed_chats_count + idle_chats_count
+    with sqlt.connect(database_client.database_path) as connection:
+        connection.executemany("INSERT INTO companies (company_id, company_name) VALUES (?, ?)", [(company_id, f"company {company_id}") for company_id in range(1, companies_count + 1)])
+        connection.executemany(
+            "INSERT INTO companies_settings (company_id, redirect_chat_id, message_response_timeout) VALUES (?, ?, ?)",
+            [(company_id, -company_id, 900) for company_id in range(1, companies_count + 1)]
+        )
+        connection.executemany(
+            "INSERT INTO chats VALUES (?, ?, ?, ?)",
+            [(-chat_number - 1, f"chat {chat_number}", chat_number % companies_count + 1, "customer") for chat_number in range(chats_count)]
+        )
+        connection.executemany(
+            "INSERT INTO chats_limits (chat_tg_id, time_limit, message_link) VALUES (?, ?, ?)",
+            [
+                (
+                    -chat_number - 1, 
+                    (now + random.randint(-600, 5400)) if chat_number < armed_chats_count else None,
+                    f"https://t.me/c/{chat_number}/1",
+                ) 
+                for chat_number in range(chats_count)
+            ]
+        )
+        connection.commit()
+
+
+def run_benchmark(armed_chats_count : int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        database_client = BotDBClient(database_path = Path(temporary_directory) / "bot_database.db")
+        seed_database(database_client, armed_chats_count, idle_chats_count = armed_chats_count)
+
+        started_at = perf_counter()
+        armed_chats = database_client.get_armed_chats()
+        loaded_at = perf_counter()
+
+        scheduler = DeadlineScheduler()
+        expired_count = bisect_right(armed_chats, time(), key = lambda armed_chat: armed_chat[1])
+        scheduler.bulk_load([(chat_id, time_limit, None) for chat_id, time_limit in armed_chats[expired_count:]])
+        heapified_at = perf_counter()
+
+        expired_chats = database_client.get_chats_info_list([chat_id for chat_id, _ in armed_chats[:expired_count]])
+        expired_companies_count = len({chat_info["company_id"] for chat_info in expired_chats})
+        finished_at = perf_counter()
+
+    print(f"Recovery of {len(armed_chats)} armed chats (+{armed_chats_count} idle chats in table)")
+    print(f"  indexed query:      {(loaded_at - started_at) * 1e3:8.1f} ms")
+    print(f"  split + heapify:    {(heapified_at - loaded_at) * 1e3:8.1f} ms ({len(scheduler)} armed)")
+    print(f"  expired chats info: {(finished_at - heapified_at) * 1e3:8.1f} ms ({len(expired_chats)} expired of {expired_companies_count} companies)")
+    print(f"  total:              {(finished_at - started_at) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,218 @@
+"""
+Replay of captured updates (see incoming.update_capture) through the real bot offline: updates are fed into
+Dispatcher.feed_update against scratch copies of bot databases, Telegram is replaced by FakeTelegramSession.
+
+Timing modes:
+    fast - updates are fed as fast as possible (at most `concurrency` updates are handled at once),
+    original - updates are fed with original intervals between them (divided by `speed`).
+
+If capture was written with known salt, pass it as --salt: IDs in scratch copy of bot database are anonymized
+by the same keyed hashes, so captured chats and users match companies, chats and managers of database.
+IDs of bot itself are not anonymized, but replayed bot has fake ID, so updates about bot's membership are not recognized.
+
+Report (throughput, latency percentiles by update type and by handler, API calls) is printed and can be saved as JSON
+with sorted keys to diff runs of different commits:
+    python -m benchmarks.replay captures/ --timing fast --json replay-new.json
+
+Run from "bot" directory.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import subprocess
+import tempfile
+
+from collections import defaultdict
+from pathlib import Path
+from time import monotonic
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from incoming import IdAnonymizer, read_capture
+
+from .fake_session import FakeTelegramSession
+from .load_test import HandlersTimer, percentiles
+from .offline_bot import BOT_DIR, prepare_databases, start_offline_bot
+
+
+# Columns of bot database which contain IDs of users and chats
+ANONYMIZED_COLUMNS : tuple[tuple[str, str]] = (
+    ("users", "user_tg_id"),
+    ("bot_admins", "user_tg_id"),
+    ("owners", "user_tg_id"),
+    ("managers", "user_tg_id"),
+    ("chats", "chat_tg_id"),
+    ("chats_limits", "chat_tg_id"),
+    ("companies_settings", "redirect_chat_id"),
+    ("outbox", "chat_id"),
+)
+
+
+def anonymize_database(database_path : Path, anonymizer : IdAnonymizer) -> None:
+    """
+    Replaces IDs of users and chats in bot database by anonymized ones (database must be scratch copy).
+    """
+    def anonymize_value(value):
+        try:
+            anonymized_id = anonymizer.anonymize(int(value))
+        except (TypeError, ValueError):
+            return value
+        return str(anonymized_id) if isinstance(value, str) else anonymized_id
+
+    connection = sqlite3.connect(database_path)
+    try:
+        connection.create_function("anonymize_id", 1, anonymize_value, deterministic = True)
+        with connection:
+            existing_tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table, column in ANONYMIZED_COLUMNS:
+                if table in existing_tables:
+                    connection.execute(f"UPDATE {table} SET {column} = anonymize_id({column})")
+    finally:
+        connection.close()
+
+
+def get_environment() -> dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd = BOT_DIR, capture_output = True, text = True, timeout = 5,
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    return {"commit" : commit or "unknown", "python" : platform.python_version(), "platform" : platform.platform()}
+
+
+async def replay_updates(
+        dispatcher : Dispatcher,
+        bot : Bot,
+        records : list[tuple[float, dict]],
+        timing : str = "fast",
+        speed : float = 1.0,
+        concurrency : int = 1000,
+    ) -> tuple[dict[str, list[float]], int]:
+    """
+    Feeds captured updates into dispatcher. Returns latencies of handling by update type and count of unhandled updates.
+    """
+    latencies : dict[str, list[float]] = defaultdict(list)
+    unhandled_count = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def feed(update : Update) -> None:
+        nonlocal unhandled_count
+        fed_at = monotonic()
+        try:
+            result = await dispatcher.feed_update(bot, update)
+        finally:
+            slots.release()
+        latencies[update.event_type].append(monotonic() - fed_at)
+        if result is UNHANDLED:
+            unhandled_count += 1
+
+    tasks = []
+    started_at = monotonic()
+    first_received_at = records[0][0] if records else 0.0
+    for received_at, raw_update in records:
+        if timing == "original":
+            delay = (received_at - first_received_at) / speed - (monotonic() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await slots.acquire()
+        tasks.append(asyncio.create_task(feed(Update.model_validate(raw_update, context = {"bot" : bot}))))
+    await asyncio.gather(*tasks, return_exceptions = True)
+    return latencies, unhandled_count
+
+
+async def _run_replay(arguments : argparse.Namespace, databases_dir : Path) -> dict:
+    records = list(read_capture(arguments.captures))
+    if arguments.limit:
+        records = records[:arguments.limit]
+    if not records:
+        raise ValueError("Capture has no updates")
+
+    bot_database_path, _ = prepare_databases(databases_dir, seed = arguments.seed)
+    if arguments.salt:
+        anonymize_database(bot_database_path, IdAnonymizer(arguments.salt))
+    latency = tuple(arguments.latency) if len(arguments.latency) == 2 else arguments.latency[0]
+    session = FakeTelegramSession(latency = latency)
+    dispatcher, bot = start_offline_bot(session, databases_dir, seed = arguments.seed)
+
+    import vars
+
+    timer = HandlersTimer()
+    timer.attach(dispatcher)
+    started_at = monotonic()
+    latencies, unhandled_count = await replay_updates(
+        dispatcher, bot, records, arguments.timing, arguments.speed, arguments.concurrency,
+    )
+    elapsed = monotonic() - started_at
+    await vars.outgoing_scheduler.close()
+
+    handled_count = sum(len(values) for values in latencies.values())
+    return {
+        "environment" : get_environment(),
+        "config" : {
+            "captures" : [str(path) for path in arguments.captures],
+            "updates_count" : len(records),
+            "timing" : arguments.timing,
+            "speed" : arguments.speed,
+            "concurrency" : arguments.concurrency,
+            "latency" : arguments.latency,
+        },
+        "elapsed_s" : round(elapsed, 3),
+        "captured_span_s" : round(records[-1][0] - records[0][0], 3),
+        "throughput_per_s" : round(handled_count / elapsed, 1),
+        "unhandled_count" : unhandled_count,
+        "update_types" : {
+            "all" : percentiles([value for values in latencies.values() for value in values]),
+            **{update_type : percentiles(values) for update_type, values in sorted(latencies.items())},
+        },
+        "handlers" : {name : percentiles(values) for name, values in sorted(timer.durations.items())},
+        "api_calls" : session.get_calls_by_method(),
+        "intake" : vars.intake_guard.get_stats(),
+    }
+
+
+def print_report(report : dict) -> None:
+    print(f"Replay of {report['config']['updates_count']} updates ({report['config']['timing']}) at commit {report['environment']['commit']}")
+    print(
+        f"Handled in {report['elapsed_s']} s (captured during {report['captured_span_s']} s): "
+        f"{report['throughput_per_s']} updates/s, unhandled {report['unhandled_count']}"
+    )
+    for title in ("update_types", "handlers"):
+        print(f"{title.replace('_', ' ').capitalize()} (ms):")
+        for name, stats in report[title].items():
+            print(
+                f"    {name:<36} {stats['count']:>7}  p50 {stats.get('p50_ms', 0):>9}  p90 {stats.get('p90_ms', 0):>9}  "
+                f"p99 {stats.get('p99_ms', 0):>9}  max {stats.get('max_ms', 0):>9}"
+            )
+    print(f"API calls: {report['api_calls']}")
+    print(f"Intake: admitted {report['intake']['admitted']}, shed {report['intake']['shed']}, max loop lag {report['intake']['max_lag']} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Replay of captured updates through offline bot")
+    parser.add_argument("captures", type = Path, nargs = "+", help = "capture files or directories")
+    parser.add_argument("--timing", choices = ("fast", "original"), default = "fast")
+    parser.add_argument("--speed", type = float, default = 1.0, help = "speed-up of original timing")
+    parser.add_argument("--concurrency", type = int, default = 1000, help = "maximal count of updates handled at once")
+    parser.add_argument("--latency", type = float, nargs = "+", default = [0.05], help = "latency of Telegram: seconds or min max")
+    parser.add_argument("--salt", default = None, help = "salt of capture, IDs of database copy are anonymized by it")
+    parser.add_argument("--seed", action = "store_true", help = "fill empty databases by benchmark content")
+    parser.add_argument("--limit", type = int, default = 0, help = "count of replayed updates (all by default)")
+    parser.add_argument("--json", type = Path, default = None, help = "path of JSON report")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as databases_dir:
+        report = asyncio.run(_run_replay(arguments, Path(databases_dir)))
+    print_report(report)
+    if arguments.json:
+        arguments.json.write_text(json.dumps(report, indent = 2, ensure_ascii = False, sort_keys = True), encoding = "UTF-8")
+        print(f"Report is saved into {arguments.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,2 @@
-from .subtasks_operator import start_subtasks
\ No newline at end of file
+from .subtasks_operator import start_subtasks, stop_subtasks, get_subtasks_report
+from .subtasks_operator import Subtask, supervisor
@@ -1,10 +1,231 @@
+"""
+This module provides supervisor of bot's subtasks: periodic and long-running coroutines which work beside updates handling.
+
+Supervisor keeps references to subtasks' tasks, restarts crashed subtasks with exponential backoff,
+collects statistics of runs and cancels subtasks on bot stopping.
+"""
+
 import asyncio
+import random
+
+from datetime import datetime
+from time import monotonic
+from typing import Awaitable, Callable
+
+from logger import record_log, regist_error
+
+from vars import loop_lag_monitor, metrics_exporter, outbox_dispatcher
+
+from ..delay_tracking import delay_tracker, delay_notifications, group_pipeline
+
+
+RESTART_POLICIES : tuple[str] = ("always", "on_failure", "never")
+
+
+class Subtask:
+    """
+    Description of subtask and statistics of its runs.
+
+    Parameters:
+    -----------
+    name : str
+        unique name of subtask
+    function : Callable[[], Awaitable]
+        coroutine function without arguments
+    interval : float | None
+        seconds between runs of periodic subtask. If None, subtask is long-running (runs until it returns or crashes)
+    jitter : float
+        random deviation (in seconds) of interval, prevents synchronous runs of subtasks
+    restart : str
+        "always", "on_failure" or "never": when subtask is started again after return or crash
+    initial_backoff : float
+        delay (in seconds) before first restart after crash, it is doubled after each next crash in a row
+    max_backoff : float
+        limit of delay before restart
+    """
+    task : asyncio.Task | None
+    runs_count : int
+    errors_count : int
+    total_duration : float
+    last_run_at : datetime | None
+    last_error : str | None
+
+    def __init__(
+            self,
+            name : str,
+            function : Callable[[], Awaitable],
+            interval : float | None = None,
+            jitter : float = 0.0,
+            restart : str = "on_failure",
+            initial_backoff : float = 1.0,
+            max_backoff : float = 300.0,
+        ) -> None:
+        if restart not in RESTART_POLICIES:
+            raise ValueError(f"Unexpected restart policy: {restart}")
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.jitter = jitter
+        self.restart = restart
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.task = None
+        self.runs_count = 0
+        self.errors_count = 0
+        self.total_duration = 0.0
+        self.last_run_at = None
+        self.last_error = None
+
+
+    @property
+    def mean_duration(self) -> float:
+        return (self.total_duration / self.runs_count) if self.runs_count else 0.0
+
+
+    def next_interval(self) -> float:
+        return max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+
+class SubtasksSupervisor:
+    subtasks : dict[str, Subtask]
+
+    def __init__(self) -> None:
+        self.subtasks = {}
+
 
+    def register(self, subtask : Subtask) -> None:
+        if subtask.name in self.subtasks:
+            raise ValueError(f"Subtask with name {subtask.name} is already registered")
+        self.subtasks[subtask.name] = subtask
 
-subtasks_list = (
 
+    def start(self) -> None:
+        """
+        Starts all registered subtasks which are not running. Must be called from running event loop.
+        """
+        for subtask in self.subtasks.values():
+            if subtask.task is None or subtask.task.done():
+                subtask.task = asyncio.create_task(self._supervise(subtask), name = f"subtask:{subtask.name}")
+
+
+    async def stop(self, timeout : float = 10.0) -> None:
+        """
+        Cancels all subtasks and waits for their ending (at most `timeout` seconds).
+        """
+        tasks = [subtask.task for subtask in self.subtasks.values() if subtask.task and not subtask.task.done()]
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout = timeout)
+        if pending:
+            record_log(f"Subtasks were not stopped in {timeout} seconds: {[task.get_name() for task in pending]}", "subtasks supervisor")
+
+
+    async def _run_once(self, subtask : Subtask) -> bool:
+        """
+        Runs subtask's function once and registers statistics. Returns True, if run is successful.
+        """
+        started_at = monotonic()
+        subtask.last_run_at = datetime.now()
+        try:
+            await subtask.function()
+            return True
+        except Exception as error:
+            subtask.errors_count += 1
+            subtask.last_error = f"{type(error).__name__}: {error}"
+            regist_error(
+                error_description = f"Subtask {subtask.name} crashed: {error}",
+                error_type = type(error),
+                raised_by = f"subtask {subtask.name}",
+            )
+            return False
+        finally:
+            subtask.runs_count += 1
+            subtask.total_duration += monotonic() - started_at
+
+
+    async def _supervise(self, subtask : Subtask) -> None:
+        backoff = subtask.initial_backoff
+        while True:
+            is_success = await self._run_once(subtask)
+
+            if is_success:
+                backoff = subtask.initial_backoff
+                if subtask.interval is not None:
+                    await asyncio.sleep(subtask.next_interval())
+                    continue
+                if subtask.restart != "always":
+                    record_log(f"Subtask {subtask.name} is finished", "subtasks supervisor")
+                    return
+                await asyncio.sleep(backoff)
+                continue
+
+            if subtask.restart == "never":
+                record_log(f"Subtask {subtask.name} is stopped after crash (restart policy: never)", "subtasks supervisor")
+                return
+
+            delay = backoff if subtask.interval is None else max(backoff, subtask.next_interval())
+            record_log(f"Subtask {subtask.name} will be restarted in {delay:.1f} seconds", "subtasks supervisor")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, subtask.max_backoff)
+
+
+    def get_stats(self) -> list[dict]:
+        return [
+            {
+                "name" : subtask.name,
+                "is_running" : bool(subtask.task and not subtask.task.done()),
+                "last_run_at" : subtask.last_run_at,
+                "runs_count" : subtask.runs_count,
+                "mean_duration" : subtask.mean_duration,
+                "errors_count" : subtask.errors_count,
+                "last_error" : subtask.last_error,
+            }
+            for subtask in self.subtasks.values()
+        ]
+
+
+subtasks_list : tuple[Subtask] = (
+    Subtask(name = "delay tracker", function = delay_tracker.run, restart = "always"),
+    Subtask(name = "delay notifications", function = delay_notifications.run, restart = "always"),
+    Subtask(name = "chats limits flushing", function = group_pipeline.run_flush, interval = 1.0),
+    Subtask(name = "outbox dispatcher", function = outbox_dispatcher.run, restart = "always"),
+    Subtask(name = "loop lag monitor", function = loop_lag_monitor.run, restart = "always"),
 )
 
+supervisor = SubtasksSupervisor()
+for subtask in subtasks_list:
+    supervisor.register(subtask)
+# Metrics endpoint is disabled by "metrics_port": 0 in config
+if metrics_exporter is not None:
+    supervisor.register(Subtask(name = "metrics exporter", function = metrics_exporter.run, restart = "always", initial_backoff = 10.0))
+
+
 def start_subtasks():
-    for subtask in subtasks_list:
-        asyncio.create_task(subtask())
\ No newline at end of file
+    supervisor.start()
+
+
+async def stop_subtasks():
+    await supervisor.stop()
+
+
+def get_subtasks_report() -> str:
+    """
+    Returns text report about subtasks: last run time, mean duration and errors count of each subtask.
+    """
+    subtasks_stats = supervisor.get_stats()
+    if not subtasks_stats:
+        return "#SUBTASKS\n\nNo subtasks are registered"
+
+    report_lines = ["#SUBTASKS"]
+    for stats in subtasks_stats:
+        last_run_at = stats["last_run_at"].strftime("%d-%m-%y %H:%M:%S") if stats["last_run_at"] else "never"
+        report_lines.append(
+            f"{stats['name']} ({'running' if stats['is_running'] else 'stopped'})\n"
+            f"Last run: {last_run_at}\n"
+            f"Runs: {stats['runs_count']}, mean duration: {stats['mean_duration']:.3f} s\n"
+            f"Errors: {stats['errors_count']}" + (f", last: {stats['last_error']}" if stats["last_error"] else "")
+        )
+    return "\n\n".join(report_lines)
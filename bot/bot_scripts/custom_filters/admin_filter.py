@@ -4,8 +4,12 @@ from aiogram.filters import BaseFilter
 
 from vars import bot_db_client
 
+from ..middlewares import UserContext
+
 
 class IsBotAdminFilter(BaseFilter):
-    async def __call__(self, incoming_entity : types.Message | types.CallbackQuery) -> bool:
-        return incoming_entity.from_user.id in bot_db_client.get_bot_admins_list()
-    
\ No newline at end of file
+    async def __call__(self, incoming_entity : types.Message | types.CallbackQuery, user_context : UserContext | None = None) -> bool:
+        if user_context is not None:
+            return user_context.is_bot_admin
+        return bot_db_client.roles_index.is_bot_admin(incoming_entity.from_user.id)
+    
@@ -19,7 +19,7 @@ class IsGroupChatFilter(BaseFilter):
 
 class IsCustomerChatFilter(BaseFilter):
     async def __call__(self, message : types.Message | types.MessageReactionUpdated) -> bool:
-        chat_info = vars.bot_db_client.get_chat_info(message.chat.id)
+        chat_info = vars.bot_db_client.get_cached_chat_info(message.chat.id)
         if (not chat_info) or (chat_info.get("chat_type") != "customer"):
             return False
         return True
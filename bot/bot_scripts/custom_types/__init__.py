@@ -0,0 +1,10 @@
+from .callbacks import ContentType, ContentItemType, PageAction, ManagersAction
+
+from .callbacks import (
+    ContentListCallback,
+    ContentTypeCallback,
+    ContentChangeCallback,
+    PageCallback,
+    ManagersCallback,
+    ChatActivationCallback,
+)
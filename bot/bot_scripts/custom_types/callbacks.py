@@ -0,0 +1,76 @@
+"""
+Structured data of inline buttons. Each class is packed into compact string "<prefix>:<field>:..." by aiogram
+(pack() raises ValueError, if result exceeds 64 bytes - limit of Telegram), enums are encoded by one-two letters.
+
+Prefix ends with version of encoding: if fields of class are changed, prefix gets new version,
+so buttons of old messages are not parsed as new payload (such callbacks are not handled).
+"""
+
+from enum import Enum
+
+from aiogram.filters.callback_data import CallbackData
+
+
+class ContentType(str, Enum):
+    MESSAGES = "m"
+    KEYBOARDS = "k"
+
+
+class ContentItemType(str, Enum):
+    MESSAGE = "m"
+    KEYBOARD = "k"
+
+
+class PageAction(str, Enum):
+    NEXT = "n"
+    PREVIOUS = "p"
+    STOP = "s"
+
+
+class ManagersAction(str, Enum):
+    LIST = "l"
+    ADD = "a"
+    DELETE = "d"
+
+
+class ContentListCallback(CallbackData, prefix = "cl1"):
+    """
+    Bot-admin: show content of communicator.
+    """
+
+
+class ContentTypeCallback(CallbackData, prefix = "ct1"):
+    """
+    Bot-admin: type of content to show.
+    """
+    content_type : ContentType
+
+
+class ContentChangeCallback(CallbackData, prefix = "cc1"):
+    """
+    Bot-admin: change text of message or keyboard.
+    """
+    item_type : ContentItemType
+
+
+class PageCallback(CallbackData, prefix = "pg2"):
+    """
+    Paging of PagedKeyboard: `pages` is short key of paged content (e.g. "cl" for content list),
+    `page` is index of page to show (for previous and next actions).
+    """
+    pages : str
+    action : PageAction
+    page : int = 0
+
+
+class ManagersCallback(CallbackData, prefix = "om1"):
+    """
+    Owner: operations with managers of company.
+    """
+    action : ManagersAction
+
+
+class ChatActivationCallback(CallbackData, prefix = "ca1"):
+    """
+    Group chat: activation of chat.
+    """
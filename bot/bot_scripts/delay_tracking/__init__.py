@@ -0,0 +1,3 @@
+from .delay_tracker import DelayTracker, delay_tracker, delay_notifications
+from .group_pipeline import group_pipeline
+from .recovery import recover_deadlines
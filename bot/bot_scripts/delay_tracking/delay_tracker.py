@@ -0,0 +1,153 @@
+"""
+This module provides DelayTracker which enforces response timeouts in customer chats.
+
+Deadline of chat is armed by the first unanswered customer's message and cancelled by manager's reply
+(see group_pipeline), response timeout is counted in working time of company (see delay_control.BusinessCalendar).
+When deadline passes, chat is reported to redirect chat of chat's company: overdue chats are aggregated
+into one message per redirect chat, which is edited as chats get answered.
+Deadlines are kept in memory (see delay_control.DeadlineScheduler) and duplicated into "chats_limits.time_limit".
+Expired deadline is reset in database only when notification about chat is saved into outbox, so chats which were not reported
+before crash of bot are reported after restart (see recovery).
+"""
+
+import asyncio
+
+from time import time
+
+from aiogram import html
+
+from communication import DEFAULT_MESSAGES_PATTERNS
+
+from delay_control import DeadlineScheduler, NotificationAggregator, OverdueChat
+
+from logger import record_log, regist_error
+
+from vars import bot, bot_db_client, communicator, outbox_dispatcher
+
+
+class DelayTracker:
+    scheduler : DeadlineScheduler
+    notifications : NotificationAggregator
+
+    def __init__(self, notifications : NotificationAggregator) -> None:
+        self.scheduler = DeadlineScheduler()
+        self.notifications = notifications
+        self._wakeup = asyncio.Event()
+
+
+    def __contains__(self, chat_id : int) -> bool:
+        return chat_id in self.scheduler
+
+
+    def cancel(self, chat_id : int) -> bool:
+        """
+        Cancels deadline of chat. Returns False, if chat had no deadline.
+        """
+        return self.scheduler.cancel(chat_id)
+
+
+    def arm(self, chat_id : int, deadline : float) -> None:
+        next_deadline = self.scheduler.next_deadline()
+        self.scheduler.arm(chat_id, deadline)
+        if next_deadline is None or deadline < next_deadline:
+            self._wakeup.set()
+
+
+    def load_deadlines(self, deadlines : list[tuple[int, float, None]]) -> int:
+        """
+        Loads many deadlines at once (see DeadlineScheduler.bulk_load). Returns count of loaded deadlines.
+        """
+        loaded_count = self.scheduler.bulk_load(deadlines)
+        self._wakeup.set()
+        return loaded_count
+
+
+    async def run(self) -> None:
+        """
+        Long-running subtask: sleeps until the nearest deadline (or arming of earlier one) and fires expired deadlines.
+        """
+        record_log("Delay tracker is started", "delay tracker")
+        while True:
+            expired = self.scheduler.pop_expired(time())
+            if expired:
+                self._fire_expired(expired)
+
+            next_deadline = self.scheduler.next_deadline()
+            self._wakeup.clear()
+            timeout = None if next_deadline is None else max(0.0, next_deadline - time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+    def _fire_expired(self, expired : list[tuple[int, float, None]]) -> None:
+        chats_by_company : dict[int, list[dict]] = {}
+        for chat_id, deadline, _ in expired:
+            chat_info = bot_db_client.get_chat_info(chat_id)
+            if not chat_info:
+                continue
+            chat_info["time_limit"] = deadline
+            chats_by_company.setdefault(chat_info.get("company_id"), []).append(chat_info)
+
+        for company_id, chats_infos in chats_by_company.items():
+            self.notify_about_delays(company_id, chats_infos)
+
+
+    def notify_about_delays(self, company_id : int, chats_infos : list[dict]) -> None:
+        """
+        Passes overdue chats of company to incident of company's redirect chat (see delay_control.NotificationAggregator),
+        their deadlines in database are reset when they are reported.
+
+        Parameters:
+        -----------
+        company_id : int
+            company of all passed chats
+        chats_infos : list[dict]
+            overdue chats, each dict has at least "chat_tg_id", "chat_title", "message_link" and "time_limit" (expired deadline)
+        """
+        try:
+            company_info = bot_db_client.get_company_info(company_id)
+            if not company_info or not company_info.get("redirect_chat_id"):
+                record_log(f"Delays of {len(chats_infos)} chats of company {company_id} are not reported: redirect chat is not set", "delay tracker")
+                return
+
+            for chat_info in chats_infos:
+                self.notifications.add_overdue(
+                    redirect_chat_id = company_info["redirect_chat_id"],
+                    chat_id = chat_info["chat_tg_id"],
+                    chat_title = chat_info.get("chat_title") or str(chat_info["chat_tg_id"]),
+                    message_link = chat_info.get("message_link"),
+                    deadline = chat_info["time_limit"],
+                    response_timeout = company_info.get("message_response_timeout") or 0,
+                )
+
+        except Exception as error:
+            regist_error(
+                error_description = f"Delay notification error for company {company_id}: {error}",
+                error_type = type(error),
+            )
+
+
+def render_delay_line(overdue_chat : OverdueChat, now : float) -> str:
+    # Built-in text is used, if pattern was removed from database after start
+    pattern = communicator.get_message("chat_delay_notification", default = DEFAULT_MESSAGES_PATTERNS["chat_delay_notification"])
+    return pattern.replace(
+        "*CHAT_TITLE*", html.quote(overdue_chat.chat_title)
+    ).replace(
+        "*MESSAGE_LINK*", overdue_chat.message_link or ""
+    ).replace(
+        "*WAITING_TIME*", str(int(overdue_chat.get_waiting_seconds(now) // 60))
+    )
+
+
+# Notifications are saved into outbox before sending, notifications which were not sent before stop are delivered after restart.
+# Deadlines armed again after expiration are not reset
+delay_notifications = NotificationAggregator(
+    bot = bot,
+    render_line = render_delay_line,
+    send_message = lambda redirect_chat_id, text: outbox_dispatcher.deliver("bot", redirect_chat_id, text, kind = "delay_alert"),
+    on_send_failure = lambda redirect_chat_id, text: outbox_dispatcher.enqueue("bot", redirect_chat_id, text, kind = "delay_alert"),
+    on_reported = lambda chats_ids: bot_db_client.reset_chats_time_limits(chats_ids, expired_before = time()),
+)
+delay_tracker = DelayTracker(notifications = delay_notifications)
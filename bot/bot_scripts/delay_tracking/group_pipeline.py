@@ -0,0 +1,17 @@
+"""
+This module provides pipeline of customer chats' messages of bot (see delay_control.GroupMessagePipeline).
+"""
+
+from delay_control import GroupMessagePipeline
+
+from vars import bot_db_client
+
+from .delay_tracker import delay_tracker, delay_notifications
+
+
+group_pipeline = GroupMessagePipeline(
+    database_client = bot_db_client,
+    tracker = delay_tracker,
+    is_company_manager = bot_db_client.roles_index.is_company_manager,
+    on_manager_reply = delay_notifications.mark_answered,
+)
@@ -0,0 +1,43 @@
+"""
+This module provides startup phase which rebuilds response deadlines after restart from "chats_limits.time_limit".
+"""
+
+from bisect import bisect_right
+from time import perf_counter, time
+
+from logger import record_log
+
+from vars import bot_db_client
+
+from .delay_tracker import delay_tracker
+
+
+async def recover_deadlines() -> None:
+    """
+    Loads all armed chats by one indexed query and heapifies them into delay tracker.
+
+    Deadlines which have expired while bot was down are fired at once (they are aggregated into one notification per redirect chat).
+    """
+    started_at = perf_counter()
+    armed_chats = bot_db_client.get_armed_chats()
+    loaded_at = perf_counter()
+
+    # Armed chats are ordered by deadline, so expired ones are prefix of list
+    expired_count = bisect_right(armed_chats, time(), key = lambda armed_chat: armed_chat[1])
+    delay_tracker.load_deadlines([(chat_id, time_limit, None) for chat_id, time_limit in armed_chats[expired_count:]])
+    recovered_at = perf_counter()
+    record_log(
+        f"Deadlines recovered: {len(armed_chats) - expired_count} armed, {expired_count} expired "
+        f"(query {loaded_at - started_at:.3f} s, heapify {recovered_at - loaded_at:.3f} s)", 
+        "delay tracker"
+    )
+    if not expired_count:
+        return
+
+    expired_by_company : dict[int, list[dict]] = {}
+    for chat_info in bot_db_client.get_chats_info_list([chat_id for chat_id, _ in armed_chats[:expired_count]]):
+        expired_by_company.setdefault(chat_info.get("company_id"), []).append(chat_info)
+
+    for company_id, chats_infos in expired_by_company.items():
+        delay_tracker.notify_about_delays(company_id, chats_infos)
+    record_log(f"Expired deadlines of {len(expired_by_company)} companies passed to notifications in {perf_counter() - recovered_at:.3f} s", "delay tracker")
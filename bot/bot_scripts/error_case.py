@@ -1,10 +1,65 @@
+from time import monotonic
+
 from aiogram.fsm.context import FSMContext
 
-from aiogram.types import InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardMarkup, TelegramObject
+
+from logger import record_log, regist_error, define_caller
+
+from vars import bot, bot_metrics, communicator
+
+from .middlewares import UserContext
+
+
+# Serialized error event is cut to this count of characters
+MAX_ERROR_EVENT_LENGTH = 4000
+
+
+class RepeatedErrors:
+    """
+    Counter of repeated errors by fingerprint (source and type of error). Error of fingerprint is registered fully 
+    once per window, other errors of window are logged briefly: without state, event and report to developer.
 
-from logger import regist_error, define_caller
+    Parameters:
+    -----------
+    window : float
+        seconds of window
+    max_fingerprints : int
+        count of tracked fingerprints, the oldest fingerprints are dropped
+    """
 
-from vars import bot, communicator
+    def __init__(self, window : float = 60.0, max_fingerprints : int = 1000) -> None:
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        # fingerprint -> [start of window, count of repeated errors of window]
+        self._windows : dict[tuple, list] = {}
+
+
+    def register(self, fingerprint : tuple) -> int | None:
+        """
+        Returns None, if error is repeated in window, otherwise count of repeated errors of previous window.
+        """
+        now = monotonic()
+        window = self._windows.pop(fingerprint, None)
+        if (window is not None) and (now - window[0] < self.window):
+            window[1] += 1
+            self._windows[fingerprint] = window
+            return None
+        if len(self._windows) >= self.max_fingerprints:
+            del self._windows[next(iter(self._windows))]
+        self._windows[fingerprint] = [now, 0]
+        return window[1] if window is not None else 0
+
+
+repeated_errors = RepeatedErrors()
+
+
+def serialize_error_event(error_event : TelegramObject | str, max_length : int = MAX_ERROR_EVENT_LENGTH) -> str:
+    if not isinstance(error_event, str):
+        error_event = error_event.model_dump_json(by_alias = True, exclude_none = True)
+    if len(error_event) > max_length:
+        error_event = f"{error_event[:max_length]}... ({len(error_event) - max_length} characters are cut)"
+    return error_event
 
 
 async def operate_error_case(
@@ -17,9 +72,13 @@ async def operate_error_case(
         save_state : bool = False,
         current_state : FSMContext = None,
         send_markup : InlineKeyboardMarkup = None,
-        error_event : str = None,
+        error_event : TelegramObject | str = None,
+        user_context : UserContext = None,
 ) -> None:
     try:
+        bot_metrics.register_script_error()
+        if (not user_id) and user_context:
+            user_id = user_context.user_id
         if message_to_user is None:
             message_to_user = communicator.get_message("default_error")
         # getting current state and finish it if neccessary 
@@ -29,16 +88,25 @@ async def operate_error_case(
         except: 
             pass
 
-        error_description = f"An error was happened in bot script.\n\nError type: {error_type}\nUser id: {user_id}\nCurrent state: {await current_state.get_state() if current_state else None}\nDescription: {error_text}"
-        regist_error(
-            error_description = error_description, 
-            error_type = "bot script error",
-            raised_by = source if source else define_caller(is_full_path = True, from_source = True),
-            from_source = True 
-        )
-        
-        if error_event:
-            regist_error(f"Error event: {error_event}", "event-information", "event-information", silent_mode = True)
+        if source is None:
+            source = define_caller(is_full_path = True, from_source = True)
+        # Event (update, message, callback) is serialized only if error is registered fully
+        repeated_count = repeated_errors.register((source, str(error_type)))
+        if repeated_count is None:
+            record_log(f"Repeated error: {error_text}", source, is_error = True, error_type = error_type)
+        else:
+            error_description = f"An error was happened in bot script.\n\nError type: {error_type}\nUser id: {user_id}\nUser roles: {user_context.describe() if user_context else None}\nCurrent state: {await current_state.get_state() if current_state else None}\nDescription: {error_text}"
+            if repeated_count:
+                error_description += f"\nRepeated errors since previous report: {repeated_count}"
+            regist_error(
+                error_description = error_description, 
+                error_type = "bot script error",
+                raised_by = source,
+                from_source = True 
+            )
+            
+            if error_event is not None:
+                regist_error(f"Error event: {serialize_error_event(error_event)}", "event-information", "event-information", silent_mode = True)
 
         if call_user and user_id:
             await bot.send_message(user_id, message_to_user, reply_markup = send_markup)
@@ -3,4 +3,5 @@ from .main_keyboard import create_keyboard_by_access
 from .bot_admins_kb import generate_content_type_choose_kb_builder
 content_type_choose_kb = generate_content_type_choose_kb_builder().as_markup()
 
-from .paging_kb import PagedKeyboard
\ No newline at end of file
+from .paging_kb import PagedKeyboard, split_into_pages, get_utf16_length
+from .content_list_kb import ContentListPages, content_list_pages, CONTENT_LIST_PAGES
\ No newline at end of file
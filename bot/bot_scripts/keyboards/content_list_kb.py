@@ -0,0 +1,57 @@
+from outgoing import MAX_MESSAGE_LENGTH
+
+from vars import communicator
+
+from ..custom_types import ContentType
+
+from .paging_kb import PagedKeyboard, split_into_pages
+
+
+# Key of paged content list in PageCallback
+CONTENT_LIST_PAGES = "cl"
+
+
+class ContentListPages:
+    """
+    Cache of paged lists of communicator's content by content type. List is rendered once per version
+    of communicator's content and its keyboard is shared by all viewers: they keep only index of page.
+    """
+
+    def __init__(self) -> None:
+        # content type -> (version of content, keyboard of list)
+        self._keyboards : dict[ContentType, tuple[int, PagedKeyboard]] = {}
+
+
+    def get_keyboard(self, content_type : ContentType) -> PagedKeyboard:
+        cached_keyboard = self._keyboards.get(content_type)
+        if (cached_keyboard is None) or (cached_keyboard[0] != communicator.content_version):
+            cached_keyboard = (communicator.content_version, self._render(content_type))
+            self._keyboards[content_type] = cached_keyboard
+        return cached_keyboard[1]
+
+
+    def _render(self, content_type : ContentType) -> PagedKeyboard:
+        match content_type:
+            case ContentType.MESSAGES:
+                content = communicator.get_messages_content()
+                header = communicator.get_message("messages_list_header") + "\n"
+
+            case ContentType.KEYBOARDS:
+                content = communicator.get_keyboards_content()
+                header = communicator.get_message("keyboards_list_header") + "\n"
+
+            case unexpected_content_type:
+                raise ValueError(f"Unexpected content type: {unexpected_content_type}")
+
+        list_pattern = communicator.get_message("content_list_pattern")
+        blocks = [
+            "\n" + list_pattern.replace("*KEY*", f'""{key}""').replace("*CONTENT_TEXT*", f'""{text}""') + "\n"
+            for key, text in content.items()
+        ]
+        return PagedKeyboard(
+            items = split_into_pages(blocks, MAX_MESSAGE_LENGTH, header),
+            pages_key = CONTENT_LIST_PAGES,
+        )
+
+
+content_list_pages = ContentListPages()
@@ -3,8 +3,10 @@ from aiogram.types import InlineKeyboardMarkup
 
 from vars import communicator
 
+from ..custom_types import ChatActivationCallback
+
 
 def generate_chat_activation_kb(builder : bool = False) -> InlineKeyboardBuilder | InlineKeyboardMarkup:
     chat_activation_kb_builder = InlineKeyboardBuilder()
-    chat_activation_kb_builder.button(text = communicator.get_keyboard_title("chat_activation"), callback_data = "group_chat:chat=activate")
+    chat_activation_kb_builder.button(text = communicator.get_keyboard_title("chat_activation"), callback_data = ChatActivationCallback().pack())
     return chat_activation_kb_builder if builder else chat_activation_kb_builder.as_markup() 
\ No newline at end of file
@@ -3,6 +3,8 @@ from aiogram.types import InlineKeyboardMarkup
 
 from vars import bot_db_client, communicator
 
+from ..middlewares import UserContext
+
 from .bot_admins_kb import generate_bot_admin_kb_builder
 
 def create_keyboard_by_access(
@@ -10,10 +12,16 @@ def create_keyboard_by_access(
         # is_manager : bool | None = None, 
         # is_owner : bool | None = None,
         is_bot_admin : bool | None = None,
+        user_context : UserContext | None = None,
     ) -> InlineKeyboardMarkup:
     """
-    Creates InlineKeyboardMarkup according to user's status
+    Creates InlineKeyboardMarkup according to user's status.
+    Status is taken from `user_context`, if it is passed, otherwise from roles index by `user_id`.
     """
+    if user_context is not None:
+        user_id = user_context.user_id
+        if is_bot_admin is None:
+            is_bot_admin = user_context.is_bot_admin
 
     builder = InlineKeyboardBuilder()
 
@@ -23,7 +31,7 @@ def create_keyboard_by_access(
     # if (is_owner != False) and (is_owner or (user_id in bot_db_client.get_owners_list(only_ids = True))):
     #     builder.attach(generate_owner_kb_builder())
     
-    if (is_bot_admin != False) and (is_bot_admin or (user_id in bot_db_client.get_bot_admins_list())):
+    if (is_bot_admin != False) and (is_bot_admin or bot_db_client.roles_index.is_bot_admin(user_id)):
         builder.attach(generate_bot_admin_kb_builder())
 
     builder.adjust(1)
@@ -3,10 +3,12 @@ from aiogram.types import InlineKeyboardMarkup
 
 from vars import communicator
 
+from ..custom_types import ManagersAction, ManagersCallback
+
 
 def generate_owner_kb_builder():
     owner_kb_builder = InlineKeyboardBuilder()
-    owner_kb_builder.button(text = communicator.get_keyboard_title("managers_list"), callback_data = "owner:manager=list")
-    owner_kb_builder.button(text = communicator.get_keyboard_title("add_manager"), callback_data = "owner:manager=add")
-    owner_kb_builder.button(text = communicator.get_keyboard_title("delete_manager"), callback_data = "owner:manager=delete")
+    owner_kb_builder.button(text = communicator.get_keyboard_title("managers_list"), callback_data = ManagersCallback(action = ManagersAction.LIST).pack())
+    owner_kb_builder.button(text = communicator.get_keyboard_title("add_manager"), callback_data = ManagersCallback(action = ManagersAction.ADD).pack())
+    owner_kb_builder.button(text = communicator.get_keyboard_title("delete_manager"), callback_data = ManagersCallback(action = ManagersAction.DELETE).pack())
     return owner_kb_builder
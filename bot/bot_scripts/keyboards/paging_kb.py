@@ -2,8 +2,52 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardMarkup
 
 
+from outgoing import get_utf16_length
+
 from vars import communicator
 
+from ..custom_types import PageAction, PageCallback
+
+
+def _split_by_utf16_length(text : str, max_length : int) -> list[str]:
+    encoded_text = text.encode("UTF-16-LE")
+    parts = []
+    start = 0
+    while start < len(encoded_text):
+        end = min(start + 2 * max_length, len(encoded_text))
+        # Surrogate pair is not split: part ends before high surrogate
+        if (end < len(encoded_text)) and (0xD8 <= encoded_text[end - 1] <= 0xDB):
+            end -= 2
+        parts.append(encoded_text[start:end].decode("UTF-16-LE"))
+        start = end
+    return parts
+
+
+def split_into_pages(blocks : list[str], max_length : int = 4096, header : str = "") -> list[str]:
+    """
+    Joins blocks into pages with header, length of page does not exceed `max_length` UTF-16 code units.
+    Blocks are not split between pages, except blocks longer than page. Time is linear in total length of blocks.
+    """
+    body_max_length = max_length - get_utf16_length(header)
+    if body_max_length <= 0:
+        raise ValueError("Header of pages exceeds length of page")
+
+    pages = []
+    page_blocks, page_length = [], 0
+    for block in blocks:
+        block_length = get_utf16_length(block)
+        parts = [block] if block_length <= body_max_length else _split_by_utf16_length(block, body_max_length)
+        for part in parts:
+            part_length = block_length if len(parts) == 1 else get_utf16_length(part)
+            if page_blocks and (page_length + part_length > body_max_length):
+                pages.append(header + "".join(page_blocks))
+                page_blocks, page_length = [], 0
+            page_blocks.append(part)
+            page_length += part_length
+    if page_blocks or not pages:
+        pages.append(header + "".join(page_blocks))
+    return pages
+
 
 class MessageContent:
     message_text : str | None
@@ -15,8 +59,15 @@ class MessageContent:
 
 
 class PagedKeyboard:
+    """
+    Paged content. Paging buttons send PageCallback with `pages_key` and index of page to show,
+    items of keyboard with buttons are (packed callback data, button text).
+
+    Pages are shown sequentially by next / previous or by index (show_page): the latter does not change keyboard,
+    so one keyboard can be shared by all viewers of content.
+    """
     
-    def __init__(self, items : list[str] | list[tuple], callback_header : str, with_buttons : bool = False, growth_factor : int = 1) -> None:
+    def __init__(self, items : list[str] | list[tuple], pages_key : str, with_buttons : bool = False, growth_factor : int = 1) -> None:
         if not isinstance(items, list):
             raise TypeError("Unsupported type of items")
             
@@ -29,17 +80,24 @@ class PagedKeyboard:
         
         self.with_buttons = with_buttons
         self.growth_factor = growth_factor
-        self.callback_header = callback_header
+        self.pages_key = pages_key
         self.previous_button_header = communicator.get_keyboard_title("previous_button")
         self.next_button_header = communicator.get_keyboard_title("next_button")
         self.current_first_point = -1
 
 
-    def _show(self, next_button : bool = True, previous_button : bool = True) -> MessageContent:
+    @property
+    def pages_count(self) -> int:
+        return max(1, -(-len(self.items) // self.growth_factor))
+
+
+    def _show(self, next_button : bool = True, previous_button : bool = True, first_point : int | None = None) -> MessageContent:
+        if first_point is None:
+            first_point = self.current_first_point
         kb_builder = InlineKeyboardBuilder()
         if self.with_buttons:
-            for callback_data, text in self.items[self.current_first_point : (self.current_first_point + self.growth_factor)]:
-                kb_builder.button(text = text, callback_data = f"{self.callback_header}={callback_data}")
+            for callback_data, text in self.items[first_point : (first_point + self.growth_factor)]:
+                kb_builder.button(text = text, callback_data = callback_data)
             
             message_content = MessageContent()
             message_content.message_text = None
@@ -48,16 +106,23 @@ class PagedKeyboard:
 
         else:
             message_content = MessageContent()
-            for id, text in self.items[self.current_first_point : (self.current_first_point + self.growth_factor)]:
+            for id, text in self.items[first_point : (first_point + self.growth_factor)]:
                 message_content.message_text += text 
 
+            page = first_point // self.growth_factor
             if previous_button:
-                kb_builder.button(text = self.previous_button_header, callback_data=f"{self.callback_header}=previous")
+                kb_builder.button(
+                    text = self.previous_button_header, 
+                    callback_data = PageCallback(pages = self.pages_key, action = PageAction.PREVIOUS, page = max(0, page - 1)).pack(),
+                )
 
             if next_button:
-                kb_builder.button(text = self.next_button_header, callback_data = f"{self.callback_header}=next")
+                kb_builder.button(
+                    text = self.next_button_header, 
+                    callback_data = PageCallback(pages = self.pages_key, action = PageAction.NEXT, page = page + 1).pack(),
+                )
 
-            kb_builder.button(text = communicator.get_keyboard_title("stop_viewing_button"), callback_data=f"{self.callback_header}=stop")
+            kb_builder.button(text = communicator.get_keyboard_title("stop_viewing_button"), callback_data = PageCallback(pages = self.pages_key, action = PageAction.STOP).pack())
             
             if previous_button and next_button:
                 kb_builder.adjust(2, 1)
@@ -98,4 +163,13 @@ class PagedKeyboard:
         return self._show(previous_button = previous_button) 
 
 
-
+    def show_page(self, page : int) -> MessageContent:
+        """
+        Shows page by index (index out of pages shows the nearest page), position of keyboard is not changed.
+        """
+        page = min(max(page, 0), self.pages_count - 1)
+        return self._show(
+            previous_button = page > 0, 
+            next_button = page < self.pages_count - 1, 
+            first_point = page * self.growth_factor,
+        )
@@ -0,0 +1,4 @@
+from .user_context import UserContext, UserContextResolverMiddleware
+
+from .throttling import ThrottlingMiddleware, ThrottlingRule, ThrottlingTable
+from .throttling import messages_throttling, callbacks_throttling, get_throttling_report
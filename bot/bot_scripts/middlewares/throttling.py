@@ -0,0 +1,252 @@
+"""
+This module provides ThrottlingMiddleware - anti-flood protection of handlers by token buckets of users (or chats).
+
+Each ThrottlingRule keeps buckets in ThrottlingTable - LRU dictionary key -> (tokens, update time, throttled count).
+Bucket which was not used for `capacity / rate` seconds is full again, so such entries are dropped from the head of LRU,
+and table never holds more than `max_keys` entries: memory does not grow with count of distinct users.
+
+Middleware is registered as inner middleware of router's observer, so only updates which passed filters of handler
+consume tokens:
+
+    general_router.message.middleware(ThrottlingMiddleware(ThrottlingRule(rate = 1.0, capacity = 3)))
+
+Handler can use own rule or be excluded from throttling by flag "throttling":
+
+    @general_router.message(..., flags = {"throttling" : ThrottlingRule(rate = 0.2, capacity = 1)})
+    @general_router.message(..., flags = {"throttling" : False})
+
+Excess updates are dropped silently, excess callback queries are answered without text (button stops loading).
+Updates are not delayed and are not fed again: they would break order of updates of chat (see ChatOrderedEventIsolation).
+
+Messages of group chats are not throttled: the only group handler tracks response deadlines of customer chats,
+so dropped customer's message or manager's reply would cause missed or false delay alerts. It does not send
+messages and its updates are cheap (see GroupMessagePipeline); flood of groups is limited by IntakeGuard,
+which classifies messages of unknown chats as LOW.
+"""
+
+from collections import Counter, OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, TelegramObject
+
+from logger import record_log
+
+
+THROTTLING_SCOPES : tuple[str] = ("user", "chat")
+
+# Throttled updates of key are recorded into log, when their count reaches these values
+FLOOD_LOG_THRESHOLDS : frozenset[int] = frozenset((10, 100, 1_000, 10_000))
+
+
+class ThrottlingTable:
+    """
+    Token buckets of keys with the same rate and capacity.
+
+    Parameters:
+    -----------
+    rate : float
+        tokens per second
+    capacity : float
+        maximal count of tokens (allowed burst)
+    max_keys : int
+        maximal count of stored buckets, the least recently used bucket is evicted first
+    """
+
+    def __init__(self, rate : float, capacity : float, max_keys : int = 100_000) -> None:
+        if rate <= 0 or capacity < 1 or max_keys < 1:
+            raise ValueError(f"Invalid throttling parameters: {rate=}, {capacity=}, {max_keys=}")
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        # Bucket is full after this count of seconds without consuming
+        self.refill_time = capacity / rate
+        # key -> [tokens, update time, throttled count]
+        self._buckets : OrderedDict[int, list] = OrderedDict()
+        self.evicted_count = 0
+
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+    def _purge(self, now : float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.refill_time and len(buckets) <= self.max_keys:
+                break
+            del buckets[key]
+            if now - bucket[1] < self.refill_time:
+                self.evicted_count += 1
+
+
+    def try_consume(self, key : int, now : float | None = None) -> bool:
+        """
+        Takes token of key. Returns False, if key has no tokens (update must be throttled).
+        """
+        now = monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.capacity - 1, now, 0]
+            self._purge(now)
+            return True
+
+        self._buckets.move_to_end(key)
+        bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._purge(now)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True
+        bucket[2] += 1
+        return False
+
+
+    def time_to_token(self, key : int, now : float | None = None) -> float:
+        """
+        Returns count of seconds until key gets one token.
+        """
+        now = monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+
+    def get_throttled_count(self, key : int) -> int:
+        bucket = self._buckets.get(key)
+        return bucket[2] if bucket is not None else 0
+
+
+    def get_top_throttled(self, count : int = 10) -> list[tuple[int, int]]:
+        """
+        Returns keys with the most throttled updates among stored buckets: [(key, throttled count)].
+        """
+        throttled = [(key, bucket[2]) for key, bucket in self._buckets.items() if bucket[2]]
+        throttled.sort(key = lambda item: item[1], reverse = True)
+        return throttled[:count]
+
+
+class ThrottlingRule:
+    """
+    Parameters:
+    -----------
+    rate : float
+        allowed updates per second
+    capacity : float
+        allowed burst of updates
+    scope : str
+        "user" - bucket per user, "chat" - bucket per chat
+    max_keys : int
+        maximal count of buckets in memory
+    """
+
+    def __init__(self, rate : float, capacity : float = 1, scope : str = "user", max_keys : int = 100_000) -> None:
+        if scope not in THROTTLING_SCOPES:
+            raise ValueError(f"Unexpected throttling scope: {scope}")
+        self.scope = scope
+        self.table = ThrottlingTable(rate, capacity, max_keys)
+
+
+    def get_key(self, data : dict[str, Any]) -> int | None:
+        if self.scope == "user":
+            user = data.get("event_from_user")
+            return user.id if user is not None else None
+        chat = data.get("event_chat")
+        return chat.id if chat is not None else None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Parameters:
+    -----------
+    rule : ThrottlingRule
+        rule of handlers without flag "throttling"
+    name : str
+        name of middleware in reports
+    """
+
+    def __init__(self, rule : ThrottlingRule, name : str = "throttling") -> None:
+        self.rule = rule
+        self.name = name
+        # Rules of middleware and of handlers' flags which were applied (rule ID -> rule), they are included into stats
+        self._rules : dict[int, ThrottlingRule] = {id(rule) : rule}
+
+        self.passed_count = 0
+        self.dropped_count = 0
+        self.answered_count = 0
+
+
+    async def __call__(
+            self,
+            handler : Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event : TelegramObject,
+            data : dict[str, Any],
+        ) -> Any:
+        rule = get_flag(data, "throttling", default = self.rule)
+        if rule is False:
+            return await handler(event, data)
+
+        key = rule.get_key(data)
+        if key is None or rule.table.try_consume(key):
+            self.passed_count += 1
+            return await handler(event, data)
+
+        if id(rule) not in self._rules:
+            self._rules[id(rule)] = rule
+        throttled_count = rule.table.get_throttled_count(key)
+        if throttled_count in FLOOD_LOG_THRESHOLDS:
+            record_log(f"Possible flood: {throttled_count} updates of {rule.scope} {key} were throttled", "throttling")
+
+        self.dropped_count += 1
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer()
+                self.answered_count += 1
+            except TelegramBadRequest:
+                # Query is too old
+                pass
+        return None
+
+
+    def get_stats(self) -> dict:
+        """
+        Returns counters of middleware and buckets of all its rules (keys with the most throttled updates are summed by rules).
+        """
+        top_throttled = Counter()
+        for rule in self._rules.values():
+            for key, throttled_count in rule.table.get_top_throttled():
+                top_throttled[key] += throttled_count
+        return {
+            "passed_count" : self.passed_count,
+            "dropped_count" : self.dropped_count,
+            "answered_count" : self.answered_count,
+            "rules_count" : len(self._rules),
+            "buckets_count" : sum(len(rule.table) for rule in self._rules.values()),
+            "evicted_buckets_count" : sum(rule.table.evicted_count for rule in self._rules.values()),
+            "top_throttled" : top_throttled.most_common(10),
+        }
+
+
+# Private messages (commands, menu requests, answers in states); group messages are not throttled (see above)
+messages_throttling = ThrottlingMiddleware(ThrottlingRule(rate = 1.0, capacity = 3), name = "messages")
+# Inline buttons
+callbacks_throttling = ThrottlingMiddleware(ThrottlingRule(rate = 2.0, capacity = 5), name = "callbacks")
+
+
+def get_throttling_report() -> str:
+    """
+    Returns text report about throttled updates of all middlewares.
+    """
+    lines = []
+    for middleware in (messages_throttling, callbacks_throttling):
+        stats = middleware.get_stats()
+        top_throttled = ", ".join(f"{key}: {count}" for key, count in stats.pop("top_throttled")) or "-"
+        lines.append(f"{middleware.name}: " + ", ".join(f"{name} {value}" for name, value in stats.items()))
+        lines.append(f"    top throttled: {top_throttled}")
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+"""
+This module provides UserContext - roles of user who sent update, which is resolved once per update by
+UserContextResolverMiddleware and is passed to filters, handlers and keyboards as `user_context` argument:
+
+    @admin_router.message(..., IsBotAdminFilter())
+    async def handler(message : types.Message, user_context : UserContext): ...
+
+Roles are taken from roles index of database client (no queries), manager's record is read lazily from cache
+of database client, so update costs at most one database query (usually none).
+"""
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+
+class UserContext:
+    """
+    Parameters:
+    -----------
+    user_id : int
+        user ID in Telegram
+    database_client : BotDBClient
+        owner of roles index and cache of managers' records
+    """
+    user_id : int
+    is_bot_admin : bool
+    owned_companies : frozenset[int]
+    managed_companies : frozenset[int]
+
+    def __init__(self, user_id : int, database_client) -> None:
+        self.user_id = user_id
+        self.database_client = database_client
+        roles_index = database_client.roles_index
+        self.is_bot_admin = roles_index.is_bot_admin(user_id)
+        self.owned_companies = frozenset(roles_index.owners.get(user_id, ()))
+        self.managed_companies = frozenset(roles_index.managers.get(user_id, ()))
+        self._manager_info = None
+        self._is_manager_info_loaded = False
+
+
+    @property
+    def is_owner(self) -> bool:
+        return bool(self.owned_companies)
+
+
+    @property
+    def is_manager(self) -> bool:
+        return bool(self.managed_companies)
+
+
+    @property
+    def company_id(self) -> int | None:
+        """
+        Company of user: owned company or, if user is not owner, managed company (the lowest ID, if there are several).
+        """
+        companies = self.owned_companies or self.managed_companies
+        return min(companies) if companies else None
+
+
+    @property
+    def manager_info(self) -> dict | None:
+        """
+        Record of manager joined with user (see BotDBClient.get_manager_info), None if user is not manager.
+        """
+        if not self._is_manager_info_loaded:
+            self._manager_info = self.database_client.get_cached_manager_info(self.user_id) if self.managed_companies else None
+            self._is_manager_info_loaded = True
+        return self._manager_info
+
+
+    def get_role(self, company_id : int) -> str | None:
+        """
+        Returns role of user in company: "owner", "manager" or None.
+        """
+        if company_id in self.owned_companies:
+            return "owner"
+        if company_id in self.managed_companies:
+            return "manager"
+        return None
+
+
+    def describe(self) -> str:
+        """
+        Returns short description of roles for error reports.
+        """
+        roles = []
+        if self.is_bot_admin:
+            roles.append("bot-admin")
+        if self.owned_companies:
+            roles.append(f"owner of {sorted(self.owned_companies)}")
+        if self.managed_companies:
+            roles.append(f"manager of {sorted(self.managed_companies)}")
+        return ", ".join(roles) if roles else "user"
+
+
+class UserContextResolverMiddleware(BaseMiddleware):
+    """
+    Outer middleware of updates: puts UserContext of update's sender into handler data as "user_context"
+    (None for updates without sender). It must be registered on `dp.update.outer_middleware`, aiogram's
+    UserContextMiddleware is registered there by Dispatcher before it and provides "event_from_user".
+
+    Parameters:
+    -----------
+    database_client : BotDBClient
+        owner of roles index and cache of managers' records
+    """
+
+    def __init__(self, database_client) -> None:
+        self.database_client = database_client
+
+
+    async def __call__(
+            self,
+            handler : Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event : TelegramObject,
+            data : dict[str, Any],
+        ) -> Any:
+        user : User | None = data.get("event_from_user")
+        data["user_context"] = UserContext(user.id, self.database_client) if user is not None else None
+        return await handler(event, data)
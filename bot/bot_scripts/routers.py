@@ -1,7 +1,9 @@
 from .sections.general.general_section import general_router
 from .sections.bot_admin.bot_admin_section import admin_router
+from .sections.group.group_section import group_router
 
 routers = (
     general_router, 
     admin_router, 
+    group_router,
 )
@@ -1,18 +1,23 @@
-from os import path
+import asyncio
+import threading
+
+from os import close, path
 from os import remove
-from datetime import datetime
+from datetime import datetime, timedelta
+from tempfile import mkstemp
 
-from aiogram import Router
+from aiogram import Dispatcher
 from aiogram import types
-from aiogram import F
-from aiogram.filters import Command, and_f, StateFilter
+from aiogram.filters import Command, CommandObject, and_f, StateFilter
 
 from aiogram.fsm.context import FSMContext
 
-from logger import PATH_TO_LOG
+from logger import log_file_handler
 from logger import record_log, regist_error
 
-from vars import bot, communicator
+from metrics import get_metrics_summary, profile_cpu, profile_memory
+
+from vars import bot, bot_metrics, communicator, intake_guard, loop_watchdog
 
 from ...FSMs import ShowContentListFSM
 from ...FSMs import UpdateContentFSM
@@ -20,19 +25,30 @@ from ...FSMs import UpdateContentFSM
 from ...custom_filters import IsBotAdminFilter
 from ...custom_filters import IsPrivateChatFilter
 
+from ...custom_types import ContentChangeCallback, ContentItemType, ContentListCallback, ContentType, ContentTypeCallback
+from ...custom_types import PageAction, PageCallback
+
 from ...error_case import operate_error_case
 
+from ...middlewares import UserContext, callbacks_throttling, get_throttling_report, messages_throttling
+
+from ...bot_subtasks import get_subtasks_report
+
+from ...updates_processing import CallbackRouter
+
 
 from ...keyboards import create_keyboard_by_access
 from ...keyboards import content_type_choose_kb
-from ...keyboards import PagedKeyboard
+from ...keyboards import content_list_pages
 
 
-admin_router = Router(name = "admin")
+admin_router = CallbackRouter(name = "admin")
+admin_router.message.middleware(messages_throttling)
+admin_router.callback_query.middleware(callbacks_throttling)
 
 
-@admin_router.callback_query(and_f(F.data == "bot_admin:communication=list", IsBotAdminFilter(), StateFilter(None)))
-async def get_bot_communication_type(callback : types.CallbackQuery, state : FSMContext):
+@admin_router.callback(ContentListCallback, IsBotAdminFilter(), StateFilter(None))
+async def get_bot_communication_type(callback : types.CallbackQuery, state : FSMContext, user_context : UserContext):
     """
     Shows content of bot`s communicator
     """
@@ -52,8 +68,9 @@ async def get_bot_communication_type(callback : types.CallbackQuery, state : FSM
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
-            send_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
-            error_event = callback.model_dump_json()
+            user_context = user_context,
+            send_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
+            error_event = callback
         )
     finally:
         try: 
@@ -62,8 +79,13 @@ async def get_bot_communication_type(callback : types.CallbackQuery, state : FSM
             pass
 
 
-@admin_router.callback_query(and_f(F.data.startswith("content_type="), IsBotAdminFilter()), ShowContentListFSM.content_type)
-async def show_bot_communication_content(callback : types.CallbackQuery, state : FSMContext):
+@admin_router.callback(ContentTypeCallback, IsBotAdminFilter(), ShowContentListFSM.content_type)
+async def show_bot_communication_content(
+        callback : types.CallbackQuery,
+        callback_data : ContentTypeCallback,
+        state : FSMContext,
+        user_context : UserContext,
+    ):
     """
     Shows content of bot`s communicator
     """
@@ -75,59 +97,20 @@ async def show_bot_communication_content(callback : types.CallbackQuery, state :
         except:
             pass
 
-        content_type = callback.data.split("=", 1)[-1]
-
-        match content_type:
-            case "messages":
-                content = communicator.get_messages_content()
-                message_text = communicator.get_message("messages_list_header") + "\n"
+        content_keyboard = content_list_pages.get_keyboard(callback_data.content_type)
+        message_content = content_keyboard.show_page(0)
 
-            case "keyboards":
-                content = communicator.get_keyboards_content()
-                message_text = communicator.get_message("keyboards_list_header") + "\n"
-
-            case unexpected_content_type:
-                raise ValueError(f"Unexpected content type: {unexpected_content_type}")
-            
-        text_blocks = []
-        await state.update_data(header = message_text)
-
-        block = ""
-        for key, text in content.items():
-            text = "\n" + communicator.get_message("content_list_pattern").replace(
-                    "*KEY*", 
-                    f'""{key}""'
-                ).replace(
-                    "*CONTENT_TEXT*",
-                    f'""{text}""'
-                ) + "\n"
-            
-            if len(block) + len(text) > 3900:
-                text_blocks.append(block)
-                block = text
-            else:
-                block += text
-        else:
-            text_blocks.append(block)
-        
-        if len(text_blocks) == 1:
-            message_text += "".join(text_blocks)
-
-            await callback.message.answer(message_text, parse_mode = None)
+        if content_keyboard.pages_count == 1:
+            await callback.message.answer(message_content.message_text, parse_mode = None)
             await state.clear()
             await callback.message.answer(
                 text = communicator.get_message("menu_header"),
-                reply_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
+                reply_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
             )
             return
 
-        paged_kb_object = PagedKeyboard(
-            items = text_blocks, 
-            callback_header = "bot_admin:communication=list", 
-        )
-        message_content = paged_kb_object.next()
-        await state.update_data(paged_kb_object = paged_kb_object)
-        
+        # Viewer keeps only content type, pages are shared (see ContentListPages) and page index is in PageCallback
+        await state.update_data(content_type = callback_data.content_type.value)
         await callback.message.answer(text = message_content.message_text, reply_markup = message_content.keyboard_markup, parse_mode = None)
 
     except Exception as error:
@@ -135,9 +118,10 @@ async def show_bot_communication_content(callback : types.CallbackQuery, state :
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
+            user_context = user_context,
             current_state = state,
-            send_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
-            error_event = callback.model_dump_json(),
+            send_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
+            error_event = callback,
         )
     finally:
         try: 
@@ -146,46 +130,45 @@ async def show_bot_communication_content(callback : types.CallbackQuery, state :
             pass
 
 
-@admin_router.callback_query(and_f(F.data.startswith("bot_admin:communication=list=")), ShowContentListFSM.content_type)
-async def update_bot_communication(callback : types.CallbackQuery, state : FSMContext):
+@admin_router.callback(PageCallback, ShowContentListFSM.content_type)
+async def update_bot_communication(
+        callback : types.CallbackQuery,
+        callback_data : PageCallback,
+        state : FSMContext,
+        user_context : UserContext,
+    ):
     try:
         user_id = callback.from_user.id
 
         state_data = await state.get_data()
-        paged_kb_object : PagedKeyboard = state_data.get("paged_kb_object")
-        if not paged_kb_object:
-            raise ValueError("Paged keyboard is not found")
-
-        action = callback.data.rsplit("=", 1)[-1]
-        match action:
-            case "next":
-                message_content = paged_kb_object.next()
-            case "previous":
-                message_content = paged_kb_object.previous()
-            case "stop":
+        if "content_type" not in state_data:
+            raise ValueError("Content type of list is not found")
+
+        match callback_data.action:
+            case PageAction.NEXT | PageAction.PREVIOUS:
+                message_content = content_list_pages.get_keyboard(ContentType(state_data["content_type"])).show_page(callback_data.page)
+            case PageAction.STOP:
                 await state.clear()
                 await callback.message.edit_reply_markup(reply_markup = None)
                 await callback.message.answer(
                     text = communicator.get_message("menu_header"),
-                    reply_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
+                    reply_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
                 )
                 return
             case undefined_case:
                 raise ValueError(f"Unexpected action: {undefined_case}")
 
-        message_text = state_data.get("header") + message_content.message_text
-
-        await callback.message.edit_text(message_text, parse_mode = None)
-        await callback.message.edit_reply_markup(reply_markup = message_content.keyboard_markup) 
+        await callback.message.edit_text(message_content.message_text, reply_markup = message_content.keyboard_markup, parse_mode = None)
 
     except Exception as error:
         await operate_error_case(
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
+            user_context = user_context,
             current_state = state,
-            send_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
-            error_event = callback.model_dump_json(),
+            send_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
+            error_event = callback,
         )
     finally:
         try: 
@@ -194,8 +177,13 @@ async def update_bot_communication(callback : types.CallbackQuery, state : FSMCo
             pass
 
 
-@admin_router.callback_query(and_f(F.data.startswith("bot_admin:communication=change_"), StateFilter(None)))
-async def change_bot_communication(callback : types.CallbackQuery, state : FSMContext):
+@admin_router.callback(ContentChangeCallback, IsBotAdminFilter(), StateFilter(None))
+async def change_bot_communication(
+        callback : types.CallbackQuery,
+        callback_data : ContentChangeCallback,
+        state : FSMContext,
+        user_context : UserContext,
+    ):
     """
     """
     try:
@@ -206,12 +194,11 @@ async def change_bot_communication(callback : types.CallbackQuery, state : FSMCo
         except:
             pass
 
-        item_type = callback.data.rsplit("_", 1)[-1]
-        match item_type:
-            case "msg":
+        match callback_data.item_type:
+            case ContentItemType.MESSAGE:
                 item_type = "message"
                 message_text = communicator.get_message("message_key_request")
-            case "kb":
+            case ContentItemType.KEYBOARD:
                 item_type = "keyboard"
                 message_text = communicator.get_message("keyboard_key_request")
             case undefined_case:
@@ -226,9 +213,10 @@ async def change_bot_communication(callback : types.CallbackQuery, state : FSMCo
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
+            user_context = user_context,
             current_state = state,
-            send_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
-            error_event = callback.model_dump_json(),
+            send_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
+            error_event = callback,
         )
     finally:
         try: 
@@ -238,7 +226,7 @@ async def change_bot_communication(callback : types.CallbackQuery, state : FSMCo
 
 
 @admin_router.message(and_f(IsBotAdminFilter(), IsPrivateChatFilter()), UpdateContentFSM.content_key)
-async def get_content_key(message : types.Message, state : FSMContext):
+async def get_content_key(message : types.Message, state : FSMContext, user_context : UserContext):
     """
     """
     try:
@@ -260,7 +248,7 @@ async def get_content_key(message : types.Message, state : FSMContext):
             await state.clear()
             await message.answer(
                 text = communicator.get_message("menu_header"),
-                reply_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
+                reply_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
             )
             return
         
@@ -274,14 +262,15 @@ async def get_content_key(message : types.Message, state : FSMContext):
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
+            user_context = user_context,
             current_state = state,
-            send_markup = create_keyboard_by_access(user_id, is_owner = True),
-            error_event = message.model_dump_json()
+            send_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
+            error_event = message
         )
 
 
 @admin_router.message(and_f(IsBotAdminFilter(), IsPrivateChatFilter()), UpdateContentFSM.new_content)
-async def get_new_content(message : types.Message, state : FSMContext):
+async def get_new_content(message : types.Message, state : FSMContext, user_context : UserContext):
     """
     """
     try:
@@ -318,41 +307,291 @@ async def get_new_content(message : types.Message, state : FSMContext):
             error_text = f"Update operating error: {error};", 
             error_type = type(error), 
             user_id = user_id,
+            user_context = user_context,
             current_state = state,
-            error_event = message.model_dump_json()
+            error_event = message
         )
 
     finally:
         await state.clear()
         await message.answer(
             text = communicator.get_message("menu_header"),
-            reply_markup = create_keyboard_by_access(user_id, is_bot_admin = True),
+            reply_markup = create_keyboard_by_access(is_bot_admin = True, user_context = user_context),
         )
 
 
+# Telegram limit of document size
+MAX_DOCUMENT_SIZE = 50 * 2**20
+LOG_PERIOD_UNITS = {"m" : timedelta(minutes = 1), "h" : timedelta(hours = 1), "d" : timedelta(days = 1)}
+
+
 @admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["getlog"]), IsBotAdminFilter()))
-async def send_log(message : types.Message):
+async def send_log(message : types.Message, command : CommandObject, user_context : UserContext):
     """
-    Sends log to requester, removes log file and creates new.
+    Sends archives and live log with records of time range as one gzip file, live log is not truncated.
+    Range is last period ("/getlog 6h", units: m, h, d; 1d by default) or dates ("/getlog 2024-05-01 2024-05-02T12:00").
     """
     user_id = message.from_user.id
     try:
-        # Log openning and sending
-        creation_time = path.getctime(PATH_TO_LOG)
+        try:
+            started_at, finished_at = _parse_log_range(command.args)
+        except ValueError:
+            await message.answer("Usage: /getlog [6h | 2d | start_date [end_date]], dates in ISO format", parse_mode = None)
+            return
+
+        file_descriptor, collected_log_path = mkstemp(suffix = ".log.gz")
+        close(file_descriptor)
+        try:
+            files_count = await asyncio.to_thread(
+                log_file_handler.collect_log, started_at.timestamp(), finished_at.timestamp(), collected_log_path,
+            )
+            collected_log_size = path.getsize(collected_log_path)
+            if not files_count:
+                await message.answer(f"Log has no records from {started_at} until {finished_at}", parse_mode = None)
+            elif collected_log_size > MAX_DOCUMENT_SIZE:
+                await message.answer(
+                    f"Log from {started_at} until {finished_at} is too large ({collected_log_size / 2**20:.1f} MiB), narrow time range", 
+                    parse_mode = None,
+                )
+            else:
+                await bot.send_document(
+                    chat_id = user_id, 
+                    document = types.FSInputFile(
+                        collected_log_path, 
+                        filename = f"log-{started_at:%Y%m%d-%H%M}-{finished_at:%Y%m%d-%H%M}.log.gz",
+                    ), 
+                    caption = f"#LOG\n\nBot`s log starting from {started_at} until {finished_at} ({files_count} files)",
+                    parse_mode = None,
+                )
+        finally:
+            remove(collected_log_path)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Getting log error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
+
+
+def _parse_log_range(arguments : str | None) -> tuple[datetime, datetime]:
+    """
+    Returns time range of log by arguments of /getlog, raises ValueError for invalid arguments.
+    """
+    now = datetime.now()
+    arguments = (arguments or "1d").split()
+    if (len(arguments) == 1) and (arguments[0][-1:] in LOG_PERIOD_UNITS) and arguments[0][:-1].isdigit():
+        return now - int(arguments[0][:-1]) * LOG_PERIOD_UNITS[arguments[0][-1]], now
+    if len(arguments) > 2:
+        raise ValueError(f"Unexpected arguments: {arguments}")
+    started_at = datetime.fromisoformat(arguments[0])
+    finished_at = datetime.fromisoformat(arguments[1]) if len(arguments) == 2 else now
+    if started_at > finished_at:
+        raise ValueError("Start of range is later than its end")
+    return started_at, finished_at
+
+
+
+# Profiling of bot process runs in background task, one at a time
+DEFAULT_PROFILING_SECONDS = 10
+MAX_PROFILING_SECONDS = 120
+MAX_MESSAGE_LENGTH = 4096
+profiling_task : asyncio.Task | None = None
+
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["profile_cpu", "profile_mem"]), IsBotAdminFilter()))
+async def start_profiling(message : types.Message, command : CommandObject, user_context : UserContext):
+    """
+    Starts profiling of live bot process for N seconds ("/profile_cpu N", "/profile_mem N"), updates are handled as usual.
+    Results are sent to requester when profiling is finished.
+    """
+    global profiling_task
+    user_id = message.from_user.id
+    try:
+        arguments = (command.args or "").strip()
+        if arguments and not arguments.isdigit():
+            await message.answer(f"Usage: /{command.command} [seconds, 1-{MAX_PROFILING_SECONDS}]", parse_mode = None)
+            return
+        seconds = min(max(int(arguments or DEFAULT_PROFILING_SECONDS), 1), MAX_PROFILING_SECONDS)
+        if (profiling_task is not None) and (not profiling_task.done()):
+            await message.answer("Profiling is already running, wait for its results", parse_mode = None)
+            return
+
+        if command.command == "profile_cpu":
+            profiling = send_cpu_profile(user_id, seconds, threading.get_ident(), user_context)
+        else:
+            profiling = send_memory_profile(user_id, seconds, user_context)
+        profiling_task = asyncio.create_task(profiling, name = f"{command.command}:{user_id}")
+        await message.answer(f"Profiling is started for {seconds} s", parse_mode = None)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Profiling starting error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
+
+
+async def send_cpu_profile(user_id : int, seconds : int, thread_id : int, user_context : UserContext) -> None:
+    """
+    Samples stacks of event loop's thread and sends top functions and collapsed stacks (for flamegraph.pl, speedscope).
+    """
+    try:
+        profile = await profile_cpu(thread_id, seconds)
+        await bot.send_message(user_id, profile.format_report()[:MAX_MESSAGE_LENGTH], parse_mode = None)
+        await bot.send_document(
+            chat_id = user_id,
+            document = types.BufferedInputFile(profile.format_collapsed().encode("UTF-8"), filename = "cpu_profile.collapsed"),
+            caption = f"#PROFILE\n\nCPU stacks for {seconds} s until {datetime.now()}",
+            parse_mode = None,
+        )
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"CPU profiling error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+        )
+
+
+async def send_memory_profile(user_id : int, seconds : int, user_context : UserContext) -> None:
+    """
+    Compares tracemalloc snapshots taken with interval and sends allocation sites with the largest growth.
+    """
+    try:
+        short_report, full_report = await profile_memory(seconds)
+        await bot.send_message(user_id, short_report[:MAX_MESSAGE_LENGTH], parse_mode = None)
         await bot.send_document(
-            chat_id = user_id, 
-            document = types.FSInputFile(PATH_TO_LOG), 
-            caption = f"#LOG\n\nBot`s log starting from {datetime.fromtimestamp(creation_time)} until {datetime.now()}"
+            chat_id = user_id,
+            document = types.BufferedInputFile(full_report.encode("UTF-8"), filename = "memory_profile.txt"),
+            caption = f"#PROFILE\n\nMemory growth for {seconds} s until {datetime.now()}",
+            parse_mode = None,
+        )
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Memory profiling error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+        )
+
+
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["subtasks"]), IsBotAdminFilter()))
+async def send_subtasks_report(message : types.Message, user_context : UserContext):
+    """
+    Sends report about bot's subtasks: last run time, mean duration and errors count.
+    """
+    user_id = message.from_user.id
+    try:
+        await message.answer(get_subtasks_report(), parse_mode = None)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Sending subtasks report error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
         )
 
-        try: remove(PATH_TO_LOG)
-        except: ...
 
-        # Log clearing:
-        with open(PATH_TO_LOG, "w") as log_file:
-            log_file.write(f"[Log is cleared now: {datetime.now()}]\n")
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["throttling"]), IsBotAdminFilter()))
+async def send_throttling_report(message : types.Message, user_context : UserContext):
+    """
+    Sends report about throttled updates: counters and users with the most throttled updates.
+    """
+    user_id = message.from_user.id
+    try:
+        await message.answer(get_throttling_report(), parse_mode = None)
 
     except Exception as error:
-        print(f"{error=}")
-        await operate_error_case(text = f"Getting log_error: {error}", error_type = type(error), call_user = False)
-    
\ No newline at end of file
+        await operate_error_case(
+            error_text = f"Sending throttling report error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
+
+
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["load"]), IsBotAdminFilter()))
+async def send_load_report(message : types.Message, dispatcher : Dispatcher, user_context : UserContext):
+    """
+    Sends report about load of updates handling: updates in processing, shed updates, event loop lag and workers.
+    """
+    user_id = message.from_user.id
+    try:
+        intake_stats = intake_guard.get_stats()
+        isolation_stats = dispatcher.fsm.events_isolation.get_stats()
+        report_lines = [
+            f"Pending updates: {intake_stats['pending_count']}",
+            f"Loop lag: {intake_stats['lag']} s (max {intake_stats['max_lag']} s)",
+            f"Outgoing delay: {intake_stats['outgoing_delay']} s",
+            f"Admitted: {intake_stats['admitted']}",
+            f"Shed: {intake_stats['shed']}",
+            f"Workers: {isolation_stats}",
+        ]
+        await message.answer("\n".join(report_lines), parse_mode = None)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Sending load report error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
+
+
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["metrics"]), IsBotAdminFilter()))
+async def send_metrics_report(message : types.Message, user_context : UserContext):
+    """
+    Sends summary of metrics: the slowest handlers and filters, Telegram API requests and errors.
+    """
+    user_id = message.from_user.id
+    try:
+        await message.answer(get_metrics_summary(bot_metrics), parse_mode = None)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Sending metrics report error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
+
+
+
+@admin_router.message(and_f(IsPrivateChatFilter(), Command(commands = ["watchdog"]), IsBotAdminFilter()))
+async def operate_loop_watchdog(message : types.Message, command : CommandObject, user_context : UserContext):
+    """
+    Switches loop watchdog ("/watchdog on", "/watchdog off") and sends report about blockings of event loop.
+    """
+    user_id = message.from_user.id
+    try:
+        match (command.args or "").strip().lower():
+            case "on":
+                loop_watchdog.start()
+            case "off":
+                loop_watchdog.stop()
+        await message.answer(loop_watchdog.get_report(), parse_mode = None)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Loop watchdog operating error: {error}",
+            error_type = type(error),
+            user_id = user_id,
+            user_context = user_context,
+            error_event = message,
+        )
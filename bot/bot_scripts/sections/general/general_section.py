@@ -17,11 +17,14 @@ from ...error_case import operate_error_case
 
 from ...keyboards import create_keyboard_by_access
 
+from ...middlewares import UserContext, messages_throttling
+
 general_router = Router(name = "general")
+general_router.message.middleware(messages_throttling)
 
 
 @general_router.message(and_f(CommandStart(), IsPrivateChatFilter(), StateFilter(None)))
-async def command_start_handler(message: Message) -> None:
+async def command_start_handler(message: Message, user_context : UserContext) -> None:
     """
     This handler receives messages with `/start` command
     """
@@ -54,11 +57,12 @@ async def command_start_handler(message: Message) -> None:
             error_text = f"Handle start command error: {error}\n\nMessage: {message}",
             error_type = type(error),
             user_id = message.from_user.id,
+            user_context = user_context,
         )    
 
 
 @general_router.message(and_f(F.text.lower() == "меню", IsPrivateChatFilter(), StateFilter(None)))
-async def menu(message: Message) -> None:
+async def menu(message: Message, user_context : UserContext) -> None:
     """
     This handler operates sending menu
     """
@@ -67,7 +71,7 @@ async def menu(message: Message) -> None:
 
         await message.answer(
             text = communicator.get_message("menu_header"),
-            reply_markup = create_keyboard_by_access(user_id)
+            reply_markup = create_keyboard_by_access(user_context = user_context)
         )
         
     except Exception as error:
@@ -75,4 +79,5 @@ async def menu(message: Message) -> None:
             error_text = f"Handle update error: {error}\n\nMessage: {message}",
             error_type = type(error),
             user_id = message.from_user.id,
+            user_context = user_context,
         )    
\ No newline at end of file
@@ -0,0 +1,31 @@
+from aiogram import Router
+from aiogram import types
+from aiogram.filters import and_f
+
+from ...custom_filters import IsGroupChatFilter
+from ...custom_filters import IsCustomerChatFilter
+
+from ...delay_tracking import group_pipeline
+
+from ...error_case import operate_error_case
+
+
+# Without throttling: each message of customer chat changes its response deadline (see middlewares.throttling)
+group_router = Router(name = "group")
+
+
+@group_router.message(and_f(IsGroupChatFilter(), IsCustomerChatFilter()))
+async def track_customer_chat_message(message : types.Message):
+    """
+    Arms response deadline on customer's message and cancels it on manager's reply
+    """
+    try:
+        group_pipeline.process(message)
+
+    except Exception as error:
+        await operate_error_case(
+            error_text = f"Customer chat message tracking error: {error}",
+            error_type = type(error),
+            call_user = False,
+            error_event = message,
+        )
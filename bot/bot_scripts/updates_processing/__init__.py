@@ -0,0 +1,3 @@
+from .chat_isolation import ChatOrderedEventIsolation
+
+from .callback_router import CallbackRouter
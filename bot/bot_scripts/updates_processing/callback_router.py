@@ -0,0 +1,114 @@
+"""
+This module provides CallbackRouter - router which dispatches callback queries by prefix of structured callback data.
+
+Router registers one callback query handler in aiogram; prefix of callback data (text before the first ":")
+is looked up in dictionary of routes, so cost of dispatching does not depend on count of registered callbacks.
+Callback data is unpacked once and is passed to handler as typed `callback_data` argument:
+
+    admin_router = CallbackRouter(name = "admin")
+
+    @admin_router.callback(ContentTypeCallback, IsBotAdminFilter(), ShowContentListFSM.content_type)
+    async def handler(callback : types.CallbackQuery, callback_data : ContentTypeCallback, state : FSMContext): ...
+
+Filters of route are checked like filters of aiogram handlers (they receive data of handler, e.g. `raw_state`,
+`user_context`). If no route of prefix passes, update is propagated to next handlers and routers.
+Route is resolved by filter of dispatching handler, so inner middlewares receive handler of route as `handler`
+(and its flags, see aiogram.dispatcher.flags.get_flag).
+"""
+
+from typing import Any, Callable
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+
+CALLBACK_DATA_SEPARATOR = ":"
+
+
+class CallbackRoute:
+    callback_data_type : type[CallbackData]
+    handler : HandlerObject
+
+    def __init__(self, callback_data_type : type[CallbackData], handler : HandlerObject) -> None:
+        self.callback_data_type = callback_data_type
+        self.handler = handler
+
+
+class CallbackRouter(Router):
+    """
+    Router with dictionary dispatching of callback queries. Other events are registered as usual
+    (`router.message(...)`, `router.callback_query(...)`), handlers of `callback_query` are checked after routes.
+    """
+
+    def __init__(self, *, name : str | None = None) -> None:
+        super().__init__(name = name)
+        # prefix of callback data -> routes (several routes of one prefix differ by filters, e.g. states)
+        self._routes : dict[str, list[CallbackRoute]] = {}
+        self.callback_query.register(self._dispatch_callback_query, self._resolve_route)
+
+
+    def callback(self, callback_data_type : type[CallbackData], *filters : Callable, flags : dict[str, Any] | None = None) -> Callable:
+        """
+        Decorator which registers handler of callback data type with filters.
+        """
+        def wrapper(callback : Callable) -> Callable:
+            self.register_callback(callback, callback_data_type, *filters, flags = flags)
+            return callback
+        return wrapper
+
+
+    def register_callback(
+            self,
+            callback : Callable,
+            callback_data_type : type[CallbackData],
+            *filters : Callable,
+            flags : dict[str, Any] | None = None,
+        ) -> None:
+        if callback_data_type.__separator__ != CALLBACK_DATA_SEPARATOR:
+            raise ValueError(f"Callback data {callback_data_type.__name__} must use separator {CALLBACK_DATA_SEPARATOR!r}")
+        handler = HandlerObject(
+            callback = callback,
+            filters = [FilterObject(callback_filter) for callback_filter in filters],
+            flags = flags or {},
+        )
+        self._routes.setdefault(callback_data_type.__prefix__, []).append(CallbackRoute(callback_data_type, handler))
+
+
+    def get_prefixes(self) -> list[str]:
+        return list(self._routes)
+
+
+    def get_routes_handlers(self) -> list[HandlerObject]:
+        return [route.handler for routes in self._routes.values() for route in routes]
+
+
+    async def _resolve_route(self, callback_query : CallbackQuery, **data : Any) -> dict[str, Any] | bool:
+        """
+        Filter of dispatching handler: returns data of the first route which passes its filters
+        (handler of route replaces dispatching handler in data of inner middlewares).
+        """
+        if not callback_query.data:
+            return False
+        routes = self._routes.get(callback_query.data.partition(CALLBACK_DATA_SEPARATOR)[0])
+        if routes is None:
+            return False
+
+        callback_data = None
+        for route in routes:
+            if not isinstance(callback_data, route.callback_data_type):
+                try:
+                    callback_data = route.callback_data_type.unpack(callback_query.data)
+                except (TypeError, ValueError):
+                    # Payload does not match encoding (e.g. button of old version with the same prefix)
+                    continue
+            is_passed, handler_data = await route.handler.check(callback_query, **data, callback_data = callback_data)
+            if is_passed:
+                handler_data["handler"] = route.handler
+                return handler_data
+        return False
+
+
+    async def _dispatch_callback_query(self, callback_query : CallbackQuery, handler : HandlerObject, **data : Any) -> Any:
+        return await handler.call(callback_query, handler = handler, **data)
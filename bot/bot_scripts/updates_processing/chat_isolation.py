@@ -0,0 +1,125 @@
+"""
+This module provides ChatOrderedEventIsolation - events isolation for Dispatcher, 
+that processes updates of one chat strictly one by one and limits count of updates processed at the same time.
+Free workers are given to waiting updates in order of their priority (see incoming.IntakeGuard).
+Update waiting for worker gets priority of the most important update of its chat: reply of manager (HIGH)
+does not wait behind message of customer (NORMAL) in queue of NORMAL updates.
+"""
+
+import asyncio
+
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from incoming import PrioritySemaphore, PriorityTicket, UpdatePriority, update_priority
+
+
+class ChatLane:
+    """
+    Serial queue of updates of one chat.
+
+    asyncio.Lock wakes up waiters in FIFO order, so updates of chat are processed in order of their receiving.
+    """
+    lock : asyncio.Lock
+    users_count : int
+    # priority -> count of updates of chat, which wait for worker
+    waiting_priorities : dict[UpdatePriority, int]
+    # Request of worker of the first update in lane
+    ticket : PriorityTicket | None
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users_count = 0
+        self.waiting_priorities = {}
+        self.ticket = None
+
+
+    def get_priority(self) -> UpdatePriority:
+        return min(self.waiting_priorities)
+
+
+    def add_waiting(self, priority : UpdatePriority) -> None:
+        self.waiting_priorities[priority] = self.waiting_priorities.get(priority, 0) + 1
+        if self.ticket is not None:
+            self.ticket.raise_priority(priority)
+
+
+    def remove_waiting(self, priority : UpdatePriority) -> None:
+        self.waiting_priorities[priority] -= 1
+        if not self.waiting_priorities[priority]:
+            del self.waiting_priorities[priority]
+
+
+class ChatOrderedEventIsolation(BaseEventIsolation):
+    """
+    Events isolation which keeps serial queue (lane) per chat and global pool of workers.
+
+    Updates of one chat wait for their lane, then for free worker. 
+    Updates of different chats are processed concurrently, but at most `workers_count` at the same time,
+    update with higher priority (or with update of higher priority behind it in lane) gets free worker first.
+    Lane of chat is removed as soon as chat has no updates in processing or waiting.
+
+    Is used by FSM middleware, so FSM state of update is loaded only after previous update of the same chat is processed.
+    """
+
+    def __init__(self, workers_count : int = 16) -> None:
+        if workers_count < 1:
+            raise ValueError(f"Workers count must be positive, passed: {workers_count}")
+        self.workers_count = workers_count
+        self._workers = PrioritySemaphore(workers_count)
+        self._lanes : dict[int, ChatLane] = {}
+        self._busy_workers = 0
+
+
+    @asynccontextmanager
+    async def lock(self, key : StorageKey) -> AsyncGenerator[None, None]:
+        chat_id = key.chat_id
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = ChatLane()
+        
+        priority = update_priority.get()
+        lane.users_count += 1
+        lane.add_waiting(priority)
+        is_waiting = True
+        try:
+            async with lane.lock:
+                lane.ticket = self._workers.ticket(lane.get_priority())
+                try:
+                    async with lane.ticket:
+                        lane.ticket = None
+                        lane.remove_waiting(priority)
+                        is_waiting = False
+                        self._busy_workers += 1
+                        try:
+                            yield
+                        finally:
+                            self._busy_workers -= 1
+                finally:
+                    lane.ticket = None
+        finally:
+            if is_waiting:
+                lane.remove_waiting(priority)
+            lane.users_count -= 1
+            if not lane.users_count:
+                del self._lanes[chat_id]
+
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns current load of isolation: count of active chats lanes, busy workers and updates waiting in lanes.
+        """
+        waiting_count = sum(lane.users_count for lane in self._lanes.values()) - self._busy_workers
+        return {
+            "workers_count" : self.workers_count,
+            "busy_workers" : self._busy_workers,
+            "active_lanes" : len(self._lanes),
+            "waiting_updates" : waiting_count,
+            "waiting_for_worker" : self._workers.get_waiters_count(),
+        }
+
+
+    async def close(self) -> None:
+        self._lanes.clear()
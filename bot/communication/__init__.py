@@ -1,2 +1,3 @@
 from .communication import Communicator
+from .messages_patterns_db_client import DEFAULT_MESSAGES_PATTERNS
 
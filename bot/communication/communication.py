@@ -5,6 +5,8 @@ from .messages_patterns_db_client import MessagesPatternsDBClient
 class Communicator:
     messages_patterns : dict = {}
     keyboards_patterns : dict = {}
+    # Incremented on each update of patterns: content rendered from patterns is cached by version
+    content_version : int = 0
 
 
     def __init__(self) -> None:
@@ -12,10 +14,15 @@ class Communicator:
             regist_error("Communicator initializing error")
 
     
-    def get_message(self, key : str) -> str:
+    def get_message(self, key : str, default : str | None = None) -> str:
+        """
+        Returns message pattern by key. If key is not found, returns `default` (if it is passed) without error registering.
+        """
         try:
             return self.messages_patterns[key]
         except KeyError:
+            if default is not None:
+                return default
             regist_error(
                 error_description = f"Get message-pattern error: key '{key}' is not found",
                 error_type = KeyError,
@@ -59,6 +66,7 @@ class Communicator:
         for key, keyboard_pattern_text in relations_list:
             self.keyboards_patterns[key] = keyboard_pattern_text
 
+        self.content_version += 1
         record_log("Request for communicator-content successfully operated!")
         return True
     
@@ -9,6 +9,11 @@ from logger import record_log, regist_error
 
 INSTANCES_RELATIONS_DB_PATH = Path(__file__).parent / "communication.db"
 
+# Patterns which are required by bot's code: they are added on start, if database has no them (texts changed by admins are kept)
+DEFAULT_MESSAGES_PATTERNS : dict[str, str] = {
+    "chat_delay_notification" : "⏰ *CHAT_TITLE*: клиент ждёт ответа *WAITING_TIME* мин. *MESSAGE_LINK*",
+}
+
 
 class MessagesPatternsDBClient:
     """Here will be documentation"""
@@ -39,6 +44,7 @@ class MessagesPatternsDBClient:
                         keyboard_pattern_text TEXT NOT NULL
                     )"""
                 )
+                cursor.executemany("INSERT OR IGNORE INTO messages_patterns VALUES (?, ?)", DEFAULT_MESSAGES_PATTERNS.items())
                 connection.commit()
             return True
         except Exception as db_error:
@@ -1 +1 @@
-from .config import get_bot_reporter_token, get_dev_tg_id, get_report_chat_id
\ No newline at end of file
+from .config import get_bot_reporter_token, get_dev_tg_id, get_report_chat_id, get_updates_workers_count, get_updates_capture_config, get_metrics_port, get_loop_watchdog_threshold, get_log_rotation_config
\ No newline at end of file
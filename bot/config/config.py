@@ -22,4 +22,24 @@ def get_report_chat_id() -> int:
 
 
 def get_dev_tg_id() -> int:
-    return _read_config_json().get("dev_tg_id")
\ No newline at end of file
+    return _read_config_json().get("dev_tg_id")
+
+
+def get_updates_workers_count() -> int:
+    return _read_config_json().get("updates_workers_count", 16)
+
+
+def get_updates_capture_config() -> dict | None:
+    return _read_config_json().get("updates_capture")
+
+
+def get_metrics_port() -> int:
+    return _read_config_json().get("metrics_port", 9108)
+
+
+def get_loop_watchdog_threshold() -> float:
+    return _read_config_json().get("loop_watchdog_threshold", 0.1)
+
+
+def get_log_rotation_config() -> dict:
+    return _read_config_json().get("log_rotation", {})
\ No newline at end of file
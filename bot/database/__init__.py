@@ -1 +1,2 @@
-from .bot_database_client import BotDBClient
\ No newline at end of file
+from .bot_database_client import BotDBClient
+from .roles_index import RolesIndex
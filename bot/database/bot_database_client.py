@@ -2,21 +2,48 @@ import json
 import sqlite3 as sqlt
 from pathlib import Path
 from contextlib import contextmanager
+from time import time
 from logger import record_log, regist_error
+from delay_control import EwordsMatcher, EwordsMatchersCache
+
+from .roles_index import ROLES_QUERY, RolesIndex
 
 INSTANCES_RELATIONS_DB_PATH = Path(__file__).parent / "bot_database.db"
 
+# Fields of "chats_limits" which can be updated by update_chats_limits_batch
+CHATS_LIMITS_FIELDS : frozenset[str] = frozenset(("is_rest_message_registered", "time_limit", "message_link", "last_message_id", "was_first_message"))
+
+# Cache of chats is cleared when it exceeds this count of chats
+CHATS_CACHE_LIMIT = 100_000
+
+# Cache of managers' records is cleared when it exceeds this count of managers
+MANAGERS_CACHE_LIMIT = 10_000
+
+# Statuses of outbox messages
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_DELIVERED = "delivered"
+OUTBOX_DEAD = "dead"
+
 class BotDBClient:
     """Here will be documentation"""
     database_path: str
 
 
-    def __init__(self) -> None:
-        self.database_path = INSTANCES_RELATIONS_DB_PATH
+    def __init__(self, database_path : str | Path | None = None) -> None:
+        # Default path is read on creation, so it can be replaced by scratch copy (see benchmarks.offline_bot)
+        self.database_path = database_path or INSTANCES_RELATIONS_DB_PATH
+        self.ewords_matchers = EwordsMatchersCache()
+        # chat ID -> static info of chat (None for unregistered chats), see get_cached_chat_info
+        self.chats_cache : dict[int, dict | None] = {}
+        # user ID -> record of manager joined with user, see get_cached_manager_info
+        self.managers_cache : dict[int, dict] = {}
+        self.roles_index = RolesIndex()
         if self.initialize_database():
             record_log("Database client successfully registered")
         else:
             raise Exception("Database initializing error")
+        self.load_roles_index()
 
 
     @contextmanager
@@ -136,6 +163,32 @@ class BotDBClient:
                         FOREIGN KEY (chat_tg_id) REFERENCES chats(chat_tg_id) ON DELETE CASCADE
                     )"""
                 )
+                # Only chats with armed deadline are indexed: restart recovery reads them without full scan 
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS chats_limits_armed_index ON chats_limits (time_limit) 
+                    WHERE time_limit IS NOT NULL"""
+                )
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS outbox (
+                        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        channel TEXT,
+                        chat_id TEXT,
+                        message_text TEXT,
+                        kind TEXT,
+                        status TEXT,
+                        attempts INTEGER DEFAULT 0,
+                        next_attempt_at REAL,
+                        created_at REAL,
+                        claimed_at REAL,
+                        delivered_at REAL,
+                        last_error TEXT
+                    )"""
+                )
+                # Dispatcher claims only pending messages, delivered ones are not indexed
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS outbox_pending_index ON outbox (next_attempt_at) 
+                    WHERE status = 'pending'"""
+                )
             return True
         except Exception as db_error:
             regist_error(
@@ -145,6 +198,30 @@ class BotDBClient:
             return False
 
 
+    def load_roles_index(self) -> bool:
+        """
+        Loads roles of all managers, owners and bot-admins into self.roles_index by one query.
+
+        Returns:
+        --------
+        bool:
+            True, if success. False, if error (index is not changed).
+        """
+        try:
+            with self._get_connection() as cursor:
+                cursor.row_factory = None
+                cursor.execute(ROLES_QUERY)
+                self.roles_index.load(cursor.fetchall())
+            return True
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Roles index loading error: {db_error}",
+                error_type = type(db_error),
+            )
+            return False
+
+
     def register_user(self, user_id : int, username : str = None, first_name : str = None, last_name : str = None) -> bool:
         """
         Registers user in bot database. If user is already registered, then updates user's data.
@@ -168,6 +245,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("INSERT INTO users VALUES (?, ?, ?, ?)", (user_id, username, first_name, last_name))
+            self.managers_cache.pop(user_id, None)
             return True
 
         except sqlt.IntegrityError:
@@ -208,6 +286,7 @@ class BotDBClient:
                     "UPDATE users SET username = ?, first_name = ?, last_name = ? WHERE user_tg_id = ?",
                     (username, first_name, last_name, user_id)
                 )
+            self.managers_cache.pop(user_id, None)
             return True
 
         except Exception as db_error:
@@ -399,6 +478,49 @@ class BotDBClient:
             return {}
 
 
+    def get_company_info(self, company_id : int) -> dict | None:
+        """
+        Returns information about concrete company with its settings.
+
+        Parameters:
+        -----
+        company_id : int
+            company id
+
+        Returns:
+        --------
+        dict:
+            information about company, fields "weekend" and "settings" are loaded from json
+        None:
+            error or company with such ID does not exist
+        """
+        try:
+            with self._get_connection() as cursor:
+                cursor.execute(
+                    """
+                    SELECT * FROM companies AS co 
+                    INNER JOIN companies_settings AS cs ON co.company_id = cs.company_id
+                    WHERE co.company_id = (?)
+                    """,
+                    (company_id,)
+                )
+                company = cursor.fetchone()
+            if not company:
+                return None
+
+            company = dict(company)
+            for field_name in ("weekend", "settings"):
+                company[field_name] = _load_from_json(company[field_name])
+            return company
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+            )
+            return None
+
+
     def delete_company(self, company_id : int) -> bool:
         """
         Deletes company with passed ID, if it exists.
@@ -419,6 +541,10 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("DELETE FROM companies WHERE company_id = ?", (company_id,))
+            self.ewords_matchers.invalidate(company_id)
+            self.chats_cache.clear()
+            self.managers_cache.clear()
+            self.roles_index.remove_company(company_id)
             return True
 
         except Exception as db_error:
@@ -449,6 +575,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("INSERT INTO owners VALUES (?, ?)", (user_id, owner_company_id))
+            self.roles_index.add_owner(user_id, owner_company_id)
             return True
 
         except sqlt.IntegrityError:
@@ -481,6 +608,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("DELETE FROM owners WHERE user_tg_id = ?", (user_id,))
+            self.roles_index.remove_owner(user_id)
             return True
 
         except Exception as db_error:
@@ -576,6 +704,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("INSERT INTO bot_admins VALUES (?)", (user_id,))
+            self.roles_index.add_bot_admin(user_id)
             return True
 
         except sqlt.IntegrityError:
@@ -610,6 +739,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("DELETE FROM bot_admins WHERE user_tg_id = ?", (user_id,))
+            self.roles_index.remove_bot_admin(user_id)
             return True
 
         except Exception as db_error:
@@ -673,6 +803,11 @@ class BotDBClient:
                     cursor.execute("INSERT INTO managers VALUES (?, ?, ?)", (user_id, manager_company_id, extra_name))
                 else:
                     cursor.execute("INSERT INTO managers VALUES (?, (SELECT company_id FROM owners WHERE user_tg_id = (?) LIMIT 1), ?)", (user_id, owner_id, extra_name))
+                    # Company is taken from inserted row
+                    cursor.execute("SELECT company_id FROM managers WHERE rowid = (?)", (cursor.lastrowid,))
+                    manager_company_id = cursor.fetchone()["company_id"]
+            self.roles_index.add_manager(user_id, manager_company_id)
+            self.managers_cache.pop(user_id, None)
             return True
 
         except sqlt.IntegrityError:
@@ -706,7 +841,13 @@ class BotDBClient:
         """
         try:
             with self._get_connection() as cursor:
-                cursor.execute("DELETE FROM managers WHERE user_tg_id = ? AND company_id = (SELECT company_id FROM owners WHERE user_tg_id = (?))", (user_id, owner_id))
+                cursor.execute("SELECT company_id FROM owners WHERE user_tg_id = (?)", (owner_id,))
+                owner_row = cursor.fetchone()
+                if not owner_row:
+                    return True
+                cursor.execute("DELETE FROM managers WHERE user_tg_id = ? AND company_id = ?", (user_id, owner_row["company_id"]))
+            self.roles_index.remove_manager(user_id, owner_row["company_id"])
+            self.managers_cache.pop(user_id, None)
             return True
 
         except Exception as db_error:
@@ -841,6 +982,41 @@ class BotDBClient:
             return None 
         
     
+    def get_cached_manager_info(self, user_id : int) -> dict | None:
+        """
+        Returns the same info as get_manager_info(user_id), but database is queried only for users which are managers
+        according to roles index and only once per user. Cache is kept in sync by methods which change users and managers
+        (register_user, update_user, register_manager, delete_manager, delete_company).
+
+        Parameters:
+        -----------
+        user_id : int
+            user ID in Telegram
+
+        Returns:
+        --------
+        dict:
+            information about manager
+        None:
+            user is not manager or some error was happened
+        """
+        if user_id not in self.roles_index.managers:
+            return None
+        try:
+            return self.managers_cache[user_id]
+        except KeyError:
+            pass
+
+        manager_info = self.get_manager_info(user_id = user_id)
+        if manager_info is None:
+            # Error is not cached, the next call repeats query
+            return None
+        if len(self.managers_cache) >= MANAGERS_CACHE_LIMIT:
+            self.managers_cache.clear()
+        self.managers_cache[user_id] = manager_info
+        return manager_info
+
+
     def get_managers_list_of_owner(self, user_id : int, only_ids : bool = False) -> list[dict] | list[int] | list:
         """
         Returns information about all managers of owner's company from table "managers".
@@ -924,6 +1100,7 @@ class BotDBClient:
                         """,
                         (eword, company_id,)
                     )
+            self.ewords_matchers.add(company_id, ewords_list)
             return True
         
         except sqlt.IntegrityError:
@@ -978,6 +1155,7 @@ class BotDBClient:
                         """,
                         (company_id, eword_content,)
                     )
+            self.ewords_matchers.remove(company_id, ewords_list)
             return True
 
         except Exception as db_error:
@@ -1025,6 +1203,24 @@ class BotDBClient:
             return [] 
 
 
+    def get_ewords_matcher(self, company_id : int) -> EwordsMatcher:
+        """
+        Returns matcher of ewords of passed company (see delay_control.EwordsMatcher).
+
+        Matcher is built from database on the first request and then is kept in sync by add_ewords and delete_ewords.
+
+        Parameters:
+        -----
+        company_id : int
+
+        Returns:
+        --------
+        EwordsMatcher:
+            matcher (empty, if company has no ewords)
+        """
+        return self.ewords_matchers.get(company_id, lambda: self.get_ewords_list_of_company(company_id))
+
+
     def get_ewords_list_by_manager_id(self, user_id : int) -> list[str] | list:
         """
         Returns list of ewords (exception-words) of manager's company.
@@ -1130,6 +1326,7 @@ class BotDBClient:
                     raise ValueError(f"Manager {manager_id} is unregistered as a manager.")
                 cursor.execute("INSERT INTO chats (chat_tg_id, chat_title, company_id, chat_type) VALUES (?, ?, ?, ?)", (chat_id, chat_title, company_id, chat_type))
                 cursor.execute("INSERT INTO chats_limits (chat_tg_id, is_rest_message_registered, time_limit, message_link, last_message_id) VALUES (?, ?, ?, ?, ?)", (chat_id, None, None, None, None))
+            self.chats_cache.pop(chat_id, None)
             return True
 
         except sqlt.IntegrityError:
@@ -1177,6 +1374,7 @@ class BotDBClient:
                     cursor.execute("UPDATE chats SET chat_title = (?) WHERE chat_tg_id = (?)", (chat_title, chat_id,))
                 if chat_type:
                     cursor.execute("UPDATE chats SET chat_type = (?) WHERE chat_tg_id = (?)", (chat_type, chat_id,))
+            self.chats_cache.pop(chat_id, None)
             return True
 
         except Exception as db_error:
@@ -1205,6 +1403,7 @@ class BotDBClient:
         try:
             with self._get_connection() as cursor:
                 cursor.execute("DELETE FROM chats WHERE chat_tg_id = ?", (chat_id,))
+            self.chats_cache.pop(chat_id, None)
             return True
 
         except Exception as db_error:
@@ -1301,6 +1500,52 @@ class BotDBClient:
             return False
         
     
+    def get_cached_chat_info(self, chat_id : int) -> dict | None:
+        """
+        Returns static info about chat ("chat_tg_id", "chat_title", "company_id", "chat_type") without limits.
+
+        Info is read from database once and then is taken from memory, cache is kept in sync by methods
+        which change chats (register_chat, update_chat, delete_chat, delete_company).
+
+        Parameters:
+        -----------
+        chat_id : int
+            chat ID in Telegram
+
+        Returns:
+        --------
+        dict:
+            info about chat
+        None:
+            chat with passed ID is not registered or some error was happened
+        """
+        try:
+            return self.chats_cache[chat_id]
+        except KeyError:
+            pass
+
+        try:
+            with self._get_connection() as cursor:
+                cursor.execute(
+                    "SELECT chat_tg_id, chat_title, company_id, chat_type FROM chats WHERE chat_tg_id = (?)",
+                    (chat_id,)
+                )
+                chat_row = cursor.fetchone()
+            chat_info = dict(chat_row) if chat_row else None
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+            )
+            return None
+
+        if len(self.chats_cache) >= CHATS_CACHE_LIMIT:
+            self.chats_cache.clear()
+        self.chats_cache[chat_id] = chat_info
+        return chat_info
+
+
     def update_chat_limits(self, chat_id : int, **kwargs) -> bool:
         """
         Updates chat limits in bot database.
@@ -1369,6 +1614,375 @@ class BotDBClient:
             return False
         
     
+    def get_armed_chats(self) -> list[tuple[int, int]] | list:
+        """
+        Returns all chats with armed response deadline (chats_limits.time_limit is set) ordered by deadline.
+
+        Query reads only partial covering index "chats_limits_armed_index", table itself is not scanned.
+
+        Returns:
+        --------
+        list[tuple[int, int]]:
+            list of tuples (chat_tg_id, time_limit) ordered by time_limit
+        list (empty list []):
+            no armed chats or some error was happened
+        """
+        try:
+            with self._get_connection() as cursor:
+                # Plain tuples instead of sqlt.Row: there may be a lot of rows
+                cursor.row_factory = None
+                cursor.execute("""
+                    SELECT chat_tg_id, time_limit FROM chats_limits
+                    WHERE time_limit IS NOT NULL
+                    ORDER BY time_limit
+                    """,
+                )
+                return cursor.fetchall()
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+            )
+            return []
+
+
+    def get_chats_info_list(self, chats_ids : list[int]) -> list[dict] | list:
+        """
+        Returns info about passed chats from two tables, including information about delay.
+
+        Parameters:
+        -----
+        chats_ids : list[int]
+            chats' IDs in Telegram
+
+        Returns:
+        --------
+        list[dict]:
+            list of chats with information for each chat (unregistered chats are skipped)
+        list:
+            no such chats or some error was happened 
+        """
+        try:
+            chats_infos = []
+            with self._get_connection() as cursor:
+                # SQLite limits count of query parameters, so IDs are passed by chunks
+                for chunk_start in range(0, len(chats_ids), 500):
+                    chunk = chats_ids[chunk_start : chunk_start + 500]
+                    cursor.execute(f"""
+                        SELECT * FROM chats AS c
+                        INNER JOIN chats_limits AS cl ON c.chat_tg_id = cl.chat_tg_id
+                        WHERE c.chat_tg_id IN ({", ".join("?" * len(chunk))})
+                        """,
+                        chunk
+                    )
+                    chats_infos.extend(dict(chat) for chat in cursor.fetchall())
+            return chats_infos
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+            )
+            return []
+
+
+    def update_chats_limits_batch(self, chats_limits : dict[int, dict]) -> bool:
+        """
+        Updates limits of many chats in one transaction.
+
+        !!! ATTENTION: UNSECURED: access to chats is unchecked.
+
+        Chats with the same set of updated fields are written by one executemany.
+
+        Parameters:
+        -----
+        chats_limits : dict[int, dict]
+            chat ID in Telegram -> new values of limits (keys - see CHATS_LIMITS_FIELDS)
+
+        Returns:
+        --------
+        bool:
+            True, if success. False, if error.
+        """
+        try:
+            updates_by_fields : dict[tuple[str], list[tuple]] = {}
+            for chat_id, limits in chats_limits.items():
+                fields = tuple(sorted(limits))
+                if not CHATS_LIMITS_FIELDS.issuperset(fields):
+                    raise ValueError(f"Unexpected fields of chats limits: {set(fields) - CHATS_LIMITS_FIELDS}")
+                updates_by_fields.setdefault(fields, []).append((*(limits[field] for field in fields), chat_id))
+
+            with self._get_connection() as cursor:
+                for fields, rows in updates_by_fields.items():
+                    if not fields:
+                        continue
+                    cursor.executemany(
+                        f"UPDATE chats_limits SET {', '.join(f'{field} = (?)' for field in fields)} WHERE chat_tg_id = (?)",
+                        rows
+                    )
+            return True
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return False
+
+
+    def reset_chats_time_limits(self, chats_ids : list[int], expired_before : float | None = None) -> bool:
+        """
+        Sets chats_limits.time_limit to NULL for all passed chats in one transaction.
+
+        Parameters:
+        -----
+        chats_ids : list[int]
+            chats' IDs in Telegram
+        expired_before : float | None
+            if it is passed, only time limits which are not later than this unix time are reset
+            (chat can be armed again, while its previous deadline is reported)
+
+        Returns:
+        --------
+        bool:
+            True, if success. False, if error.
+        """
+        try:
+            with self._get_connection() as cursor:
+                if expired_before is None:
+                    cursor.executemany(
+                        "UPDATE chats_limits SET time_limit = NULL WHERE chat_tg_id = (?)",
+                        [(chat_id,) for chat_id in chats_ids]
+                    )
+                else:
+                    cursor.executemany(
+                        "UPDATE chats_limits SET time_limit = NULL WHERE chat_tg_id = (?) AND time_limit <= (?)",
+                        [(chat_id, expired_before) for chat_id in chats_ids]
+                    )
+            return True
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return False
+
+
+    def enqueue_outbox_messages(self, messages : list[tuple[str, int | str, str, str]]) -> bool:
+        """
+        Adds messages into outbox, they will be sent by outbox dispatcher.
+
+        Errors are registered in silent mode: outbox is used for error reports itself.
+
+        Parameters:
+        -----
+        messages : list[tuple[str, int | str, str, str]]
+            list of tuples (channel, chat_id, message_text, kind). Channel is "bot" (main bot) or "reporter" (reporter bot),
+            kind describes message, e.g. "delay_alert" or "error_report"
+
+        Returns:
+        --------
+        bool:
+            True, if success. False, if error.
+        """
+        try:
+            now = time()
+            with self._get_connection() as cursor:
+                cursor.executemany(
+                    """
+                    INSERT INTO outbox (channel, chat_id, message_text, kind, status, attempts, next_attempt_at, created_at) 
+                    VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+                    """,
+                    [(channel, str(chat_id), message_text, kind, OUTBOX_PENDING, now, now) for channel, chat_id, message_text, kind in messages]
+                )
+            return True
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return False
+
+
+    def add_claimed_outbox_message(self, channel : str, chat_id : int | str, message_text : str, kind : str) -> int | None:
+        """
+        Adds message into outbox as already claimed ("sending"): it is sent by caller at once, and it is returned
+        to "pending" by claim_outbox_messages, if result of sending is not saved (e.g. bot crashed during sending).
+
+        Errors are registered in silent mode: outbox is used for error reports itself.
+
+        Parameters:
+        -----
+        channel : str
+            "bot" (main bot) or "reporter" (reporter bot)
+        chat_id : int | str
+            receiver of message
+        message_text : str
+            text of message
+        kind : str
+            description of message, e.g. "delay_alert"
+
+        Returns:
+        --------
+        int:
+            ID of outbox message, if success
+        None:
+            some error was happened
+        """
+        try:
+            now = time()
+            with self._get_connection() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO outbox (channel, chat_id, message_text, kind, status, attempts, next_attempt_at, created_at, claimed_at) 
+                    VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)
+                    """,
+                    (channel, str(chat_id), message_text, kind, OUTBOX_SENDING, now, now, now)
+                )
+                return cursor.lastrowid
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return None
+
+
+    def claim_outbox_messages(self, limit : int, lease_time : float = 300.0, released_before : float | None = None) -> list[dict] | list:
+        """
+        Claims batch of due pending messages (in order of adding): their status is changed to "sending" in one transaction.
+
+        Messages which were claimed more than `lease_time` seconds ago and are still "sending" (bot was stopped during sending)
+        are returned to "pending" before claiming.
+
+        Parameters:
+        -----
+        limit : int
+            maximal count of claimed messages
+        lease_time : float
+            seconds after which claimed message is considered as lost
+        released_before : float | None
+            if it is passed, messages claimed before this unix time are considered as lost instead (e.g. start of bot)
+
+        Returns:
+        --------
+        list[dict]:
+            claimed messages ("message_id", "channel", "chat_id", "message_text", "kind", "attempts")
+        list (empty list []):
+            no due messages or some error was happened
+        """
+        try:
+            now = time()
+            with self._get_connection() as cursor:
+                cursor.execute(
+                    "UPDATE outbox SET status = (?) WHERE status = (?) AND claimed_at < (?)",
+                    (OUTBOX_PENDING, OUTBOX_SENDING, now - lease_time if released_before is None else released_before)
+                )
+                cursor.execute(
+                    """
+                    SELECT message_id, channel, chat_id, message_text, kind, attempts FROM outbox
+                    WHERE status = 'pending' AND next_attempt_at <= (?)
+                    ORDER BY next_attempt_at, message_id
+                    LIMIT (?)
+                    """,
+                    (now, limit)
+                )
+                messages = [dict(message) for message in cursor.fetchall()]
+                cursor.executemany(
+                    "UPDATE outbox SET status = (?), claimed_at = (?) WHERE message_id = (?)",
+                    [(OUTBOX_SENDING, now, message["message_id"]) for message in messages]
+                )
+            return messages
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return []
+
+
+    def complete_outbox_messages(
+            self, 
+            delivered_ids : list[int], 
+            retries : list[tuple[int, float, str]], 
+            dead : list[tuple[int, str]],
+        ) -> bool:
+        """
+        Saves results of sending of claimed messages in one transaction.
+
+        Parameters:
+        -----
+        delivered_ids : list[int]
+            IDs of delivered messages
+        retries : list[tuple[int, float, str]]
+            tuples (message_id, next_attempt_at, error) of messages which must be sent again
+        dead : list[tuple[int, str]]
+            tuples (message_id, error) of messages which can not be delivered (dead-letter state)
+
+        Returns:
+        --------
+        bool:
+            True, if success. False, if error.
+        """
+        try:
+            now = time()
+            with self._get_connection() as cursor:
+                cursor.executemany(
+                    "UPDATE outbox SET status = (?), delivered_at = (?), attempts = attempts + 1 WHERE message_id = (?)",
+                    [(OUTBOX_DELIVERED, now, message_id) for message_id in delivered_ids]
+                )
+                cursor.executemany(
+                    "UPDATE outbox SET status = (?), next_attempt_at = (?), last_error = (?), attempts = attempts + 1 WHERE message_id = (?)",
+                    [(OUTBOX_PENDING, next_attempt_at, error, message_id) for message_id, next_attempt_at, error in retries]
+                )
+                cursor.executemany(
+                    "UPDATE outbox SET status = (?), last_error = (?), attempts = attempts + 1 WHERE message_id = (?)",
+                    [(OUTBOX_DEAD, error, message_id) for message_id, error in dead]
+                )
+            return True
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return False
+
+
+    def get_outbox_stats(self) -> dict[str, int]:
+        """
+        Returns count of outbox messages by status.
+        
+        Returns:
+        --------
+        dict[str, int]:
+            status -> count of messages (empty dict in case of error)
+        """
+        try:
+            with self._get_connection() as cursor:
+                cursor.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+                return {row[0] : row[1] for row in cursor.fetchall()}
+
+        except Exception as db_error:
+            regist_error(
+                error_description = f"Database error: {db_error}",
+                error_type = type(db_error),
+                silent_mode = True
+            )
+            return {}
+
+
     def get_last_task_id(self, company_id : int) -> int | None:
         """
         Returns INTEGER value of last task ID.
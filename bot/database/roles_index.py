@@ -0,0 +1,102 @@
+"""
+This module provides RolesIndex - in-memory copy of roles of users: managers and owners of companies and bot-admins.
+
+Index is loaded from database by one query and then is kept in sync by BotDBClient methods which register and delete roles,
+so checks of roles in hot paths (group messages, filters, keyboards) do not touch SQLite.
+"""
+
+# One query for all roles: (role, user ID, company ID)
+ROLES_QUERY = """
+    SELECT 'manager', user_tg_id, company_id FROM managers
+    UNION ALL
+    SELECT 'owner', user_tg_id, company_id FROM owners
+    UNION ALL
+    SELECT 'bot_admin', user_tg_id, NULL FROM bot_admins
+"""
+
+
+class RolesIndex:
+    """
+    Roles of users. Companies' roles are stored as user ID -> set of companies' IDs.
+    """
+    managers : dict[int, set[int]]
+    owners : dict[int, set[int]]
+    bot_admins : set[int]
+
+    def __init__(self) -> None:
+        self.managers = {}
+        self.owners = {}
+        self.bot_admins = set()
+
+
+    def load(self, rows : list[tuple[str, int, int | None]]) -> None:
+        """
+        Replaces content of index by rows of ROLES_QUERY.
+        """
+        managers, owners, bot_admins = {}, {}, set()
+        for role, user_id, company_id in rows:
+            if role == "bot_admin":
+                bot_admins.add(user_id)
+            elif company_id is not None:
+                (managers if role == "manager" else owners).setdefault(user_id, set()).add(company_id)
+        self.managers, self.owners, self.bot_admins = managers, owners, bot_admins
+
+
+    def get_role(self, company_id : int, user_id : int) -> str | None:
+        """
+        Returns role of user in company: "owner", "manager" or None.
+        """
+        if company_id in self.owners.get(user_id, ()):
+            return "owner"
+        if company_id in self.managers.get(user_id, ()):
+            return "manager"
+        return None
+
+
+    def is_company_manager(self, user_id : int, company_id : int) -> bool:
+        return company_id in self.managers.get(user_id, ())
+
+
+    def is_bot_admin(self, user_id : int) -> bool:
+        return user_id in self.bot_admins
+
+
+    def add_manager(self, user_id : int, company_id : int | None) -> None:
+        if company_id is not None:
+            self.managers.setdefault(user_id, set()).add(company_id)
+
+
+    def remove_manager(self, user_id : int, company_id : int | None) -> None:
+        companies_ids = self.managers.get(user_id)
+        if companies_ids is None:
+            return
+        companies_ids.discard(company_id)
+        if not companies_ids:
+            del self.managers[user_id]
+
+
+    def add_owner(self, user_id : int, company_id : int) -> None:
+        self.owners.setdefault(user_id, set()).add(company_id)
+
+
+    def remove_owner(self, user_id : int) -> None:
+        self.owners.pop(user_id, None)
+
+
+    def add_bot_admin(self, user_id : int) -> None:
+        self.bot_admins.add(user_id)
+
+
+    def remove_bot_admin(self, user_id : int) -> None:
+        self.bot_admins.discard(user_id)
+
+
+    def remove_company(self, company_id : int) -> None:
+        """
+        Removes all roles in company (company deleting cascades to managers and owners).
+        """
+        for roles in (self.managers, self.owners):
+            for user_id in [user_id for user_id, companies_ids in roles.items() if company_id in companies_ids]:
+                roles[user_id].discard(company_id)
+                if not roles[user_id]:
+                    del roles[user_id]
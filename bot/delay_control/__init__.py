@@ -0,0 +1,5 @@
+from .deadline_scheduler import DeadlineScheduler
+from .business_calendar import BusinessCalendar, CalendarsCache
+from .ewords_matcher import EwordsMatcher, EwordsMatchersCache
+from .group_pipeline import GroupMessagePipeline, MANAGER_MESSAGE, CUSTOMER_MESSAGE, EWORD_MESSAGE
+from .notification_aggregator import NotificationAggregator, OverdueChat
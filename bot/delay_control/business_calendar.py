@@ -0,0 +1,217 @@
+"""
+This module provides BusinessCalendar - compiled working time of company, which is used for response deadlines counting:
+deadline = moment of message + N working seconds.
+
+Calendar is compiled from company settings:
+    working_time_start, working_time_end : "HH:MM" in company timezone (start later than end means overnight shift),
+    weekend : list of weekdays (0 - monday, 6 - sunday) when company does not work,
+    settings["timezone"] : name of timezone (UTC by default),
+    settings["holidays"] : list of dates "YYYY-MM-DD" when company does not work.
+
+Working window is attributed to the day of its start: overnight shift of friday ends on saturday morning.
+Windows are computed lazily and cached per local date, so both questions "is working time now" and
+"add N working seconds" are answered in O(1) amortized (if N is not longer than several working days).
+"""
+
+import pytz
+
+from datetime import date, datetime, time, timedelta
+
+
+FULL_WEEK_MASK = 0b1111111
+
+# Cached windows of calendar are cleared when cache exceeds this count of dates
+WINDOWS_CACHE_LIMIT = 512
+
+
+def _parse_time(value : str | None) -> time | None:
+    if not value:
+        return None
+    hours, minutes = value.strip().split(":")
+    return time(int(hours), int(minutes))
+
+
+class BusinessCalendar:
+    """
+    Working time of one company.
+
+    Parameters:
+    -----------
+    working_time_start : str | None
+        "HH:MM", start of working day. If start or end is not set (or they are equal), company works all day long
+    working_time_end : str | None
+        "HH:MM", end of working day. Value earlier than start means, that working day ends next day
+    weekend : list[int] | None
+        weekdays without work (0 - monday, 6 - sunday)
+    timezone : str
+        name of company's timezone, e.g. "Asia/Almaty"
+    holidays : list[str] | None
+        dates "YYYY-MM-DD" without work
+    """
+    working_days_mask : int
+
+    def __init__(
+            self,
+            working_time_start : str | None = None,
+            working_time_end : str | None = None,
+            weekend : list[int] | None = None,
+            timezone : str = "UTC",
+            holidays : list[str] | None = None,
+        ) -> None:
+        self.timezone = pytz.timezone(timezone)
+        self.start_time = _parse_time(working_time_start)
+        self.end_time = _parse_time(working_time_end)
+        if (self.start_time is None) or (self.end_time is None) or (self.start_time == self.end_time):
+            # Whole day is working
+            self.start_time = self.end_time = time(0, 0)
+        self.is_overnight = self.end_time <= self.start_time
+
+        self.working_days_mask = FULL_WEEK_MASK
+        for weekday in (weekend or []):
+            self.working_days_mask &= ~(1 << int(weekday))
+        self.holidays = frozenset(date.fromisoformat(holiday) for holiday in (holidays or []))
+
+        self._windows_cache : dict[date, tuple[float, float] | None] = {}
+
+
+    @classmethod
+    def from_company_info(cls, company_info : dict) -> "BusinessCalendar":
+        """
+        Compiles calendar from company info (see BotDBClient.get_company_info)
+        """
+        settings = company_info.get("settings") or {}
+        return cls(
+            working_time_start = company_info.get("working_time_start"),
+            working_time_end = company_info.get("working_time_end"),
+            weekend = company_info.get("weekend"),
+            timezone = settings.get("timezone") or "UTC",
+            holidays = settings.get("holidays"),
+        )
+
+
+    def _to_timestamp(self, day : date, moment : time) -> float:
+        local_moment = datetime.combine(day, moment)
+        try:
+            return self.timezone.localize(local_moment, is_dst = None).timestamp()
+        except pytz.AmbiguousTimeError:
+            # DST overlap: the first occurrence of local time
+            return self.timezone.localize(local_moment, is_dst = True).timestamp()
+        except pytz.NonExistentTimeError:
+            # DST gap: the moment when clock jumps over the gap
+            while True:
+                local_moment += timedelta(minutes = 1)
+                try:
+                    return self.timezone.localize(local_moment, is_dst = None).timestamp()
+                except pytz.NonExistentTimeError:
+                    continue
+
+
+    def get_window(self, day : date) -> tuple[float, float] | None:
+        """
+        Returns working window (start, end) of local date as unix timestamps or None, if date is not working.
+        """
+        try:
+            return self._windows_cache[day]
+        except KeyError:
+            pass
+
+        window = None
+        if (self.working_days_mask >> day.weekday()) & 1 and day not in self.holidays:
+            window_start = self._to_timestamp(day, self.start_time)
+            window_end = self._to_timestamp(day + timedelta(days = 1) if self.is_overnight else day, self.end_time)
+            if window_end > window_start:
+                window = (window_start, window_end)
+
+        if len(self._windows_cache) >= WINDOWS_CACHE_LIMIT:
+            self._windows_cache.clear()
+        self._windows_cache[day] = window
+        return window
+
+
+    def _local_date(self, timestamp : float) -> date:
+        return datetime.fromtimestamp(timestamp, self.timezone).date()
+
+
+    def is_working_time(self, timestamp : float) -> bool:
+        """
+        Checks if passed unix timestamp is inside of working window.
+        """
+        day = self._local_date(timestamp)
+        # Overnight window of previous day can cover the moment
+        for window_day in (day - timedelta(days = 1), day):
+            window = self.get_window(window_day)
+            if window and window[0] <= timestamp < window[1]:
+                return True
+        return False
+
+
+    def add_business_seconds(self, timestamp : float, seconds : float) -> float | None:
+        """
+        Returns unix timestamp which is `seconds` working seconds later than passed timestamp.
+
+        If passed moment is not working, counting starts from the beginning of the next working window.
+        Returns None, if calendar has no working days at all.
+        """
+        if not self.working_days_mask:
+            return None
+
+        remaining = seconds
+        current = timestamp
+        day = self._local_date(timestamp) - timedelta(days = 1)
+        non_working_days_in_row = 0
+        while True:
+            window = self.get_window(day)
+            if window is None:
+                non_working_days_in_row += 1
+                if non_working_days_in_row > 366:
+                    # Only holidays are left
+                    return None
+            else:
+                non_working_days_in_row = 0
+                window_start, window_end = window
+                if window_end > current:
+                    begin = max(window_start, current)
+                    available = window_end - begin
+                    if remaining <= available:
+                        return begin + remaining
+                    remaining -= available
+                    current = window_end
+            day += timedelta(days = 1)
+
+
+class CalendarsCache:
+    """
+    Compiled calendars of companies. Calendar of company is recompiled only when its settings are changed.
+    """
+
+    def __init__(self) -> None:
+        self._calendars : dict[int, tuple[tuple, BusinessCalendar]] = {}
+
+
+    @staticmethod
+    def _fingerprint(company_info : dict) -> tuple:
+        settings = company_info.get("settings") or {}
+        return (
+            company_info.get("working_time_start"),
+            company_info.get("working_time_end"),
+            tuple(company_info.get("weekend") or ()),
+            settings.get("timezone"),
+            tuple(settings.get("holidays") or ()),
+        )
+
+
+    def get(self, company_id : int, company_info : dict) -> BusinessCalendar:
+        fingerprint = self._fingerprint(company_info)
+        cached = self._calendars.get(company_id)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        calendar = BusinessCalendar.from_company_info(company_info)
+        self._calendars[company_id] = (fingerprint, calendar)
+        return calendar
+
+
+    def invalidate(self, company_id : int | None = None) -> None:
+        if company_id is None:
+            self._calendars.clear()
+        else:
+            self._calendars.pop(company_id, None)
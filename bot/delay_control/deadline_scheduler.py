@@ -0,0 +1,126 @@
+"""
+This module provides DeadlineScheduler - in-memory scheduler of response deadlines keyed by chat.
+
+Deadlines are kept in binary min-heap with lazy deletion:
+    arm - O(log n), cancel - O(1), getting of next deadline and firing of each expired deadline - O(log n) amortized,
+    bulk loading of n deadlines (restart recovery) - O(n).
+Cancelled entries stay in heap as tombstones and are thrown away when they reach the top of heap,
+heap is rebuilt when tombstones outnumber active deadlines.
+"""
+
+import heapq
+
+from itertools import count
+from typing import Any, Hashable, Iterable
+
+
+# Heap is compacted only if it holds at least this count of tombstones
+MIN_TOMBSTONES_TO_COMPACT = 1024
+
+# Entry fields: [deadline, sequence number, key, payload]
+_DEADLINE, _SEQUENCE, _KEY, _PAYLOAD = range(4)
+_REMOVED = object()
+
+
+class DeadlineScheduler:
+    """
+    Min-heap of deadlines, each key (chat ID) has at most one active deadline.
+    """
+
+    def __init__(self) -> None:
+        self._heap : list[list] = []
+        self._entries : dict[Hashable, list] = {}
+        self._sequence = count()
+        self._tombstones_count = 0
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def __contains__(self, key : Hashable) -> bool:
+        return key in self._entries
+
+
+    def arm(self, key : Hashable, deadline : float, payload : Any = None) -> None:
+        """
+        Sets deadline for key. Previous deadline of key is replaced.
+        """
+        if key in self._entries:
+            self.cancel(key)
+        entry = [deadline, next(self._sequence), key, payload]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+
+    def cancel(self, key : Hashable) -> bool:
+        """
+        Cancels deadline of key. Returns False, if key has no deadline.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[_KEY] = _REMOVED
+        entry[_PAYLOAD] = None
+        self._tombstones_count += 1
+        if self._tombstones_count >= MIN_TOMBSTONES_TO_COMPACT and self._tombstones_count > len(self._entries):
+            self._compact()
+        return True
+
+
+    def get_deadline(self, key : Hashable) -> float | None:
+        entry = self._entries.get(key)
+        return entry[_DEADLINE] if entry else None
+
+
+    def next_deadline(self) -> float | None:
+        """
+        Returns the earliest active deadline or None, if there are no deadlines.
+        """
+        heap = self._heap
+        while heap and heap[0][_KEY] is _REMOVED:
+            heapq.heappop(heap)
+            self._tombstones_count -= 1
+        return heap[0][_DEADLINE] if heap else None
+
+
+    def pop_expired(self, now : float) -> list[tuple[Hashable, float, Any]]:
+        """
+        Removes and returns all deadlines which are not later than `now` as list of (key, deadline, payload) in deadlines order.
+        """
+        expired = []
+        heap = self._heap
+        while heap and heap[0][_DEADLINE] <= now:
+            entry = heapq.heappop(heap)
+            if entry[_KEY] is _REMOVED:
+                self._tombstones_count -= 1
+                continue
+            del self._entries[entry[_KEY]]
+            expired.append((entry[_KEY], entry[_DEADLINE], entry[_PAYLOAD]))
+        return expired
+
+
+    def bulk_load(self, deadlines : Iterable[tuple[Hashable, float, Any]]) -> int:
+        """
+        Adds many deadlines at once by heapify (O(n)) instead of n pushes (O(n log n)).
+        Deadlines of already armed keys are replaced. Returns count of loaded deadlines.
+        """
+        loaded_count = 0
+        for key, deadline, payload in deadlines:
+            old_entry = self._entries.get(key)
+            if old_entry is not None:
+                old_entry[_KEY] = _REMOVED
+                old_entry[_PAYLOAD] = None
+                self._tombstones_count += 1
+            entry = [deadline, next(self._sequence), key, payload]
+            self._entries[key] = entry
+            self._heap.append(entry)
+            loaded_count += 1
+        self._compact()
+        return loaded_count
+
+
+    def _compact(self) -> None:
+        self._heap = list(self._entries.values())
+        heapq.heapify(self._heap)
+        self._tombstones_count = 0
@@ -0,0 +1,300 @@
+"""
+This module provides EwordsMatcher - multi-pattern matcher of exception words (ewords) of company.
+
+Customer's message which contains eword ("спасибо", "ok", ...) as a separate word or phrase does not start response timer.
+
+Ewords are kept in trie, which is compiled into one regular expression: regex engine walks trie from each position of text
+in C code, so cost of matching depends on length of text and depth of trie, but not on count of ewords.
+Set of ewords is updated incrementally, but compilation of expression takes hundreds of milliseconds for thousands
+of ewords, so inside of event loop it is executed in worker thread from snapshot of ewords. Until new expression
+is compiled, the previous one is used with correction by ewords which were added or removed after its snapshot,
+so results of matching are always exact.
+Compiler allocates hundreds of thousands of short-living objects without reference cycles: they would trigger full
+collection of garbage collector, which holds GIL for all objects of bot and stops event loop for ~150 ms,
+so automatic collection is paused while compilation is executed in worker thread.
+Both ewords and texts are case-folded (Unicode, including Cyrillic; "ё" is equal to "е").
+"""
+
+import asyncio
+import gc
+import re
+import threading
+
+from typing import Callable, Iterable
+
+from logger import regist_error
+
+
+# Key of trie node which marks end of eword
+_END = ""
+
+# Count of compilations in worker threads, while it is positive automatic garbage collection is paused
+_compilations_lock = threading.Lock()
+_compilations_count = 0
+_is_gc_paused = False
+
+
+def normalize_text(text : str) -> str:
+    return text.casefold().replace("ё", "е")
+
+
+def _normalize_eword(eword : str) -> str:
+    return " ".join(normalize_text(eword).split())
+
+
+def _is_word_character(character : str) -> bool:
+    # The same characters as "\w" of regular expressions
+    return character.isalnum() or character == "_"
+
+
+def _contains_any(ewords : Iterable[str], text : str) -> bool:
+    """
+    Checks ewords one by one in normalized text with collapsed whitespace (used only for small sets of ewords
+    and until the first compilation).
+    """
+    for eword in ewords:
+        position = text.find(eword)
+        while position != -1:
+            end = position + len(eword)
+            if (
+                ((position == 0) or not _is_word_character(text[position - 1]))
+                and ((end == len(text)) or not _is_word_character(text[end]))
+            ):
+                return True
+            position = text.find(eword, position + 1)
+    return False
+
+
+def compile_ewords(ewords : Iterable[str]) -> re.Pattern | None:
+    """
+    Compiles normalized ewords into one regular expression (None, if there are no ewords).
+    """
+    trie = {}
+    for eword in ewords:
+        node = trie
+        for character in eword:
+            node = node.setdefault(character, {})
+        node[_END] = True
+    expression = _trie_to_expression(trie)
+    # Eword must be a separate word: it is not preceded and not followed by letter or digit
+    return re.compile(rf"(?<!\w)(?:{expression})(?!\w)") if expression else None
+
+
+def _compile_in_thread(ewords : frozenset[str]) -> re.Pattern | None:
+    global _compilations_count, _is_gc_paused
+    with _compilations_lock:
+        _compilations_count += 1
+        if _compilations_count == 1 and gc.isenabled():
+            gc.disable()
+            _is_gc_paused = True
+    try:
+        return compile_ewords(ewords)
+    finally:
+        with _compilations_lock:
+            _compilations_count -= 1
+            if _compilations_count == 0 and _is_gc_paused:
+                gc.enable()
+                _is_gc_paused = False
+
+
+class EwordsMatcher:
+    """
+    Matcher of ewords of one company. Ewords are passed as they are stored in database:
+    eword is matched while at least one stored eword has the same normalized form ("OK" and "ok").
+    """
+
+    def __init__(self, ewords : Iterable[str] = ()) -> None:
+        # stored eword -> normalized form
+        self._stored : dict[str, str] = {}
+        # normalized form -> count of stored ewords with this form
+        self._forms : dict[str, int] = {}
+        self._version = 0
+
+        self._pattern : re.Pattern | None = None
+        # Normalized ewords and version of matcher, from which pattern was compiled
+        self._pattern_ewords : frozenset[str] = frozenset()
+        self._pattern_version = 0
+        self._is_compiling = False
+        # (version, added ewords, removed ewords) relatively to pattern
+        self._changes : tuple[int, frozenset[str], frozenset[str]] | None = None
+        self.add(ewords)
+
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+
+    @property
+    def is_compiled(self) -> bool:
+        return self._pattern_version == self._version
+
+
+    def add(self, ewords : Iterable[str]) -> None:
+        for eword in ewords:
+            form = _normalize_eword(eword)
+            if (not form) or (eword in self._stored):
+                continue
+            self._stored[eword] = form
+            self._forms[form] = self._forms.get(form, 0) + 1
+            if self._forms[form] == 1:
+                self._version += 1
+
+
+    def remove(self, ewords : Iterable[str]) -> None:
+        for eword in ewords:
+            form = self._stored.pop(eword, None)
+            if form is None:
+                continue
+            self._forms[form] -= 1
+            if not self._forms[form]:
+                del self._forms[form]
+                self._version += 1
+
+
+    def compile(self) -> None:
+        """
+        Compiles pattern synchronously (e.g. out of event loop).
+        """
+        self._set_pattern(self._version, frozenset(self._forms), compile_ewords(self._forms))
+
+
+    def _set_pattern(self, version : int, ewords : frozenset[str], pattern : re.Pattern | None) -> None:
+        self._pattern, self._pattern_ewords, self._pattern_version = pattern, ewords, version
+        self._changes = None
+
+
+    def _schedule_compilation(self) -> None:
+        if self._is_compiling:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.compile()
+            return
+        version, ewords = self._version, frozenset(self._forms)
+        self._is_compiling = True
+        future = loop.run_in_executor(None, _compile_in_thread, ewords)
+        future.add_done_callback(lambda future: self._on_compiled(version, ewords, future))
+
+
+    def _on_compiled(self, version : int, ewords : frozenset[str], future : asyncio.Future) -> None:
+        self._is_compiling = False
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            regist_error(
+                error_description = f"Ewords compilation error: {error}",
+                error_type = type(error),
+            )
+            return
+        self._set_pattern(version, ewords, future.result())
+        if not self.is_compiled:
+            # Ewords were changed during compilation
+            self._schedule_compilation()
+
+
+    def _get_changes(self) -> tuple[frozenset[str], frozenset[str]]:
+        """
+        Returns ewords which were added and removed after snapshot of current pattern.
+        """
+        if (self._changes is None) or (self._changes[0] != self._version):
+            current_ewords = self._forms.keys()
+            self._changes = (
+                self._version,
+                frozenset(current_ewords - self._pattern_ewords),
+                frozenset(self._pattern_ewords - current_ewords),
+            )
+        return self._changes[1], self._changes[2]
+
+
+    def contains_eword(self, text : str | None) -> bool:
+        if not text:
+            return False
+        text = normalize_text(text)
+        if self.is_compiled:
+            return (self._pattern is not None) and (self._pattern.search(text) is not None)
+
+        self._schedule_compilation()
+        if self.is_compiled:
+            # Pattern was compiled synchronously
+            return (self._pattern is not None) and (self._pattern.search(text) is not None)
+        added, removed = self._get_changes()
+        collapsed_text = " ".join(text.split())
+        if added and _contains_any(added, collapsed_text):
+            return True
+        if self._pattern is None:
+            return False
+        is_rejected = False
+        for match in self._pattern.finditer(text):
+            if " ".join(match.group().split()) not in removed:
+                return True
+            is_rejected = True
+        # Match of removed eword can hide shorter eword at the same position
+        return is_rejected and _contains_any(self._forms, collapsed_text)
+
+
+    def find_ewords(self, text : str | None) -> list[str]:
+        """
+        Returns all ewords found in text (in normalized form). It is not used in hot path: pattern is compiled synchronously.
+        """
+        if not text:
+            return []
+        if not self.is_compiled:
+            self.compile()
+        if self._pattern is None:
+            return []
+        return [" ".join(match.group().split()) for match in self._pattern.finditer(normalize_text(text))]
+
+
+def _trie_to_expression(node : dict) -> str:
+    """
+    Converts trie node into regular expression. Branches of node start with different characters,
+    so regex engine follows at most one branch at each step.
+    """
+    branches = []
+    for character, child in sorted(node.items()):
+        if character == _END:
+            continue
+        # Space in phrase matches any sequence of whitespace characters
+        branches.append((r"\s+" if character == " " else re.escape(character)) + _trie_to_expression(child))
+
+    if not branches:
+        return ""
+    expression = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{expression})?" if _END in node else expression
+
+
+class EwordsMatchersCache:
+    """
+    Matchers of companies. Matcher is built lazily on the first request and then is updated incrementally.
+    """
+
+    def __init__(self) -> None:
+        self._matchers : dict[int, EwordsMatcher] = {}
+
+
+    def get(self, company_id : int, load_ewords : Callable[[], list[str]]) -> EwordsMatcher:
+        matcher = self._matchers.get(company_id)
+        if matcher is None:
+            matcher = self._matchers[company_id] = EwordsMatcher(load_ewords())
+        return matcher
+
+
+    def add(self, company_id : int, ewords : Iterable[str]) -> None:
+        matcher = self._matchers.get(company_id)
+        if matcher is not None:
+            matcher.add(ewords)
+
+
+    def remove(self, company_id : int, ewords : Iterable[str]) -> None:
+        matcher = self._matchers.get(company_id)
+        if matcher is not None:
+            matcher.remove(ewords)
+
+
+    def invalidate(self, company_id : int | None = None) -> None:
+        if company_id is None:
+            self._matchers.clear()
+        else:
+            self._matchers.pop(company_id, None)
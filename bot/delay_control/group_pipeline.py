@@ -0,0 +1,264 @@
+"""
+This module provides GroupMessagePipeline - ingestion of messages of customer chats, which drives response deadlines.
+
+Each message passes stages:
+    1. chat lookup - static info of chat from cache of database client (SQLite is queried once per chat),
+    2. classification - sender is manager of chat's company or customer,
+    3. eword filtering - customer's message with eword of company does not start timer,
+    4. deadline arming (customer) or cancelling (manager),
+    5. persistence - changes of "chats_limits" are buffered and written by one transaction on flush.
+
+Pipeline does not await anything: message is processed completely in one step of event loop.
+All dependencies are passed to constructor, so pipeline can be run outside of bot (see benchmarks.group_pipeline_benchmark).
+"""
+
+from time import monotonic, time
+from typing import Callable, Protocol
+
+from aiogram import types
+
+from logger import regist_error
+
+from .business_calendar import CalendarsCache
+
+
+# Company info (response timeout, working time) is re-read from database after this count of seconds
+COMPANY_INFO_TTL = 60.0
+
+# Kinds of messages of customer chats (see GroupMessagePipeline.classify_message)
+MANAGER_MESSAGE = "manager"
+CUSTOMER_MESSAGE = "customer"
+EWORD_MESSAGE = "eword"
+
+
+class DeadlinesTracker(Protocol):
+    """
+    Keeper of armed deadlines (DelayTracker in bot, DeadlineScheduler in benchmarks).
+    """
+
+    def __contains__(self, chat_id : int) -> bool: ...
+
+    def arm(self, chat_id : int, deadline : float) -> None: ...
+
+    def cancel(self, chat_id : int) -> bool: ...
+
+
+class PipelineStats:
+    processed_count : int
+    skipped_count : int
+    ewords_count : int
+    armed_count : int
+    cancelled_count : int
+    flushes_count : int
+    flushed_chats_count : int
+
+    def __init__(self) -> None:
+        self.processed_count = 0
+        self.skipped_count = 0
+        self.ewords_count = 0
+        self.armed_count = 0
+        self.cancelled_count = 0
+        self.flushes_count = 0
+        self.flushed_chats_count = 0
+
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+
+class GroupMessagePipeline:
+    """
+    Parameters:
+    -----------
+    database_client : BotDBClient
+        source of chats, companies and ewords; receiver of batched "chats_limits" updates
+    tracker : DeadlinesTracker
+        keeper of armed deadlines
+    is_company_manager : Callable[[int, int], bool]
+        classifier of sender: (user_id, company_id) -> True, if user is manager of company
+    calendars : CalendarsCache | None
+        compiled working time of companies
+    on_manager_reply : Callable[[int], object] | None
+        called with chat ID on each manager's message (e.g. to mark reported overdue chat as answered)
+    """
+
+    def __init__(
+            self,
+            database_client,
+            tracker : DeadlinesTracker,
+            is_company_manager : Callable[[int, int], bool],
+            calendars : CalendarsCache | None = None,
+            on_manager_reply : Callable[[int], object] | None = None,
+        ) -> None:
+        self.database_client = database_client
+        self.tracker = tracker
+        self.is_company_manager = is_company_manager
+        self.calendars = calendars or CalendarsCache()
+        self.on_manager_reply = on_manager_reply
+        self.stats = PipelineStats()
+
+        # chat ID -> fields of "chats_limits" to write on flush (later values overwrite earlier ones)
+        self._pending_limits : dict[int, dict] = {}
+        self._companies_infos : dict[int, tuple[float, dict | None]] = {}
+
+
+    def process(self, message : types.Message) -> None:
+        """
+        Passes message of group chat through all stages.
+        """
+        self.stats.processed_count += 1
+        classified = self.classify_message(message)
+        if classified is None:
+            self.stats.skipped_count += 1
+            return
+
+        message_kind, company_id = classified
+        if message_kind == MANAGER_MESSAGE:
+            self.cancel_deadline(message.chat.id)
+            if self.on_manager_reply is not None:
+                self.on_manager_reply(message.chat.id)
+            return
+
+        self._set_limits(message.chat.id, last_message_id = message.message_id)
+        if message_kind == EWORD_MESSAGE:
+            self.stats.ewords_count += 1
+            return
+        self.arm_deadline(message, company_id)
+
+
+    def classify_message(self, message : types.Message) -> tuple[str, int] | None:
+        """
+        Returns (kind of message, company ID) for message of customer chat, kind is MANAGER_MESSAGE, EWORD_MESSAGE
+        (customer's message with eword) or CUSTOMER_MESSAGE. Returns None for messages of bots and of other chats.
+        """
+        user = message.from_user
+        if (user is None) or user.is_bot:
+            return None
+
+        chat_info = self.lookup_chat(message.chat.id)
+        if chat_info is None:
+            return None
+
+        company_id = chat_info["company_id"]
+        if self.is_company_manager(user.id, company_id):
+            return MANAGER_MESSAGE, company_id
+        if self.contains_eword(company_id, message.text or message.caption):
+            return EWORD_MESSAGE, company_id
+        return CUSTOMER_MESSAGE, company_id
+
+
+    def lookup_chat(self, chat_id : int) -> dict | None:
+        """
+        Returns static info of customer chat or None, if chat is not registered or is not customer chat.
+        """
+        chat_info = self.database_client.get_cached_chat_info(chat_id)
+        if (not chat_info) or (chat_info.get("chat_type") != "customer"):
+            return None
+        return chat_info
+
+
+    def contains_eword(self, company_id : int, text : str | None) -> bool:
+        return self.database_client.get_ewords_matcher(company_id).contains_eword(text)
+
+
+    def get_company_info(self, company_id : int) -> dict | None:
+        cached = self._companies_infos.get(company_id)
+        now = monotonic()
+        if cached is not None and now - cached[0] < COMPANY_INFO_TTL:
+            return cached[1]
+        company_info = self.database_client.get_company_info(company_id)
+        self._companies_infos[company_id] = (now, company_info)
+        return company_info
+
+
+    def arm_deadline(self, message : types.Message, company_id : int) -> bool:
+        """
+        Arms deadline of chat, if it is not armed yet. Returns True, if deadline was armed.
+        """
+        chat_id = message.chat.id
+        if chat_id in self.tracker:
+            # Deadline is counted from the first unanswered message
+            return False
+
+        company_info = self.get_company_info(company_id)
+        if not company_info or not company_info.get("message_response_timeout"):
+            return False
+
+        # Timeout is counted only in working time of company, from sending of message
+        # (it matters for messages which are received after downtime of bot)
+        now = min(time(), message.date.timestamp()) if message.date else time()
+        calendar = self.calendars.get(company_id, company_info)
+        deadline = calendar.add_business_seconds(now, company_info["message_response_timeout"])
+        if deadline is None:
+            return False
+
+        self.tracker.arm(chat_id, deadline)
+        self.stats.armed_count += 1
+        self._set_limits(
+            chat_id,
+            time_limit = int(deadline),
+            message_link = message.get_url(),
+            was_first_message = 1,
+            is_rest_message_registered = int(not calendar.is_working_time(now)),
+        )
+        return True
+
+
+    def cancel_deadline(self, chat_id : int) -> bool:
+        """
+        Cancels deadline of chat. Returns False, if chat had no deadline.
+        """
+        if not self.tracker.cancel(chat_id):
+            return False
+        self.stats.cancelled_count += 1
+        self._set_limits(chat_id, time_limit = None, was_first_message = 0)
+        return True
+
+
+    def _set_limits(self, chat_id : int, **limits) -> None:
+        pending = self._pending_limits.get(chat_id)
+        if pending is None:
+            self._pending_limits[chat_id] = limits
+        else:
+            pending.update(limits)
+
+
+    def flush(self) -> int:
+        """
+        Writes buffered changes of "chats_limits" by one transaction. Returns count of written chats.
+
+        If writing fails, changes are returned into buffer (newer changes of the same chats are kept).
+        """
+        if not self._pending_limits:
+            return 0
+        pending_limits = self._pending_limits
+        self._pending_limits = {}
+        if not self.database_client.update_chats_limits_batch(pending_limits):
+            for chat_id, limits in pending_limits.items():
+                newer_limits = self._pending_limits.get(chat_id)
+                if newer_limits:
+                    limits.update(newer_limits)
+                self._pending_limits[chat_id] = limits
+            regist_error(
+                error_description = f"Chats limits of {len(pending_limits)} chats were not flushed, they will be retried",
+                error_type = "group pipeline",
+                silent_mode = True,
+            )
+            return 0
+
+        self.stats.flushes_count += 1
+        self.stats.flushed_chats_count += len(pending_limits)
+        return len(pending_limits)
+
+
+    async def run_flush(self) -> None:
+        """
+        Periodic subtask wrapper of flush.
+        """
+        self.flush()
+
+
+    def get_stats(self) -> dict:
+        stats = self.stats.as_dict()
+        stats["pending_chats_count"] = len(self._pending_limits)
+        return stats
@@ -0,0 +1,364 @@
+"""
+This module provides NotificationAggregator - collector of delay notifications, which keeps count of API calls
+to redirect chats low when a lot of chats become overdue at once.
+
+Overdue chats of one redirect chat are collected into incident during `window` seconds, then incident is rendered
+into message, which lists overdue chats with links to their first unanswered messages and waiting time
+(list which exceeds limit of message length is continued in next messages of incident).
+Later changes of incident (new overdue chats, answers of managers) edit the same messages in place,
+not more often than once per `window` seconds. Incident is closed when all its chats are answered
+or when it is older than `incident_ttl` seconds (next overdue chat opens new message).
+
+New messages are sent through `send_message`, e.g. outbox of bot, which saves message before sending:
+message which was not delivered at once is delivered by outbox later and incident is closed (it can not be edited).
+Chats are passed to `on_reported`, when their message is sent or saved.
+"""
+
+import asyncio
+
+from time import time
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from logger import record_log, regist_error
+
+from outgoing import MAX_MESSAGE_LENGTH, SendPriority, get_utf16_length, send_priority
+
+
+LINES_SEPARATOR = "\n\n"
+
+
+class OverdueChat:
+    chat_id : int
+    chat_title : str
+    message_link : str | None
+    deadline : float
+    response_timeout : float
+    answered_at : float | None
+    is_reported : bool
+
+    def __init__(self, chat_id : int, chat_title : str, message_link : str | None, deadline : float, response_timeout : float) -> None:
+        self.chat_id = chat_id
+        self.chat_title = chat_title
+        self.message_link = message_link
+        self.deadline = deadline
+        self.response_timeout = response_timeout
+        self.answered_at = None
+        self.is_reported = False
+
+
+    def get_waiting_seconds(self, now : float) -> float:
+        """
+        Returns time from the first unanswered message until answer (or until now, if chat is not answered).
+        """
+        return (self.answered_at or now) - self.deadline + self.response_timeout
+
+
+class Incident:
+    redirect_chat_id : int | str
+    chats : dict[int, OverdueChat]
+    opened_at : float
+    due_at : float | None
+    rendered_at : float | None
+    messages_ids : list[int]
+    texts : list[str]
+
+    def __init__(self, redirect_chat_id : int | str, opened_at : float) -> None:
+        self.redirect_chat_id = redirect_chat_id
+        self.chats = {}
+        self.opened_at = opened_at
+        # Time of the next rendering (None, if incident is not changed since the last rendering)
+        self.due_at = None
+        self.rendered_at = None
+        # Messages of incident and their texts (in order of chats)
+        self.messages_ids = []
+        self.texts = []
+
+
+    @property
+    def is_answered(self) -> bool:
+        return all(overdue_chat.answered_at is not None for overdue_chat in self.chats.values())
+
+
+class NotificationAggregator:
+    """
+    Parameters:
+    -----------
+    bot : Bot
+        sender of notifications
+    render_line : Callable[[OverdueChat, float], str]
+        renders line of one chat: (overdue chat, current unix time) -> text
+    window : float
+        seconds of collecting before the first message and minimal interval between edits of message
+    incident_ttl : float
+        seconds after which incident is not edited anymore
+    max_length : int
+        maximal length of text of one message (UTF-16 code units), the rest of chats is listed in next messages
+    send_message : Callable[[int | str, str], Awaitable[Message | None]] | None
+        sender of new messages: (redirect chat ID, text) -> sent message or None, if message will be delivered later.
+        By default messages are sent by bot, failed sending is repeated by aggregator after `window` seconds
+    on_send_failure : Callable[[int | str, str], object] | None
+        receiver of notifications which were not sent before stop of bot: (redirect chat ID, text) -> None, e.g. outbox of bot
+    on_reported : Callable[[list[int]], object] | None
+        receiver of IDs of chats whose notifications are sent or saved (e.g. resetting of their deadlines in database)
+    """
+
+    def __init__(
+            self,
+            bot : Bot,
+            render_line : Callable[[OverdueChat, float], str],
+            window : float = 5.0,
+            incident_ttl : float = 3600.0,
+            max_length : int = MAX_MESSAGE_LENGTH,
+            send_message : Callable[[int | str, str], Awaitable[Message | None]] | None = None,
+            on_send_failure : Callable[[int | str, str], object] | None = None,
+            on_reported : Callable[[list[int]], object] | None = None,
+        ) -> None:
+        self.bot = bot
+        self.render_line = render_line
+        self.window = window
+        self.incident_ttl = incident_ttl
+        self.max_length = max_length
+        self.send_message = send_message or bot.send_message
+        self.on_send_failure = on_send_failure
+        self.on_reported = on_reported
+
+        self._incidents : dict[int | str, Incident] = {}
+        self._chats_incidents : dict[int, Incident] = {}
+        self._wakeup = asyncio.Event()
+
+        self.sent_count = 0
+        self.edited_count = 0
+        self.incidents_count = 0
+
+
+    def add_overdue(
+            self,
+            redirect_chat_id : int | str,
+            chat_id : int,
+            chat_title : str,
+            message_link : str | None,
+            deadline : float,
+            response_timeout : float,
+        ) -> None:
+        """
+        Registers overdue chat in incident of redirect chat (incident is opened, if there is no open one).
+        """
+        now = time()
+        incident = self._incidents.get(redirect_chat_id)
+        if incident is None or now - incident.opened_at > self.incident_ttl:
+            if incident is not None:
+                self._close(incident)
+            incident = self._incidents[redirect_chat_id] = Incident(redirect_chat_id, now)
+            self.incidents_count += 1
+
+        previous_incident = self._chats_incidents.get(chat_id)
+        if previous_incident is not None and previous_incident is not incident:
+            previous_incident.chats.pop(chat_id, None)
+            self._schedule(previous_incident, now)
+
+        incident.chats[chat_id] = OverdueChat(chat_id, chat_title, message_link, deadline, response_timeout)
+        self._chats_incidents[chat_id] = incident
+        self._schedule(incident, now)
+
+
+    def mark_answered(self, chat_id : int) -> bool:
+        """
+        Marks overdue chat as answered. Returns False, if chat is not in open incident.
+        """
+        incident = self._chats_incidents.pop(chat_id, None)
+        if incident is None:
+            return False
+        overdue_chat = incident.chats.get(chat_id)
+        if overdue_chat is None or overdue_chat.answered_at is not None:
+            return False
+        now = time()
+        overdue_chat.answered_at = now
+        self._schedule(incident, now)
+        return True
+
+
+    def _schedule(self, incident : Incident, now : float) -> None:
+        if incident.due_at is not None:
+            return
+        if incident.rendered_at is None:
+            incident.due_at = incident.opened_at + self.window
+        else:
+            incident.due_at = max(now, incident.rendered_at + self.window)
+        self._wakeup.set()
+
+
+    def _close(self, incident : Incident) -> None:
+        if self._incidents.get(incident.redirect_chat_id) is incident:
+            del self._incidents[incident.redirect_chat_id]
+        for chat_id in incident.chats:
+            if self._chats_incidents.get(chat_id) is incident:
+                del self._chats_incidents[chat_id]
+
+
+    def _render_texts(self, incident : Incident, now : float) -> list[str]:
+        """
+        Renders chats of incident into texts of messages. Line of chat is not split between messages.
+        """
+        texts = []
+        lines, length = [], 0
+        separator_length = get_utf16_length(LINES_SEPARATOR)
+        for overdue_chat in incident.chats.values():
+            line = self.render_line(overdue_chat, now)
+            if overdue_chat.answered_at is not None:
+                line = f"<s>{line}</s> ✅"
+            line_length = get_utf16_length(line)
+            if lines and length + separator_length + line_length > self.max_length:
+                texts.append(LINES_SEPARATOR.join(lines))
+                lines, length = [], 0
+            length += line_length + (separator_length if lines else 0)
+            lines.append(line)
+        if lines:
+            texts.append(LINES_SEPARATOR.join(lines))
+        return texts
+
+
+    async def _render(self, incident : Incident, now : float) -> None:
+        incident.due_at = None
+        if not incident.messages_ids:
+            # Chats which were answered during collecting are not reported
+            for chat_id in [chat_id for chat_id, overdue_chat in incident.chats.items() if overdue_chat.answered_at is not None]:
+                del incident.chats[chat_id]
+            if not incident.chats:
+                self._close(incident)
+                return
+
+        texts = self._render_texts(incident, now)
+        is_editable = True
+        if texts != incident.texts:
+            with send_priority(SendPriority.ALERT):
+                for text_number, text in enumerate(texts):
+                    if text_number < len(incident.messages_ids):
+                        if text != incident.texts[text_number]:
+                            is_editable = await self._edit(incident, text_number, text) and is_editable
+                        continue
+                    message = await self.send_message(incident.redirect_chat_id, text)
+                    self.sent_count += 1
+                    if (message is None) or not is_editable:
+                        is_editable = False
+                        continue
+                    incident.messages_ids.append(message.message_id)
+                    incident.texts.append(text)
+                # Chat was moved to newer incident: messages which became empty are deleted
+                while is_editable and len(incident.messages_ids) > len(texts):
+                    await self._delete_last(incident)
+        incident.rendered_at = now
+        self._report(incident)
+
+        if not is_editable:
+            record_log(f"Notification to {incident.redirect_chat_id} is left to delayed delivery, incident is closed", "delay notifications")
+        if incident.is_answered or not is_editable:
+            self._close(incident)
+
+
+    def _report(self, incident : Incident) -> None:
+        reported_ids = [chat_id for chat_id, overdue_chat in incident.chats.items() if not overdue_chat.is_reported]
+        for chat_id in reported_ids:
+            incident.chats[chat_id].is_reported = True
+        if reported_ids and self.on_reported is not None:
+            self.on_reported(reported_ids)
+
+
+    async def _edit(self, incident : Incident, text_number : int, text : str) -> bool:
+        """
+        Edits message of incident. Returns False, if message was sent again and it will be delivered later.
+        """
+        try:
+            await self.bot.edit_message_text(text = text, chat_id = incident.redirect_chat_id, message_id = incident.messages_ids[text_number])
+            self.edited_count += 1
+        except TelegramBadRequest as error:
+            if "message is not modified" not in str(error):
+                # Message was deleted or became not editable: its part of incident is sent again
+                message = await self.send_message(incident.redirect_chat_id, text)
+                self.sent_count += 1
+                if message is None:
+                    return False
+                incident.messages_ids[text_number] = message.message_id
+        incident.texts[text_number] = text
+        return True
+
+
+    async def _delete_last(self, incident : Incident) -> None:
+        message_id = incident.messages_ids.pop()
+        incident.texts.pop()
+        try:
+            await self.bot.delete_message(incident.redirect_chat_id, message_id)
+        except TelegramBadRequest:
+            pass
+
+
+    async def flush(self, now : float | None = None) -> None:
+        """
+        Renders all incidents which are due.
+        """
+        now = time() if now is None else now
+        for incident in list(self._incidents.values()):
+            if incident.due_at is None or incident.due_at > now:
+                continue
+            try:
+                await self._render(incident, now)
+            except Exception as error:
+                incident.due_at = now + self.window
+                regist_error(
+                    error_description = f"Delay notification error for redirect chat {incident.redirect_chat_id}: {error}",
+                    error_type = type(error),
+                )
+
+
+    def spill_unsent(self) -> int:
+        """
+        Passes incidents which were not sent yet to failure receiver (used on bot stopping). Returns count of passed incidents.
+        New chats of sent incidents are not reported, their deadlines stay in database until restart.
+        """
+        if self.on_send_failure is None:
+            return 0
+        now = time()
+        spilled_count = 0
+        for incident in list(self._incidents.values()):
+            if not incident.messages_ids and not incident.is_answered:
+                for chat_id in [chat_id for chat_id, overdue_chat in incident.chats.items() if overdue_chat.answered_at is not None]:
+                    del incident.chats[chat_id]
+                for text in self._render_texts(incident, now):
+                    self.on_send_failure(incident.redirect_chat_id, text)
+                self._report(incident)
+                spilled_count += 1
+            self._close(incident)
+        return spilled_count
+
+
+    def next_due_time(self) -> float | None:
+        due_times = [incident.due_at for incident in self._incidents.values() if incident.due_at is not None]
+        return min(due_times) if due_times else None
+
+
+    async def run(self) -> None:
+        """
+        Long-running subtask: renders incidents when they are due.
+        """
+        record_log("Delay notifications aggregator is started", "delay notifications")
+        while True:
+            await self.flush()
+            next_due_time = self.next_due_time()
+            self._wakeup.clear()
+            timeout = None if next_due_time is None else max(0.0, next_due_time - time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "open_incidents_count" : len(self._incidents),
+            "incidents_count" : self.incidents_count,
+            "sent_count" : self.sent_count,
+            "edited_count" : self.edited_count,
+        }
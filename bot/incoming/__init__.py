@@ -0,0 +1,6 @@
+from .priorities import UpdatePriority, PrioritySemaphore, PriorityTicket, update_priority
+from .loop_lag import LoopLagMonitor
+from .loop_watchdog import LoopWatchdog
+from .intake_guard import UpdateClassifier, IntakeGuard, GuardedDispatcher, draining_backlog
+from .backlog_drain import DrainStats, collapse_backlog, drain_backlog
+from .update_capture import IdAnonymizer, UpdateCaptureWriter, UpdateCaptureMiddleware, anonymize_update, read_capture
@@ -0,0 +1,181 @@
+"""
+This module provides draining of updates backlog, which is accumulated by Telegram while bot is stopped.
+
+Before polling is started, pending updates are fetched in bulk and messages of customer chats are collapsed per chat
+to the state which matters for response deadlines:
+    - the last reply of manager (it cancels deadline, earlier messages of chat are answered by it),
+    - the first customer's message after that reply, which starts timer (deadline is counted from its sending),
+    - the last message after that reply (it is the last message of chat).
+Other updates are kept as is. Kept updates are processed concurrently in order of receiving (events isolation keeps order
+inside chat) by batches of `batch_size` updates: batch is smaller than limit of IntakeGuard, so updates of backlog
+are not shed for count of updates in processing (limits of live overload are not applied to them, see `draining_backlog`). Changes of "chats_limits" are written by one flush,
+then bot switches to normal polling.
+"""
+
+import asyncio
+
+from time import monotonic
+from typing import Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from delay_control import CUSTOMER_MESSAGE, MANAGER_MESSAGE
+
+from logger import record_log
+
+from .intake_guard import draining_backlog
+
+
+# Maximal count of updates returned by getUpdates
+GET_UPDATES_LIMIT = 100
+
+# Count of updates processed at once (IntakeGuard sheds LOW updates after 1000 updates in processing by default)
+DRAIN_BATCH_SIZE = 500
+
+
+class DrainStats:
+    fetched_count : int
+    collapsed_count : int
+    processed_count : int
+    unhandled_count : int
+    failed_count : int
+    duration : float
+
+    def __init__(self) -> None:
+        self.fetched_count = 0
+        self.collapsed_count = 0
+        # Updates which were handled, were not handled (no handler or shed by IntakeGuard), failed with exception
+        self.processed_count = 0
+        self.unhandled_count = 0
+        self.failed_count = 0
+        self.duration = 0.0
+
+
+def collapse_backlog(updates : list[Update], classify_message : Callable) -> list[Update]:
+    """
+    Returns updates which are kept after collapsing of customer chats, in order of receiving.
+
+    Parameters:
+    -----------
+    updates : list[Update]
+        updates in order of receiving
+    classify_message : Callable[[Message], tuple[str, int] | None]
+        classifier of messages of customer chats (GroupMessagePipeline.classify_message)
+    """
+    kept_updates : list[Update] = []
+    chats_messages : dict[int, list[tuple[Update, str]]] = {}
+    for update in updates:
+        message = update.message
+        classified = classify_message(message) if (message is not None) and (message.chat.type != "private") else None
+        if classified is None:
+            kept_updates.append(update)
+        else:
+            chats_messages.setdefault(message.chat.id, []).append((update, classified[0]))
+
+    for chat_messages in chats_messages.values():
+        last_reply_index = -1
+        for message_index, (_, message_kind) in enumerate(chat_messages):
+            if message_kind == MANAGER_MESSAGE:
+                last_reply_index = message_index
+
+        if last_reply_index >= 0:
+            kept_updates.append(chat_messages[last_reply_index][0])
+        unanswered = chat_messages[last_reply_index + 1:]
+        if not unanswered:
+            continue
+        first_customer_update = next((update for update, message_kind in unanswered if message_kind == CUSTOMER_MESSAGE), None)
+        if first_customer_update is not None:
+            kept_updates.append(first_customer_update)
+        if unanswered[-1][0] is not first_customer_update:
+            kept_updates.append(unanswered[-1][0])
+
+    kept_updates.sort(key = lambda update: update.update_id)
+    return kept_updates
+
+
+async def fetch_backlog(bot : Bot, allowed_updates : list[str] | None = None, max_updates : int = 100_000) -> tuple[list[Update], int | None]:
+    """
+    Fetches pending updates without long polling. Returns updates and offset for confirmation of the last fetched update.
+
+    Each next request confirms previous batch, so updates are fetched only once.
+    """
+    updates : list[Update] = []
+    offset = None
+    while len(updates) < max_updates:
+        batch = await bot.get_updates(offset = offset, limit = GET_UPDATES_LIMIT, timeout = 0, allowed_updates = allowed_updates)
+        if not batch:
+            break
+        updates.extend(batch)
+        offset = batch[-1].update_id + 1
+        if len(batch) < GET_UPDATES_LIMIT:
+            break
+    return updates, offset
+
+
+async def drain_backlog(
+        dispatcher : Dispatcher,
+        bot : Bot,
+        classify_message : Callable,
+        flush : Callable[[], object] | None = None,
+        max_updates : int = 100_000,
+        batch_size : int = DRAIN_BATCH_SIZE,
+    ) -> DrainStats:
+    """
+    Fetches backlog, collapses it, processes kept updates through dispatcher and confirms them.
+
+    Parameters:
+    -----------
+    dispatcher : Dispatcher
+        dispatcher which processes kept updates
+    bot : Bot
+        bot which fetches updates
+    classify_message : Callable[[Message], tuple[str, int] | None]
+        classifier of messages of customer chats (GroupMessagePipeline.classify_message)
+    flush : Callable[[], object] | None
+        writer of buffered changes, called once after processing (GroupMessagePipeline.flush)
+    max_updates : int
+        maximal count of fetched updates, the rest is processed by polling
+    batch_size : int
+        count of updates processed at once, the next batch is started after the previous one
+    """
+    stats = DrainStats()
+    started_at = monotonic()
+    updates, offset = await fetch_backlog(bot, dispatcher.resolve_used_update_types(), max_updates)
+    stats.fetched_count = len(updates)
+    if not updates:
+        return stats
+
+    kept_updates = collapse_backlog(updates, classify_message)
+    stats.collapsed_count = len(updates) - len(kept_updates)
+
+    token = draining_backlog.set(True)
+    try:
+        for batch_start in range(0, len(kept_updates), batch_size):
+            results = await asyncio.gather(
+                *(dispatcher.feed_update(bot, update) for update in kept_updates[batch_start:batch_start + batch_size]),
+                return_exceptions = True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    stats.failed_count += 1
+                elif result is UNHANDLED:
+                    stats.unhandled_count += 1
+                else:
+                    stats.processed_count += 1
+    finally:
+        draining_backlog.reset(token)
+    if flush is not None:
+        flush()
+    # The last batch is confirmed, so polling does not receive drained updates again
+    await bot.get_updates(offset = offset, limit = 1, timeout = 0)
+
+    stats.duration = monotonic() - started_at
+    record_log(
+        f"Backlog is drained: {stats.fetched_count} updates fetched, {stats.collapsed_count} collapsed, "
+        f"{stats.processed_count} of {len(kept_updates)} processed ({stats.unhandled_count} unhandled, {stats.failed_count} failed) "
+        f"in {stats.duration:.2f} s",
+        "backlog drain"
+    )
+    return stats
@@ -0,0 +1,243 @@
+"""
+This module provides overload protection of updates handling:
+    - UpdateClassifier - priority of update by its type, chat and sender,
+    - IntakeGuard - admission of updates: counts updates in processing and sheds low-priority updates on overload,
+    - GuardedDispatcher - Dispatcher which passes each update through IntakeGuard and sets its priority.
+
+Priorities:
+    HIGH - messages and callbacks of bot-admins, replies of managers in customer chats,
+    NORMAL - messages of customers, callbacks and messages of other users in private chat, changes of chat members,
+    LOW - reactions, edited messages, menu requests, messages of unknown chats and other updates.
+
+LOW updates are shed when event loop lag exceeds `lag_threshold`, when `max_pending` updates are in processing,
+when outgoing messages wait for Telegram limits longer than `max_outgoing_delay` (handlers mostly wait for sending,
+so overload is seen in outgoing queue earlier than in event loop lag) or when `max_low_pending` LOW updates are in processing
+(handlers of LOW updates waiting for sending do not take all workers of events isolation).
+Updates of backlog (see drain_backlog) are processed before polling and do not compete with new updates,
+so while `draining_backlog` is set, LOW updates are shed only for `max_pending` updates in processing.
+NORMAL updates are shed only when `hard_max_pending` updates are in processing (memory protection), HIGH updates are never shed.
+Admitted updates wait for workers of events isolation in order of priority, replies to LOW updates are sent with
+BROADCAST priority, so they do not delay replies to HIGH and NORMAL updates.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from logger import record_log
+from outgoing import SendPriority, send_priority
+
+from .loop_lag import LoopLagMonitor
+from .loop_watchdog import LoopWatchdog
+from .priorities import UpdatePriority, update_priority
+
+
+# Texts of private messages which only request menu
+MENU_REQUESTS : frozenset[str] = frozenset(("меню", "/start"))
+
+draining_backlog : ContextVar[bool] = ContextVar("draining_backlog", default = False)
+
+# Priorities of messages sent while update is handled (handler can set other priority explicitly)
+SEND_PRIORITIES : dict[UpdatePriority, SendPriority] = {
+    UpdatePriority.HIGH : SendPriority.MENU,
+    UpdatePriority.NORMAL : SendPriority.MENU,
+    UpdatePriority.LOW : SendPriority.BROADCAST,
+}
+
+# Shed updates are recorded into log not more often than once per this count of shed updates
+SHEDDING_LOG_INTERVAL = 100
+
+
+class UpdateClassifier:
+    """
+    Parameters:
+    -----------
+    database_client : BotDBClient
+        owner of roles index and cache of chats
+    """
+
+    def __init__(self, database_client) -> None:
+        self.database_client = database_client
+
+
+    def classify(self, update : Update) -> UpdatePriority:
+        if update.message is not None:
+            return self._classify_message(update.message)
+        if update.callback_query is not None:
+            user_id = update.callback_query.from_user.id
+            return UpdatePriority.HIGH if self.database_client.roles_index.is_bot_admin(user_id) else UpdatePriority.NORMAL
+        if (update.my_chat_member is not None) or (update.chat_member is not None):
+            return UpdatePriority.NORMAL
+        return UpdatePriority.LOW
+
+
+    def _classify_message(self, message) -> UpdatePriority:
+        user = message.from_user
+        if (user is None) or user.is_bot:
+            return UpdatePriority.LOW
+        roles_index = self.database_client.roles_index
+
+        if message.chat.type == "private":
+            if roles_index.is_bot_admin(user.id):
+                return UpdatePriority.HIGH
+            if (message.text or "").strip().lower() in MENU_REQUESTS:
+                return UpdatePriority.LOW
+            return UpdatePriority.NORMAL
+
+        chat_info = self.database_client.get_cached_chat_info(message.chat.id)
+        if (not chat_info) or (chat_info.get("chat_type") != "customer"):
+            return UpdatePriority.LOW
+        if roles_index.is_company_manager(user.id, chat_info["company_id"]):
+            return UpdatePriority.HIGH
+        return UpdatePriority.NORMAL
+
+
+class IntakeGuard:
+    """
+    Parameters:
+    -----------
+    classify : Callable[[Update], UpdatePriority]
+        classifier of updates
+    lag_monitor : LoopLagMonitor
+        source of event loop lag
+    max_pending : int
+        count of updates in processing, after which LOW updates are shed
+    hard_max_pending : int
+        count of updates in processing, after which NORMAL updates are shed too
+    lag_threshold : float
+        event loop lag (in seconds), after which LOW updates are shed
+    get_outgoing_delay : Callable[[], float] | None
+        source of delay of outgoing messages in seconds (e.g. OutgoingScheduler.get_queue_delay)
+    max_outgoing_delay : float
+        delay of outgoing messages (in seconds), after which LOW updates are shed
+    max_low_pending : int
+        count of LOW updates in processing, after which LOW updates are shed (e.g. half of workers of events isolation)
+    """
+
+    def __init__(
+            self,
+            classify,
+            lag_monitor : LoopLagMonitor,
+            max_pending : int = 1_000,
+            hard_max_pending : int = 20_000,
+            lag_threshold : float = 0.5,
+            get_outgoing_delay : Callable[[], float] | None = None,
+            max_outgoing_delay : float = 2.0,
+            max_low_pending : int = 8,
+        ) -> None:
+        if not (0 < max_pending <= hard_max_pending):
+            raise ValueError(f"Invalid intake limits: {max_pending=}, {hard_max_pending=}")
+        self.classify = classify
+        self.lag_monitor = lag_monitor
+        self.max_pending = max_pending
+        self.hard_max_pending = hard_max_pending
+        self.lag_threshold = lag_threshold
+        self.get_outgoing_delay = get_outgoing_delay
+        self.max_outgoing_delay = max_outgoing_delay
+        self.max_low_pending = max_low_pending
+
+        self.pending_count = 0
+        self.pending_counts = {priority : 0 for priority in UpdatePriority}
+        self.admitted_counts = {priority : 0 for priority in UpdatePriority}
+        self.shed_counts = {priority : 0 for priority in UpdatePriority}
+
+
+    def _get_current_outgoing_delay(self) -> float:
+        return self.get_outgoing_delay() if self.get_outgoing_delay else 0.0
+
+
+    def is_overloaded(self) -> bool:
+        return (
+            (self.pending_count >= self.max_pending)
+            or (self.lag_monitor.get_current_lag() >= self.lag_threshold)
+            or (self._get_current_outgoing_delay() >= self.max_outgoing_delay)
+        )
+
+
+    def admit(self, update : Update) -> UpdatePriority | None:
+        """
+        Returns priority of admitted update or None, if update is shed. Admitted update must be released.
+        """
+        priority = self.classify(update)
+        if priority == UpdatePriority.LOW:
+            if draining_backlog.get():
+                is_shed = self.pending_count >= self.max_pending
+            else:
+                is_shed = self.is_overloaded() or (self.pending_counts[priority] >= self.max_low_pending)
+        else:
+            is_shed = (priority == UpdatePriority.NORMAL) and (self.pending_count >= self.hard_max_pending)
+
+        if is_shed:
+            self.shed_counts[priority] += 1
+            shed_count = sum(self.shed_counts.values())
+            if shed_count % SHEDDING_LOG_INTERVAL == 1:
+                record_log(
+                    f"Updates are shed: {shed_count} in total, pending {self.pending_count}, "
+                    f"loop lag {self.lag_monitor.get_current_lag():.3f} s, "
+                    f"outgoing delay {self._get_current_outgoing_delay():.3f} s",
+                    "intake guard"
+                )
+            return None
+
+        self.pending_count += 1
+        self.pending_counts[priority] += 1
+        self.admitted_counts[priority] += 1
+        return priority
+
+
+    def release(self, priority : UpdatePriority) -> None:
+        self.pending_count -= 1
+        self.pending_counts[priority] -= 1
+
+
+    def get_stats(self) -> dict:
+        return {
+            "pending_count" : self.pending_count,
+            "admitted" : {priority.name : count for priority, count in self.admitted_counts.items()},
+            "shed" : {priority.name : count for priority, count in self.shed_counts.items()},
+            "outgoing_delay" : round(self._get_current_outgoing_delay(), 3),
+            **self.lag_monitor.get_stats(),
+        }
+
+
+class GuardedDispatcher(Dispatcher):
+    """
+    Dispatcher with IntakeGuard: shed updates are not handled (feed_update returns UNHANDLED),
+    admitted updates are handled with their priority in context variable `update_priority`
+    and with priority of outgoing messages from SEND_PRIORITIES.
+    If LoopWatchdog is passed, handled update is linked with its task, so blockings of loop are logged with update.
+    """
+
+    def __init__(self, *args, intake_guard : IntakeGuard | None = None, loop_watchdog : LoopWatchdog | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.intake_guard = intake_guard
+        self.loop_watchdog = loop_watchdog
+
+
+    async def feed_update(self, bot : Bot, update : Update, **kwargs : Any) -> Any:
+        if self.loop_watchdog is None:
+            return await self._feed_guarded_update(bot, update, **kwargs)
+        self.loop_watchdog.track_update(update)
+        try:
+            return await self._feed_guarded_update(bot, update, **kwargs)
+        finally:
+            self.loop_watchdog.untrack_update()
+
+
+    async def _feed_guarded_update(self, bot : Bot, update : Update, **kwargs : Any) -> Any:
+        if self.intake_guard is None:
+            return await super().feed_update(bot, update, **kwargs)
+
+        priority = self.intake_guard.admit(update)
+        if priority is None:
+            return UNHANDLED
+        token = update_priority.set(priority)
+        try:
+            with send_priority(SEND_PRIORITIES[priority]):
+                return await super().feed_update(bot, update, **kwargs)
+        finally:
+            update_priority.reset(token)
+            self.intake_guard.release(priority)
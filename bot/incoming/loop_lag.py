@@ -0,0 +1,60 @@
+"""
+This module provides LoopLagMonitor - meter of event loop lag: delay between planned and real wake up of sleeping coroutine.
+
+Lag grows when handlers block loop or when loop has too many ready tasks, so it is used as signal of overload.
+"""
+
+import asyncio
+
+from collections import deque
+from time import monotonic
+
+
+class LoopLagMonitor:
+    """
+    Parameters:
+    -----------
+    interval : float
+        seconds between measurements
+    window : int
+        count of the last measurements used for maximal lag
+    """
+
+    def __init__(self, interval : float = 0.25, window : int = 20) -> None:
+        self.interval = interval
+        self.lag = 0.0
+        self._lags : deque[float] = deque(maxlen = window)
+        self._wake_up_at : float | None = None
+        self.measurements_count = 0
+
+
+    def get_current_lag(self) -> float:
+        """
+        Returns the last measured lag or, if monitor is already late to wake up, current delay of its wake up.
+        """
+        if self._wake_up_at is None:
+            return self.lag
+        return max(self.lag, monotonic() - self._wake_up_at)
+
+
+    def get_max_lag(self) -> float:
+        """
+        Returns maximal lag of the last `window` measurements.
+        """
+        return max(self._lags, default = 0.0)
+
+
+    async def run(self) -> None:
+        """
+        Long-running subtask: measures lag each `interval` seconds.
+        """
+        while True:
+            self._wake_up_at = monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, monotonic() - self._wake_up_at)
+            self._lags.append(self.lag)
+            self.measurements_count += 1
+
+
+    def get_stats(self) -> dict[str, float]:
+        return {"lag" : round(self.get_current_lag(), 4), "max_lag" : round(self.get_max_lag(), 4)}
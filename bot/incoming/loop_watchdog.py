@@ -0,0 +1,243 @@
+"""
+This module provides LoopWatchdog - detector of event loop blocking by synchronous code (SQLite queries, HTTP requests
+by requests, heavy computations) in async handlers.
+
+Watchdog thread schedules ping callback into event loop each `interval` seconds. If ping is not executed during
+`threshold` seconds, loop is blocked (or overloaded): stack of loop's thread is captured by sys._current_frames,
+and when loop is unblocked, blocking is logged with stack and update of the running task and is aggregated by blocking site
+(the innermost frame of bot's code). While loop is not blocked, watchdog costs one callback per interval.
+
+Watchdog is switched at runtime by start / stop (see /watchdog command).
+"""
+
+import asyncio
+import sys
+import threading
+import traceback
+
+from pathlib import Path
+from time import monotonic
+from typing import Any
+
+from aiogram.types import Update
+
+from logger import record_log
+
+
+BOT_DIR = Path(__file__).parent.parent
+
+# Count of captured frames of blocked stack
+STACK_LIMIT = 40
+# Full stack of site is logged at most once per this count of seconds, other blockings of site are logged briefly
+SITE_STACK_LOG_INTERVAL = 60.0
+
+
+class BlockingSite:
+    count : int
+    total_time : float
+    max_time : float
+    last_update : str
+    stack : list[str]
+    stack_logged_at : float | None
+
+    def __init__(self, stack : list[str]) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_update = ""
+        self.stack = stack
+        self.stack_logged_at = None
+
+
+class LoopWatchdog:
+    """
+    Parameters:
+    -----------
+    threshold : float
+        seconds of blocking, after which stack is captured
+    interval : float
+        seconds between pings of loop
+    max_sites : int
+        count of aggregated blocking sites, sites with the least total time are dropped
+    """
+
+    def __init__(self, threshold : float = 0.1, interval : float = 0.05, max_sites : int = 200) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.max_sites = max_sites
+        self.sites : dict[str, BlockingSite] = {}
+        self.blockings_count = 0
+        self.lag = 0.0
+        # task -> update handled by task, see track_update
+        self._tasks_updates : dict[asyncio.Task, Update] = {}
+        self._loop : asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id : int | None = None
+        self._thread : threading.Thread | None = None
+        self._stop_event = threading.Event()
+        # Sites are changed by watchdog thread and are read by reports in loop's thread
+        self._sites_lock = threading.Lock()
+
+
+    @property
+    def is_running(self) -> bool:
+        return (self._thread is not None) and self._thread.is_alive()
+
+
+    def start(self) -> None:
+        """
+        Starts watchdog thread for running loop (must be called from loop's thread).
+        """
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target = self._watch, name = "loop watchdog", daemon = True)
+        self._thread.start()
+        record_log(f"Loop watchdog is started, threshold {self.threshold} s", "loop watchdog")
+
+
+    def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout = 1.0)
+        self._thread = None
+        record_log("Loop watchdog is stopped", "loop watchdog")
+
+
+    def track_update(self, update : Update) -> None:
+        """
+        Links update with current task, blocking of loop by this task is logged with update.
+        """
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks_updates[task] = update
+
+
+    def untrack_update(self) -> None:
+        self._tasks_updates.pop(asyncio.current_task(), None)
+
+
+    def _watch(self) -> None:
+        while not self._stop_event.is_set():
+            ping = threading.Event()
+            sent_at = monotonic()
+            try:
+                self._loop.call_soon_threadsafe(ping.set)
+            except RuntimeError:
+                # Loop is closed
+                break
+            if not ping.wait(self.threshold):
+                stack, update = self._capture()
+                while not ping.wait(self.interval):
+                    if self._stop_event.is_set() or self._loop.is_closed():
+                        return
+                self._register_blocking(stack, update, monotonic() - sent_at)
+            self.lag = monotonic() - sent_at
+            self._stop_event.wait(self.interval)
+
+
+    def _capture(self) -> tuple[traceback.StackSummary | None, Update | None]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None, None
+        stack = traceback.StackSummary.extract(traceback.walk_stack(frame), limit = STACK_LIMIT, lookup_lines = False)
+        stack.reverse()
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        return stack, self._tasks_updates.get(task) if task is not None else None
+
+
+    def _register_blocking(self, stack : traceback.StackSummary | None, update : Update | None, duration : float) -> None:
+        site_name = _get_site_name(stack)
+        with self._sites_lock:
+            self.blockings_count += 1
+            site = self.sites.get(site_name)
+            if site is None:
+                if len(self.sites) >= self.max_sites:
+                    del self.sites[min(self.sites, key = lambda name: self.sites[name].total_time)]
+                site = self.sites[site_name] = BlockingSite(stack.format() if stack else [])
+            site.count += 1
+            site.total_time += duration
+            site.max_time = max(site.max_time, duration)
+            site.last_update = _describe_update(update)
+
+        now = monotonic()
+        if (site.stack_logged_at is None) or (now - site.stack_logged_at >= SITE_STACK_LOG_INTERVAL):
+            site.stack_logged_at = now
+            record_log(
+                f"Loop was blocked for {duration:.3f} s at {site_name}, {site.last_update}\n{''.join(site.stack)}",
+                "loop watchdog",
+            )
+        else:
+            record_log(f"Loop was blocked for {duration:.3f} s at {site_name} ({site.count} times), {site.last_update}", "loop watchdog")
+
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "is_running" : self.is_running,
+            "lag" : round(self.lag, 4),
+            "blockings_count" : self.blockings_count,
+            "sites_count" : len(self.sites),
+        }
+
+
+    def get_top_sites(self, count : int = 10) -> list[tuple[str, BlockingSite]]:
+        with self._sites_lock:
+            return sorted(self.sites.items(), key = lambda item: item[1].total_time, reverse = True)[:count]
+
+
+    def get_report(self, count : int = 10) -> str:
+        """
+        Returns text report: state of watchdog and blocking sites with the largest total time.
+        """
+        report_lines = [
+            f"Watchdog: {'on' if self.is_running else 'off'}, threshold {self.threshold} s, lag {self.lag:.3f} s",
+            f"Blockings: {self.blockings_count}",
+        ]
+        for site_name, site in self.get_top_sites(count):
+            report_lines.append(
+                f"{site_name}\n    {site.count} times, total {site.total_time:.2f} s, max {site.max_time:.2f} s, last: {site.last_update}"
+            )
+        return "\n".join(report_lines)
+
+
+def _get_site_name(stack : traceback.StackSummary | None) -> str:
+    """
+    Returns site of blocking: the innermost frame of bot's code and the innermost frame, if it is out of bot's code.
+    """
+    if not stack:
+        return "unknown site"
+    bot_frame = next((frame for frame in reversed(stack) if _is_bot_file(frame.filename)), None)
+    innermost_frame = stack[-1]
+    if bot_frame is None:
+        return _format_frame(innermost_frame)
+    if bot_frame is innermost_frame:
+        return _format_frame(bot_frame)
+    return f"{_format_frame(bot_frame)} -> {_format_frame(innermost_frame)}"
+
+
+def _is_bot_file(filename : str) -> bool:
+    return filename.startswith(str(BOT_DIR))
+
+
+def _format_frame(frame : traceback.FrameSummary) -> str:
+    path = Path(frame.filename)
+    if _is_bot_file(frame.filename):
+        path = path.relative_to(BOT_DIR)
+    return f"{path}:{frame.lineno} {frame.name}()"
+
+
+def _describe_update(update : Update | None) -> str:
+    if update is None:
+        return "no update"
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    user = getattr(event, "from_user", None)
+    return (
+        f"update {update.update_id} ({update.event_type}), chat {chat.id if chat else None}, "
+        f"user {user.id if user else None}"
+    )
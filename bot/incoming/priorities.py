@@ -0,0 +1,125 @@
+"""
+This module provides priorities of incoming updates and PrioritySemaphore - pool of workers which serves waiters by priority.
+Priority of waiter can be raised while it waits (see PriorityTicket), e.g. when update with higher priority waits behind it.
+
+Priority of update is set by IntakeGuard into context variable `update_priority` before update is passed to Dispatcher,
+so all code which processes update (e.g. events isolation) can read it.
+"""
+
+import asyncio
+import heapq
+
+from contextvars import ContextVar
+from enum import IntEnum
+from itertools import count
+
+
+class UpdatePriority(IntEnum):
+    """
+    Lower value is served first.
+    """
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+update_priority : ContextVar[UpdatePriority] = ContextVar("update_priority", default = UpdatePriority.NORMAL)
+
+
+class PriorityTicket:
+    """
+    Request of slot of PrioritySemaphore, whose priority can be raised while it waits:
+
+        async with semaphore.ticket(priority) as ticket:
+            ...
+
+    (ticket.raise_priority can be called by other task before slot is given).
+    """
+
+    def __init__(self, semaphore : "PrioritySemaphore", priority : int) -> None:
+        self.semaphore = semaphore
+        self.priority = priority
+        self.waiter : asyncio.Future | None = None
+
+
+    def raise_priority(self, priority : int) -> None:
+        if priority >= self.priority:
+            return
+        self.priority = priority
+        if (self.waiter is not None) and not self.waiter.done():
+            # Previous entry of waiter stays in heap and is skipped, when waiter is done
+            self.semaphore._push_waiter(priority, self.waiter)
+
+
+    async def __aenter__(self) -> "PriorityTicket":
+        await self.semaphore._acquire(self)
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.semaphore.release()
+
+
+class PrioritySemaphore:
+    """
+    Semaphore which wakes up waiters with higher priority first (FIFO among waiters with equal priority).
+    """
+
+    def __init__(self, value : int) -> None:
+        if value < 1:
+            raise ValueError(f"Semaphore value must be positive, passed: {value}")
+        self._value = value
+        self._waiters : list[tuple[int, int, asyncio.Future]] = []
+        self._counter = count()
+
+
+    def get_waiters_count(self) -> int:
+        return len({id(waiter) for _, _, waiter in self._waiters if not waiter.done()})
+
+
+    def ticket(self, priority : int = UpdatePriority.NORMAL) -> PriorityTicket:
+        return PriorityTicket(self, priority)
+
+
+    def _push_waiter(self, priority : int, waiter : asyncio.Future) -> None:
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+
+
+    async def acquire(self, priority : int = UpdatePriority.NORMAL) -> None:
+        await self._acquire(PriorityTicket(self, priority))
+
+
+    async def _acquire(self, ticket : PriorityTicket) -> None:
+        # Free slots exist only when there are no waiters (release passes slot to waiter first)
+        if self._value > 0:
+            self._value -= 1
+            return
+
+        waiter = ticket.waiter = asyncio.get_running_loop().create_future()
+        self._push_waiter(ticket.priority, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was passed to cancelled waiter: it is passed further
+                self.release()
+            raise
+        finally:
+            ticket.waiter = None
+
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._value += 1
+
+
+    async def __aenter__(self) -> None:
+        await self.acquire(update_priority.get())
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
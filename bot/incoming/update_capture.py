@@ -0,0 +1,239 @@
+"""
+This module provides capture of incoming updates for replays (see benchmarks.replay).
+
+Raw updates are appended to gzip-compressed JSON-lines files, which are rotated by size (the oldest files are deleted).
+Each line is {"received_at": unix time, "update": update}. IDs of users and chats are replaced by keyed hashes
+(IDs of bots are kept), names and contacts are replaced by placeholders, so capture does not contain real IDs,
+but the same ID is always replaced by the same value:
+with the same salt IDs in scratch copy of bot database can be anonymized too (benchmarks.replay --salt).
+
+Capture is opt-in: it is enabled by "updates_capture" section of config.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import secrets
+import zlib
+
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from logger import record_log, regist_error
+
+
+CAPTURE_FILE_PREFIX = "updates-"
+CAPTURE_FILE_SUFFIX = ".jsonl.gz"
+
+# Objects of update, "id" of which is ID of user or chat
+ANONYMIZED_OBJECTS : frozenset[str] = frozenset((
+    "from", "chat", "user", "sender_chat", "sender_user", "forward_from", "forward_from_chat", "via_bot",
+    "new_chat_member", "old_chat_member", "new_chat_members", "left_chat_member", "actor_chat", "voter_chat",
+))
+# Fields of any object, which contain ID of user or chat (e.g. "contact", "users_shared", "chat_shared", migration of group)
+ANONYMIZED_ID_FIELDS : frozenset[str] = frozenset((
+    "user_id", "user_ids", "chat_id", "user_chat_id", "migrate_to_chat_id", "migrate_from_chat_id",
+))
+# Fields which contain personal names, they are replaced by names based on anonymized ID
+ANONYMIZED_NAMES : frozenset[str] = frozenset(("first_name", "last_name", "username"))
+# Fields of any object with personal data without ID, they are replaced by name of field
+HIDDEN_FIELDS : frozenset[str] = frozenset(("phone_number", "vcard", "sender_user_name", "forward_sender_name"))
+
+
+class IdAnonymizer:
+    """
+    Replaces IDs by keyed hashes with the same sign (private chats have positive IDs, groups - negative ones).
+
+    Parameters:
+    -----------
+    salt : str
+        key of hashes, IDs can not be restored without it
+    """
+
+    def __init__(self, salt : str) -> None:
+        self.salt = salt.encode("UTF-8")
+        self.anonymize = lru_cache(maxsize = 100_000)(self._anonymize)
+
+
+    def _anonymize(self, tg_id : int) -> int:
+        digest = hmac.new(self.salt, str(abs(tg_id)).encode(), hashlib.sha256).digest()
+        anonymized_id = int.from_bytes(digest[:5], "big") + 1
+        return anonymized_id if tg_id > 0 else -anonymized_id
+
+
+def anonymize_update(update : dict, anonymizer : IdAnonymizer) -> dict:
+    """
+    Anonymizes dumped update in place: IDs of users and chats (except bots) and their names. Returns update.
+    """
+    def walk(value : Any, key : str | None = None) -> None:
+        if isinstance(value, dict):
+            is_anonymized = False
+            if (key in ANONYMIZED_OBJECTS) and (not value.get("is_bot")) and isinstance(value.get("id"), int):
+                value["id"] = anonymizer.anonymize(value["id"])
+                is_anonymized = True
+            for id_key in ANONYMIZED_ID_FIELDS & value.keys():
+                if isinstance(value[id_key], int):
+                    value[id_key] = anonymizer.anonymize(value[id_key])
+                    is_anonymized = True
+                elif isinstance(value[id_key], list):
+                    value[id_key] = [anonymizer.anonymize(tg_id) if isinstance(tg_id, int) else tg_id for tg_id in value[id_key]]
+            if is_anonymized:
+                name_id = abs(value.get("id") or value.get("user_id") or value.get("chat_id") or 0)
+                for name_key in ANONYMIZED_NAMES & value.keys():
+                    if value[name_key]:
+                        value[name_key] = f"{name_key}_{name_id}"
+            for hidden_key in HIDDEN_FIELDS & value.keys():
+                if isinstance(value[hidden_key], str):
+                    value[hidden_key] = hidden_key
+            for item_key, item in value.items():
+                walk(item, item_key)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item, key)
+
+    walk(update)
+    return update
+
+
+class UpdateCaptureWriter:
+    """
+    Appends records to gzip-compressed JSON-lines files in `directory`.
+
+    Parameters:
+    -----------
+    directory : str | Path
+        directory of capture files
+    salt : str | None
+        key of IDs anonymization, random key is generated by default (then IDs can not be matched with database)
+    max_file_size : int
+        size of uncompressed records in bytes, after which file is rotated
+    max_files : int
+        count of kept files, the oldest files are deleted on rotation
+    flush_interval : float
+        seconds between flushes of compressed stream (unflushed records are lost on crash)
+    """
+
+    def __init__(
+            self,
+            directory : str | Path,
+            salt : str | None = None,
+            max_file_size : int = 50 * 1024 * 1024,
+            max_files : int = 20,
+            flush_interval : float = 1.0,
+        ) -> None:
+        self.directory = Path(directory)
+        self.anonymizer = IdAnonymizer(salt or secrets.token_hex(16))
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.records_count = 0
+        self._file : gzip.GzipFile | None = None
+        self._file_size = 0
+        self._flushed_at = 0.0
+
+
+    def _open_file(self) -> None:
+        self.directory.mkdir(parents = True, exist_ok = True)
+        file_name = f"{CAPTURE_FILE_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{CAPTURE_FILE_SUFFIX}"
+        self._file = gzip.open(self.directory / file_name, "ab")
+        self._file_size = 0
+        self._delete_old_files()
+
+
+    def _delete_old_files(self) -> None:
+        capture_files = sorted(self.directory.glob(f"{CAPTURE_FILE_PREFIX}*{CAPTURE_FILE_SUFFIX}"))
+        for old_file in capture_files[:max(0, len(capture_files) - self.max_files)]:
+            old_file.unlink(missing_ok = True)
+
+
+    def write(self, update : dict, received_at : float) -> None:
+        """
+        Anonymizes dumped update and appends it to current file.
+        """
+        if self._file is None or self._file_size >= self.max_file_size:
+            self.close()
+            self._open_file()
+        line = json.dumps(
+            {"received_at" : round(received_at, 3), "update" : anonymize_update(update, self.anonymizer)},
+            ensure_ascii = False,
+            separators = (",", ":"),
+        ).encode("UTF-8") + b"\n"
+        self._file.write(line)
+        self._file_size += len(line)
+        self.records_count += 1
+
+        now = monotonic()
+        if now - self._flushed_at >= self.flush_interval:
+            self._file.flush()
+            self._flushed_at = now
+
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class UpdateCaptureMiddleware(BaseMiddleware):
+    """
+    Outer middleware of updates which writes raw updates by UpdateCaptureWriter before handling
+    (updates shed by intake guard do not reach middlewares and are not captured).
+    Errors of writing do not affect handling: capture is stopped after the first error.
+    """
+
+    def __init__(self, writer : UpdateCaptureWriter) -> None:
+        self.writer = writer
+        self.is_enabled = True
+
+
+    async def __call__(
+            self,
+            handler : Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event : TelegramObject,
+            data : dict[str, Any],
+        ) -> Any:
+        if self.is_enabled and isinstance(event, Update):
+            try:
+                self.writer.write(event.model_dump(mode = "json", by_alias = True, exclude_none = True, exclude_unset = True), time())
+            except Exception as error:
+                self.is_enabled = False
+                self.writer.close()
+                regist_error(f"Updates capture error, capture is stopped: {error}", type(error))
+        return await handler(event, data)
+
+
+def get_capture_files(paths : list[str | Path]) -> list[Path]:
+    """
+    Returns capture files of passed files and directories in order of writing.
+    """
+    capture_files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            capture_files.extend(sorted(path.glob(f"{CAPTURE_FILE_PREFIX}*{CAPTURE_FILE_SUFFIX}")))
+        else:
+            capture_files.append(path)
+    return capture_files
+
+
+def read_capture(paths : list[str | Path]) -> Iterator[tuple[float, dict]]:
+    """
+    Yields (receiving time, dumped update) of capture files. Truncated tails of files (after crash) are skipped.
+    """
+    for capture_file in get_capture_files(paths):
+        try:
+            with gzip.open(capture_file, "rb") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield record["received_at"], record["update"]
+        except (EOFError, gzip.BadGzipFile, zlib.error) as error:
+            record_log(f"Capture file {capture_file.name} is truncated: {error}", "updates capture")
@@ -1,5 +1,6 @@
 from .logger import record_log
 from .error_reporter import regist_error
 from .rchat_interactor import send_message_to_report_chat
-from .logger import PATH_TO_LOG
+from .rchat_interactor import post_message, set_failed_messages_sink, ReporterSendError
+from .logger import PATH_TO_LOG, LOG_ARCHIVE_DIRECTORY, log_file_handler
 from .caller_definer import define_caller
@@ -1,5 +1,5 @@
 from pathlib import Path
-import inspect
+import sys
 
 PROJECT_DIRECTORY = Path.cwd()
 
@@ -24,11 +24,12 @@ def define_caller(is_full_path : bool = False, from_source : bool = False):
         a path of caller
     """
     
-    frame = inspect.stack()[2]
-    module_path = Path(frame.filename)
+    # Frame of caller of logging function (inspect.stack is not used: it reads source lines of all frames)
+    code = sys._getframe(2).f_code
+    module_path = Path(code.co_filename)
 
     if is_full_path:
-        return f"{str(module_path)} {frame.function}"
+        return f"{str(module_path)} {code.co_name}"
 
     module_relative_path = str(module_path.relative_to(PROJECT_DIRECTORY)).replace('/', '.').replace('\\', '.').rstrip('.py')
-    return f"{module_relative_path}.{frame.function}()"
\ No newline at end of file
+    return f"{module_relative_path}.{code.co_name}()"
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+This module provides storage of bot's log: live log file with size- and time-based rotation into gzip archives.
+
+Records are written by QueueListener thread (see logger.py), so writing, rotation and compression of log are executed
+out of event loop. Archives are stored in archive directory with index of their time ranges (index.json),
+which is used for selection of archives by time range (see CompressedRotatingFileHandler.collect_log).
+Time of the first record of live log file is stored next to index (live.json), so it is known after restart of bot
+(time of creation is not kept by file system: ctime is changed by each write).
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+
+from datetime import datetime
+from pathlib import Path
+
+
+INDEX_FILE_NAME = "index.json"
+LIVE_LOG_FILE_NAME = "live.json"
+ARCHIVE_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class LogArchive:
+    file_name : str
+    started_at : float
+    finished_at : float
+    size : int
+
+    def __init__(self, file_name : str, started_at : float, finished_at : float, size : int) -> None:
+        self.file_name = file_name
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.size = size
+
+
+    def to_dict(self) -> dict:
+        return {
+            "file_name" : self.file_name,
+            "started_at" : self.started_at,
+            "finished_at" : self.finished_at,
+            "size" : self.size,
+        }
+
+
+    @classmethod
+    def from_dict(cls, archive : dict) -> "LogArchive":
+        return cls(archive["file_name"], archive["started_at"], archive["finished_at"], archive["size"])
+
+
+class LogArchiveIndex:
+    """
+    Index of archives of log (chronological), it is saved into index.json of archive directory after each change.
+
+    Parameters:
+    -----------
+    directory : Path
+        directory of archives
+    max_archives : int
+        count of stored archives, the oldest archives are removed
+    """
+
+    def __init__(self, directory : Path, max_archives : int = 60) -> None:
+        self.directory = Path(directory)
+        self.max_archives = max_archives
+        self.directory.mkdir(parents = True, exist_ok = True)
+        self.archives : list[LogArchive] = self._load()
+
+
+    def _load(self) -> list[LogArchive]:
+        try:
+            with open(self.directory / INDEX_FILE_NAME, "r", encoding = "UTF-8") as index_file:
+                archives = [LogArchive.from_dict(archive) for archive in json.load(index_file)]
+        except (OSError, ValueError, KeyError):
+            return []
+        # Archives, which were removed manually, are dropped from index
+        return [archive for archive in archives if (self.directory / archive.file_name).exists()]
+
+
+    def _save(self) -> None:
+        self._write_json(INDEX_FILE_NAME, [archive.to_dict() for archive in self.archives])
+
+
+    def _write_json(self, file_name : str, content) -> None:
+        temporary_path = self.directory / f"{file_name}.tmp"
+        with open(temporary_path, "w", encoding = "UTF-8") as json_file:
+            json.dump(content, json_file, indent = 1)
+        os.replace(temporary_path, self.directory / file_name)
+
+
+    def load_live_log_started_at(self) -> float | None:
+        """
+        Returns time of the first record of live log file, which was saved by save_live_log_started_at.
+        """
+        try:
+            with open(self.directory / LIVE_LOG_FILE_NAME, "r", encoding = "UTF-8") as live_log_file:
+                return float(json.load(live_log_file)["started_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+    def save_live_log_started_at(self, started_at : float | None) -> None:
+        self._write_json(LIVE_LOG_FILE_NAME, {"started_at" : started_at})
+
+
+    def add(self, archive : LogArchive) -> None:
+        self.archives.append(archive)
+        while len(self.archives) > self.max_archives:
+            outdated_archive = self.archives.pop(0)
+            (self.directory / outdated_archive.file_name).unlink(missing_ok = True)
+        self._save()
+
+
+    def select(self, started_at : float, finished_at : float) -> list[LogArchive]:
+        """
+        Returns archives, which contain records from time range (timestamps).
+        """
+        return [
+            archive for archive in self.archives
+            if (archive.finished_at >= started_at) and (archive.started_at <= finished_at)
+        ]
+
+
+class CompressedRotatingFileHandler(logging.FileHandler):
+    """
+    File handler, which archives log file into gzip file of archive directory, when size of log file exceeds `max_size`
+    or the first record of log file is older than `interval`.
+
+    Parameters:
+    -----------
+    path : Path
+        path to live log file
+    archive_directory : Path
+        directory of archives and their index
+    max_size : int
+        size of live log file (bytes), after which it is archived
+    interval : float
+        seconds from the first record of live log file, after which it is archived
+    max_archives : int
+        count of stored archives
+    """
+
+    def __init__(
+            self,
+            path : Path,
+            archive_directory : Path,
+            max_size : int = 10 * 2**20,
+            interval : float = 24 * 60 * 60,
+            max_archives : int = 60,
+        ) -> None:
+        super().__init__(path, mode = "a", encoding = "UTF-8")
+        self.max_size = max_size
+        self.interval = interval
+        self.index = LogArchiveIndex(archive_directory, max_archives)
+        # Time range of records of live log file
+        self.started_at : float | None = None
+        self.finished_at : float | None = None
+        if os.path.getsize(self.baseFilename):
+            self.finished_at = os.path.getmtime(self.baseFilename)
+            self.started_at = self.index.load_live_log_started_at()
+            if self.started_at is None:
+                # Live log file of previous version: its records are newer than the last archive
+                self.started_at = self.index.archives[-1].finished_at if self.index.archives else self.finished_at
+
+
+    def emit(self, record : logging.LogRecord) -> None:
+        if (self.started_at is not None) and (record.created - self.started_at >= self.interval):
+            self.rotate()
+        super().emit(record)
+        if self.started_at is None:
+            self.started_at = record.created
+            self._save_started_at()
+        self.finished_at = record.created
+        if self.stream.tell() >= self.max_size:
+            self.rotate()
+
+
+    def rotate(self) -> None:
+        """
+        Archives live log file and opens new one. Must be called with lock of handler (emit is called with it).
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if os.path.getsize(self.baseFilename):
+            try:
+                self.index.add(self._compress())
+                os.truncate(self.baseFilename, 0)
+            except OSError as error:
+                # Log is not lost, it is archived with the next rotation
+                print(f"LOGGER ERROR (type: {type(error)}): log was not archived: {error}")
+        self.started_at = self.finished_at = None
+        self._save_started_at()
+        self.stream = self._open()
+
+
+    def _save_started_at(self) -> None:
+        try:
+            self.index.save_live_log_started_at(self.started_at)
+        except OSError as error:
+            print(f"LOGGER ERROR (type: {type(error)}): time of live log was not saved: {error}")
+
+
+    def _compress(self) -> LogArchive:
+        finished_at = self.finished_at or os.path.getmtime(self.baseFilename)
+        started_at = self.started_at or finished_at
+        name = (
+            f"log-{datetime.fromtimestamp(started_at).strftime(ARCHIVE_TIME_FORMAT)}"
+            f"-{datetime.fromtimestamp(finished_at).strftime(ARCHIVE_TIME_FORMAT)}"
+        )
+        file_name = f"{name}.log.gz"
+        # Several archives of one second (rotation by size under heavy logging) are numbered
+        file_number = 0
+        while (self.index.directory / file_name).exists():
+            file_number += 1
+            file_name = f"{name}-{file_number}.log.gz"
+        archive_path = self.index.directory / file_name
+        temporary_path = archive_path.with_name(f"{file_name}.tmp")
+        with open(self.baseFilename, "rb") as log_file, gzip.open(temporary_path, "wb") as archive_file:
+            shutil.copyfileobj(log_file, archive_file)
+        os.replace(temporary_path, archive_path)
+        return LogArchive(file_name, started_at, finished_at, archive_path.stat().st_size)
+
+
+    def collect_log(self, started_at : float, finished_at : float, destination : Path) -> int:
+        """
+        Writes archives and live log file with records from time range (timestamps) into destination gzip file,
+        live log file is not truncated. Archives are appended as is (concatenation of gzip files is gzip file).
+        Blocks caller, must be called in separate thread (asyncio.to_thread).
+
+        Returns:
+        --------
+        int
+            count of collected files
+        """
+        self.acquire()
+        try:
+            archives = self.index.select(started_at, finished_at)
+            is_live_log_selected = (
+                (self.started_at is not None) and (self.finished_at >= started_at) and (self.started_at <= finished_at)
+            )
+            with open(destination, "wb") as destination_file:
+                for archive in archives:
+                    with open(self.index.directory / archive.file_name, "rb") as archive_file:
+                        shutil.copyfileobj(archive_file, destination_file)
+                if is_live_log_selected:
+                    self.flush()
+                    with open(self.baseFilename, "rb") as log_file, gzip.open(destination_file, "wb") as live_log_file:
+                        shutil.copyfileobj(log_file, live_log_file)
+            return len(archives) + is_live_log_selected
+        finally:
+            self.release()
@@ -3,25 +3,39 @@ This module provides record_log functions for logging.
 """
 
 from pathlib import Path
+from queue import SimpleQueue
 
+import atexit
 import logging
+import logging.handlers
+
+from config import get_log_rotation_config
 
 from .caller_definer import define_caller
+from .log_storage import CompressedRotatingFileHandler
 
 PATH_TO_LOG = Path(__file__).parent / 'log.log'
+LOG_ARCHIVE_DIRECTORY = Path(__file__).parent / 'archive'
+
+# Records are passed through queue into listener's thread, which writes, rotates and compresses log out of event loop
+log_file_handler = CompressedRotatingFileHandler(PATH_TO_LOG, LOG_ARCHIVE_DIRECTORY, **get_log_rotation_config())
+log_file_handler.setFormatter(logging.Formatter(fmt = "(%(asctime)s) %(message)s", datefmt = '%d-%m-%y %H:%M:%S'))
+_log_queue = SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, log_file_handler)
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_queue_handler.setFormatter(logging.Formatter(fmt = "%(message)s"))
 
 logging.basicConfig(
-    filename = PATH_TO_LOG, 
-    filemode = "a", 
-    format = "(%(asctime)s) %(message)s", 
+    handlers = [_log_queue_handler],
     level = logging.INFO, 
-    datefmt = '%d-%m-%y %H:%M:%S',
-    encoding = "UTF-8",
 )
+_log_listener.start()
+# Records of queue are written on exit
+atexit.register(_log_listener.stop)
 
 def record_log(record_text : str, source : str = None, is_error : bool = False, error_type : type = None) -> None:
     """
-    Saves record into log.log
+    Saves record into log.log (see log_storage for rotation of log)
 
     In case of error during logging prints (through print function) error of logging with passed parameters 
     
@@ -1,10 +1,15 @@
 """
 This module provides ways function for sending message to developer of developer group through Telgeram.
 The Telegram ids of chats must be defined in project`s config 
+
+Messages which were not sent because of temporary failure (network error, 5xx or 429 answer of Telegram) 
+are passed to failed messages sink (see set_failed_messages_sink), e.g. into outbox of bot.
 """
 
 import requests
 
+from typing import Callable
+
 from .logger import record_log
 from config import get_bot_reporter_token, get_report_chat_id, get_dev_tg_id
 
@@ -12,12 +17,61 @@ REPORTER_BOT_TOKEN = get_bot_reporter_token()
 REPORT_CHAT_ID = get_report_chat_id()
 DEV_ID = get_dev_tg_id()
 
+REQUEST_TIMEOUT = 10
+
+# Receiver of not sent messages: (receiver_id, message_text) -> None
+_failed_messages_sink : Callable[[int, str], object] | None = None
+
+
+class ReporterSendError(Exception):
+    """
+    Message was not sent by reporter bot. Error is permanent, if Telegram rejected request (4xx answer except 429).
+    """
+
+    def __init__(self, description : str, status_code : int | None = None) -> None:
+        super().__init__(description)
+        self.status_code = status_code
+
+
+    @property
+    def is_permanent(self) -> bool:
+        return (self.status_code is not None) and (400 <= self.status_code < 500) and (self.status_code != 429)
+
+
+def set_failed_messages_sink(sink : Callable[[int, str], object] | None) -> None:
+    """
+    Sets receiver of messages which were not sent because of temporary failure.
+    """
+    global _failed_messages_sink
+    _failed_messages_sink = sink
+
+
+def post_message(message_text : str, receiver_id : int | str) -> None:
+    """
+    Sends message-text through reporter bot to passed receiver. 
+    
+    Raises ReporterSendError, if message was not sent.
+    """
+    api_url = f'https://api.telegram.org/bot{REPORTER_BOT_TOKEN}/sendMessage'
+    params = {
+        'chat_id': receiver_id,
+        'text': message_text,
+        # 'parse_mode' : 'Markdown'
+    }
+    try:
+        response = requests.post(api_url, params=params, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as error:
+        raise ReporterSendError(f"Request failed: {error}") from error
+    if response.status_code != 200:
+        raise ReporterSendError(f"Response: Status<{response.status_code}> {response.text[:500]}", response.status_code)
+
 
 def _send_message_via_bot(message_text : str, receiver_id : int) -> None:
     """
     Sends message-text through bot to passed receiver.
 
-    In case of error during message sending prints (through print function) text about request failing and passed args.
+    In case of error during message sending records failing into log, 
+    message is passed to failed messages sink, if failure is temporary.
     
 
     Parameters:
@@ -31,16 +85,12 @@ def _send_message_via_bot(message_text : str, receiver_id : int) -> None:
     --------
         None
     """
-
-    api_url = f'https://api.telegram.org/bot{REPORTER_BOT_TOKEN}/sendMessage'
-    params = {
-        'chat_id': receiver_id,
-        'text': message_text,
-        # 'parse_mode' : 'Markdown'
-    }
-    response = requests.post(api_url, params=params)
-    if response.status_code != 200:
-        record_log(f"Message was not sent to receiver. Response: Status<{response.status_code}> JSON: {response.json()}; {message_text=} {receiver_id=}")
+    try:
+        post_message(message_text, receiver_id)
+    except ReporterSendError as error:
+        record_log(f"Message was not sent to receiver. {error}; {message_text=} {receiver_id=}")
+        if (not error.is_permanent) and (_failed_messages_sink is not None):
+            _failed_messages_sink(receiver_id, message_text)
 
 
 def send_message_to_report_chat(message_text : str) -> None:
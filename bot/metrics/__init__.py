@@ -0,0 +1,5 @@
+from .registry import MetricsRegistry, Histogram, CounterFamily, HistogramFamily, DURATION_BUCKETS
+from .bot_metrics import BotMetrics, HandlerMetricsMiddleware, ApiMetricsMiddleware, current_handler
+from .bot_metrics import instrument_filters, get_metrics_summary
+from .exporter import MetricsExporter
+from .profiling import StackSampler, CpuProfile, profile_cpu, profile_memory
@@ -0,0 +1,219 @@
+"""
+This module provides metrics of bot: durations and errors of handlers, durations of filters, errors of bot scripts
+(operate_error_case) and durations and errors of Telegram API requests, and their collectors:
+    - HandlerMetricsMiddleware - inner middleware of dispatcher's observers (it is applied to handlers of all routers),
+    - ApiMetricsMiddleware - middleware of bot's session,
+    - instrument_filters - wraps filters of registered handlers by timers.
+"""
+
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters.logic import _AndFilter, _InvertFilter, _OrFilter
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+
+from .registry import MetricsRegistry
+
+
+# Name of handler which is processing current update (label of errors registered by operate_error_case)
+current_handler : ContextVar[str] = ContextVar("current_handler", default = "unknown")
+
+
+class BotMetrics:
+    """
+    Metrics of bot in own registry.
+    """
+
+    def __init__(self, registry : MetricsRegistry | None = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        self.handler_duration = self.registry.histogram(
+            "bot_handler_duration_seconds", "Duration of handlers", ("event", "handler"),
+        )
+        self.handler_errors = self.registry.counter(
+            "bot_handler_errors_total", "Exceptions raised by handlers", ("event", "handler", "error"),
+        )
+        self.filter_duration = self.registry.histogram(
+            "bot_filter_duration_seconds", "Duration of filters checks", ("event", "filter"),
+        )
+        self.script_errors = self.registry.counter(
+            "bot_script_errors_total", "Errors operated by operate_error_case", ("handler",),
+        )
+        self.api_duration = self.registry.histogram(
+            "bot_api_request_duration_seconds", "Duration of Telegram API requests", ("method",),
+        )
+        self.api_errors = self.registry.counter(
+            "bot_api_request_errors_total", "Failed Telegram API requests", ("method", "error"),
+        )
+
+
+    def register_script_error(self) -> None:
+        self.script_errors.inc(current_handler.get())
+
+
+def get_handler_name(handler : HandlerObject) -> str:
+    """
+    Returns name of handler's callback. Routes of CallbackRouter are passed to inner middlewares as their own handlers,
+    so callback queries are named by matched route (callback data of update is not used: its values are not bounded).
+    """
+    callback = handler.callback
+    return getattr(callback, "__name__", type(callback).__name__)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware which records duration and exceptions of handlers. It must be registered on dispatcher's observers
+    (except "update"), then it is applied to handlers of all included routers.
+    """
+
+    def __init__(self, metrics : BotMetrics) -> None:
+        self.metrics = metrics
+        self._names : dict[Callable, str] = {}
+
+
+    async def __call__(
+            self,
+            handler : Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event : TelegramObject,
+            data : dict[str, Any],
+        ) -> Any:
+        handler_object : HandlerObject = data["handler"]
+        handler_name = self._names.get(handler_object.callback)
+        if handler_name is None:
+            handler_name = self._names[handler_object.callback] = get_handler_name(handler_object)
+        event_type = data.get("event_update").event_type if "event_update" in data else type(event).__name__
+
+        token = current_handler.set(handler_name)
+        started_at = perf_counter()
+        try:
+            return await handler(event, data)
+        except SkipHandler:
+            raise
+        except Exception as error:
+            self.metrics.handler_errors.inc(event_type, handler_name, type(error).__name__)
+            raise
+        finally:
+            self.metrics.handler_duration.labels(event_type, handler_name).observe(perf_counter() - started_at)
+            current_handler.reset(token)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware of bot's session which records duration and errors of API requests by API method.
+    Registered after OutgoingScheduler, it does not count waiting for sending slot.
+    """
+
+    def __init__(self, metrics : BotMetrics) -> None:
+        self.metrics = metrics
+
+
+    async def __call__(self, make_request, bot : Bot, method : TelegramMethod):
+        api_method = method.__api_method__
+        started_at = perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as error:
+            self.metrics.api_errors.inc(api_method, type(error).__name__)
+            raise
+        finally:
+            self.metrics.api_duration.labels(api_method).observe(perf_counter() - started_at)
+
+
+def _get_filter_name(filter_object : FilterObject) -> str:
+    if filter_object.magic is not None:
+        return "magic filter"
+    callback = filter_object.callback
+    return getattr(callback, "__name__", None) or type(callback).__name__
+
+
+def _instrument_filter(filter_object : FilterObject, event_type : str, metrics : BotMetrics) -> None:
+    callback = filter_object.callback
+    # Parts of logic filters are timed separately
+    if isinstance(callback, (_AndFilter, _OrFilter)):
+        for target in callback.targets:
+            _instrument_filter(target, event_type, metrics)
+        return
+    if isinstance(callback, _InvertFilter):
+        _instrument_filter(callback.target, event_type, metrics)
+        return
+    if getattr(filter_object, "is_instrumented", False):
+        return
+
+    histogram = metrics.filter_duration.labels(event_type, _get_filter_name(filter_object))
+    call = filter_object.call
+    async def timed_call(*args : Any, **kwargs : Any) -> Any:
+        started_at = perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            histogram.observe(perf_counter() - started_at)
+
+    filter_object.call = timed_call
+    filter_object.is_instrumented = True
+
+
+def instrument_filters(router : Router, metrics : BotMetrics) -> int:
+    """
+    Wraps filters of handlers of router and its subrouters (including routes of CallbackRouter) by timers.
+    Must be called after including of all routers. Returns count of handlers.
+    """
+    handlers_count = 0
+    for sub_router in router.chain_tail:
+        for event_type, observer in sub_router.observers.items():
+            handlers : list[HandlerObject] = list(observer.handlers)
+            if (event_type == "callback_query") and hasattr(sub_router, "get_routes_handlers"):
+                handlers.extend(sub_router.get_routes_handlers())
+            for handler in handlers:
+                for filter_object in handler.filters or ():
+                    _instrument_filter(filter_object, event_type, metrics)
+            handlers_count += len(handlers)
+    return handlers_count
+
+
+def _format_duration(seconds : float) -> str:
+    return f"{seconds * 1000:.1f} ms" if seconds >= 0.001 else f"{seconds * 1_000_000:.0f} us"
+
+
+def get_metrics_summary(metrics : BotMetrics, top_count : int = 10) -> str:
+    """
+    Returns text report: the slowest handlers and filters by total time, API methods, errors.
+    """
+    lines = ["Handlers (calls, mean, p95, errors):"]
+    handlers = sorted(metrics.handler_duration.children.items(), key = lambda item: item[1].sum, reverse = True)
+    errors_by_handler : dict[tuple, float] = {}
+    for (event_type, handler_name, _), count in metrics.handler_errors.children.items():
+        errors_by_handler[(event_type, handler_name)] = errors_by_handler.get((event_type, handler_name), 0) + count
+    for (event_type, handler_name), histogram in handlers[:top_count]:
+        lines.append(
+            f"    {handler_name} ({event_type}): {histogram.count}, {_format_duration(histogram.get_mean())}, "
+            f"{_format_duration(histogram.get_quantile(0.95))}, {errors_by_handler.get((event_type, handler_name), 0):.0f}"
+        )
+
+    lines.append("Filters (calls, mean, p95):")
+    filters = sorted(metrics.filter_duration.children.items(), key = lambda item: item[1].sum, reverse = True)
+    for (event_type, filter_name), histogram in filters[:top_count]:
+        lines.append(
+            f"    {filter_name} ({event_type}): {histogram.count}, {_format_duration(histogram.get_mean())}, "
+            f"{_format_duration(histogram.get_quantile(0.95))}"
+        )
+
+    lines.append("Telegram API (calls, mean, p95, errors):")
+    api_errors : dict[str, float] = {}
+    for (api_method, _), count in metrics.api_errors.children.items():
+        api_errors[api_method] = api_errors.get(api_method, 0) + count
+    for (api_method,), histogram in sorted(metrics.api_duration.children.items(), key = lambda item: item[1].count, reverse = True):
+        lines.append(
+            f"    {api_method}: {histogram.count}, {_format_duration(histogram.get_mean())}, "
+            f"{_format_duration(histogram.get_quantile(0.95))}, {api_errors.get(api_method, 0):.0f}"
+        )
+
+    script_errors = sorted(metrics.script_errors.children.items(), key = lambda item: item[1], reverse = True)
+    lines.append(f"Script errors: {sum(count for _, count in script_errors):.0f}")
+    for (handler_name,), count in script_errors[:top_count]:
+        lines.append(f"    {handler_name}: {count:.0f}")
+    return "\n".join(lines)
@@ -0,0 +1,52 @@
+"""
+This module provides MetricsExporter - local HTTP endpoint which serves metrics in Prometheus text format (GET /metrics).
+"""
+
+import asyncio
+
+from aiohttp import web
+
+from logger import record_log
+
+from .registry import MetricsRegistry
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsExporter:
+    """
+    Parameters:
+    -----------
+    registry : MetricsRegistry
+        rendered registry
+    host : str
+        listened host, local by default
+    port : int
+        listened port
+    """
+
+    def __init__(self, registry : MetricsRegistry, host : str = "127.0.0.1", port : int = 9108) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+
+    async def _serve_metrics(self, request : web.Request) -> web.Response:
+        return web.Response(body = self.registry.render().encode("UTF-8"), headers = {"Content-Type" : PROMETHEUS_CONTENT_TYPE})
+
+
+    async def run(self) -> None:
+        """
+        Long-running subtask: serves metrics until cancellation.
+        """
+        application = web.Application()
+        application.router.add_get("/metrics", self._serve_metrics)
+        runner = web.AppRunner(application, access_log = None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            record_log(f"Metrics are served on http://{self.host}:{self.port}/metrics", "metrics exporter")
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
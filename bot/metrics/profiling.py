@@ -0,0 +1,176 @@
+"""
+This module provides on-demand profiling of live bot process without stopping updates handling:
+    - StackSampler - CPU profiler which samples stack of event loop's thread from separate thread (sys._current_frames),
+      it returns top functions by samples and stacks in collapsed format (flamegraph.pl, speedscope),
+    - profile_memory - diff of two tracemalloc snapshots taken with interval: allocation sites with the largest growth.
+"""
+
+import asyncio
+import sys
+import sysconfig
+import time
+import tracemalloc
+
+from collections import Counter
+from pathlib import Path
+from types import CodeType
+
+
+BOT_DIR = Path(__file__).parent.parent
+STDLIB_DIR = Path(sysconfig.get_paths()["stdlib"])
+
+# Innermost functions of event loop's thread which wait for events
+IDLE_FUNCTIONS : frozenset[str] = frozenset(("select", "poll", "epoll", "kqueue", "wait"))
+
+# Traces of these files are excluded from memory diffs
+MEMORY_IGNORED_FILES : tuple[str] = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+class CpuProfile:
+    """
+    Result of StackSampler: counts of sampled stacks (from the outermost frame) and count of idle samples.
+    """
+    stacks : Counter[tuple[CodeType, ...]]
+    samples_count : int
+    idle_count : int
+    duration : float
+
+    def __init__(self) -> None:
+        self.stacks = Counter()
+        self.samples_count = 0
+        self.idle_count = 0
+        self.duration = 0.0
+
+
+    def get_top_functions(self, count : int = 25) -> list[tuple[str, int, int]]:
+        """
+        Returns (function, self samples, total samples) of functions with the most self samples (idle samples are excluded).
+        """
+        self_counts, total_counts = Counter(), Counter()
+        for stack, stack_count in self.stacks.items():
+            self_counts[stack[-1]] += stack_count
+            for code in set(stack):
+                total_counts[code] += stack_count
+        return [
+            (_describe_code(code), self_count, total_counts[code])
+            for code, self_count in self_counts.most_common(count)
+        ]
+
+
+    def format_report(self, count : int = 25) -> str:
+        busy_count = self.samples_count - self.idle_count
+        report_lines = [
+            f"CPU profile: {self.samples_count} samples in {self.duration:.1f} s, "
+            f"loop is busy in {busy_count / max(1, self.samples_count):.1%} of samples",
+            "self%   total%  function",
+        ]
+        for function, self_count, total_count in self.get_top_functions(count):
+            report_lines.append(f"{self_count / max(1, busy_count):>6.1%}  {total_count / max(1, busy_count):>6.1%}  {function}")
+        return "\n".join(report_lines)
+
+
+    def format_collapsed(self) -> str:
+        """
+        Returns stacks in collapsed format: "outer;...;inner count" per line.
+        """
+        names : dict[CodeType, str] = {}
+        lines = []
+        for stack, stack_count in self.stacks.most_common():
+            for code in stack:
+                if code not in names:
+                    names[code] = _describe_code(code).replace(";", ",")
+            lines.append(f"{';'.join(names[code] for code in stack)} {stack_count}")
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """
+    Parameters:
+    -----------
+    thread_id : int
+        identifier of sampled thread (threading.get_ident() of event loop's thread)
+    interval : float
+        seconds between samples
+    max_depth : int
+        count of the innermost frames of sample
+    """
+
+    def __init__(self, thread_id : int, interval : float = 0.005, max_depth : int = 64) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+
+
+    def sample(self, duration : float) -> CpuProfile:
+        """
+        Samples thread during `duration` seconds. Blocks caller, must be called in separate thread (asyncio.to_thread).
+        """
+        profile = CpuProfile()
+        started_at = time.monotonic()
+        while time.monotonic() - started_at < duration:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while (frame is not None) and (len(stack) < self.max_depth):
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                profile.samples_count += 1
+                if stack[-1].co_name in IDLE_FUNCTIONS:
+                    profile.idle_count += 1
+                else:
+                    profile.stacks[tuple(stack)] += 1
+            time.sleep(self.interval)
+        profile.duration = time.monotonic() - started_at
+        return profile
+
+
+def _describe_code(code : CodeType) -> str:
+    path = Path(code.co_filename)
+    if path.is_relative_to(BOT_DIR):
+        path = path.relative_to(BOT_DIR)
+    elif "site-packages" in path.parts:
+        path = Path(*path.parts[path.parts.index("site-packages") + 1:])
+    elif path.is_relative_to(STDLIB_DIR):
+        path = path.relative_to(STDLIB_DIR)
+    return f"{code.co_qualname if hasattr(code, 'co_qualname') else code.co_name} ({path}:{code.co_firstlineno})"
+
+
+async def profile_cpu(thread_id : int, duration : float, interval : float = 0.005) -> CpuProfile:
+    return await asyncio.to_thread(StackSampler(thread_id, interval).sample, duration)
+
+
+async def profile_memory(duration : float, frames_count : int = 10, count : int = 30) -> tuple[str, str]:
+    """
+    Takes tracemalloc snapshots at start and after `duration` seconds (tracing is started and stopped, if it was off).
+    Returns short report (allocation lines with the largest growth) and full report (growth by tracebacks).
+    """
+    is_started_here = not tracemalloc.is_tracing()
+    if is_started_here:
+        tracemalloc.start(frames_count)
+    try:
+        first_snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+        await asyncio.sleep(duration)
+        second_snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+        traced_size, peak_size = tracemalloc.get_traced_memory()
+    finally:
+        if is_started_here:
+            tracemalloc.stop()
+
+    def compare() -> tuple[str, str]:
+        filters = [tracemalloc.Filter(False, file_pattern) for file_pattern in MEMORY_IGNORED_FILES]
+        first, second = first_snapshot.filter_traces(filters), second_snapshot.filter_traces(filters)
+        header = (
+            f"Memory diff for {duration:.0f} s: traced {traced_size / 2**20:.1f} MiB, peak {peak_size / 2**20:.1f} MiB"
+            + (" (tracing was started for profiling, older allocations are not traced)" if is_started_here else "")
+        )
+        lines_stats = second.compare_to(first, "lineno")[:count]
+        short_report = "\n".join([header] + [str(stat) for stat in lines_stats])
+
+        full_report_lines = [header]
+        for stat in second.compare_to(first, "traceback")[:count]:
+            full_report_lines.append(f"\n{stat.size_diff / 1024:+.1f} KiB, {stat.count_diff:+d} blocks (now {stat.size / 1024:.1f} KiB, {stat.count} blocks)")
+            full_report_lines.extend(stat.traceback.format())
+        return short_report, "\n".join(full_report_lines)
+
+    return await asyncio.to_thread(compare)
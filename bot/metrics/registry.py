@@ -0,0 +1,158 @@
+"""
+This module provides MetricsRegistry - registry of counters and histograms with labels, which are rendered
+in Prometheus text format.
+
+Metrics are updated in hot paths (each update, filter and API request), so update of metric is a dictionary lookup
+and a binary search of bucket, values are not locked (bot is single-threaded).
+"""
+
+from bisect import bisect_left
+
+
+# Buckets of durations in seconds: from 100 microseconds to 10 seconds
+DURATION_BUCKETS : tuple[float] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Counts of observed values by buckets (the last bucket is +Inf), their sum and count.
+    """
+    buckets : tuple[float]
+    counts : list[int]
+    sum : float
+    count : int
+
+    def __init__(self, buckets : tuple[float] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value : float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def get_mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+    def get_quantile(self, quantile : float) -> float:
+        """
+        Returns upper bound of bucket which contains quantile (upper bound of the last finite bucket for +Inf bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        cumulative_count = 0
+        for bucket_index, bucket_count in enumerate(self.counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return self.buckets[min(bucket_index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+
+class MetricFamily:
+    """
+    Metric with label names, children are values of metric by values of labels.
+    """
+    metric_type : str = ""
+
+    def __init__(self, name : str, documentation : str, label_names : tuple[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.children : dict[tuple, object] = {}
+
+
+    def _format_labels(self, label_values : tuple, extra : str = "") -> str:
+        labels = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(self.label_names, label_values)]
+        if extra:
+            labels.append(extra)
+        return "{" + ",".join(labels) + "}" if labels else ""
+
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class CounterFamily(MetricFamily):
+    metric_type = "counter"
+
+    def inc(self, *label_values : str, amount : float = 1) -> None:
+        self.children[label_values] = self.children.get(label_values, 0) + amount
+
+
+    def get(self, *label_values : str) -> float:
+        return self.children.get(label_values, 0)
+
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for label_values, value in sorted(self.children.items()):
+            lines.append(f"{self.name}{self._format_labels(label_values)} {value}")
+        return lines
+
+
+class HistogramFamily(MetricFamily):
+    metric_type = "histogram"
+
+    def __init__(self, name : str, documentation : str, label_names : tuple[str] = (), buckets : tuple[float] = DURATION_BUCKETS) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+
+
+    def labels(self, *label_values : str) -> Histogram:
+        histogram = self.children.get(label_values)
+        if histogram is None:
+            histogram = self.children[label_values] = Histogram(self.buckets)
+        return histogram
+
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for label_values, histogram in sorted(self.children.items()):
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), histogram.counts):
+                cumulative_count += bucket_count
+                bound_label = 'le="+Inf"' if upper_bound == float("inf") else f'le="{upper_bound!r}"'
+                lines.append(f"{self.name}_bucket{self._format_labels(label_values, bound_label)} {cumulative_count}")
+            lines.append(f"{self.name}_sum{self._format_labels(label_values)} {histogram.sum}")
+            lines.append(f"{self.name}_count{self._format_labels(label_values)} {histogram.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.families : dict[str, MetricFamily] = {}
+
+
+    def _register(self, family : MetricFamily) -> MetricFamily:
+        if family.name in self.families:
+            raise ValueError(f"Metric {family.name} is already registered")
+        self.families[family.name] = family
+        return family
+
+
+    def counter(self, name : str, documentation : str, label_names : tuple[str] = ()) -> CounterFamily:
+        return self._register(CounterFamily(name, documentation, label_names))
+
+
+    def histogram(self, name : str, documentation : str, label_names : tuple[str] = (), buckets : tuple[float] = DURATION_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily(name, documentation, label_names, buckets))
+
+
+    def render(self) -> str:
+        """
+        Returns all metrics in Prometheus text format.
+        """
+        lines = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
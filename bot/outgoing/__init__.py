@@ -0,0 +1,4 @@
+from .token_bucket import TokenBucket
+from .send_scheduler import OutgoingScheduler, SendPriority, send_priority
+from .outbox_dispatcher import OutboxDispatcher
+from .message_length import MAX_MESSAGE_LENGTH, get_utf16_length
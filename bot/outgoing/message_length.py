@@ -0,0 +1,14 @@
+"""
+This module provides measuring of message texts in units of Telegram limits.
+"""
+
+
+# Telegram limit of message length (UTF-16 code units)
+MAX_MESSAGE_LENGTH = 4096
+
+
+def get_utf16_length(text : str) -> int:
+    """
+    Returns length of text in UTF-16 code units: Telegram measures limits of messages in them.
+    """
+    return len(text.encode("UTF-16-LE")) // 2
@@ -0,0 +1,272 @@
+"""
+This module provides OutboxDispatcher - worker which delivers messages from "outbox" table of bot database.
+
+Outbox keeps messages which must not be lost (delay alerts, error reports), if bot crashes or Telegram fails:
+    1. dispatcher claims batch of due pending messages (status "sending"),
+    2. sends them concurrently through sender of message's channel,
+    3. saves results by one transaction: delivered messages are marked "delivered", messages with temporary failure
+       are retried with exponential backoff, messages with permanent failure (or after `max_attempts`) become "dead".
+
+Alerts are saved into outbox before the first attempt of sending (see OutboxDispatcher.deliver): they are sent at once
+and are marked "delivered" after success, alert which was being sent during crash of bot is sent again after restart.
+
+Database is accessed in worker threads (asyncio.to_thread), so draining of backlog does not block updates handling.
+While backlog is drained, throughput is recorded into log.
+"""
+
+import asyncio
+
+from time import monotonic, time
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.types import Message
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+from logger import post_message, record_log
+
+from .send_scheduler import SendPriority, send_priority
+
+
+# Errors of Telegram which are not fixed by repeating of request
+PERMANENT_ERRORS : tuple[type[Exception]] = (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+# Throughput is recorded into log not more often than once per this count of seconds
+THROUGHPUT_LOG_INTERVAL = 10.0
+
+# Kinds of messages which are sent with priority of alerts, other messages must not delay answers to users
+ALERT_KINDS : frozenset[str] = frozenset(("delay_alert",))
+
+
+def is_permanent_error(error : Exception) -> bool:
+    return isinstance(error, PERMANENT_ERRORS) or getattr(error, "is_permanent", False)
+
+
+def get_send_priority(kind : str) -> SendPriority:
+    return SendPriority.ALERT if kind in ALERT_KINDS else SendPriority.BROADCAST
+
+
+class OutboxDispatcher:
+    """
+    Parameters:
+    -----------
+    database_client : BotDBClient
+        owner of "outbox" table
+    bot : Bot
+        sender of channel "bot" (channel "reporter" is sent by reporter bot of logger)
+    senders : dict[str, Callable[[str, str], Awaitable]] | None
+        senders of other channels: (chat_id, message_text) -> awaitable, raise exception on failure.
+        Senders are called with priority of message's kind (see send_priority)
+    batch_size : int
+        count of messages claimed at once
+    max_attempts : int
+        message becomes "dead" after this count of failed attempts
+    initial_backoff : float
+        delay (in seconds) before the second attempt, it is doubled after each next failure
+    max_backoff : float
+        limit of delay between attempts
+    poll_interval : float
+        seconds between checks of outbox, when it is empty (new messages of bot wake dispatcher immediately)
+    """
+
+    def __init__(
+            self,
+            database_client,
+            bot : Bot,
+            senders : dict[str, Callable[[str, str], Awaitable]] | None = None,
+            batch_size : int = 100,
+            max_attempts : int = 8,
+            initial_backoff : float = 5.0,
+            max_backoff : float = 600.0,
+            poll_interval : float = 5.0,
+        ) -> None:
+        self.database_client = database_client
+        self.bot = bot
+        self.senders = {"bot" : self._send_via_bot, "reporter" : self._send_via_reporter, **(senders or {})}
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+
+        self._wakeup = asyncio.Event()
+        self._loop : asyncio.AbstractEventLoop | None = None
+        self._is_started = False
+        self._created_at = time()
+
+        self.delivered_count = 0
+        self.retried_count = 0
+        self.dead_count = 0
+
+
+    async def _send_via_bot(self, chat_id : str, message_text : str) -> Message:
+        return await self.bot.send_message(chat_id, message_text)
+
+
+    async def _send_via_reporter(self, chat_id : str, message_text : str) -> None:
+        await asyncio.to_thread(post_message, message_text, chat_id)
+
+
+    def enqueue(self, channel : str, chat_id : int | str, message_text : str, kind : str) -> bool:
+        """
+        Adds message into outbox and wakes dispatcher.
+        """
+        is_added = self.database_client.enqueue_outbox_messages([(channel, chat_id, message_text, kind)])
+        if is_added:
+            self.wake_up()
+        return is_added
+
+
+    async def deliver(self, channel : str, chat_id : int | str, message_text : str, kind : str) -> object | None:
+        """
+        Saves message into outbox as claimed and sends it at once. Message is marked "delivered" after success,
+        failed message is retried by dispatcher (as message claimed by dispatcher itself).
+
+        Returns:
+        --------
+        object
+            result of channel's sender (sent Message for channel "bot")
+        None
+            message was not delivered now, it is left to dispatcher
+        """
+        message = {"message_id" : None, "channel" : channel, "chat_id" : chat_id, "message_text" : message_text, "kind" : kind, "attempts" : 0}
+        message["message_id"] = await asyncio.to_thread(
+            self.database_client.add_claimed_outbox_message, channel, chat_id, message_text, kind,
+        )
+        if message["message_id"] is None:
+            # Outbox is not available: message is sent without saving, failure is raised to caller
+            with send_priority(get_send_priority(kind)):
+                return await self.senders[channel](chat_id, message_text)
+
+        result, error = await self._send(message)
+        await self._complete([message], [error])
+        return result if error is None else None
+
+
+    def wake_up(self) -> None:
+        """
+        Thread-safe wake up of dispatcher (error reports can be enqueued from worker threads).
+        """
+        if self._loop is None or self._loop.is_closed():
+            # Dispatcher is not started, messages will be claimed on start
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+
+    def _get_backoff(self, attempts : int) -> float:
+        return min(self.initial_backoff * 2 ** attempts, self.max_backoff)
+
+
+    async def _send(self, message : dict) -> tuple[object, Exception | None]:
+        """
+        Returns (result of sender, None) or (None, error).
+        """
+        sender = self.senders.get(message["channel"])
+        if sender is None:
+            return None, ValueError(f"Unknown outbox channel: {message['channel']}")
+        try:
+            with send_priority(get_send_priority(message["kind"])):
+                return await sender(message["chat_id"], message["message_text"]), None
+        except Exception as error:
+            return None, error
+
+
+    async def dispatch_batch(self) -> int:
+        """
+        Claims and sends one batch of messages. Returns count of claimed messages.
+        """
+        # On the first claiming messages which were "sending" during stop of bot are released at once
+        # (messages which are being delivered by this process are not released)
+        released_before = None if self._is_started else self._created_at
+        self._is_started = True
+        messages = await asyncio.to_thread(self.database_client.claim_outbox_messages, self.batch_size, 300.0, released_before)
+        if not messages:
+            return 0
+
+        results = await asyncio.gather(*(self._send(message) for message in messages))
+        await self._complete(messages, [error for _, error in results])
+        return len(messages)
+
+
+    async def _complete(self, messages : list[dict], errors : list[Exception | None]) -> None:
+        """
+        Saves results of sending of claimed messages.
+        """
+        now = time()
+        delivered_ids, retries, dead = [], [], []
+        for message, error in zip(messages, errors):
+            if error is None:
+                delivered_ids.append(message["message_id"])
+                continue
+            error_text = f"{type(error).__name__}: {error}"[:500]
+            if is_permanent_error(error) or message["attempts"] + 1 >= self.max_attempts:
+                dead.append((message["message_id"], error_text))
+                record_log(f"Outbox message {message['message_id']} ({message['kind']}) is dead: {error_text}", "outbox dispatcher")
+            else:
+                retries.append((message["message_id"], now + self._get_backoff(message["attempts"]), error_text))
+
+        await asyncio.to_thread(self.database_client.complete_outbox_messages, delivered_ids, retries, dead)
+        self.delivered_count += len(delivered_ids)
+        self.retried_count += len(retries)
+        self.dead_count += len(dead)
+
+
+    async def run(self) -> None:
+        """
+        Long-running subtask: drains outbox, then waits for new messages.
+        """
+        self._loop = asyncio.get_running_loop()
+        record_log("Outbox dispatcher is started", "outbox dispatcher")
+        draining_started_at = None
+        delivered_before = 0
+        last_report_at = monotonic()
+        while True:
+            claimed_count = await self.dispatch_batch()
+            if claimed_count:
+                if draining_started_at is None:
+                    draining_started_at, delivered_before = monotonic(), self.delivered_count
+                if monotonic() - last_report_at >= THROUGHPUT_LOG_INTERVAL:
+                    last_report_at = monotonic()
+                    self._report_throughput(draining_started_at, delivered_before, is_finished = False)
+                if claimed_count == self.batch_size:
+                    continue
+            elif draining_started_at is not None:
+                self._report_throughput(draining_started_at, delivered_before, is_finished = True)
+                draining_started_at = None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+    def _report_throughput(self, draining_started_at : float, delivered_before : int, is_finished : bool) -> None:
+        duration = max(monotonic() - draining_started_at, 1e-9)
+        delivered_count = self.delivered_count - delivered_before
+        record_log(
+            f"Outbox {'is drained' if is_finished else 'draining'}: {delivered_count} messages delivered in {duration:.1f} s "
+            f"({delivered_count / duration:.1f} messages/s), retried {self.retried_count}, dead {self.dead_count}",
+            "outbox dispatcher"
+        )
+
+
+    def get_stats(self) -> dict:
+        return {
+            "delivered_count" : self.delivered_count,
+            "retried_count" : self.retried_count,
+            "dead_count" : self.dead_count,
+            "outbox" : self.database_client.get_outbox_stats(),
+        }
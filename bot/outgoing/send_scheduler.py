@@ -0,0 +1,318 @@
+"""
+This module provides OutgoingScheduler - request middleware of bot session, which schedules all outgoing messages
+according to Telegram limits: global limit of bot and limits of each chat.
+
+Waiting requests are granted by priority (see SendPriority), chats of one priority are served in round-robin order.
+Chat with waiting requests is either in ready queue of its priority or in heap of chats waiting for token of their bucket,
+so each grant costs O(log n) of count of waiting chats.
+If Telegram still answers with "retry_after", chat (or whole bot) is paused for passed time and request is repeated.
+
+Priority of request is taken from context, e.g.:
+
+    with send_priority(SendPriority.ALERT):
+        await bot.send_message(redirect_chat_id, text)
+"""
+
+import asyncio
+import heapq
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from time import monotonic
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from .token_bucket import TokenBucket
+
+
+# API methods which are counted by Telegram as sent messages
+LIMITED_METHODS_PREFIXES : tuple[str] = ("send", "copy", "forward", "edit")
+
+# Idle chats' buckets are cleaned after this count of granted requests
+BUCKETS_CLEANING_PERIOD = 1000
+
+
+class SendPriority(IntEnum):
+    """
+    Priority classes of outgoing messages. Lower value is served earlier.
+    """
+    ALERT = 0
+    MENU = 1
+    BROADCAST = 2
+
+
+current_send_priority : ContextVar[SendPriority] = ContextVar("current_send_priority", default = SendPriority.MENU)
+
+
+@contextmanager
+def send_priority(priority : SendPriority):
+    """
+    Sets priority for all messages sent inside of `with` block.
+    """
+    token = current_send_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_send_priority.reset(token)
+
+
+class WaitTimeStats:
+    count : int
+    total : float
+    max : float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def add(self, wait_time : float) -> None:
+        self.count += 1
+        self.total += wait_time
+        if wait_time > self.max:
+            self.max = wait_time
+
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count" : self.count,
+            "mean" : (self.total / self.count) if self.count else 0.0,
+            "max" : self.max,
+        }
+
+
+class OutgoingScheduler(BaseRequestMiddleware):
+    """
+    Central scheduler of outgoing messages.
+
+    Parameters:
+    -----------
+    global_rate : float
+        messages per second for whole bot (Telegram: about 30)
+    private_chat_rate : float
+        messages per second for one private chat (Telegram: about 1)
+    private_chat_burst : float
+        messages which can be sent to private chat at once, e.g. several answers of one handler
+        (Telegram allows short bursts in private chats)
+    group_chat_rate : float
+        messages per second for one group (Telegram: about 20 per minute)
+    max_retries : int
+        how many times request is repeated after "retry_after" answer
+    """
+
+    def __init__(
+            self,
+            global_rate : float = 30,
+            private_chat_rate : float = 1,
+            private_chat_burst : float = 3,
+            group_chat_rate : float = 20 / 60,
+            max_retries : int = 3,
+        ) -> None:
+        self.private_chat_rate = private_chat_rate
+        self.private_chat_burst = private_chat_burst
+        self.group_chat_rate = group_chat_rate
+        self.max_retries = max_retries
+
+        self._global_bucket = TokenBucket(global_rate)
+        self._chats_buckets : dict[int | str, TokenBucket] = {}
+        # priority -> chat ID -> waiters of chat in FIFO order
+        self._pending : dict[SendPriority, dict[int | str | None, deque[asyncio.Future]]] = {priority : {} for priority in SendPriority}
+        # priority -> chats with waiters, whose buckets have token (round-robin order)
+        self._ready : dict[SendPriority, deque[int | str | None]] = {priority : deque() for priority in SendPriority}
+        # (time of token, priority, sequence number, chat ID) of chats with waiters, whose buckets have no token
+        self._sleeping : list[tuple[float, SendPriority, int, int | str | None]] = []
+        self._sleeping_sequence = 0
+        self._pending_count = 0
+        self._new_waiter = asyncio.Event()
+        self._pump_task : asyncio.Task | None = None
+        self._granted_count = 0
+
+        self.retry_after_count = 0
+        self._wait_time_stats : dict[SendPriority, WaitTimeStats] = {priority : WaitTimeStats() for priority in SendPriority}
+
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(LIMITED_METHODS_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = current_send_priority.get()
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as flood_error:
+                self.retry_after_count += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                bucket = self._get_chat_bucket(chat_id) or self._global_bucket
+                bucket.block(flood_error.retry_after)
+
+
+    async def _acquire(self, chat_id : int | str | None, priority : SendPriority) -> None:
+        """
+        Waits until request of passed chat and priority is granted by pump.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        chat_waiters = self._pending[priority].get(chat_id)
+        if chat_waiters is None:
+            chat_waiters = self._pending[priority][chat_id] = deque()
+            self._schedule_chat(chat_id, priority, monotonic())
+        chat_waiters.append(waiter)
+        self._pending_count += 1
+        self._new_waiter.set()
+
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+        enqueued_at = monotonic()
+        await waiter
+        self._wait_time_stats[priority].add(monotonic() - enqueued_at)
+
+
+    def _get_chat_bucket(self, chat_id : int | str | None) -> TokenBucket | None:
+        if chat_id is None:
+            return None
+        bucket = self._chats_buckets.get(chat_id)
+        if bucket is None:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            if is_private:
+                bucket = TokenBucket(self.private_chat_rate, self.private_chat_burst)
+            else:
+                bucket = TokenBucket(self.group_chat_rate)
+            self._chats_buckets[chat_id] = bucket
+        return bucket
+
+
+    def _schedule_chat(self, chat_id : int | str | None, priority : SendPriority, now : float) -> None:
+        """
+        Puts chat with waiters into ready queue of priority or into heap of sleeping chats until token of its bucket.
+        """
+        bucket = self._get_chat_bucket(chat_id)
+        delay = bucket.time_to_token(now) if bucket else 0.0
+        if delay > 0:
+            self._sleeping_sequence += 1
+            heapq.heappush(self._sleeping, (now + delay, priority, self._sleeping_sequence, chat_id))
+        else:
+            self._ready[priority].append(chat_id)
+
+
+    def _grant_next(self, now : float) -> float:
+        """
+        Grants first ready request in priority order.
+
+        Returns 0.0, if request was granted, otherwise count of seconds until some chat will be ready.
+        """
+        while self._sleeping and self._sleeping[0][0] <= now:
+            _, priority, _, chat_id = heapq.heappop(self._sleeping)
+            # Token could be taken by request of chat with other priority or bucket could be blocked by "retry_after"
+            self._schedule_chat(chat_id, priority, now)
+
+        for priority in SendPriority:
+            chats, ready_chats = self._pending[priority], self._ready[priority]
+            while ready_chats:
+                chat_id = ready_chats.popleft()
+                waiters = chats[chat_id]
+                while waiters and waiters[0].done():
+                    # Requester was cancelled while waiting
+                    waiters.popleft()
+                    self._pending_count -= 1
+                if not waiters:
+                    del chats[chat_id]
+                    continue
+
+                bucket = self._get_chat_bucket(chat_id)
+                if bucket and bucket.time_to_token(now) > 0:
+                    self._schedule_chat(chat_id, priority, now)
+                    continue
+
+                if bucket:
+                    bucket.consume(now)
+                self._global_bucket.consume(now)
+                waiters.popleft().set_result(None)
+                self._pending_count -= 1
+
+                # Round-robin: chat goes to the end of queue of its priority (or sleeps until token)
+                if waiters:
+                    self._schedule_chat(chat_id, priority, now)
+                else:
+                    del chats[chat_id]
+
+                self._granted_count += 1
+                if not self._granted_count % BUCKETS_CLEANING_PERIOD:
+                    self._clean_buckets(now)
+                return 0.0
+        return (self._sleeping[0][0] - now) if self._sleeping else float("inf")
+
+
+    def _clean_buckets(self, now : float) -> None:
+        """
+        Removes full buckets of chats: new bucket of chat is equal to full one.
+        """
+        for chat_id, bucket in list(self._chats_buckets.items()):
+            if bucket.is_full(now):
+                del self._chats_buckets[chat_id]
+
+
+    async def _pump(self) -> None:
+        while True:
+            if not self._pending_count:
+                self._new_waiter.clear()
+                await self._new_waiter.wait()
+                continue
+
+            now = monotonic()
+            delay = self._global_bucket.time_to_token(now)
+            if delay <= 0:
+                delay = self._grant_next(now)
+                if delay <= 0:
+                    continue
+                if delay == float("inf"):
+                    # All pending requests were cancelled
+                    continue
+
+            self._new_waiter.clear()
+            try:
+                await asyncio.wait_for(self._new_waiter.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+    def get_queue_delay(self) -> float:
+        """
+        Returns count of seconds needed to send all waiting requests with global rate
+        (lower bound of waiting time of new request with the lowest priority).
+        """
+        return self._pending_count / self._global_bucket.rate
+
+
+    def get_stats(self) -> dict:
+        """
+        Returns queue depth (total and by priority), wait time stats by priority and count of "retry_after" answers.
+        """
+        return {
+            "queue_depth" : self._pending_count,
+            "queue_depth_by_priority" : {
+                priority.name : sum(len(waiters) for waiters in self._pending[priority].values()) for priority in SendPriority
+            },
+            "wait_time" : {priority.name : stats.as_dict() for priority, stats in self._wait_time_stats.items()},
+            "retry_after_count" : self.retry_after_count,
+            "chats_buckets_count" : len(self._chats_buckets),
+        }
+
+
+    async def close(self) -> None:
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
@@ -0,0 +1,62 @@
+"""
+This module provides TokenBucket - rate limiter used for outgoing messages scheduling.
+"""
+
+from time import monotonic
+
+
+class TokenBucket:
+    """
+    Classic token bucket: gets `rate` tokens per second, but holds at most `capacity` tokens.
+
+    Any interval of T seconds contains at most `capacity + rate * T` consumed tokens.
+    """
+    rate : float
+    capacity : float
+    tokens : float
+    updated_at : float
+
+    def __init__(self, rate : float, capacity : float = 1) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"Invalid token bucket parameters: {rate=}, {capacity=}")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = monotonic()
+
+
+    def _refill(self, now : float) -> None:
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+
+    def time_to_token(self, now : float | None = None) -> float:
+        """
+        Returns count of seconds until one token will be available (0.0 if token is available now).
+        """
+        self._refill(monotonic() if now is None else now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+    def consume(self, now : float | None = None) -> None:
+        """
+        Takes one token. Be sure about token availability (check time_to_token).
+        """
+        self._refill(monotonic() if now is None else now)
+        self.tokens -= 1
+
+
+    def block(self, seconds : float, now : float | None = None) -> None:
+        """
+        Makes next token available not earlier than in passed count of seconds (used for Telegram "retry_after").
+        """
+        self._refill(monotonic() if now is None else now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+    def is_full(self, now : float | None = None) -> bool:
+        self._refill(monotonic() if now is None else now)
+        return self.tokens >= self.capacity
@@ -1,19 +1,42 @@
 import asyncio
 import logging
 
-from aiogram import Dispatcher
-
 from aiogram.fsm.storage.memory import MemoryStorage
 
+from config import get_loop_watchdog_threshold, get_updates_capture_config, get_updates_workers_count
+
 from logger import record_log, regist_error
 
-from vars import bot, DEV_ID
+from incoming import GuardedDispatcher, UpdateCaptureMiddleware, UpdateCaptureWriter, drain_backlog
+
+from metrics import HandlerMetricsMiddleware, instrument_filters
+
+from vars import bot, bot_db_client, bot_metrics, intake_guard, loop_watchdog, outgoing_scheduler, DEV_ID
 
 from bot_scripts import bot_subtasks
+from bot_scripts.delay_tracking import delay_notifications, group_pipeline, recover_deadlines
+from bot_scripts.middlewares import UserContextResolverMiddleware
+from bot_scripts.updates_processing import ChatOrderedEventIsolation
 
 
 storage = MemoryStorage()
-dp = Dispatcher(storage = storage)
+# Updates of one chat are processed in order of receiving, updates of different chats - concurrently by limited pool of workers
+events_isolation = ChatOrderedEventIsolation(workers_count = get_updates_workers_count())
+# Updates pass through intake guard, which sheds low-priority updates on overload,
+# handled updates are known to loop watchdog, which logs blockings of loop with them
+dp = GuardedDispatcher(storage = storage, events_isolation = events_isolation, intake_guard = intake_guard, loop_watchdog = loop_watchdog)
+# Opt-in capture of raw updates for replays, config section "updates_capture": {"directory": ..., "salt": ..., "max_files": ...}
+updates_capture_config = get_updates_capture_config()
+updates_capture_writer = UpdateCaptureWriter(**updates_capture_config) if updates_capture_config else None
+if updates_capture_writer is not None:
+    dp.update.outer_middleware(UpdateCaptureMiddleware(updates_capture_writer))
+# Roles of update's sender are resolved once and are passed to filters and handlers as "user_context"
+dp.update.outer_middleware(UserContextResolverMiddleware(bot_db_client))
+# Durations and errors of handlers of all routers
+handler_metrics_middleware = HandlerMetricsMiddleware(bot_metrics)
+for event_name, observer in dp.observers.items():
+    if event_name != "update":
+        observer.middleware(handler_metrics_middleware)
 
 # Routers including:
 from bot_scripts import routers
@@ -28,6 +51,9 @@ for router in routers:
         )
         exit()
 
+# Filters of all handlers are timed, routers must be included before
+instrument_filters(dp, bot_metrics)
+
 
 async def main() -> None:
     bot_me = await bot.get_me()
@@ -40,11 +66,35 @@ async def main() -> None:
     _set_bot_tag(bot_me.username)
     record_log(f"Bot tag @{bot_me.username} was set", "main")
 
+    record_log("Deadlines recovering...", "main")
+    await recover_deadlines()
+
+    if get_loop_watchdog_threshold():
+        loop_watchdog.start()
+
     record_log("Subtasks starting...", "main")
     bot_subtasks.start_subtasks()
     record_log("Subtasks have been started.", "main")
 
-    await dp.start_polling(bot, skip_updates = False)
+    # Updates received during downtime are collapsed per chat and processed at once
+    record_log("Backlog draining...", "main")
+    try:
+        await drain_backlog(dp, bot, group_pipeline.classify_message, flush = group_pipeline.flush)
+    except Exception as error:
+        regist_error(f"Backlog draining error, the rest of backlog is processed by polling: {error}", type(error))
+
+    try:
+        await dp.start_polling(bot, skip_updates = False)
+    finally:
+        record_log("Subtasks stopping...", "main")
+        await bot_subtasks.stop_subtasks()
+        group_pipeline.flush()
+        # Notifications which were not sent are delivered after restart
+        delay_notifications.spill_unsent()
+        await outgoing_scheduler.close()
+        loop_watchdog.stop()
+        if updates_capture_writer is not None:
+            updates_capture_writer.close()
 
 
 def _set_bot_tag(bot_tag : str):
@@ -0,0 +1,25 @@
+"""
+Tests of bot. Run from "bot" directory:
+    python -m pytest tests
+
+Databases of bot are replaced by scratch copies in temporary directory before the first import of "vars",
+reports of errors are only recorded into log.
+"""
+
+import sys
+import tempfile
+
+from pathlib import Path
+
+
+BOT_DIR = Path(__file__).parent.parent
+if str(BOT_DIR) not in sys.path:
+    sys.path.insert(0, str(BOT_DIR))
+
+import logger.rchat_interactor as rchat_interactor
+
+from benchmarks.offline_bot import prepare_databases
+
+
+prepare_databases(Path(tempfile.mkdtemp(prefix = "bot-tests-")))
+rchat_interactor.post_message = lambda message_text, receiver_id: None
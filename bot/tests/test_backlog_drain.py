@@ -0,0 +1,73 @@
+"""
+Tests of drain_backlog through GuardedDispatcher: updates of backlog are fed by batches, so IntakeGuard does not shed them,
+unhandled updates are not counted as processed.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.types import Chat, Message, Update, User
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from incoming import GuardedDispatcher, IntakeGuard, UpdatePriority, drain_backlog
+
+
+class IdleLoopLagMonitor:
+    def get_current_lag(self) -> float:
+        return 0.0
+
+
+def make_updates(count : int) -> list[Update]:
+    return [
+        Update(
+            update_id = update_id,
+            message = Message(
+                message_id = update_id,
+                date = datetime.now(),
+                chat = Chat(id = 1000 + update_id % 50, type = "private"),
+                from_user = User(id = 1000 + update_id % 50, is_bot = False, first_name = "User"),
+                text = "hello",
+            ),
+        )
+        for update_id in range(1, count + 1)
+    ]
+
+
+def drain(updates_count : int, batch_size : int) -> tuple:
+    async def run():
+        intake_guard = IntakeGuard(lambda update: UpdatePriority.LOW, IdleLoopLagMonitor(), max_pending = 100, hard_max_pending = 200)
+        dispatcher = GuardedDispatcher(intake_guard = intake_guard)
+        handled = []
+
+        @dispatcher.message()
+        async def handler(message : Message):
+            await asyncio.sleep(0.001)
+            handled.append(message.message_id)
+
+        session = FakeTelegramSession(pending_updates = make_updates(updates_count))
+        bot = Bot(token = FAKE_TOKEN, session = session)
+        stats = await drain_backlog(dispatcher, bot, classify_message = lambda message: None, batch_size = batch_size)
+        return stats, handled, intake_guard
+
+    return asyncio.run(run())
+
+
+def test_backlog_is_not_shed():
+    stats, handled, intake_guard = drain(updates_count = 1000, batch_size = 100)
+
+    assert stats.fetched_count == 1000
+    assert (stats.processed_count, stats.unhandled_count, stats.failed_count) == (1000, 0, 0)
+    assert sorted(handled) == list(range(1, 1001))
+    assert intake_guard.shed_counts[UpdatePriority.LOW] == 0
+
+
+def test_shed_updates_are_counted_as_unhandled():
+    stats, handled, intake_guard = drain(updates_count = 300, batch_size = 300)
+
+    shed_count = intake_guard.shed_counts[UpdatePriority.LOW]
+    assert shed_count > 0
+    assert stats.unhandled_count == shed_count
+    assert stats.processed_count == len(handled) == 300 - shed_count
@@ -0,0 +1,62 @@
+"""
+Tests of HandlerMetricsMiddleware: callback queries are labelled by matched route, labels do not depend on callback data.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from bot_scripts.updates_processing import CallbackRouter
+
+from metrics import BotMetrics, HandlerMetricsMiddleware
+
+
+class PageCallback(CallbackData, prefix = "pg"):
+    page : int
+
+
+def make_update(update_id : int, callback_data : str) -> Update:
+    return Update(
+        update_id = update_id,
+        callback_query = CallbackQuery(
+            id = str(update_id),
+            from_user = User(id = 7, is_bot = False, first_name = "User"),
+            chat_instance = "1",
+            data = callback_data,
+            message = Message(message_id = 1, date = datetime.now(), chat = Chat(id = 7, type = "private")),
+        ),
+    )
+
+
+def test_callbacks_are_labelled_by_matched_route():
+    async def run():
+        router = CallbackRouter(name = "callbacks")
+
+        @router.callback(PageCallback, lambda callback: callback.data.endswith("0"))
+        async def first_page(callback : CallbackQuery, callback_data : PageCallback):
+            pass
+
+        @router.callback(PageCallback)
+        async def other_page(callback : CallbackQuery, callback_data : PageCallback):
+            pass
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        metrics = BotMetrics()
+        dispatcher.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+
+        bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+        callbacks_data = ["pg:0", "pg:1", "pg:2"] + [f"x{number}:{number}" for number in range(100)]
+        for update_id, callback_data in enumerate(callbacks_data):
+            await dispatcher.feed_update(bot, make_update(update_id, callback_data))
+
+        counts = {labels : histogram.count for labels, histogram in metrics.handler_duration.children.items()}
+        assert counts == {("callback_query", "first_page") : 1, ("callback_query", "other_page") : 2}
+
+    asyncio.run(run())
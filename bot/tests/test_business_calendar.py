@@ -0,0 +1,167 @@
+"""
+Property-based tests of BusinessCalendar: random calendars (working hours, overnight shifts, weekends, holidays, timezones
+with DST) are compared with brute-force reference, which walks time minute by minute and checks local wall clock.
+"""
+
+import random
+
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytz
+
+from delay_control import BusinessCalendar
+
+
+TIMEZONES : tuple[str] = ("UTC", "Europe/Berlin", "America/New_York", "Asia/Almaty")
+# Days around DST transitions of 2026 (Europe: March 29 and October 25, USA: March 8 and November 1) and usual days
+BASE_DAYS : tuple[datetime] = (
+    datetime(2026, 3, 27), datetime(2026, 3, 6), datetime(2026, 10, 23), datetime(2026, 10, 30), datetime(2026, 6, 1),
+)
+TRIALS_COUNT = 60
+PROBES_INTERVAL = 37 * 60
+
+
+class ReferenceCalendar:
+    """
+    Brute-force calendar: moment is working, if wall clock of company is inside working hours of working date
+    (overnight hours after midnight belong to previous date).
+    """
+
+    def __init__(self, calendar_arguments : dict) -> None:
+        self.timezone = pytz.timezone(calendar_arguments["timezone"])
+        start_hours, start_minutes = map(int, calendar_arguments["working_time_start"].split(":"))
+        end_hours, end_minutes = map(int, calendar_arguments["working_time_end"].split(":"))
+        self.start = start_hours * 60 + start_minutes
+        self.end = end_hours * 60 + end_minutes
+        self.weekend = set(calendar_arguments["weekend"])
+        self.holidays = {date.fromisoformat(holiday) for holiday in calendar_arguments["holidays"]}
+
+
+    def _is_working_date(self, day : date) -> bool:
+        return (day.weekday() not in self.weekend) and (day not in self.holidays)
+
+
+    def is_working_time(self, timestamp : int) -> bool:
+        local_moment = datetime.fromtimestamp(timestamp, self.timezone)
+        minute = local_moment.hour * 60 + local_moment.minute
+        day = local_moment.date()
+        if self.start == self.end:
+            return self._is_working_date(day)
+        if self.start < self.end:
+            return self._is_working_date(day) and (self.start <= minute < self.end)
+        return ((minute >= self.start) and self._is_working_date(day)) or (
+            (minute < self.end) and self._is_working_date(day - timedelta(days = 1))
+        )
+
+
+    def add_business_seconds(self, timestamp : int, seconds : int) -> int:
+        moment = timestamp
+        if not seconds:
+            while not self.is_working_time(moment):
+                moment += 60
+            return moment
+        remaining = seconds
+        while remaining > 0:
+            if self.is_working_time(moment):
+                remaining -= 60
+            moment += 60
+        return moment
+
+
+def get_repeated_hours(timezone_name : str) -> set[int]:
+    """
+    Returns local hours, which are repeated by DST overlaps of test days.
+    """
+    timezone = pytz.timezone(timezone_name)
+    repeated_hours = set()
+    for base_day in BASE_DAYS:
+        for day_offset in range(-2, 6):
+            for hour in range(24):
+                local_moment = datetime.combine(base_day.date() + timedelta(days = day_offset), datetime.min.time()).replace(hour = hour)
+                try:
+                    timezone.localize(local_moment, is_dst = None)
+                except pytz.AmbiguousTimeError:
+                    repeated_hours.add(hour)
+                except pytz.NonExistentTimeError:
+                    pass
+    return repeated_hours
+
+
+def make_calendar_arguments(randomizer : random.Random, timezone_name : str, base_day : datetime) -> dict:
+    # Boundary inside repeated hour is ambiguous for wall clock reference (see test_boundary_in_dst_gap_and_overlap)
+    repeated_hours = get_repeated_hours(timezone_name)
+    hours = [hour for hour in range(24) if hour not in repeated_hours]
+    return {
+        "working_time_start" : f"{randomizer.choice(hours):02d}:{randomizer.choice((0, 30)):02d}",
+        "working_time_end" : f"{randomizer.choice(hours):02d}:{randomizer.choice((0, 30)):02d}",
+        "weekend" : randomizer.sample(range(7), randomizer.randint(0, 3)),
+        "timezone" : timezone_name,
+        "holidays" : [
+            (base_day.date() + timedelta(days = randomizer.randint(-1, 4))).isoformat()
+            for _ in range(randomizer.randint(0, 2))
+        ],
+    }
+
+
+@pytest.mark.parametrize("timezone_name", TIMEZONES)
+def test_working_time_and_deadlines_match_reference(timezone_name):
+    randomizer = random.Random(timezone_name)
+    for _ in range(TRIALS_COUNT):
+        base_day = randomizer.choice(BASE_DAYS)
+        calendar_arguments = make_calendar_arguments(randomizer, timezone_name, base_day)
+        calendar, reference = BusinessCalendar(**calendar_arguments), ReferenceCalendar(calendar_arguments)
+        start = int(pytz.utc.localize(base_day).timestamp()) + randomizer.randrange(3 * 24 * 60) * 60
+
+        for probe in range(start, start + 3 * 24 * 60 * 60, PROBES_INTERVAL):
+            assert calendar.is_working_time(probe) == reference.is_working_time(probe), (calendar_arguments, probe)
+
+        seconds = randomizer.randrange(12 * 60) * 60
+        assert calendar.add_business_seconds(start, seconds) == reference.add_business_seconds(start, seconds), (
+            calendar_arguments, start, seconds,
+        )
+
+
+def test_overnight_shift_belongs_to_day_of_its_start():
+    # Friday is working, Saturday and Sunday are weekend: shift of Friday ends on Saturday morning
+    calendar = BusinessCalendar("22:00", "06:00", weekend = [5, 6])
+    saturday_morning = datetime(2026, 6, 6, 3, 0, tzinfo = pytz.utc).timestamp()
+    sunday_morning = datetime(2026, 6, 7, 3, 0, tzinfo = pytz.utc).timestamp()
+
+    assert calendar.is_working_time(saturday_morning)
+    assert not calendar.is_working_time(sunday_morning)
+    # 2 hours of Friday's shift are left at 04:00 of Saturday, the rest is counted from Monday 22:00
+    deadline = calendar.add_business_seconds(datetime(2026, 6, 6, 4, 0, tzinfo = pytz.utc).timestamp(), 3 * 60 * 60)
+    assert deadline == datetime(2026, 6, 8, 23, 0, tzinfo = pytz.utc).timestamp()
+
+
+def test_holiday_is_skipped():
+    calendar = BusinessCalendar("09:00", "18:00", holidays = ["2026-06-02"])
+    deadline = calendar.add_business_seconds(datetime(2026, 6, 1, 17, 0, tzinfo = pytz.utc).timestamp(), 2 * 60 * 60)
+    assert deadline == datetime(2026, 6, 3, 10, 0, tzinfo = pytz.utc).timestamp()
+
+
+def test_working_day_is_shorter_and_longer_on_dst_transitions():
+    calendar = BusinessCalendar("00:00", "06:00", timezone = "Europe/Berlin")
+    berlin = pytz.timezone("Europe/Berlin")
+
+    spring_start, spring_end = calendar.get_window(date(2026, 3, 29))
+    autumn_start, autumn_end = calendar.get_window(date(2026, 10, 25))
+    assert spring_end - spring_start == 5 * 60 * 60
+    assert autumn_end - autumn_start == 7 * 60 * 60
+    assert spring_start == berlin.localize(datetime(2026, 3, 29)).timestamp()
+
+
+def test_boundary_in_dst_gap_and_overlap():
+    berlin = pytz.timezone("Europe/Berlin")
+    # 02:30 does not exist on March 29: window starts when clock jumps to 03:00
+    spring_calendar = BusinessCalendar("02:30", "10:00", timezone = "Europe/Berlin")
+    assert spring_calendar.get_window(date(2026, 3, 29))[0] == berlin.localize(datetime(2026, 3, 29, 3, 0)).timestamp()
+    # 02:30 happens twice on October 25: the first occurrence is boundary
+    autumn_calendar = BusinessCalendar("00:00", "02:30", timezone = "Europe/Berlin")
+    assert autumn_calendar.get_window(date(2026, 10, 25))[1] == berlin.localize(datetime(2026, 10, 25, 2, 30), is_dst = True).timestamp()
+
+
+def test_calendar_without_working_days():
+    calendar = BusinessCalendar("09:00", "18:00", weekend = list(range(7)))
+    assert calendar.add_business_seconds(datetime(2026, 6, 1, tzinfo = pytz.utc).timestamp(), 60) is None
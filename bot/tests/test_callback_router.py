@@ -0,0 +1,80 @@
+"""
+Tests of CallbackRouter: dispatching by prefix of callback data and flags of routes in inner middlewares.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.flags import get_flag
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from bot_scripts.updates_processing import CallbackRouter
+
+
+class PageCallback(CallbackData, prefix = "pg"):
+    page : int
+
+
+class OtherCallback(CallbackData, prefix = "ot"):
+    value : str
+
+
+def make_update(update_id : int, callback_data : str) -> Update:
+    user = User(id = 7, is_bot = False, first_name = "User")
+    return Update(
+        update_id = update_id,
+        callback_query = CallbackQuery(
+            id = str(update_id),
+            from_user = user,
+            chat_instance = "1",
+            data = callback_data,
+            message = Message(message_id = 1, date = datetime.now(), chat = Chat(id = 7, type = "private")),
+        ),
+    )
+
+
+def test_inner_middlewares_receive_handler_and_flags_of_route():
+    async def run():
+        calls = []
+        router = CallbackRouter(name = "callbacks")
+
+        @router.callback(PageCallback, lambda callback: callback.data.endswith("0"), flags = {"throttling" : "first"})
+        async def first_page(callback : CallbackQuery, callback_data : PageCallback):
+            calls.append(("first_page", callback_data.page))
+
+        @router.callback(PageCallback, flags = {"throttling" : "pages"})
+        async def other_page(callback : CallbackQuery, callback_data : PageCallback):
+            calls.append(("other_page", callback_data.page))
+
+        @router.callback(OtherCallback)
+        async def other(callback : CallbackQuery, callback_data : OtherCallback):
+            calls.append(("other", callback_data.value))
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        seen = []
+
+        @dispatcher.callback_query.middleware()
+        async def recorder(handler, event, data):
+            seen.append((data["handler"].callback.__name__, get_flag(data, "throttling")))
+            return await handler(event, data)
+
+        bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+        for update_id, callback_data in enumerate(("pg:0", "pg:3", "ot:x")):
+            await dispatcher.feed_update(bot, make_update(update_id, callback_data))
+
+        assert calls == [("first_page", 0), ("other_page", 3), ("other", "x")]
+        assert seen == [("first_page", "first"), ("other_page", "pages"), ("other", None)]
+
+        # Unknown prefix and payload of other encoding are not handled and do not reach inner middlewares
+        assert await dispatcher.feed_update(bot, make_update(10, "zz:1")) is UNHANDLED
+        assert await dispatcher.feed_update(bot, make_update(11, "pg:not_a_number")) is UNHANDLED
+        assert len(seen) == 3
+
+    asyncio.run(run())
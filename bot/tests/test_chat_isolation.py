@@ -0,0 +1,120 @@
+import asyncio
+import random
+
+from collections import defaultdict
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Message, Update
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+from bot_scripts.updates_processing import ChatOrderedEventIsolation
+from incoming import UpdatePriority, update_priority
+
+
+CHATS_COUNT = 40
+UPDATES_PER_CHAT = 15
+WORKERS_COUNT = 8
+
+
+def make_updates(seed : int = 1) -> list[Update]:
+    """
+    Returns interleaved messages of many chats, text of message is its number in chat.
+    """
+    randomizer = random.Random(seed)
+    chats_sequences = {chat_id : list(range(UPDATES_PER_CHAT)) for chat_id in range(1, CHATS_COUNT + 1)}
+    updates = []
+    while chats_sequences:
+        chat_id = randomizer.choice(list(chats_sequences))
+        number = chats_sequences[chat_id].pop(0)
+        if not chats_sequences[chat_id]:
+            del chats_sequences[chat_id]
+        updates.append(Update.model_validate({
+            "update_id" : len(updates) + 1,
+            "message" : {
+                "message_id" : number + 1,
+                "date" : 0,
+                "chat" : {"id" : chat_id, "type" : "private"},
+                "from" : {"id" : chat_id, "is_bot" : False, "first_name" : "user"},
+                "text" : str(number),
+            },
+        }))
+    return updates
+
+
+async def replay(updates : list[Update]) -> tuple[dict[int, list[int]], int, ChatOrderedEventIsolation]:
+    events_isolation = ChatOrderedEventIsolation(workers_count = WORKERS_COUNT)
+    dispatcher = Dispatcher(events_isolation = events_isolation)
+    bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+    randomizer = random.Random(2)
+    handled : dict[int, list[int]] = defaultdict(list)
+    in_processing = set()
+    max_concurrency = 0
+
+    @dispatcher.message()
+    async def handler(message : Message):
+        nonlocal max_concurrency
+        assert message.chat.id not in in_processing, "two updates of one chat are processed at the same time"
+        in_processing.add(message.chat.id)
+        max_concurrency = max(max_concurrency, len(in_processing))
+        await asyncio.sleep(randomizer.uniform(0, 0.003))
+        handled[message.chat.id].append(int(message.text))
+        in_processing.discard(message.chat.id)
+
+    # Each update is fed in separate task, like polling does
+    await asyncio.gather(*(dispatcher.feed_update(bot, update) for update in updates))
+    return handled, max_concurrency, events_isolation
+
+
+def test_updates_of_chat_are_processed_in_order_of_receiving():
+    handled, _, _ = asyncio.run(replay(make_updates()))
+
+    assert len(handled) == CHATS_COUNT
+    for chat_id, numbers in handled.items():
+        assert numbers == list(range(UPDATES_PER_CHAT)), f"order of chat {chat_id} is broken"
+
+
+def test_chats_are_processed_concurrently_within_workers_limit():
+    _, max_concurrency, events_isolation = asyncio.run(replay(make_updates()))
+
+    assert 1 < max_concurrency <= WORKERS_COUNT
+    # Lanes of chats are removed, when chats have no updates
+    assert events_isolation.get_stats()["active_lanes"] == 0
+    assert events_isolation.get_stats()["busy_workers"] == 0
+
+
+def test_update_behind_high_priority_update_gets_worker_first():
+    events_isolation = ChatOrderedEventIsolation(workers_count = 1)
+    handled = []
+    blocker_started = asyncio.Event()
+    blocker_released = asyncio.Event()
+
+    async def process(chat_id : int, name : str, priority : UpdatePriority, blocker : bool = False) -> None:
+        update_priority.set(priority)
+        async with events_isolation.lock(StorageKey(bot_id = 1, chat_id = chat_id, user_id = chat_id)):
+            if blocker:
+                blocker_started.set()
+                await blocker_released.wait()
+            await asyncio.sleep(0.01)
+            handled.append(name)
+
+    async def run():
+        tasks = [asyncio.create_task(process(1, "blocker", UpdatePriority.NORMAL, blocker = True))]
+        await blocker_started.wait()
+        # Customer's messages wait for the only worker, then manager replies in chat 4 behind customer's message
+        for chat_id, name, priority in (
+            (2, "customer 2", UpdatePriority.NORMAL),
+            (3, "customer 3", UpdatePriority.NORMAL),
+            (4, "customer 4", UpdatePriority.NORMAL),
+            (4, "manager 4", UpdatePriority.HIGH),
+        ):
+            tasks.append(asyncio.create_task(process(chat_id, name, priority)))
+            await asyncio.sleep(0)
+        blocker_released.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    # Message of chat 4 inherits priority of manager's reply, order inside chat is kept.
+    # Worker released by chat 4 is given before the reply requests it, so the reply waits for one more update
+    assert handled == ["blocker", "customer 4", "customer 2", "manager 4", "customer 3"]
+    assert events_isolation.get_stats()["waiting_for_worker"] == 0
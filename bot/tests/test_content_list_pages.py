@@ -0,0 +1,60 @@
+"""
+Tests of paged content list: pages are rendered once per version of communicator's content and are re-rendered
+after update of patterns, pages do not exceed limit of Telegram in UTF-16 code units and do not split surrogate pairs.
+"""
+
+from communication.messages_patterns_db_client import MessagesPatternsDBClient
+
+from bot_scripts.custom_types import ContentType
+from bot_scripts.keyboards import ContentListPages
+from bot_scripts.keyboards.paging_kb import get_utf16_length, split_into_pages
+
+
+TEST_KEY = "test_content_list_pages"
+
+
+def test_pages_are_rendered_again_only_after_update_of_patterns():
+    from vars import communicator
+
+    patterns_client = MessagesPatternsDBClient()
+    patterns_client.add_message_pattern(TEST_KEY, "first text")
+    assert communicator.update_patterns()
+
+    content_list_pages = ContentListPages()
+    keyboard = content_list_pages.get_keyboard(ContentType.MESSAGES)
+    assert content_list_pages.get_keyboard(ContentType.MESSAGES) is keyboard
+    assert content_list_pages.get_keyboard(ContentType.KEYBOARDS) is not keyboard
+    pages_text = "".join(text for _, text in keyboard.items)
+    assert '""first text""' in pages_text
+
+    # Changed pattern is not seen until patterns are updated
+    assert communicator.update_message_content(TEST_KEY, "second text")
+    assert content_list_pages.get_keyboard(ContentType.MESSAGES) is keyboard
+
+    assert communicator.update_patterns()
+    updated_keyboard = content_list_pages.get_keyboard(ContentType.MESSAGES)
+    assert updated_keyboard is not keyboard
+    pages_text = "".join(text for _, text in updated_keyboard.items)
+    assert '""second text""' in pages_text and '""first text""' not in pages_text
+    assert content_list_pages.get_keyboard(ContentType.MESSAGES) is updated_keyboard
+
+
+def test_shown_page_does_not_move_shared_keyboard():
+    keyboard = ContentListPages().get_keyboard(ContentType.MESSAGES)
+    position = keyboard.current_first_point
+    last_page = keyboard.show_page(keyboard.pages_count + 10)
+    assert last_page.message_text == keyboard.show_page(keyboard.pages_count - 1).message_text
+    assert keyboard.current_first_point == position
+
+
+def test_pages_fit_length_in_utf16_code_units():
+    header = "Header\n"
+    blocks = [f"\nblock {number} 😀\n" for number in range(300)] + ["😀" * 100]
+    pages = split_into_pages(blocks, max_length = 120, header = header)
+
+    assert all(page.startswith(header) for page in pages)
+    assert all(get_utf16_length(page) <= 120 for page in pages)
+    # Blocks are kept whole, only block longer than page is split and not inside of surrogate pair
+    assert "".join(page[len(header):] for page in pages) == "".join(blocks)
+    assert all(any(block in page for page in pages) for block in blocks[:-1])
+    assert split_into_pages([], max_length = 120, header = header) == [header]
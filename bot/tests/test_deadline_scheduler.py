@@ -0,0 +1,67 @@
+"""
+Tests of DeadlineScheduler: each chat has at most one active deadline, cancelled and replaced deadlines never fire,
+compaction of heap and bulk loading keep deadlines.
+"""
+
+import random
+
+from delay_control import DeadlineScheduler
+from delay_control.deadline_scheduler import MIN_TOMBSTONES_TO_COMPACT
+
+
+def test_rearmed_and_cancelled_deadlines_do_not_fire():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(1, 10.0, "first")
+    scheduler.arm(2, 20.0)
+    scheduler.arm(1, 30.0, "second")
+    scheduler.arm(3, 5.0)
+    assert scheduler.cancel(3)
+    assert not scheduler.cancel(3)
+
+    assert len(scheduler) == 2
+    assert scheduler.next_deadline() == 20.0
+    assert scheduler.pop_expired(25.0) == [(2, 20.0, None)]
+    assert scheduler.pop_expired(29.0) == []
+    assert scheduler.pop_expired(30.0) == [(1, 30.0, "second")]
+    assert scheduler.next_deadline() is None
+    assert 1 not in scheduler
+
+
+def test_scheduler_matches_dictionary_of_deadlines():
+    randomizer = random.Random(0)
+    scheduler = DeadlineScheduler()
+    expected : dict[int, float] = {}
+    now = 0.0
+    # Enough cancellations to compact heap several times
+    for _ in range(20 * MIN_TOMBSTONES_TO_COMPACT):
+        chat_id = randomizer.randrange(500)
+        action = randomizer.random()
+        if action < 0.5:
+            deadline = now + randomizer.uniform(0, 100)
+            scheduler.arm(chat_id, deadline, chat_id)
+            expected[chat_id] = deadline
+        elif action < 0.9:
+            assert scheduler.cancel(chat_id) == (expected.pop(chat_id, None) is not None)
+        else:
+            now += randomizer.uniform(0, 10)
+            fired = scheduler.pop_expired(now)
+            fired_deadlines = [deadline for _, deadline, _ in fired]
+            assert fired_deadlines == sorted(fired_deadlines)
+            assert {chat_id : deadline for chat_id, deadline, _ in fired} == {
+                chat_id : deadline for chat_id, deadline in expected.items() if deadline <= now
+            }
+            for chat_id, _, payload in fired:
+                assert payload == chat_id
+                del expected[chat_id]
+        assert len(scheduler) == len(expected)
+        assert scheduler.next_deadline() == (min(expected.values()) if expected else None)
+
+
+def test_bulk_load_replaces_armed_deadlines():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(1, 50.0)
+    scheduler.arm(2, 60.0)
+
+    assert scheduler.bulk_load([(1, 10.0, "recovered"), (3, 30.0, None)]) == 2
+    assert scheduler.get_deadline(1) == 10.0
+    assert scheduler.pop_expired(100.0) == [(1, 10.0, "recovered"), (3, 30.0, None), (2, 60.0, None)]
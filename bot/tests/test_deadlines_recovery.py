@@ -0,0 +1,67 @@
+"""
+Tests of recovery of response deadlines after restart: armed chats are read from "chats_limits" in order of deadlines,
+pending deadlines are loaded into delay tracker, expired ones are passed to notifications grouped by company.
+"""
+
+import asyncio
+
+from time import time
+
+import pytest
+
+from benchmarks.group_pipeline_benchmark import _chat_id, seed_database
+from database import BotDBClient
+from delay_control import DeadlineScheduler
+
+import bot_scripts.delay_tracking.recovery as recovery
+
+
+@pytest.fixture
+def database_client(tmp_path) -> BotDBClient:
+    database_client = BotDBClient(database_path = tmp_path / "bot_database.db")
+    seed_database(database_client)
+    return database_client
+
+
+def test_pending_deadlines_are_loaded_and_expired_are_reported(database_client, monkeypatch):
+    now = time()
+    # Chats 0 and 20 belong to company 1, chat 1 - to company 2
+    time_limits = {
+        _chat_id(0) : now - 600,
+        _chat_id(20) : now - 60,
+        _chat_id(1) : now - 300,
+        _chat_id(2) : now + 600,
+        _chat_id(3) : now + 60,
+    }
+    assert database_client.update_chats_limits_batch({chat_id : {"time_limit" : time_limit} for chat_id, time_limit in time_limits.items()})
+    assert database_client.get_armed_chats() == sorted(time_limits.items(), key = lambda armed_chat: armed_chat[1])
+
+    reported : dict[int, list[int]] = {}
+    monkeypatch.setattr(recovery, "bot_db_client", database_client)
+    monkeypatch.setattr(recovery.delay_tracker, "scheduler", DeadlineScheduler())
+    monkeypatch.setattr(
+        recovery.delay_tracker, "notify_about_delays",
+        lambda company_id, chats_infos: reported.setdefault(company_id, []).extend(chat_info["chat_tg_id"] for chat_info in chats_infos)
+    )
+    asyncio.run(recovery.recover_deadlines())
+
+    scheduler = recovery.delay_tracker.scheduler
+    assert len(scheduler) == 2
+    assert scheduler.get_deadline(_chat_id(3)) == now + 60
+    assert scheduler.get_deadline(_chat_id(2)) == now + 600
+    assert {company_id : sorted(chats_ids) for company_id, chats_ids in reported.items()} == {
+        1 : sorted([_chat_id(0), _chat_id(20)]),
+        2 : [_chat_id(1)],
+    }
+
+
+def test_nothing_is_reported_without_armed_chats(database_client, monkeypatch):
+    reported = []
+    monkeypatch.setattr(recovery, "bot_db_client", database_client)
+    monkeypatch.setattr(recovery.delay_tracker, "scheduler", DeadlineScheduler())
+    monkeypatch.setattr(recovery.delay_tracker, "notify_about_delays", lambda company_id, chats_infos: reported.append(company_id))
+    asyncio.run(recovery.recover_deadlines())
+
+    assert database_client.get_armed_chats() == []
+    assert len(recovery.delay_tracker.scheduler) == 0
+    assert reported == []
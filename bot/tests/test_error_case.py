@@ -0,0 +1,102 @@
+"""
+Tests of operate_error_case: error of the same source and type is registered fully once per window, event of error
+is serialized only for full registration and is cut, repeated errors are counted in the next full report.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+import pytest
+
+from aiogram.types import Chat, Message, User
+
+import bot_scripts.error_case as error_case
+
+from bot_scripts.error_case import RepeatedErrors, operate_error_case, serialize_error_event
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(error_case, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def registered(monkeypatch, clock) -> dict[str, list]:
+    registered = {"errors" : [], "logs" : [], "serialized" : []}
+    monkeypatch.setattr(error_case, "repeated_errors", RepeatedErrors(window = 60.0))
+    monkeypatch.setattr(error_case, "regist_error", lambda error_description, *args, **kwargs: registered["errors"].append((error_description, kwargs.get("raised_by"))))
+    monkeypatch.setattr(error_case, "record_log", lambda message, *args, **kwargs: registered["logs"].append(message))
+
+    def counted_serialize_error_event(error_event, *args, **kwargs):
+        registered["serialized"].append(error_event)
+        return serialize_error_event(error_event, *args, **kwargs)
+
+    monkeypatch.setattr(error_case, "serialize_error_event", counted_serialize_error_event)
+    return registered
+
+
+def make_message(text : str) -> Message:
+    return Message(
+        message_id = 1,
+        date = datetime.now(),
+        chat = Chat(id = 500, type = "private"),
+        from_user = User(id = 500, is_bot = False, first_name = "User"),
+        text = text,
+    )
+
+
+def test_repeated_errors_are_counted_in_window(clock):
+    repeated_errors = RepeatedErrors(window = 60.0, max_fingerprints = 2)
+    assert repeated_errors.register(("a", "KeyError")) == 0
+    clock.now += 30
+    assert repeated_errors.register(("a", "KeyError")) is None
+    assert repeated_errors.register(("a", "KeyError")) is None
+    assert repeated_errors.register(("a", "ValueError")) == 0
+    clock.now += 31
+    assert repeated_errors.register(("a", "KeyError")) == 2
+
+    # The oldest fingerprint is dropped
+    assert repeated_errors.register(("b", "KeyError")) == 0
+    assert repeated_errors.register(("a", "ValueError")) == 0
+
+
+def test_long_event_is_cut():
+    assert serialize_error_event("x" * 10, max_length = 4) == "xxxx... (6 characters are cut)"
+    serialized = serialize_error_event(make_message("text " * 2000))
+    assert serialized.startswith('{"message_id":1')
+    assert serialized.endswith("characters are cut)")
+
+
+def test_event_is_serialized_only_for_full_registration(registered, clock):
+    message = make_message("hello")
+
+    async def handler() -> None:
+        await operate_error_case("broken", KeyError, call_user = False, error_event = message)
+
+    async def run():
+        for _ in range(3):
+            await handler()
+        clock.now += 61
+        await handler()
+
+    asyncio.run(run())
+    assert registered["serialized"] == [message, message]
+    assert len(registered["logs"]) == 2
+    reports = [error_description for error_description, raised_by in registered["errors"] if raised_by is not None]
+    assert len(reports) == 2
+    assert "Repeated errors" not in reports[0]
+    assert reports[1].endswith("Repeated errors since previous report: 2")
+    # Source of error is the awaiting handler
+    assert all(raised_by.endswith(" handler") for _, raised_by in registered["errors"] if raised_by is not None)
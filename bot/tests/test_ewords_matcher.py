@@ -0,0 +1,75 @@
+"""
+Tests of EwordsMatcher: ewords are removed only with the last stored variant of their normalized form,
+results of matching are exact while new pattern is compiled in worker thread.
+"""
+
+import asyncio
+import random
+
+from delay_control import EwordsMatcher
+
+
+WORDS = ["спасибо", "спасибо большое", "ок", "ok", "ok!", "thanks", "ясно", "до свидания", "пока", "понял"]
+TEXTS = [
+    "Спасибо!", "СПАСИБО   большое", "ок, ясно", "OK", "ok!", "okay", "thanks a lot", "до\nсвидания", "покажите",
+    "понял, пока", "спасибочки", "всё ясно", "ну ок", "ничего",
+]
+
+
+def expected_results(ewords : set[str]) -> list[bool]:
+    matcher = EwordsMatcher(ewords)
+    matcher.compile()
+    return [matcher.contains_eword(text) for text in TEXTS]
+
+
+def test_removal_of_case_variant_keeps_eword():
+    matcher = EwordsMatcher(["OK", "ok", "Спасибо"])
+    matcher.remove(["OK"])
+    assert matcher.contains_eword("ну ok")
+
+    matcher.remove(["ok", "спасибо"])
+    assert not matcher.contains_eword("ну ok")
+    # "спасибо" is not stored, so "Спасибо" is not removed
+    assert matcher.contains_eword("спасибо")
+
+    matcher.remove(["Спасибо"])
+    assert not matcher.contains_eword("спасибо")
+    assert len(matcher) == 0
+
+
+def test_matching_is_exact_during_background_compilation():
+    async def run():
+        random.seed(0)
+        stored = set(WORDS[:5])
+        matcher = EwordsMatcher(stored)
+        matcher.compile()
+        for _ in range(30):
+            added = set(random.sample(WORDS, 2)) - stored
+            removed = set(random.sample(sorted(stored), min(2, len(stored))))
+            matcher.add(added)
+            matcher.remove(removed)
+            stored = (stored | added) - removed
+            assert not matcher.is_compiled
+
+            assert [matcher.contains_eword(text) for text in TEXTS] == expected_results(stored)
+            # Old pattern is used until new one is compiled in worker thread
+            while not matcher.is_compiled:
+                await asyncio.sleep(0.001)
+            assert [matcher.contains_eword(text) for text in TEXTS] == expected_results(stored)
+
+    asyncio.run(run())
+
+
+def test_changes_during_compilation_are_compiled_later():
+    async def run():
+        matcher = EwordsMatcher(["ок"])
+        assert matcher.contains_eword("ок")
+        matcher.add(["thanks"])
+        matcher.remove(["ок"])
+        assert matcher.contains_eword("thanks")
+        assert not matcher.contains_eword("ок")
+        while not matcher.is_compiled:
+            await asyncio.sleep(0.001)
+        assert matcher.find_ewords("ок, thanks") == ["thanks"]
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+"""
+Tests of GroupMessagePipeline: customers' messages arm deadlines and move "last_message_id" of chat,
+managers' messages only cancel deadlines, changes of "chats_limits" are written on flush and kept, if writing fails.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from aiogram import types
+
+from benchmarks.group_pipeline_benchmark import _chat_id, seed_database
+from database import BotDBClient
+from delay_control import DeadlineScheduler, GroupMessagePipeline
+
+
+CHAT_ID = _chat_id(0)
+MANAGER_ID = 1000
+CUSTOMER_ID = 10_000_000
+
+
+@pytest.fixture
+def database_client(tmp_path) -> BotDBClient:
+    database_client = BotDBClient(database_path = tmp_path / "bot_database.db")
+    seed_database(database_client)
+    database_client.load_roles_index()
+    return database_client
+
+
+@pytest.fixture
+def pipeline(database_client) -> GroupMessagePipeline:
+    return GroupMessagePipeline(
+        database_client = database_client,
+        tracker = DeadlineScheduler(),
+        is_company_manager = database_client.roles_index.is_company_manager,
+    )
+
+
+def make_message(message_id : int, user_id : int, text : str) -> types.Message:
+    return types.Message(
+        message_id = message_id,
+        date = datetime.now(),
+        chat = types.Chat(id = CHAT_ID, type = "supergroup", title = "chat 0"),
+        from_user = types.User(id = user_id, is_bot = False, first_name = "user"),
+        text = text,
+    )
+
+
+def test_manager_messages_do_not_update_last_message_id(database_client, pipeline):
+    pipeline.process(make_message(1, CUSTOMER_ID, "когда будет готово?"))
+    assert CHAT_ID in pipeline.tracker
+    pipeline.process(make_message(2, MANAGER_ID, "уточню и вернусь с ответом"))
+    assert CHAT_ID not in pipeline.tracker
+    assert pipeline.flush() == 1
+
+    chat_info = database_client.get_chat_info(CHAT_ID)
+    assert chat_info["last_message_id"] == 1
+    assert chat_info["time_limit"] is None
+    assert chat_info["was_first_message"] == 0
+
+    pipeline.process(make_message(3, MANAGER_ID, "готово"))
+    assert pipeline.flush() == 0
+    assert database_client.get_chat_info(CHAT_ID)["last_message_id"] == 1
+
+
+def test_deadline_is_counted_from_first_unanswered_message(database_client, pipeline):
+    pipeline.process(make_message(1, CUSTOMER_ID, "добрый день"))
+    deadline = pipeline.tracker.get_deadline(CHAT_ID)
+    pipeline.process(make_message(2, CUSTOMER_ID, "есть новости?"))
+    assert pipeline.tracker.get_deadline(CHAT_ID) == deadline
+    pipeline.flush()
+
+    chat_info = database_client.get_chat_info(CHAT_ID)
+    assert chat_info["last_message_id"] == 2
+    assert chat_info["time_limit"] == int(deadline)
+    assert pipeline.stats.armed_count == 1
+
+
+def test_eword_message_does_not_arm_deadline(database_client, pipeline):
+    pipeline.process(make_message(1, CUSTOMER_ID, "Спасибо!"))
+    assert CHAT_ID not in pipeline.tracker
+    pipeline.flush()
+
+    chat_info = database_client.get_chat_info(CHAT_ID)
+    assert chat_info["last_message_id"] == 1
+    assert chat_info["time_limit"] is None
+    assert pipeline.stats.ewords_count == 1
+
+
+def test_changes_are_kept_if_flush_fails(database_client, pipeline, monkeypatch):
+    pipeline.process(make_message(1, CUSTOMER_ID, "когда будет готово?"))
+    with monkeypatch.context() as patch:
+        patch.setattr(database_client, "update_chats_limits_batch", lambda chats_limits: False)
+        assert pipeline.flush() == 0
+    pipeline.process(make_message(2, MANAGER_ID, "готово"))
+    assert pipeline.flush() == 1
+
+    chat_info = database_client.get_chat_info(CHAT_ID)
+    assert chat_info["last_message_id"] == 1
+    assert chat_info["time_limit"] is None
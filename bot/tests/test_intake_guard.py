@@ -0,0 +1,91 @@
+"""
+Tests of IntakeGuard: LOW updates are shed, when outgoing messages wait too long or too many LOW updates are in processing,
+replies to LOW updates are sent with BROADCAST priority.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.types import Chat, Message, Update, User
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from incoming import GuardedDispatcher, IntakeGuard, UpdatePriority
+from outgoing.send_scheduler import current_send_priority, SendPriority
+
+
+class IdleLoopLagMonitor:
+    def get_current_lag(self) -> float:
+        return 0.0
+
+    def get_stats(self) -> dict:
+        return {"lag" : 0.0, "max_lag" : 0.0}
+
+
+def make_update(update_id : int, text : str) -> Update:
+    return Update(
+        update_id = update_id,
+        message = Message(
+            message_id = update_id,
+            date = datetime.now(),
+            chat = Chat(id = 1000 + update_id, type = "private"),
+            from_user = User(id = 1000 + update_id, is_bot = False, first_name = "User"),
+            text = text,
+        ),
+    )
+
+
+def classify(update : Update) -> UpdatePriority:
+    return UpdatePriority[update.message.text]
+
+
+def test_low_updates_are_shed_while_outgoing_messages_wait():
+    outgoing_delay = 0.5
+    intake_guard = IntakeGuard(
+        classify,
+        IdleLoopLagMonitor(),
+        get_outgoing_delay = lambda: outgoing_delay,
+        max_outgoing_delay = 2.0,
+    )
+
+    assert intake_guard.admit(make_update(1, "LOW")) == UpdatePriority.LOW
+    outgoing_delay = 3.0
+    assert intake_guard.admit(make_update(2, "LOW")) is None
+    assert intake_guard.admit(make_update(3, "NORMAL")) == UpdatePriority.NORMAL
+    assert intake_guard.admit(make_update(4, "HIGH")) == UpdatePriority.HIGH
+
+    stats = intake_guard.get_stats()
+    assert stats["shed"]["LOW"] == 1
+    assert stats["outgoing_delay"] == 3.0
+
+
+def test_low_updates_take_limited_count_of_places():
+    intake_guard = IntakeGuard(classify, IdleLoopLagMonitor(), max_low_pending = 2)
+
+    assert [intake_guard.admit(make_update(update_id, "LOW")) for update_id in range(3)] == [UpdatePriority.LOW] * 2 + [None]
+    assert intake_guard.admit(make_update(3, "NORMAL")) == UpdatePriority.NORMAL
+    intake_guard.release(UpdatePriority.LOW)
+    assert intake_guard.admit(make_update(4, "LOW")) == UpdatePriority.LOW
+    assert intake_guard.pending_counts == {UpdatePriority.HIGH : 0, UpdatePriority.NORMAL : 1, UpdatePriority.LOW : 2}
+
+
+def test_replies_to_low_updates_have_broadcast_priority():
+    send_priorities = {}
+
+    async def run():
+        dispatcher = GuardedDispatcher(intake_guard = IntakeGuard(classify, IdleLoopLagMonitor()))
+
+        @dispatcher.message()
+        async def handler(message : Message):
+            send_priorities[message.text] = current_send_priority.get()
+
+        bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+        for update_id, text in enumerate(("HIGH", "NORMAL", "LOW")):
+            await dispatcher.feed_update(bot, make_update(update_id, text))
+        return dispatcher.intake_guard
+
+    intake_guard = asyncio.run(run())
+    assert send_priorities == {"HIGH" : SendPriority.MENU, "NORMAL" : SendPriority.MENU, "LOW" : SendPriority.BROADCAST}
+    assert intake_guard.pending_count == 0
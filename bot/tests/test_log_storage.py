@@ -0,0 +1,52 @@
+"""
+Tests of CompressedRotatingFileHandler: time of the first record of live log file is kept after restart,
+so selection of log by time range and rotation by interval do not depend on time of the last write.
+"""
+
+import gzip
+import logging
+
+from time import time
+
+from logger.log_storage import CompressedRotatingFileHandler
+
+
+def make_record(message : str, created : float) -> logging.LogRecord:
+    record = logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+    record.created = created
+    return record
+
+
+def test_time_of_live_log_is_kept_after_restart(tmp_path):
+    now = time()
+    handler = CompressedRotatingFileHandler(tmp_path / "log.log", tmp_path / "archive")
+    handler.emit(make_record("first", now - 3600))
+    handler.emit(make_record("second", now - 10))
+    handler.close()
+
+    handler = CompressedRotatingFileHandler(tmp_path / "log.log", tmp_path / "archive")
+    try:
+        assert handler.started_at == now - 3600
+        destination = tmp_path / "collected.log.gz"
+        # Range contains only the first record
+        assert handler.collect_log(now - 3700, now - 3500, destination) == 1
+        assert gzip.decompress(destination.read_bytes()).decode().splitlines() == ["first", "second"]
+    finally:
+        handler.close()
+
+
+def test_log_is_rotated_by_interval_after_restart(tmp_path):
+    now = time()
+    handler = CompressedRotatingFileHandler(tmp_path / "log.log", tmp_path / "archive", interval = 60)
+    handler.emit(make_record("old", now - 120))
+    handler.close()
+
+    handler = CompressedRotatingFileHandler(tmp_path / "log.log", tmp_path / "archive", interval = 60)
+    try:
+        handler.emit(make_record("new", now))
+        # Time of the last record after restart is time of the last write of file
+        assert [archive.started_at for archive in handler.index.archives] == [now - 120]
+        assert handler.started_at == now
+        assert (tmp_path / "log.log").read_text(encoding = "UTF-8").splitlines() == ["new"]
+    finally:
+        handler.close()
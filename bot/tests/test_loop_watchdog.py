@@ -0,0 +1,78 @@
+"""
+Tests of LoopWatchdog: blocking of event loop is aggregated by the innermost frame of bot's code with update
+of the blocking task, loop which is not blocked is not reported, the least expensive sites are dropped first.
+"""
+
+import asyncio
+import time
+import traceback
+
+from datetime import datetime
+
+from aiogram.types import Chat, Message, Update, User
+
+from incoming import LoopWatchdog
+
+
+def block_loop(seconds : float) -> None:
+    time.sleep(seconds)
+
+
+def make_update(update_id : int) -> Update:
+    return Update(
+        update_id = update_id,
+        message = Message(
+            message_id = 1,
+            date = datetime.now(),
+            chat = Chat(id = 500, type = "private"),
+            from_user = User(id = 500, is_bot = False, first_name = "User"),
+            text = "hello",
+        ),
+    )
+
+
+def test_blocking_is_aggregated_by_site_with_update():
+    async def handle_update(watchdog : LoopWatchdog, update : Update) -> None:
+        watchdog.track_update(update)
+        try:
+            block_loop(0.2)
+        finally:
+            watchdog.untrack_update()
+
+    async def run():
+        watchdog = LoopWatchdog(threshold = 0.05, interval = 0.01)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            assert watchdog.blockings_count == 0
+
+            for update_id in (7, 8):
+                await asyncio.create_task(handle_update(watchdog, make_update(update_id)))
+                # Blocking is registered by watchdog thread after loop is unblocked
+                for _ in range(100):
+                    if watchdog.blockings_count == update_id - 6:
+                        break
+                    await asyncio.sleep(0.01)
+        finally:
+            watchdog.stop()
+        return watchdog
+
+    watchdog = asyncio.run(run())
+    assert not watchdog.is_running
+    assert watchdog.blockings_count == 2
+    [(site_name, site)] = watchdog.get_top_sites()
+    assert site_name.startswith("tests/test_loop_watchdog.py:")
+    assert site_name.endswith("block_loop()")
+    assert site.count == 2
+    assert site.max_time >= watchdog.threshold
+    assert site.last_update.startswith("update 8 (message), chat 500, user 500")
+    assert site_name in watchdog.get_report()
+
+
+def test_sites_with_the_least_total_time_are_dropped():
+    watchdog = LoopWatchdog(max_sites = 2)
+    for site_number, duration in ((1, 0.5), (2, 0.2), (3, 0.3)):
+        stack = traceback.StackSummary.from_list([(f"/library/module{site_number}.py", 10, "work", None)])
+        watchdog._register_blocking(stack, None, duration)
+    assert [site_name for site_name, _ in watchdog.get_top_sites()] == ["/library/module1.py:10 work()", "/library/module3.py:10 work()"]
+    assert watchdog.blockings_count == 3
@@ -0,0 +1,36 @@
+import communication.communication as communication_module
+import communication.messages_patterns_db_client as patterns_module
+
+from communication import DEFAULT_MESSAGES_PATTERNS
+from delay_control import OverdueChat
+
+
+def test_default_patterns_are_added_once_and_changed_texts_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(patterns_module, "INSTANCES_RELATIONS_DB_PATH", tmp_path / "communication.db")
+
+    patterns_client = patterns_module.MessagesPatternsDBClient()
+    assert set(DEFAULT_MESSAGES_PATTERNS) <= dict(patterns_client.get_all_messages_patterns()).keys()
+
+    patterns_client.update_message_pattern_text("chat_delay_notification", "changed *CHAT_TITLE*")
+    # Next start of bot
+    patterns_client = patterns_module.MessagesPatternsDBClient()
+    patterns = patterns_client.get_all_messages_patterns()
+    assert len(patterns) == len(set(key for key, _ in patterns))
+    assert dict(patterns)["chat_delay_notification"] == "changed *CHAT_TITLE*"
+
+
+def test_delay_line_is_rendered_without_pattern_in_communicator(monkeypatch):
+    from bot_scripts.delay_tracking.delay_tracker import render_delay_line
+    from vars import communicator
+
+    registered_errors = []
+    monkeypatch.setattr(communication_module, "regist_error", lambda *args, **kwargs: registered_errors.append(args or kwargs))
+    monkeypatch.setattr(communicator, "messages_patterns", {})
+
+    overdue_chat = OverdueChat(-100, "Chat <1>", "https://t.me/c/100/5", deadline = 1000.0, response_timeout = 600.0)
+    line = render_delay_line(overdue_chat, now = 1300.0)
+
+    assert "Chat &lt;1&gt;" in line
+    assert "15" in line
+    assert "https://t.me/c/100/5" in line
+    assert not registered_errors
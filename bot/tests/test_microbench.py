@@ -0,0 +1,80 @@
+"""
+Tests of microbenchmarks suite and of FakeTelegramSession which it runs bot with:
+series of case grow until they are long enough, comparison of reports flags only slowdowns beyond threshold,
+fake session records successful requests and answers like Telegram does.
+"""
+
+import asyncio
+
+import pytest
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+import benchmarks.microbench as microbench
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+from benchmarks.microbench import BenchmarkCase, compare_results
+
+
+def make_report(commit : str, results : dict[str, float]) -> dict:
+    return {
+        "environment" : {"commit" : commit},
+        "results" : {name : {"min_ns_per_call" : nanoseconds} for name, nanoseconds in results.items()},
+    }
+
+
+def test_case_series_grow_until_they_are_measurable(monkeypatch):
+    monkeypatch.setattr(microbench, "SERIES_TIME", 0.001)
+    calls = []
+    result = BenchmarkCase("append", lambda: calls.append(None)).measure(repeats = 3)
+    # Calibration series: 1, 10, ... calls
+    assert result["calls_per_series"] >= 10
+    assert result["repeats"] == 3
+    assert result["min_ns_per_call"] <= result["ns_per_call"]
+    assert len(calls) >= 3 * result["calls_per_series"]
+
+    awaited = []
+
+    async def coroutine_function():
+        awaited.append(None)
+
+    result = BenchmarkCase("await", coroutine_function).measure(repeats = 2)
+    assert len(awaited) >= 2 * result["calls_per_series"]
+
+
+def test_comparison_flags_only_slowdowns_beyond_threshold(capsys):
+    base_report = make_report("base", {"fast" : 100.0, "same" : 100.0, "slow" : 100.0, "removed" : 100.0})
+    new_report = make_report("new", {"fast" : 50.0, "same" : 105.0, "slow" : 150.0, "added" : 100.0})
+
+    assert compare_results(base_report, new_report, threshold = 0.1) == ["slow"]
+    assert compare_results(base_report, new_report, threshold = 0.6) == []
+    output = capsys.readouterr().out
+    assert "improvement" in output
+    assert "only in base" in output and "only in new" in output
+
+
+def test_fake_session_records_only_successful_requests():
+    async def run():
+        session = FakeTelegramSession()
+        bot = Bot(token = FAKE_TOKEN, session = session)
+        first_message = await bot.send_message(chat_id = 1, text = "first")
+        second_message = await bot.send_message(chat_id = -100, text = "second")
+        edited_message = await bot.edit_message_text(chat_id = 1, message_id = first_message.message_id, text = "edited")
+        assert (first_message.message_id, second_message.message_id) == (1, 2)
+        assert edited_message.message_id == first_message.message_id
+        assert second_message.chat.type == "supergroup"
+
+        session.too_many_requests_rate = 1.0
+        with pytest.raises(TelegramRetryAfter):
+            await bot.send_message(chat_id = 1, text = "dropped")
+        return session
+
+    session = asyncio.run(run())
+    assert session.get_calls_by_method() == {"sendMessage" : 2, "editMessageText" : 1}
+    assert [call[3] for call in session.calls] == ["first", "second", "edited"]
+    assert session.too_many_requests_count == 1
+
+    session.reset()
+    assert session.get_calls_count() == 0
+    assert session.too_many_requests_count == 0
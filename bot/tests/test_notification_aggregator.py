@@ -0,0 +1,140 @@
+"""
+Tests of NotificationAggregator against fake Bot session: collecting of overdue chats during window,
+edits of incident's messages and splitting of long incident into several messages.
+"""
+
+import asyncio
+
+from time import time
+
+from aiogram import Bot
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from delay_control import NotificationAggregator, OverdueChat
+
+from outgoing import get_utf16_length
+
+
+REDIRECT_CHAT_ID = -1_000_000_000_001
+WINDOW = 60.0
+
+
+def render_line(overdue_chat : OverdueChat, now : float) -> str:
+    return f"{overdue_chat.chat_title}: {overdue_chat.message_link} - {int(overdue_chat.get_waiting_seconds(now) // 60)} min"
+
+
+def make_aggregator(**kwargs) -> tuple[FakeTelegramSession, NotificationAggregator]:
+    session = FakeTelegramSession()
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    return session, NotificationAggregator(bot = bot, **{"render_line" : render_line, "window" : WINDOW, **kwargs})
+
+
+def add_overdue(aggregator : NotificationAggregator, chat_id : int, chat_title : str | None = None) -> None:
+    aggregator.add_overdue(
+        REDIRECT_CHAT_ID, chat_id, chat_title or f"chat {chat_id}", f"https://t.me/c/{chat_id}/1", time() - 60, 900,
+    )
+
+
+def get_texts(session : FakeTelegramSession, api_method : str) -> list[str]:
+    return [call[3] for call in session.calls if call[1] == api_method]
+
+
+def test_chats_of_window_are_sent_in_one_message():
+    async def run():
+        session, aggregator = make_aggregator()
+        for chat_id in range(1, 11):
+            add_overdue(aggregator, chat_id)
+        aggregator.mark_answered(10)
+
+        await aggregator.flush(time() + WINDOW / 2)
+        assert session.get_calls_count() == 0
+
+        await aggregator.flush(time() + WINDOW)
+        [text] = get_texts(session, "sendMessage")
+        assert all(f"chat {chat_id}:" in text for chat_id in range(1, 10))
+        # Chat which was answered during collecting is not reported
+        assert "chat 10:" not in text
+
+    asyncio.run(run())
+
+
+def test_changes_edit_message_not_more_often_than_window():
+    async def run():
+        session, aggregator = make_aggregator()
+        add_overdue(aggregator, 1)
+        add_overdue(aggregator, 2)
+        rendered_at = time() + WINDOW
+        await aggregator.flush(rendered_at)
+
+        aggregator.mark_answered(1)
+        add_overdue(aggregator, 3)
+        await aggregator.flush(rendered_at + WINDOW / 2)
+        assert session.get_calls_count("editMessageText") == 0
+
+        await aggregator.flush(rendered_at + WINDOW)
+        [text] = get_texts(session, "editMessageText")
+        assert "<s>chat 1:" in text and "chat 3:" in text
+        assert session.get_calls_count("sendMessage") == 1
+
+        # Incident is closed, when all its chats are answered: next overdue chat opens new message
+        aggregator.mark_answered(2)
+        aggregator.mark_answered(3)
+        await aggregator.flush(rendered_at + 2 * WINDOW)
+        assert aggregator.get_stats()["open_incidents_count"] == 0
+        add_overdue(aggregator, 4)
+        await aggregator.flush(time() + WINDOW)
+        assert session.get_calls_count("sendMessage") == 2
+
+    asyncio.run(run())
+
+
+def test_long_incident_is_split_into_messages():
+    async def run():
+        max_length = 1000
+        # Waiting time is not rendered: lines of not changed chats are the same after window
+        session, aggregator = make_aggregator(
+            max_length = max_length,
+            render_line = lambda overdue_chat, now: f"{overdue_chat.chat_title}: {overdue_chat.message_link}",
+        )
+        # Emoji take 2 UTF-16 code units each
+        chats_ids = range(1, 101)
+        for chat_id in chats_ids:
+            add_overdue(aggregator, chat_id, f"chat {chat_id} {'😀' * 10}")
+        rendered_at = time() + WINDOW
+        await aggregator.flush(rendered_at)
+
+        texts = get_texts(session, "sendMessage")
+        assert len(texts) > 1
+        assert all(get_utf16_length(text) <= max_length for text in texts)
+        joined_text = "\n\n".join(texts)
+        assert all(joined_text.count(f"chat {chat_id} ") == 1 for chat_id in chats_ids)
+
+        # Only message with changed chat is edited
+        aggregator.mark_answered(100)
+        await aggregator.flush(rendered_at + WINDOW)
+        [text] = get_texts(session, "editMessageText")
+        assert text.endswith("✅") and "chat 100 " in text
+        assert session.calls[-1][2] == REDIRECT_CHAT_ID and session.get_calls_count("sendMessage") == len(texts)
+
+    asyncio.run(run())
+
+
+def test_growing_incident_is_continued_in_next_message():
+    async def run():
+        session, aggregator = make_aggregator(max_length = 300)
+        add_overdue(aggregator, 1)
+        rendered_at = time() + WINDOW
+        await aggregator.flush(rendered_at)
+
+        for chat_id in range(2, 21):
+            add_overdue(aggregator, chat_id)
+        await aggregator.flush(rendered_at + WINDOW)
+
+        texts = get_texts(session, "sendMessage")
+        edited_texts = get_texts(session, "editMessageText")
+        assert len(texts) > 1 and len(edited_texts) == 1
+        joined_text = "\n\n".join(edited_texts + texts[1:])
+        assert all(joined_text.count(f"chat {chat_id}:") == 1 for chat_id in range(1, 21))
+
+    asyncio.run(run())
@@ -0,0 +1,124 @@
+"""
+Tests of OutboxDispatcher against fake Bot session and scratch bot database: alerts are saved before sending,
+marked "delivered" after success and sent again by dispatcher after failure or crash of bot.
+"""
+
+import asyncio
+import sqlite3
+import tempfile
+
+from pathlib import Path
+from time import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from database import BotDBClient
+
+from delay_control import NotificationAggregator
+
+from outgoing import OutboxDispatcher, SendPriority
+from outgoing.send_scheduler import current_send_priority
+
+
+REDIRECT_CHAT_ID = -1_000_000_000_001
+
+
+class RecordingMiddleware(BaseRequestMiddleware):
+    """
+    Records priority of each request and statuses of outbox messages at the moment of request.
+    """
+
+    def __init__(self, database_path : Path) -> None:
+        self.database_path = database_path
+        self.records : list[tuple[SendPriority, list[str]]] = []
+
+
+    async def __call__(self, make_request, bot, method):
+        self.records.append((current_send_priority.get(), get_statuses(self.database_path)))
+        return await make_request(bot, method)
+
+
+def get_statuses(database_path : Path) -> list[str]:
+    with sqlite3.connect(database_path) as connection:
+        return [row[0] for row in connection.execute("SELECT status FROM outbox ORDER BY message_id")]
+
+
+def make_dispatcher(session : FakeTelegramSession) -> tuple[OutboxDispatcher, BotDBClient, RecordingMiddleware]:
+    database_path = Path(tempfile.mkdtemp(prefix = "outbox-")) / "bot.db"
+    database_client = BotDBClient(database_path)
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    recorder = RecordingMiddleware(database_path)
+    bot.session.middleware(recorder)
+    return OutboxDispatcher(database_client = database_client, bot = bot, initial_backoff = 0.0), database_client, recorder
+
+
+def test_alert_is_saved_before_sending_and_marked_delivered():
+    async def run():
+        dispatcher, database_client, recorder = make_dispatcher(FakeTelegramSession())
+        message = await dispatcher.deliver("bot", REDIRECT_CHAT_ID, "alert", kind = "delay_alert")
+
+        assert message.text == "alert"
+        assert recorder.records == [(SendPriority.ALERT, ["sending"])]
+        assert get_statuses(database_client.database_path) == ["delivered"]
+
+    asyncio.run(run())
+
+
+def test_failed_alert_is_retried_by_dispatcher():
+    async def run():
+        session = FakeTelegramSession(server_errors_rate = 1.0)
+        dispatcher, database_client, recorder = make_dispatcher(session)
+        assert await dispatcher.deliver("bot", REDIRECT_CHAT_ID, "alert", kind = "delay_alert") is None
+        assert get_statuses(database_client.database_path) == ["pending"]
+
+        session.server_errors_rate = 0.0
+        assert await dispatcher.dispatch_batch() == 1
+        assert get_statuses(database_client.database_path) == ["delivered"]
+        # Retried alert keeps priority of alerts
+        assert [priority for priority, _ in recorder.records] == [SendPriority.ALERT, SendPriority.ALERT]
+        assert session.get_calls_count("sendMessage") == 1
+
+    asyncio.run(run())
+
+
+def test_alert_of_crashed_bot_is_sent_after_restart():
+    async def run():
+        session = FakeTelegramSession()
+        dispatcher, database_client, _ = make_dispatcher(session)
+        # Bot crashed during sending: message stays claimed
+        database_client.add_claimed_outbox_message("bot", REDIRECT_CHAT_ID, "alert", "delay_alert")
+
+        restarted_dispatcher = OutboxDispatcher(database_client = database_client, bot = dispatcher.bot)
+        # Message which is being delivered by restarted bot is not released
+        database_client.add_claimed_outbox_message("bot", REDIRECT_CHAT_ID, "new alert", "delay_alert")
+        assert await restarted_dispatcher.dispatch_batch() == 1
+        assert [call[3] for call in session.calls] == ["alert"]
+        assert get_statuses(database_client.database_path) == ["delivered", "sending"]
+
+    asyncio.run(run())
+
+
+def test_incident_which_was_not_delivered_is_left_to_outbox():
+    async def run():
+        session = FakeTelegramSession(server_errors_rate = 1.0)
+        dispatcher, database_client, _ = make_dispatcher(session)
+        reported_ids = []
+        aggregator = NotificationAggregator(
+            bot = dispatcher.bot,
+            render_line = lambda overdue_chat, now: overdue_chat.chat_title,
+            window = 1.0,
+            send_message = lambda redirect_chat_id, text: dispatcher.deliver("bot", redirect_chat_id, text, kind = "delay_alert"),
+            on_reported = reported_ids.extend,
+        )
+        for chat_id in (1, 2):
+            aggregator.add_overdue(REDIRECT_CHAT_ID, chat_id, f"chat {chat_id}", None, time() - 60, 900)
+        await aggregator.flush(time() + 1.0)
+
+        assert reported_ids == [1, 2]
+        assert aggregator.get_stats()["open_incidents_count"] == 0
+        assert get_statuses(database_client.database_path) == ["pending"]
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+"""
+Tests of on-demand profiling: StackSampler attributes samples of busy thread to running function and counts waiting
+of event loop as idle, memory diff reports allocation sites which grew during profiling.
+"""
+
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from metrics import StackSampler, profile_cpu, profile_memory
+
+
+def spin(duration : float) -> int:
+    iterations_count = 0
+    finished_at = time.monotonic() + duration
+    while time.monotonic() < finished_at:
+        iterations_count += 1
+    return iterations_count
+
+
+def test_busy_function_is_on_top_of_cpu_profile():
+    sampler = StackSampler(threading.get_ident(), interval = 0.002)
+    profiles = []
+    sampling_thread = threading.Thread(target = lambda: profiles.append(sampler.sample(0.2)))
+    sampling_thread.start()
+    spin(0.3)
+    sampling_thread.join()
+
+    [profile] = profiles
+    assert profile.samples_count > 10
+    # Main thread may still wait for start of sampling thread in the first samples
+    assert profile.idle_count < profile.samples_count / 2
+    function, self_count, total_count = profile.get_top_functions(1)[0]
+    assert function.startswith("spin (tests/test_profiling.py:")
+    assert total_count >= self_count > profile.samples_count / 2
+    # Each line is "outer;...;inner count"
+    stack_line = profile.format_collapsed().splitlines()[0]
+    assert stack_line.rsplit(" ", 1)[0].endswith(function)
+    assert function in profile.format_report()
+
+
+def test_waiting_loop_is_idle():
+    profile = asyncio.run(profile_cpu(threading.get_ident(), 0.2, interval = 0.002))
+    assert profile.samples_count > 10
+    assert profile.idle_count > profile.samples_count / 2
+
+
+def test_memory_growth_is_attributed_to_allocation_site():
+    kept = []
+
+    async def allocate():
+        await asyncio.sleep(0.02)
+        kept.extend(bytearray(1024) for _ in range(1000))
+
+    async def run():
+        allocation_task = asyncio.create_task(allocate())
+        reports = await profile_memory(0.1)
+        await allocation_task
+        return reports
+
+    short_report, full_report = asyncio.run(run())
+    assert not tracemalloc.is_tracing()
+    assert "tests/test_profiling.py" in short_report.splitlines()[1]
+    assert full_report.startswith(short_report.splitlines()[0])
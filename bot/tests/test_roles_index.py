@@ -0,0 +1,79 @@
+"""
+Tests of RolesIndex: index is kept in sync with tables of roles by BotDBClient methods which register and delete roles,
+so it is always equal to index loaded from database.
+"""
+
+import pytest
+
+from database import BotDBClient
+from database.roles_index import ROLES_QUERY, RolesIndex
+
+
+OWNER_ID = 1
+MANAGER_ID = 2
+BOT_ADMIN_ID = 3
+
+
+@pytest.fixture
+def database_client(tmp_path) -> BotDBClient:
+    database_client = BotDBClient(database_path = tmp_path / "bot_database.db")
+    for user_id in (OWNER_ID, MANAGER_ID, BOT_ADMIN_ID):
+        assert database_client.register_user(user_id, first_name = f"user {user_id}")
+    for company_number in (1, 2):
+        assert database_client.register_company(f"company {company_number}", -company_number, "09:00", "18:00", 900, [5, 6], {})
+    return database_client
+
+
+def assert_index_is_synced(database_client : BotDBClient) -> None:
+    loaded_index = RolesIndex()
+    with database_client._get_connection() as cursor:
+        cursor.execute(ROLES_QUERY)
+        loaded_index.load([tuple(row) for row in cursor.fetchall()])
+    assert database_client.roles_index.managers == loaded_index.managers
+    assert database_client.roles_index.owners == loaded_index.owners
+    assert database_client.roles_index.bot_admins == loaded_index.bot_admins
+
+
+def test_index_follows_registering_and_deleting_of_roles(database_client):
+    roles_index = database_client.roles_index
+
+    assert database_client.register_owner(OWNER_ID, 1)
+    assert database_client.register_manager(MANAGER_ID, owner_id = OWNER_ID)
+    assert database_client.register_manager(MANAGER_ID, manager_company_id = 2)
+    assert database_client.register_bot_admin(BOT_ADMIN_ID)
+    assert_index_is_synced(database_client)
+    assert roles_index.get_role(1, OWNER_ID) == "owner"
+    assert roles_index.get_role(1, MANAGER_ID) == "manager"
+    assert roles_index.is_company_manager(MANAGER_ID, 2)
+    assert roles_index.is_bot_admin(BOT_ADMIN_ID)
+
+    assert database_client.delete_manager(MANAGER_ID, OWNER_ID)
+    assert_index_is_synced(database_client)
+    assert not roles_index.is_company_manager(MANAGER_ID, 1)
+    assert roles_index.is_company_manager(MANAGER_ID, 2)
+
+    assert database_client.delete_owner(OWNER_ID)
+    assert database_client.delete_bot_admin(BOT_ADMIN_ID)
+    assert_index_is_synced(database_client)
+    assert roles_index.get_role(1, OWNER_ID) is None
+    assert not roles_index.is_bot_admin(BOT_ADMIN_ID)
+
+
+def test_failed_registering_does_not_change_index(database_client):
+    assert database_client.register_bot_admin(BOT_ADMIN_ID)
+    assert not database_client.register_bot_admin(BOT_ADMIN_ID)
+    # Owner of nonexistent company
+    assert not database_client.register_owner(OWNER_ID, 100)
+    assert_index_is_synced(database_client)
+    assert database_client.roles_index.get_role(100, OWNER_ID) is None
+
+
+def test_company_deleting_removes_its_roles(database_client):
+    assert database_client.register_owner(OWNER_ID, 1)
+    assert database_client.register_manager(MANAGER_ID, manager_company_id = 1)
+    assert database_client.register_manager(MANAGER_ID, manager_company_id = 2)
+
+    assert database_client.delete_company(1)
+    assert_index_is_synced(database_client)
+    assert OWNER_ID not in database_client.roles_index.owners
+    assert database_client.roles_index.managers == {MANAGER_ID : {2}}
@@ -0,0 +1,165 @@
+import asyncio
+
+from time import monotonic
+
+import pytest
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+from outgoing import OutgoingScheduler, SendPriority, send_priority
+
+
+# Scheduling of timers is not exact
+TIME_TOLERANCE = 0.05
+
+
+class FloodOnceSession(FakeTelegramSession):
+    """
+    Answers with "retry_after" to the first message of `flooded_chat_id`.
+    """
+
+    def __init__(self, flooded_chat_id : int, retry_after : int = 1) -> None:
+        super().__init__(retry_after = retry_after)
+        self.flooded_chat_id = flooded_chat_id
+        self.is_flooded = False
+
+
+    async def make_request(self, bot, method, timeout = None):
+        if (getattr(method, "chat_id", None) == self.flooded_chat_id) and not self.is_flooded:
+            self.is_flooded = True
+            raise TelegramRetryAfter(method = method, message = "Too Many Requests", retry_after = self.retry_after)
+        return await super().make_request(bot, method, timeout)
+
+
+def make_bot(session : FakeTelegramSession) -> tuple[Bot, OutgoingScheduler]:
+    scheduler = OutgoingScheduler()
+    bot = Bot(token = FAKE_TOKEN, session = session)
+    bot.session.middleware(scheduler)
+    return bot, scheduler
+
+
+def get_sending_times(session : FakeTelegramSession, chat_id : int | None = None) -> list[float]:
+    return [call[0] for call in session.calls if (chat_id is None) or (call[2] == chat_id)]
+
+
+async def send_messages(bot : Bot, chats_ids : list[int], priority : SendPriority = SendPriority.MENU) -> None:
+    with send_priority(priority):
+        await asyncio.gather(*(bot.send_message(chat_id, "text") for chat_id in chats_ids))
+
+
+def test_global_limit_is_30_messages_per_second():
+    session = FakeTelegramSession()
+    bot, scheduler = make_bot(session)
+
+    async def run():
+        await send_messages(bot, list(range(1, 62)))
+        await scheduler.close()
+    asyncio.run(run())
+
+    sending_times = get_sending_times(session)
+    assert len(sending_times) == 61
+    # Any interval of T seconds contains at most 1 + 30 * T messages
+    for first_index, first_time in enumerate(sending_times):
+        for last_index in range(first_index + 1, len(sending_times)):
+            interval = sending_times[last_index] - first_time
+            assert last_index - first_index + 1 <= 1 + 30 * (interval + TIME_TOLERANCE)
+    assert sending_times[-1] - sending_times[0] == pytest.approx(2.0, abs = 0.2)
+
+
+def test_private_chat_limit_is_1_message_per_second_after_burst():
+    session = FakeTelegramSession()
+    bot, scheduler = make_bot(session)
+
+    async def run():
+        await send_messages(bot, [100] * 6 + [200])
+        await scheduler.close()
+    asyncio.run(run())
+
+    chat_times = get_sending_times(session, 100)
+    assert len(chat_times) == 6
+    # Burst of 3 messages is sent at once, then any interval of T seconds contains at most 3 + 1 * T messages
+    assert chat_times[2] - chat_times[0] < 0.2
+    for first_index, first_time in enumerate(chat_times):
+        for last_index in range(first_index + 1, len(chat_times)):
+            interval = chat_times[last_index] - first_time
+            assert last_index - first_index + 1 <= 3 + 1 * (interval + TIME_TOLERANCE)
+    assert chat_times[5] - chat_times[0] >= 3.0 - TIME_TOLERANCE
+    # Other chat is not delayed by limit of chat 100
+    assert get_sending_times(session, 200)[0] - chat_times[0] < 0.2
+
+
+def test_handler_answering_with_several_messages_is_not_delayed():
+    session = FakeTelegramSession()
+    bot, scheduler = make_bot(session)
+
+    async def handler(chat_id : int) -> float:
+        # Typical menu step: answer, edit of previous menu, new menu
+        started_at = monotonic()
+        await bot.send_message(chat_id, "answer")
+        await bot.edit_message_text("previous menu", chat_id = chat_id, message_id = 1)
+        await bot.send_message(chat_id, "menu")
+        return monotonic() - started_at
+
+    async def run():
+        latencies = await asyncio.gather(*(handler(chat_id) for chat_id in range(1, 4)))
+        await scheduler.close()
+        return latencies
+    latencies = asyncio.run(run())
+
+    # 9 messages take 0.3 s of global limit, without burst the last message of chat would wait 2 s
+    assert max(latencies) < 0.5
+    assert scheduler.get_stats()["queue_depth"] == 0
+
+
+def test_group_limit_is_20_messages_per_minute():
+    session = FakeTelegramSession()
+    bot, scheduler = make_bot(session)
+
+    async def run():
+        await send_messages(bot, [-100, -100])
+        await scheduler.close()
+    asyncio.run(run())
+
+    first_time, second_time = get_sending_times(session, -100)
+    assert second_time - first_time >= 60 / 20 - TIME_TOLERANCE
+
+
+def test_higher_priority_is_served_first():
+    session = FakeTelegramSession()
+    bot, scheduler = make_bot(session)
+    broadcast_chats = list(range(1, 21))
+    alert_chats = list(range(-1, -6, -1))
+
+    async def run():
+        broadcasts = asyncio.create_task(send_messages(bot, broadcast_chats, SendPriority.BROADCAST))
+        menus = asyncio.create_task(send_messages(bot, list(range(101, 106)), SendPriority.MENU))
+        alerts = asyncio.create_task(send_messages(bot, alert_chats, SendPriority.ALERT))
+        await asyncio.gather(broadcasts, menus, alerts)
+        await scheduler.close()
+    asyncio.run(run())
+
+    sent_chats = [call[2] for call in session.calls]
+    # The first broadcast can be granted before other requests are enqueued
+    sent_chats = [chat_id for chat_id in sent_chats if chat_id != broadcast_chats[0]]
+    assert sent_chats[:5] == alert_chats
+    assert sorted(sent_chats[5:10]) == list(range(101, 106))
+
+
+def test_retry_after_pauses_chat_and_repeats_request():
+    session = FloodOnceSession(flooded_chat_id = 300, retry_after = 1)
+    bot, scheduler = make_bot(session)
+
+    async def run():
+        started_at = monotonic()
+        await send_messages(bot, [300, 400])
+        await scheduler.close()
+        return started_at
+    started_at = asyncio.run(run())
+
+    assert scheduler.get_stats()["retry_after_count"] == 1
+    # Flooded chat is repeated after "retry_after", other chat is not paused
+    assert get_sending_times(session, 300)[0] - started_at >= 1.0 - TIME_TOLERANCE
+    assert get_sending_times(session, 400)[0] - started_at < 0.2
+    assert scheduler.get_stats()["queue_depth"] == 0
@@ -0,0 +1,91 @@
+"""
+Tests of ThrottlingMiddleware: excess callback queries are answered and dropped (not fed again),
+rules of handlers' flags are included into stats.
+"""
+
+import asyncio
+
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from benchmarks.fake_session import FAKE_TOKEN, FakeTelegramSession
+
+from bot_scripts.middlewares import ThrottlingMiddleware, ThrottlingRule
+from bot_scripts.updates_processing import CallbackRouter
+
+
+class PageCallback(CallbackData, prefix = "pg"):
+    page : int
+
+
+class StopCallback(CallbackData, prefix = "st"):
+    pass
+
+
+def make_update(update_id : int, user_id : int, callback_data : str) -> Update:
+    return Update(
+        update_id = update_id,
+        callback_query = CallbackQuery(
+            id = str(update_id),
+            from_user = User(id = user_id, is_bot = False, first_name = "User"),
+            chat_instance = "1",
+            data = callback_data,
+            message = Message(message_id = 1, date = datetime.now(), chat = Chat(id = user_id, type = "private")),
+        ),
+    )
+
+
+def make_dispatcher(handled : list) -> tuple[Dispatcher, ThrottlingMiddleware]:
+    router = CallbackRouter(name = "callbacks")
+    throttling = ThrottlingMiddleware(ThrottlingRule(rate = 0.01, capacity = 2), name = "callbacks")
+    router.callback_query.middleware(throttling)
+
+    @router.callback(PageCallback)
+    async def next_page(callback : CallbackQuery, callback_data : PageCallback):
+        handled.append(f"page {callback_data.page}")
+
+    @router.callback(StopCallback, flags = {"throttling" : ThrottlingRule(rate = 0.01, capacity = 1)})
+    async def stop(callback : CallbackQuery, callback_data : StopCallback):
+        handled.append("stop")
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    return dispatcher, throttling
+
+
+def test_excess_callbacks_are_answered_and_not_handled_later():
+    async def run():
+        handled = []
+        dispatcher, throttling = make_dispatcher(handled)
+        session = FakeTelegramSession()
+        bot = Bot(token = FAKE_TOKEN, session = session)
+
+        for update_id, callback_data in enumerate(("pg:1", "pg:2", "pg:3", "st", "pg:4")):
+            await dispatcher.feed_update(bot, make_update(update_id, 7, callback_data))
+        await asyncio.sleep(0.1)
+
+        # Excess clicks are not fed again after STOP
+        assert handled == ["page 1", "page 2", "stop"]
+        assert session.get_calls_count("answerCallbackQuery") == 2
+        assert throttling.get_stats()["dropped_count"] == 2
+
+    asyncio.run(run())
+
+
+def test_stats_include_rules_of_handlers():
+    async def run():
+        dispatcher, throttling = make_dispatcher([])
+        bot = Bot(token = FAKE_TOKEN, session = FakeTelegramSession())
+        for update_id in range(3):
+            await dispatcher.feed_update(bot, make_update(update_id, 8, "st"))
+        await dispatcher.feed_update(bot, make_update(3, 9, "pg:1"))
+
+        stats = throttling.get_stats()
+        assert stats["rules_count"] == 2
+        assert stats["buckets_count"] == 2
+        assert stats["top_throttled"] == [(8, 2)]
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+"""
+Tests of anonymization of captured updates: dumped capture does not contain original IDs, names and contacts.
+"""
+
+import json
+import tempfile
+
+from pathlib import Path
+
+from aiogram.types import Update
+
+from incoming import UpdateCaptureWriter, read_capture
+
+
+USER_ID = 111_222_333
+FORWARDED_USER_ID = 222_333_444
+CONTACT_USER_ID = 333_444_555
+SHARED_USER_ID = 444_555_666
+GROUP_ID = -100_555_666_777
+MIGRATED_GROUP_ID = -100_666_777_888
+SHARED_CHAT_ID = -100_777_888_999
+ORIGIN_CHAT_ID = -100_888_999_111
+BOT_ID = 42
+
+ORIGINAL_IDS = (USER_ID, FORWARDED_USER_ID, CONTACT_USER_ID, SHARED_USER_ID, GROUP_ID, MIGRATED_GROUP_ID, SHARED_CHAT_ID, ORIGIN_CHAT_ID)
+PERSONAL_DATA = ("Alice", "Bob", "Carol", "Dave", "alice_nick", "+79990001122", "Hidden Eve", "shared_group")
+
+DATE = 1_700_000_000
+USER = {"id" : USER_ID, "is_bot" : False, "first_name" : "Alice", "username" : "alice_nick"}
+GROUP = {"id" : GROUP_ID, "type" : "supergroup", "title" : "Group"}
+
+
+def make_updates() -> list[dict]:
+    return [
+        {"update_id" : 1, "message" : {
+            "message_id" : 1, "date" : DATE, "chat" : GROUP, "from" : USER,
+            "via_bot" : {"id" : BOT_ID, "is_bot" : True, "first_name" : "Bot"},
+            "forward_origin" : {"type" : "user", "date" : DATE, "sender_user" : {"id" : FORWARDED_USER_ID, "is_bot" : False, "first_name" : "Bob"}},
+            "external_reply" : {
+                "origin" : {"type" : "chat", "date" : DATE, "sender_chat" : {"id" : ORIGIN_CHAT_ID, "type" : "channel", "title" : "Channel"}},
+                "chat" : {"id" : ORIGIN_CHAT_ID, "type" : "channel", "title" : "Channel"},
+            },
+            "reply_to_message" : {
+                "message_id" : 0, "date" : DATE, "chat" : GROUP,
+                "forward_origin" : {"type" : "hidden_user", "date" : DATE, "sender_user_name" : "Hidden Eve"},
+            },
+        }},
+        {"update_id" : 2, "message" : {
+            "message_id" : 2, "date" : DATE, "chat" : GROUP, "from" : USER,
+            "contact" : {
+                "phone_number" : "+79990001122", "first_name" : "Carol", "user_id" : CONTACT_USER_ID,
+                "vcard" : "BEGIN:VCARD\\nTEL:+79990001122\\nEND:VCARD",
+            },
+        }},
+        {"update_id" : 3, "message" : {"message_id" : 3, "date" : DATE, "chat" : GROUP, "migrate_to_chat_id" : MIGRATED_GROUP_ID}},
+        {"update_id" : 4, "message" : {
+            "message_id" : 4, "date" : DATE, "chat" : {"id" : MIGRATED_GROUP_ID, "type" : "supergroup", "title" : "Group"},
+            "migrate_from_chat_id" : GROUP_ID,
+        }},
+        {"update_id" : 5, "message" : {
+            "message_id" : 5, "date" : DATE, "chat" : {"id" : USER_ID, "type" : "private", "first_name" : "Alice"}, "from" : USER,
+            "users_shared" : {"request_id" : 1, "users" : [{"user_id" : SHARED_USER_ID, "first_name" : "Dave"}]},
+        }},
+        {"update_id" : 6, "message" : {
+            "message_id" : 6, "date" : DATE, "chat" : {"id" : USER_ID, "type" : "private", "first_name" : "Alice"}, "from" : USER,
+            "chat_shared" : {"request_id" : 2, "chat_id" : SHARED_CHAT_ID, "username" : "shared_group"},
+        }},
+        {"update_id" : 7, "chat_join_request" : {"chat" : GROUP, "from" : USER, "user_chat_id" : USER_ID, "date" : DATE}},
+    ]
+
+
+def test_capture_does_not_contain_original_ids():
+    directory = Path(tempfile.mkdtemp(prefix = "capture-"))
+    writer = UpdateCaptureWriter(directory, salt = "test")
+    for update in make_updates():
+        # Updates are dumped like in UpdateCaptureMiddleware
+        dumped_update = Update.model_validate(update).model_dump(mode = "json", by_alias = True, exclude_none = True, exclude_unset = True)
+        writer.write(dumped_update, DATE)
+    writer.close()
+
+    captured_updates = [update for _, update in read_capture([directory])]
+    assert len(captured_updates) == 7
+    capture_text = json.dumps(captured_updates, ensure_ascii = False)
+    for original_id in ORIGINAL_IDS:
+        assert str(abs(original_id)) not in capture_text, original_id
+    for personal_data in PERSONAL_DATA:
+        assert personal_data not in capture_text, personal_data
+    # IDs of bots are kept, the same ID is replaced by the same value
+    assert captured_updates[0]["message"]["via_bot"]["id"] == BOT_ID
+    assert captured_updates[2]["message"]["migrate_to_chat_id"] == captured_updates[3]["message"]["chat"]["id"]
+    assert captured_updates[0]["message"]["from"]["id"] == captured_updates[6]["chat_join_request"]["user_chat_id"]
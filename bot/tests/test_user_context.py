@@ -0,0 +1,95 @@
+"""
+Tests of UserContext and UserContextResolverMiddleware: roles of sender are taken from roles index,
+record of manager is read lazily once and cache of managers' records follows changes of managers.
+"""
+
+import asyncio
+
+import pytest
+
+from aiogram import types
+
+from bot_scripts.middlewares import UserContext, UserContextResolverMiddleware
+from database import BotDBClient
+
+
+OWNER_ID = 1
+MANAGER_ID = 2
+
+
+@pytest.fixture
+def database_client(tmp_path) -> BotDBClient:
+    database_client = BotDBClient(database_path = tmp_path / "bot_database.db")
+    for user_id in (OWNER_ID, MANAGER_ID):
+        assert database_client.register_user(user_id, first_name = f"user {user_id}")
+    for company_number in (1, 2):
+        assert database_client.register_company(f"company {company_number}", -company_number, "09:00", "18:00", 900, [5, 6], {})
+    assert database_client.register_owner(OWNER_ID, 2)
+    assert database_client.register_manager(MANAGER_ID, owner_id = OWNER_ID, extra_name = "support")
+    assert database_client.register_manager(MANAGER_ID, manager_company_id = 1)
+    return database_client
+
+
+def count_manager_queries(database_client : BotDBClient, monkeypatch) -> list[int]:
+    queried_users = []
+    get_manager_info = database_client.get_manager_info
+
+    def counted_get_manager_info(user_id : int, *args, **kwargs):
+        queried_users.append(user_id)
+        return get_manager_info(user_id, *args, **kwargs)
+
+    monkeypatch.setattr(database_client, "get_manager_info", counted_get_manager_info)
+    return queried_users
+
+
+def test_roles_are_resolved_from_index(database_client):
+    owner_context = UserContext(OWNER_ID, database_client)
+    assert owner_context.is_owner and not owner_context.is_manager and not owner_context.is_bot_admin
+    assert owner_context.company_id == 2
+    assert owner_context.get_role(2) == "owner"
+    assert owner_context.manager_info is None
+
+    manager_context = UserContext(MANAGER_ID, database_client)
+    assert manager_context.managed_companies == {1, 2}
+    # The lowest ID of managed companies
+    assert manager_context.company_id == 1
+    assert manager_context.get_role(2) == "manager"
+    assert manager_context.describe() == "manager of [1, 2]"
+
+    assert UserContext(100, database_client).describe() == "user"
+
+
+def test_manager_record_is_read_once(database_client, monkeypatch):
+    queried_users = count_manager_queries(database_client, monkeypatch)
+    owner_context = UserContext(OWNER_ID, database_client)
+    assert owner_context.manager_info is None
+    assert queried_users == []
+
+    for _ in range(3):
+        manager_context = UserContext(MANAGER_ID, database_client)
+        assert manager_context.manager_info is not None
+        assert manager_context.manager_info["user_tg_id"] == MANAGER_ID
+    assert queried_users == [MANAGER_ID]
+
+    assert database_client.delete_manager(MANAGER_ID, OWNER_ID)
+    manager_context = UserContext(MANAGER_ID, database_client)
+    assert manager_context.managed_companies == {1}
+    assert manager_context.manager_info["company_id"] == 1
+    assert queried_users == [MANAGER_ID, MANAGER_ID]
+
+
+def test_middleware_passes_context_of_sender(database_client):
+    middleware = UserContextResolverMiddleware(database_client)
+    received = []
+
+    async def handler(event, data):
+        received.append(data["user_context"])
+
+    async def run():
+        user = types.User(id = OWNER_ID, is_bot = False, first_name = "owner")
+        await middleware(handler, types.Update(update_id = 1), {"event_from_user" : user})
+        await middleware(handler, types.Update(update_id = 2), {})
+
+    asyncio.run(run())
+    assert received[0].user_id == OWNER_ID and received[0].is_owner
+    assert received[1] is None
@@ -4,12 +4,20 @@ from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from config import get_dev_tg_id
+from config import get_dev_tg_id, get_loop_watchdog_threshold, get_metrics_port, get_updates_workers_count
 
 from communication import Communicator 
 
 from database import BotDBClient
 
+from incoming import IntakeGuard, LoopLagMonitor, LoopWatchdog, UpdateClassifier
+
+from logger import set_failed_messages_sink
+
+from metrics import ApiMetricsMiddleware, BotMetrics, MetricsExporter
+
+from outgoing import OutgoingScheduler, OutboxDispatcher
+
 from token_ import TOKEN
 
 UTC_TZ = pytz.utc
@@ -27,5 +35,33 @@ bot = Bot(
         link_preview_is_disabled = True
     )
 )
+# All outgoing requests of bot go through scheduler, which keeps Telegram limits
+outgoing_scheduler = OutgoingScheduler()
+bot.session.middleware(outgoing_scheduler)
+
+# Metrics of handlers, filters, errors and API requests, they are served by local endpoint (if port is set) and /metrics command
+bot_metrics = BotMetrics()
+api_metrics_middleware = ApiMetricsMiddleware(bot_metrics)
+bot.session.middleware(api_metrics_middleware)
+metrics_exporter = MetricsExporter(bot_metrics.registry, port = get_metrics_port()) if get_metrics_port() else None
+
+# Alerts and error reports which were not sent are kept in "outbox" table and delivered by dispatcher
+outbox_dispatcher = OutboxDispatcher(database_client = bot_db_client, bot = bot)
+set_failed_messages_sink(
+    lambda receiver_id, message_text: outbox_dispatcher.enqueue("reporter", receiver_id, message_text, kind = "error_report")
+)
+
+# Overload protection: low-priority updates are shed, when loop lags, too many updates are in processing
+# or outgoing messages wait for Telegram limits too long (LOW updates take at most half of updates workers)
+loop_lag_monitor = LoopLagMonitor()
+intake_guard = IntakeGuard(
+    classify = UpdateClassifier(bot_db_client).classify,
+    lag_monitor = loop_lag_monitor,
+    get_outgoing_delay = outgoing_scheduler.get_queue_delay,
+    max_low_pending = max(1, get_updates_workers_count() // 2),
+)
+
+# Detector of loop blocking by synchronous code, it is started on launch, if threshold is set ("loop_watchdog_threshold": 0 - off)
+loop_watchdog = LoopWatchdog(threshold = get_loop_watchdog_threshold() or 0.1)
 
 bot_tag = None
\ No newline at end of file